@@ -0,0 +1,162 @@
+# Throughput of concurrent bid writes + bid polls, blocking vs. AsyncDB.
+#
+# Runs the same SQL as create_bid / get_bids_for_nft against a local SQLite file.
+# Each statement sleeps --latency-ms to stand in for the SQL Server round-trip, which
+# is what actually blocks the event loop in production.
+#
+#   python benchmarks/bench_async_db.py [--clients 50] [--seconds 5] [--latency-ms 2]
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from db_async import AsyncDB  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE Users (UserID INTEGER PRIMARY KEY, Username TEXT UNIQUE NOT NULL);
+CREATE TABLE Listings (ListingID INTEGER PRIMARY KEY, NFTID INTEGER NOT NULL, IsActive INTEGER DEFAULT 1);
+CREATE TABLE Bids (BidID INTEGER PRIMARY KEY, ListingID INTEGER, BidderID INTEGER, BidAmount REAL, BidAt TEXT);
+"""
+
+
+class SlowCursor:
+    def __init__(self, connection, cursor, latency):
+        self._cursor = cursor
+        self.connection = connection
+        self._latency = latency
+
+    def execute(self, sql, params=()):
+        time.sleep(self._latency)
+        self._cursor.execute(sql, params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SlowConnection:
+    def __init__(self, path, latency):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._latency = latency
+
+    def cursor(self):
+        return SlowCursor(self, self._conn.cursor(), self._latency)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def interrupt(self):
+        self._conn.interrupt()
+
+    def close(self):
+        self._conn.close()
+
+
+def place_bid(cursor, nft_id, username, amount):
+    cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (nft_id,))
+    listing_id = cursor.fetchone()[0]
+    cursor.execute("SELECT UserID FROM Users WHERE Username = ?", (username,))
+    bidder_id = cursor.fetchone()[0]
+    cursor.execute(
+        "INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+        (listing_id, bidder_id, amount),
+    )
+    cursor.connection.commit()
+
+
+def load_bids(cursor, nft_id):
+    cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (nft_id,))
+    listing_id = cursor.fetchone()[0]
+    cursor.execute(
+        """SELECT b.BidID, b.BidAmount, b.BidAt, b.BidderID, u.Username
+           FROM Bids b INNER JOIN Users u ON b.BidderID = u.UserID
+           WHERE b.ListingID = ? ORDER BY b.BidAmount DESC LIMIT 50""",
+        (listing_id,),
+    )
+    return cursor.fetchall()
+
+
+def setup(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO Users (UserID, Username) VALUES (?, ?)", [(i, f"user{i}") for i in range(1, 101)])
+    conn.executemany("INSERT INTO Listings (ListingID, NFTID) VALUES (?, ?)", [(i, i) for i in range(1, 11)])
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.commit()
+    conn.close()
+
+
+async def run_clients(call, clients, seconds):
+    done = 0
+    deadline = time.monotonic() + seconds
+
+    async def client(n):
+        nonlocal done
+        i = 0
+        while time.monotonic() < deadline:
+            nft_id = (n % 10) + 1
+            if i % 2 == 0:
+                await call(place_bid, nft_id, f"user{(n % 100) + 1}", float(i))
+            else:
+                await call(load_bids, nft_id)
+            done += 1
+            i += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    return done / (time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=2)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        setup(path)
+        latency = args.latency_ms / 1000
+        pool = ConnectionPool(lambda: SlowConnection(path, latency), max_size=args.pool_size)
+
+        # Before: the async handler calls the driver directly on the event loop
+        async def blocking(fn, *a):
+            with pool.connection() as conn:
+                return fn(conn.cursor(), *a)
+
+        db = AsyncDB(pool)
+
+        # After: the same work awaited through AsyncDB
+        async def non_blocking(fn, *a):
+            return await db.run(fn, *a)
+
+        before = asyncio.run(run_clients(blocking, args.clients, args.seconds))
+        after = asyncio.run(run_clients(non_blocking, args.clients, args.seconds))
+        db.shutdown()
+        pool.close()
+
+    print(f"clients={args.clients} latency={args.latency_ms}ms pool={args.pool_size}")
+    print(f"blocking on event loop: {before:8.1f} req/s")
+    print(f"AsyncDB thread pool:    {after:8.1f} req/s  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# Bid ingestion under a concurrent burst: per-bid commits against the bid engine.
+#
+# Seeds --listings listings and --bidders bidders with random wallet balances in the
+# SQLite stand-in, then fires --bids bids from --clients concurrent clients, most of
+# them on a handful of hot listings and many at or below the going price, as in the
+# last seconds of an auction. Each client waits for its bid's outcome before the
+# next one. Three ways of taking them, each on a fresh copy of the database:
+#   - the old create_bid body: INSERT and commit per bid, no validation;
+#   - BidEngine with max_batch=1: validated, one transaction per bid;
+#   - BidEngine with max_batch=--batch: validated, group commit.
+# Reports throughput and latency, and checks the bids in the database: amounts must
+# rise with BidID on every listing, and no bidder's highest bids on active listings
+# may add up to more than their balance. For the engine, every accepted bid must be
+# in Bids and no rejected one.
+#
+#   python benchmarks/bench_bid_ingest.py [--bids 20000] [--clients 64] [--listings 200] [--bidders 500] [--batch 64] [--latency 0.001]
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from bid_engine import BidEngine  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+from migrate import migrate  # noqa: E402
+
+SELLER_ID = 1
+
+
+def prepare(path, listings, bidders, rng):
+    standin.create_schema(path, seed=False)
+    conn = standin.connect(path)
+    cursor = conn.raw.cursor()
+    cursor.executemany("INSERT INTO Users (UserID, Username, Email) VALUES (?, ?, ?)",
+                       [(user_id, f"user{user_id}", f"user{user_id}@example.com") for user_id in range(1, bidders + 2)])
+    cursor.executemany("INSERT INTO Wallets (UserID, PublicKey, Balance) VALUES (?, ?, ?)",
+                       [(user_id, f"0x{user_id:040x}", round(rng.uniform(50, 1500), 2))
+                        for user_id in range(2, bidders + 2)])
+    cursor.executemany("INSERT INTO NFTs (NFTID, Title, OwnerID) VALUES (?, ?, ?)",
+                       [(nft_id, f"NFT {nft_id}", SELLER_ID) for nft_id in range(1, listings + 1)])
+    cursor.executemany("INSERT INTO Listings (ListingID, NFTID, SellerID, Price, IsActive) VALUES (?, ?, ?, 10, 1)",
+                       [(nft_id, nft_id, SELLER_ID) for nft_id in range(1, listings + 1)])
+    conn.raw.commit()
+    migrate(conn, out=lambda line: None)
+    conn.close()
+
+
+def workload(count, listings, bidders, rng):
+    # A fifth of the listings draw most bids; amounts climb with the number of bids a
+    # listing has drawn, with enough spread that many arrive below the going price
+    weights = [5 if listing_id <= listings // 5 else 1 for listing_id in range(1, listings + 1)]
+    drawn = [0] * (listings + 1)
+    bids = []
+    for listing_id in rng.choices(range(1, listings + 1), weights, k=count):
+        drawn[listing_id] += 1
+        amount = round(10 + drawn[listing_id] * 2 + rng.uniform(-40, 40), 2)
+        bids.append((listing_id, rng.randint(2, bidders + 1), max(amount, 1.0)))
+    return bids
+
+
+def run_clients(bids, clients, place):
+    # Each client places its share of the bids one after another; returns (seconds, latencies in ms, outcomes)
+    latencies, outcomes = [], []
+    lock = threading.Lock()
+
+    def client(share):
+        mine, results = [], []
+        for bid in share:
+            started = time.perf_counter()
+            results.append((bid, place(*bid)))
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+            outcomes.extend(results)
+
+    threads = [threading.Thread(target=client, args=(bids[i::clients],)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, outcomes
+
+
+def check(path):
+    # (listings whose amounts don't rise with BidID, bidders reserved beyond their balance)
+    conn = standin.connect(path)
+    cursor = conn.raw.cursor()
+    falling = 0
+    last = {}
+    for listing_id, amount in cursor.execute("SELECT ListingID, BidAmount FROM Bids ORDER BY ListingID, BidID"):
+        if listing_id in last and amount <= last[listing_id]:
+            falling += 1
+        last[listing_id] = amount
+    over = cursor.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT b.BidderID, SUM(b.BidAmount) AS Reserved
+            FROM Bids b INNER JOIN Listings l ON l.ListingID = b.ListingID AND l.IsActive = 1
+            WHERE b.BidID = (SELECT x.BidID FROM Bids x WHERE x.ListingID = b.ListingID ORDER BY x.BidAmount DESC, x.BidID LIMIT 1)
+            GROUP BY b.BidderID
+        ) r INNER JOIN Wallets w ON w.UserID = r.BidderID
+        WHERE r.Reserved > w.Balance + 0.001
+    """).fetchone()[0]
+    rows = cursor.execute("SELECT COUNT(*) FROM Bids").fetchone()[0]
+    conn.close()
+    return falling, over, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bids", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--bidders", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.001, help="seconds per database round trip")
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "template.db")
+        prepare(template, args.listings, args.bidders, rng)
+        bids = workload(args.bids, args.listings, args.bidders, rng)
+        print(f"{args.bids:,} bids from {args.clients} clients on {args.listings} listings, "
+              f"{args.latency * 1000:g} ms per round trip\n")
+        print(f"{'':<24} {'bids/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'accepted':>9} {'falling':>8} {'over':>6}")
+
+        for label, batch in (("insert + commit per bid", None), ("engine, 1 per txn", 1),
+                             (f"engine, up to {args.batch} per txn", args.batch)):
+            path = os.path.join(tmp, f"run{batch}.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(template + suffix):
+                    shutil.copy(template + suffix, path + suffix)
+            pool = ConnectionPool(lambda: standin.connect(path, args.latency), max_size=args.clients)
+
+            if batch is None:
+                def place(listing_id, bidder_id, amount):
+                    with pool.connection() as conn:
+                        cursor = conn.cursor()
+                        cursor.execute("""
+                            INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt)
+                            OUTPUT INSERTED.BidID VALUES (?, ?, ?, GETDATE())
+                        """, (listing_id, bidder_id, amount))
+                        cursor.fetchone()
+                        conn.commit()
+                    return True
+                engine = None
+            else:
+                engine = BidEngine(pool, max_batch=batch, max_pending=args.bids)
+                engine.start()
+
+                def place(listing_id, bidder_id, amount):
+                    return engine.submit(listing_id, bidder_id, amount).result()
+
+            seconds, latencies, outcomes = run_clients(bids, args.clients, place)
+            if engine is not None:
+                engine.stop()
+            pool.close()
+
+            falling, over, rows = check(path)
+            if engine is None:
+                accepted = len(outcomes)
+            else:
+                accepted = sum(1 for _, result in outcomes if result.accepted)
+                assert accepted == rows, (accepted, rows)
+                assert falling == 0 and over == 0, (falling, over)
+            latencies.sort()
+            print(f"{label:<24} {len(outcomes) / seconds:8,.0f} {statistics.median(latencies):8.1f} "
+                  f"{latencies[int(len(latencies) * 0.99)]:8.1f} {accepted:9,} {falling:8,} {over:6,}")
+            if engine is not None:
+                stats = engine.stats()
+                print(f"{'':<24} {stats['batches']:,} batches, mean {stats['mean_batch']}, "
+                      f"rejected {stats['rejected']}")
+
+
+if __name__ == "__main__":
+    main()
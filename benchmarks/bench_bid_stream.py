@@ -0,0 +1,134 @@
+# Live bid fan-out: thousands of SSE subscribers on one NFT.
+#
+# Runs BidBroadcaster.events() generators (the bodies /api/nfts/{id}/bids/stream
+# streams) in-process, most reading promptly and a share of them stalled, while
+# bids are published at a fixed rate. Reports delivery latency for the prompt
+# subscribers, how many stalled ones were coalesced into a resync, and memory
+# growth, which should stay bounded by max_pending per subscriber. --trace-memory
+# measures with tracemalloc instead of peak RSS (much slower, skews latency).
+#
+#   python benchmarks/bench_bid_stream.py [--subscribers 5000] [--slow 0.1] [--bids 100] [--rate 20]
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bid_stream import BidBroadcaster  # noqa: E402
+
+NFT_ID = 1
+
+
+async def prompt_reader(stream, latencies, done):
+    received = 0
+    async for chunk in stream:
+        now = time.perf_counter()
+        for line in chunk.split(b"\n"):
+            if line.startswith(b"data: {\"BidID\""):
+                latencies.append((now - json.loads(line[6:])["SentAt"]) * 1000)
+                received += 1
+        if received >= done:
+            return received
+    return received
+
+
+async def stalled_reader(stream, stop):
+    # Reads the first chunk, then stops reading until the publisher is done
+    resyncs = 0
+    await stream.__anext__()
+    await stop.wait()
+    chunk = await stream.__anext__()
+    if b"event: resync" in chunk:
+        resyncs += 1
+    return resyncs
+
+
+class Memory:
+    # Bytes allocated since start(): tracemalloc when asked for, otherwise peak RSS
+    def __init__(self, trace):
+        self.trace = trace
+
+    def start(self):
+        if self.trace:
+            tracemalloc.start()
+        self.baseline = self.current()
+
+    def current(self):
+        if self.trace:
+            return tracemalloc.get_traced_memory()[0]
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def peak(self):
+        if self.trace:
+            return tracemalloc.get_traced_memory()[1] - self.baseline
+        return self.current() - self.baseline
+
+
+async def run(args):
+    broadcaster = BidBroadcaster(max_pending=args.max_pending, heartbeat=30)
+    slow = int(args.subscribers * args.slow)
+    stop = asyncio.Event()
+    latencies = []
+
+    memory = Memory(args.trace_memory)
+    memory.start()
+
+    streams = [broadcaster.events(NFT_ID) for _ in range(args.subscribers)]
+    readers = [asyncio.create_task(prompt_reader(s, latencies, args.bids)) for s in streams[slow:]]
+    stalled = [asyncio.create_task(stalled_reader(s, stop)) for s in streams[:slow]]
+    while broadcaster.subscribers < args.subscribers:
+        await asyncio.sleep(0.01)
+    subscribed = memory.current() - memory.baseline
+
+    started = time.perf_counter()
+    for bid_id in range(1, args.bids + 1):
+        broadcaster.publish(NFT_ID, {
+            "BidID": bid_id,
+            "BidAmount": 100.0 + bid_id,
+            "BidAt": "2025-05-20 12:00:00",
+            "BidderID": 1,
+            "BidderUsername": "bench",
+            "SentAt": time.perf_counter(),
+        })
+        await asyncio.sleep(1 / args.rate)
+    delivered = sum(await asyncio.gather(*readers))
+    elapsed = time.perf_counter() - started
+    peak = memory.peak()
+
+    stop.set()
+    resyncs = sum(await asyncio.gather(*stalled))
+    for stream in streams:
+        await stream.aclose()
+
+    latencies.sort()
+    print(f"subscribers={args.subscribers} (stalled {slow}) bids={args.bids} at {args.rate}/s max_pending={args.max_pending}")
+    print(f"delivered {delivered} events in {elapsed:.2f}s ({delivered / elapsed:,.0f} events/s)")
+    print(f"delivery latency: p50 {statistics.median(latencies):.2f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms  max {latencies[-1]:.2f} ms")
+    print(f"stalled subscribers told to resync: {resyncs}/{slow} (coalesced {broadcaster.stats()['coalesced']})")
+    print(f"memory ({'tracemalloc' if args.trace_memory else 'peak RSS'}): "
+          f"{subscribed / args.subscribers / 1024:.1f} KiB per idle subscriber, "
+          f"{peak / 1024 / 1024:.1f} MiB total at peak")
+    print(f"subscribers left after close: {broadcaster.subscribers}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--slow", type=float, default=0.1)
+    parser.add_argument("--bids", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=20)
+    parser.add_argument("--max-pending", type=int, default=32)
+    parser.add_argument("--trace-memory", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# /api/browse filter, sort and facet-count latency at a million NFTs.
+#
+# Builds a FacetIndex over synthetic NFTs spread over categories and collections
+# (collection sizes are skewed, as drops are), each with a few of the tags and
+# about a third listed at random prices. Then times browse() for common filter
+# combinations, facet counts included, and the updates mint, listing and tag
+# changes apply. Latencies are for the index only; the handler adds one
+# `WHERE NFTID IN (...)` query for the page of rows.
+#
+#   python benchmarks/bench_browse.py [--nfts 1000000] [--queries 300] [--tags 200]
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from facet_index import FacetIndex  # noqa: E402
+
+CATEGORIES = 20
+COLLECTIONS = 2000
+
+
+def percentile(samples, p):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def report(label, samples):
+    print(f"{label:<34} {statistics.median(samples):8.3f} {percentile(samples, 95):8.3f} "
+          f"{percentile(samples, 99):8.3f} {max(samples):8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nfts", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--tags", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    categories = [(i, f"Category {i}") for i in range(1, CATEGORIES + 1)]
+    collections = [(i, f"Collection {i}", rng.randint(1, CATEGORIES)) for i in range(1, COLLECTIONS + 1)]
+    tags = [(i, f"tag{i}") for i in range(1, args.tags + 1)]
+    collection_weights = [1 / (rank + 1) for rank in range(COLLECTIONS)]
+    tag_weights = [1 / (rank + 1) for rank in range(args.tags)]
+
+    nfts = list(zip(range(1, args.nfts + 1), rng.choices(range(1, COLLECTIONS + 1), collection_weights, k=args.nfts)))
+    nft_tags = array("i")
+    tag_pool = rng.choices(range(1, args.tags + 1), tag_weights, k=1 << 16)
+    for nft_id in range(1, args.nfts + 1):
+        start = rng.randrange(len(tag_pool) - 3)
+        for tag_id in set(tag_pool[start:start + rng.randint(0, 3)]):
+            nft_tags.append(nft_id)
+            nft_tags.append(tag_id)
+    listings = [(nft_id, round(rng.lognormvariate(3, 1.2), 2)) for nft_id in range(1, args.nfts + 1)
+                if rng.random() < 0.35]
+
+    index = FacetIndex()
+    started = time.perf_counter()
+    index.build(categories, collections, tags, nfts, nft_tags, listings)
+    build_s = time.perf_counter() - started
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    stats = index.stats()
+    print(f"nfts={args.nfts:,} listed={stats['listed']:,} categories={CATEGORIES} collections={COLLECTIONS:,} "
+          f"tags={args.tags} tag assignments={len(nft_tags) // 2:,}")
+    print(f"build={build_s:.1f}s peak RSS={rss_mb:,.0f} MiB")
+
+    def category():
+        return [rng.randint(1, CATEGORIES)]
+
+    def popular_tag():
+        return [rng.randint(1, 10)]
+
+    kinds = {
+        "no filter": lambda: {},
+        "category": lambda: {"categories": category()},
+        "category + tag": lambda: {"categories": category(), "tags": popular_tag()},
+        "collection": lambda: {"collections": [rng.randint(1, 50)]},
+        "price range, by price": lambda: {"min_price": 10, "max_price": 50, "sort": "price_asc"},
+        "category + tag + price, by price": lambda: {
+            "categories": category(), "tags": popular_tag(), "min_price": 5, "max_price": 100, "sort": "price_desc"},
+        "two categories + three tags": lambda: {
+            "categories": category() + category(), "tags": [rng.randint(1, args.tags) for _ in range(3)]},
+        "listed, page 20": lambda: {"listed": True, "offset": 19 * 24},
+        "page 2 of the above, no facets": lambda: {
+            "categories": category(), "tags": popular_tag(), "min_price": 5, "max_price": 100, "sort": "price_desc",
+            "offset": 24, "facet_values": 0},
+    }
+    print(f"\n{'query (24 per page)':<34} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind, make_query in kinds.items():
+        samples = []
+        for _ in range(args.queries):
+            query = make_query()
+            started = time.perf_counter()
+            index.browse(limit=24, **query)
+            samples.append((time.perf_counter() - started) * 1000)
+        report(kind, samples)
+
+    updates = {
+        "mint (add_nft)": lambda i: index.add_nft(args.nfts + i + 1, rng.randint(1, COLLECTIONS)),
+        "list / reprice (set_listing)": lambda i: index.set_listing(
+            rng.randint(1, args.nfts), round(rng.lognormvariate(3, 1.2), 2)),
+        "delist (set_listing None)": lambda i: index.set_listing(rng.randint(1, args.nfts), None),
+        "retag (set_tags)": lambda i: index.set_tags(rng.randint(1, args.nfts), rng.sample(range(1, 11), 2)),
+    }
+    print(f"\n{'update':<34} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind, update in updates.items():
+        samples = []
+        for i in range(args.queries):
+            started = time.perf_counter()
+            update(i)
+            samples.append((time.perf_counter() - started) * 1000)
+        report(kind, samples)
+
+
+if __name__ == "__main__":
+    main()
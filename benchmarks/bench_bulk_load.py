@@ -0,0 +1,80 @@
+# Seeding: one INSERT statement per row (as in metamood_tables.sql) vs. bulk_load.py.
+#
+# Generates a synthetic dataset, loads it into an empty schema with load_directory()
+# and checks row counts and that IDENTITY values were kept. The row-by-row path is
+# timed on the first --row-by-row rows of each file, which is enough for its rate.
+#
+#   python benchmarks/bench_bulk_load.py [--users 2000] [--latency-ms 1] [--chunk-size 5000]
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from bulk_load import TABLES, generate, load_directory, read_rows, table_file  # noqa: E402
+
+
+def row_by_row(conn, directory, limit):
+    # One statement (and round-trip) per row, a single commit at the end
+    cursor = conn.cursor()
+    rows_done = 0
+    started = time.perf_counter()
+    for table, _, _ in TABLES:
+        columns, rows = read_rows(table_file(directory, table))
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        for i, row in enumerate(rows):
+            if i == limit:
+                break
+            cursor.execute(sql, row)
+            rows_done += 1
+    conn.commit()
+    return rows_done / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=1)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--row-by-row", type=int, default=200, help="rows per table for the slow path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, "data")
+        counts = generate(data, args.users)
+        total = sum(counts.values())
+
+        slow_db = os.path.join(tmp, "slow.db")
+        standin.create_schema(slow_db, seed=False)
+        slow_rate = row_by_row(standin.connect(slow_db, latency=args.latency_ms / 1000), data, args.row_by_row)
+
+        fast_db = os.path.join(tmp, "fast.db")
+        standin.create_schema(fast_db, seed=False)
+        conn = standin.connect(fast_db, latency=args.latency_ms / 1000)
+        started = time.perf_counter()
+        results = load_directory(conn, data, chunk_size=args.chunk_size, out=io.StringIO())
+        elapsed = time.perf_counter() - started
+
+        raw = conn.raw.cursor()
+        for table, identity, _ in TABLES:
+            loaded = raw.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if loaded != counts[table]:
+                raise SystemExit(f"{table}: {loaded} rows loaded, {counts[table]} in the file")
+            if identity and raw.execute(f"SELECT MAX({identity}) FROM {table}").fetchone()[0] != counts[table]:
+                raise SystemExit(f"{table}: IDENTITY values were not kept")
+
+    print(f"users={args.users} rows={total:,} round-trip latency={args.latency_ms}ms chunk size={args.chunk_size}")
+    for table, (rows, rate) in results.items():
+        print(f"  {table:<16} {rows:>10,} rows {rate:>12,.0f} rows/s")
+    print(f"row-by-row INSERTs: {slow_rate:12,.0f} rows/s  (~{total / slow_rate / 60:.1f} min for this dataset)")
+    print(f"bulk_load:          {total / elapsed:12,.0f} rows/s  ({elapsed:.1f}s, {total / elapsed / slow_rate:.0f}x)")
+    print("row counts match and IDENTITY values were kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Hot-path queries before and after the index migrations (migrations/0001-0003).
+#
+# Loads a synthetic dataset with bulk_load.generate(), then times each handler's
+# SQL and prints its query plan on the bare schema, applies the migrations with
+# migrate.migrate(), and does the same again. SQLite plans stand in for SQL
+# Server's: SCAN means a table scan, SEARCH ... USING INDEX an index seek.
+# Listings.NFTID and Users.Username/Email already have UNIQUE indexes, so the
+# active-listing and login indexes only add covering columns; on SQL Server that
+# removes a key lookup per query, which SQLite (no INCLUDE) doesn't show.
+#
+#   python benchmarks/bench_indexes.py [--users 20000] [--repeat 200]
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from bulk_load import generate, load_directory  # noqa: E402
+from migrate import migrate  # noqa: E402
+
+# (label, SQL, parameter factory taking (rng, sizes))
+QUERIES = [
+    ("order book load", "SELECT BidID, BidAmount, BidAt, BidderID FROM Bids WHERE ListingID = ?",
+     lambda rng, n: (rng.randint(1, n["Listings"]),)),
+    ("bids by amount", "SELECT BidID, BidAmount, BidAt, BidderID FROM Bids WHERE ListingID = ? ORDER BY BidAmount DESC",
+     lambda rng, n: (rng.randint(1, n["Listings"]),)),
+    ("active listing", "SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1",
+     lambda rng, n: (rng.randint(1, n["NFTs"]),)),
+    ("views of an NFT", "SELECT COUNT(*) FROM NFT_Views WHERE NFTID = ?",
+     lambda rng, n: (rng.randint(1, n["NFTs"]),)),
+    ("reports, newest first", """
+        SELECT r.ReportID, r.Reason, r.ReportedAt, u.Username AS ReporterUsername, n.Title AS NFTTitle
+        FROM Reports r
+        INNER JOIN Users u ON r.ReporterID = u.UserID
+        INNER JOIN NFTs n ON r.NFTID = n.NFTID
+        ORDER BY r.ReportedAt DESC
+     """, lambda rng, n: ()),
+    ("login", "SELECT UserID FROM Users WHERE Username = ? AND Email = ?",
+     lambda rng, n: (lambda i: (f"user_{i}", f"user_{i}@example.com"))(rng.randint(1, n["Users"]))),
+    ("collections by category", "SELECT CollectionID, CollectionName FROM Collections WHERE CategoryID = ?",
+     lambda rng, n: (rng.randint(1, n["Categories"]),)),
+    ("wallet of a user", "SELECT WalletID, UserID, PublicKey, Balance FROM Wallets WHERE UserID = ?",
+     lambda rng, n: (rng.randint(1, n["Users"]),)),
+]
+
+
+def plan(conn, sql, params):
+    rows = conn.raw.execute("EXPLAIN QUERY PLAN " + standin.translate(sql, params)[0], params).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+def measure(conn, sizes, repeat):
+    results = {}
+    for label, sql, make_params in QUERIES:
+        rng = random.Random(label)
+        cursor = conn.cursor()
+        samples = []
+        for _ in range(repeat):
+            params = make_params(rng, sizes)
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[label] = (statistics.median(samples), plan(conn, sql, make_params(rng, sizes)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, "data")
+        sizes = generate(data, args.users)
+        path = os.path.join(tmp, "bench.db")
+        standin.create_schema(path, seed=False)
+        conn = standin.connect(path)
+        load_directory(conn, data, out=io.StringIO())
+
+        before = measure(conn, sizes, args.repeat)
+        migrate(conn, out=lambda line: None)
+        after = measure(conn, sizes, args.repeat)
+
+    print(f"users={args.users:,} NFTs={sizes['NFTs']:,} listings={sizes['Listings']:,} bids={sizes['Bids']:,} "
+          f"views={sizes['NFT_Views']:,} reports={sizes['Reports']:,}")
+    print(f"{'query':<24} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for label, _, _ in QUERIES:
+        old_ms, new_ms = before[label][0], after[label][0]
+        print(f"{label:<24} {old_ms:10.3f} {new_ms:10.3f} {old_ms / new_ms:7.1f}x")
+    print()
+    for label, _, _ in QUERIES:
+        print(f"{label}\n  before: {before[label][1]}\n  after:  {after[label][1]}")
+
+
+if __name__ == "__main__":
+    main()
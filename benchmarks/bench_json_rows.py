@@ -0,0 +1,105 @@
+# Serialization CPU time for /api/collections and /api/reports at 100k rows.
+#
+# Compares the old response path (a dict per row, str() on every ReportedAt, then
+# FastAPI's response_model validation, jsonable_encoder and json.dumps via
+# JSONResponse) with json_rows.encode_rows, which goes from the cursor tuples to
+# bytes with orjson. Rows are synthetic tuples shaped like the two queries; no
+# database time is included. The models mirror the ones in main.py.
+#
+#   python benchmarks/bench_json_rows.py [--rows 100000] [--repeat 5]
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from json_rows import encode_rows  # noqa: E402
+
+
+class Collection(BaseModel):
+    CollectionID: int
+    CollectionName: str
+    CreatorID: int
+    CategoryID: Optional[int] = None
+
+
+class ReportWithDetails(BaseModel):
+    ReportID: int
+    ReporterUsername: str
+    NFTTitle: str
+    Reason: Optional[str] = None
+    ReportedAt: str
+
+
+COLLECTION_COLUMNS = ["CollectionID", "CollectionName", "CreatorID", "CategoryID"]
+REPORT_COLUMNS = ["ReportID", "Reason", "ReportedAt", "ReporterUsername", "NFTTitle"]
+
+
+def response_model_path(model, columns, rows, stringify=None):
+    # What the handlers did before: dicts, optional str() pass, then FastAPI's serialization
+    items = [dict(zip(columns, row)) for row in rows]
+    if stringify:
+        for item in items:
+            item[stringify] = str(item[stringify])
+    field = create_response_field(name="response", type_=List[model], mode="serialization")
+    content = asyncio.run(serialize_response(field=field, response_content=items))
+    return JSONResponse(content).body
+
+
+def time_it(fn, repeat):
+    samples, body = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), min(samples), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    reported = datetime(2024, 5, 1, 10, 0, 0, 123000)
+    collections = [(i, f"Collection {i}", i % 5000 + 1, None if i % 7 == 0 else i % 20 + 1)
+                   for i in range(1, args.rows + 1)]
+    reports = [(i, None if i % 3 == 0 else "Copied artwork, please review", reported + timedelta(seconds=i),
+                f"user_{i % 5000}", f"Dragon #{i}") for i in range(1, args.rows + 1)]
+
+    cases = [
+        ("collections", "response_model", lambda: response_model_path(Collection, COLLECTION_COLUMNS, collections)),
+        ("collections", "encode_rows", lambda: encode_rows(COLLECTION_COLUMNS, collections)),
+        ("reports", "response_model", lambda: response_model_path(
+            ReportWithDetails, REPORT_COLUMNS, reports, stringify="ReportedAt")),
+        ("reports", "encode_rows", lambda: encode_rows(REPORT_COLUMNS, reports)),
+    ]
+
+    # Same documents apart from the ReportedAt format (str() before, ISO 8601 now)
+    old = json.loads(cases[2][2]())
+    new = json.loads(cases[3][2]())
+    assert [{**row, "ReportedAt": None} for row in old] == [{**row, "ReportedAt": None} for row in new]
+    assert json.loads(cases[0][2]()) == json.loads(cases[1][2]())
+
+    print(f"rows={args.rows:,} repeat={args.repeat}")
+    print(f"{'endpoint':<12} {'path':<16} {'median ms':>10} {'best ms':>10} {'MB':>7} {'rows/s':>12}")
+    for endpoint, path, fn in cases:
+        median, best, size = time_it(fn, args.repeat)
+        print(f"{endpoint:<12} {path:<16} {median:10.1f} {best:10.1f} {size / 1e6:7.1f} "
+              f"{args.rows / median * 1000:12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# Collection market stats at a million sales: in-memory rollups against per-request SQL.
+#
+# Loads a synthetic dataset with bulk_load.generate() into the SQLite stand-in and
+# adds --sales Transactions over the last 30 days, most of them in a few popular
+# collections, then applies the migrations. Times:
+#   - MarketStats.load(), and rollup() alone against the same buckets built with a
+#     Python loop;
+#   - one collection's floor, 24h / 7d volume and 7 days of hourly buckets, from
+#     memory against the queries a handler would otherwise run, checking both agree;
+#   - sync() of --batch new sales, and listing updates with the floor read after each.
+#
+#   python benchmarks/bench_market_stats.py [--users 5000] [--sales 1000000] [--batch 1000] [--repeat 20]
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from bulk_load import generate, load_directory  # noqa: E402
+from market_stats import HOUR, MarketStats, rollup  # noqa: E402
+from migrate import migrate  # noqa: E402
+
+HOURS = 168
+
+FLOOR_SQL = """
+    SELECT MIN(l.Price), COUNT(*) FROM Listings l INNER JOIN NFTs n ON n.NFTID = l.NFTID
+    WHERE n.CollectionID = ? AND l.IsActive = 1
+"""
+VOLUME_SQL = """
+    SELECT SUM(t.SalePrice), COUNT(*) FROM Transactions t INNER JOIN NFTs n ON n.NFTID = t.NFTID
+    WHERE n.CollectionID = ? AND t.TransactionDate >= ?
+"""
+# Without open and close, which SQL can only get with window functions
+HISTORY_SQL = """
+    SELECT DATEADD(HOUR, DATEDIFF(HOUR, 0, t.TransactionDate), 0) AS HourStart,
+           MIN(t.SalePrice), MAX(t.SalePrice), SUM(t.SalePrice), COUNT(*)
+    FROM Transactions t INNER JOIN NFTs n ON n.NFTID = t.NFTID
+    WHERE n.CollectionID = ? AND t.TransactionDate >= ?
+    GROUP BY DATEADD(HOUR, DATEDIFF(HOUR, 0, t.TransactionDate), 0)
+    ORDER BY HourStart
+"""
+
+
+def add_sales(conn, count, sizes, rng, start, span):
+    # A third of the sales go to the NFTs of the 20 biggest collections
+    cursor = conn.raw.cursor()
+    nfts = cursor.execute("SELECT NFTID, CollectionID FROM NFTs WHERE CollectionID IS NOT NULL").fetchall()
+    by_collection = {}
+    for nft_id, collection_id in nfts:
+        by_collection.setdefault(collection_id, []).append(nft_id)
+    popular = sorted(by_collection, key=lambda c: -len(by_collection[c]))[:20]
+    hot = [nft_id for collection_id in popular for nft_id in by_collection[collection_id]]
+    rows = []
+    for _ in range(count):
+        nft_id = rng.choice(hot) if rng.random() < 0.3 else rng.choice(nfts)[0]
+        at = (start + timedelta(seconds=rng.random() * span)).strftime("%Y-%m-%d %H:%M:%S")
+        rows.append((nft_id, rng.randint(1, sizes["Users"]), rng.randint(1, sizes["Users"]),
+                     round(rng.lognormvariate(3, 1), 2), at))
+    cursor.executemany("INSERT INTO Transactions (NFTID, BuyerID, SellerID, SalePrice, TransactionDate) "
+                       "VALUES (?, ?, ?, ?, ?)", rows)
+    conn.raw.commit()
+    return popular[0]
+
+
+def python_rollup(collections, times, prices, transaction_ids):
+    # What rollup() replaces: one dict entry per (collection, hour), updated a sale at a time
+    buckets = {}
+    for collection_id, at, price, _ in sorted(zip(collections, times, prices, transaction_ids),
+                                              key=lambda sale: (sale[0], sale[1], sale[3])):
+        bucket = buckets.get((collection_id, int(at // HOUR)))
+        if bucket is None:
+            buckets[(collection_id, int(at // HOUR))] = [price, price, price, price, price, 1]
+        else:
+            bucket[1] = max(bucket[1], price)
+            bucket[2] = min(bucket[2], price)
+            bucket[3] = price
+            bucket[4] += price
+            bucket[5] += 1
+    return buckets
+
+
+def time_it(fn, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=1000, help="new sales per sync()")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, "data")
+        sizes = generate(data, args.users)
+        path = os.path.join(tmp, "bench.db")
+        standin.create_schema(path, seed=False)
+        conn = standin.connect(path)
+        load_directory(conn, data, out=io.StringIO())
+        # Frozen at the end of the loaded sales, so the windows hold still between runs
+        now = datetime.now().replace(microsecond=0)
+        collection_id = add_sales(conn, args.sales, sizes, rng, now - timedelta(days=30), 30 * 86400 - 1)
+        migrate(conn, out=lambda line: None)
+        cursor = conn.cursor()
+        clock = [now.timestamp()]
+        stats = MarketStats(clock=lambda: clock[0])
+
+        started = time.perf_counter()
+        counted = stats.load(cursor)
+        print(f"sales={args.sales:,} collections={sizes['Collections']:,}; load() rolled up {counted:,} sales "
+              f"in {time.perf_counter() - started:.1f}s; {stats.stats()['buckets']:,} buckets, "
+              f"{stats.stats()['bucket_bytes'] / 1e6:.1f} MB")
+
+        collections = np.array([rng.randint(1, sizes["Collections"]) for _ in range(args.sales)], np.int64)
+        times = clock[0] - np.array([rng.random() * 30 * 86400 for _ in range(args.sales)])
+        prices = np.array([rng.lognormvariate(3, 1) for _ in range(args.sales)])
+        ids = np.arange(args.sales, dtype=np.int64)
+        numpy_ms, _ = time_it(lambda: rollup(collections, times, prices, ids), 3)
+        python_ms, _ = time_it(lambda: python_rollup(collections.tolist(), times.tolist(), prices.tolist(),
+                                                     ids.tolist()), 1)
+        print(f"rollup of {args.sales:,} sales: numpy {numpy_ms:.0f} ms, python loop {python_ms:.0f} ms "
+              f"({python_ms / numpy_ms:.0f}x)")
+
+        def from_sql():
+            floor = cursor.execute(FLOOR_SQL, (collection_id,)).fetchone()
+            volumes = {}
+            for window, hours in (("24h", 24), ("7d", 168)):
+                since = datetime.fromtimestamp((clock[0] // HOUR - hours + 1) * HOUR)
+                volumes[window] = cursor.execute(VOLUME_SQL, (collection_id, since)).fetchone()
+            since = datetime.fromtimestamp((clock[0] // HOUR - HOURS + 1) * HOUR)
+            history = cursor.execute(HISTORY_SQL, (collection_id, since)).fetchall()
+            return floor, volumes, history
+
+        sql_ms, (floor, volumes, history) = time_it(from_sql, 3)
+        memory_ms, result = time_it(lambda: stats.collection(collection_id, HOURS), args.repeat)
+        assert result["FloorPrice"] == (float(floor[0]) if floor[0] is not None else None)
+        assert result["Listed"] == floor[1]
+        for window in ("24h", "7d"):
+            assert result[f"Sales{window}"] == volumes[window][1], window
+            assert abs(result[f"Volume{window}"] - float(volumes[window][0] or 0)) < 0.01, window
+        assert [bucket["Sales"] for bucket in result["History"]] == [row[4] for row in history]
+        print(f"\ncollection {collection_id} ({result['Sales7d']:,} sales in 7 days, {len(history)} hours)")
+        print(f"{'per-request SQL':<24} {sql_ms:10.2f} ms")
+        print(f"{'MarketStats.collection':<24} {memory_ms:10.3f} ms  ({sql_ms / memory_ms:.0f}x)")
+
+        add_sales(conn, args.batch, sizes, rng, now, 59)
+        clock[0] += 60
+        started = time.perf_counter()
+        added = stats.sync(cursor)
+        print(f"\nsync() of {added:,} new sales: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        listed = list(stats._listed.items())
+        samples = []
+        for _ in range(args.repeat * 500):
+            nft_id, listed_collection = rng.choice(listed)
+            started = time.perf_counter()
+            stats.set_listing(nft_id, rng.choice((None, round(rng.lognormvariate(3, 1), 2))), listed_collection)
+            stats.collection(listed_collection, 1)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"listing update + stats read: {statistics.median(samples) * 1000:.1f} us median")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Moderation queue and "most reported" queries at 1M reports.
+#
+# Loads a synthetic dataset with bulk_load.generate() into the SQLite stand-in,
+# adds --reports reports spread over the last 90 days (a few NFTs draw most of
+# them), and applies the migrations, whose 0005 backfills the report rollups.
+# Then times:
+#   - the old /api/reports list (every report, newest first) against one page of
+#     the keyset-paginated queue, at the start and --depth rows in;
+#   - "most reported" for 24h / 7d / all time, grouped from Reports against read
+#     from NFT_Report_Hourly / NFT_Report_Counts, checking both give the same counts;
+#   - a report insert on its own against one with moderation.record_report.
+#
+#   python benchmarks/bench_moderation.py [--users 5000] [--reports 1000000] [--depth 10000] [--repeat 20]
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from bulk_load import generate, load_directory  # noqa: E402
+from migrate import migrate  # noqa: E402
+from moderation import load_report_queue, queue_cursor, record_report, top_reported  # noqa: E402
+
+PAGE = 50
+TOP = 20
+
+OLD_LIST = """
+    SELECT r.ReportID, r.Reason, r.ReportedAt, u.Username AS ReporterUsername, n.Title AS NFTTitle
+    FROM Reports r
+    INNER JOIN Users u ON r.ReporterID = u.UserID
+    INNER JOIN NFTs n ON r.NFTID = n.NFTID
+    ORDER BY r.ReportedAt DESC
+"""
+
+# What "most reported" costs without the rollups
+SCAN_TOP = """
+    SELECT TOP (?) r.NFTID, n.Title, COUNT(*) AS ReportCount, MAX(r.ReportedAt) AS LastReportedAt
+    FROM Reports r
+    INNER JOIN NFTs n ON n.NFTID = r.NFTID
+    {where}
+    GROUP BY r.NFTID, n.Title
+    ORDER BY COUNT(*) DESC, r.NFTID
+"""
+# The same whole-hour window as the rollup: from the start of the hour (hours - 1) ago
+SCAN_WINDOW = "WHERE r.ReportedAt >= DATEADD(HOUR, ?, DATEADD(HOUR, DATEDIFF(HOUR, 0, GETDATE()), 0))"
+
+
+def add_reports(conn, count, users, nfts, rng):
+    # Skewed like real reports: a tenth of them go to the same 50 NFTs
+    now = datetime.utcnow()
+    hot = rng.sample(range(1, nfts + 1), 50)
+    rows = []
+    for _ in range(count):
+        nft_id = rng.choice(hot) if rng.random() < 0.1 else rng.randint(1, nfts)
+        at = now - timedelta(seconds=rng.randrange(90 * 86400))
+        rows.append((rng.randint(1, users), nft_id, "Synthetic report", at.strftime("%Y-%m-%d %H:%M:%S")))
+    conn.raw.executemany("INSERT INTO Reports (ReporterID, NFTID, Reason, ReportedAt) VALUES (?, ?, ?, ?)", rows)
+    conn.raw.commit()
+
+
+def time_it(fn, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--depth", type=int, default=10_000, help="rows into the queue for the deep page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, "data")
+        sizes = generate(data, args.users)
+        path = os.path.join(tmp, "bench.db")
+        standin.create_schema(path, seed=False)
+        conn = standin.connect(path)
+        load_directory(conn, data, out=io.StringIO())
+        add_reports(conn, args.reports, sizes["Users"], sizes["NFTs"], rng)
+        started = time.perf_counter()
+        migrate(conn, out=lambda line: None)
+        print(f"reports={sizes['Reports'] + args.reports:,} NFTs={sizes['NFTs']:,} "
+              f"(migrations with rollup backfill: {time.perf_counter() - started:.1f}s)")
+        cursor = conn.cursor()
+
+        def fetch(sql, params=()):
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+        # A cursor --depth rows into the queue, found by walking it page by page
+        after, walked = None, 0
+        while walked < args.depth:
+            columns, rows = load_report_queue(cursor, after, 1000)
+            walked += len(rows)
+            after = queue_cursor(dict(zip(columns, rows[-1])))
+
+        print(f"\n{'moderation queue':<28} {'ms':>10} {'rows':>10}")
+        for label, fn in (
+            ("old list (every report)", lambda: fetch(OLD_LIST)),
+            ("keyset page 1", lambda: load_report_queue(cursor, None, PAGE)[1]),
+            (f"keyset page at row {walked:,}", lambda: load_report_queue(cursor, after, PAGE)[1]),
+        ):
+            ms, rows = time_it(fn, 3 if label.startswith("old") else args.repeat)
+            print(f"{label:<28} {ms:10.2f} {len(rows):10,}")
+
+        print(f"\n{'most reported':<12} {'scan ms':>10} {'rollup ms':>10} {'speedup':>8}")
+        for window, hours in (("24h", 24), ("7d", 168), ("all", None)):
+            if hours is None:
+                scan = lambda: fetch(SCAN_TOP.format(where=""), (TOP,))
+            else:
+                scan = lambda: fetch(SCAN_TOP.format(where=SCAN_WINDOW), (TOP, 1 - hours))
+            scan_ms, scanned = time_it(scan, 3)
+            rollup_ms, (_, rolled) = time_it(lambda: top_reported(cursor, window, TOP), args.repeat)
+            assert [(r[0], r[2]) for r in scanned] == [(r[0], r[2]) for r in rolled], window
+            print(f"{window:<12} {scan_ms:10.2f} {rollup_ms:10.2f} {scan_ms / rollup_ms:7.0f}x")
+
+        print(f"\n{'report insert':<28} {'ms':>10}")
+        for label, rollups in (("insert only", False), ("insert + record_report", True)):
+            def insert():
+                nft_id = rng.randint(1, sizes["NFTs"])
+                cursor.execute("INSERT INTO Reports (ReporterID, NFTID, Reason) VALUES (?, ?, ?)", (1, nft_id, "bench"))
+                if rollups:
+                    record_report(cursor, nft_id)
+                conn.commit()
+            ms, _ = time_it(insert, args.repeat * 10)
+            print(f"{label:<28} {ms:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Minting throughput: one INSERT + commit per NFT (POST /nfts) vs. mint_nfts() chunks.
+#
+# Both paths return the new NFTIDs. Checks that every id returned by the batch path
+# points at the NFT it was reported for, then prints rows/sec for each path with a
+# simulated round-trip latency per statement.
+#
+#   python benchmarks/bench_nft_mint.py [--nfts 10000] [--latency-ms 1] [--chunk-size 400]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from identity_map import IdentityMap  # noqa: E402
+from nft_mint import mint_nfts  # noqa: E402
+
+
+def payloads(n, prefix):
+    return [(i, SimpleNamespace(Title=f"{prefix} {i}", Description=f"Bulk minted item {i}", CollectionID=1, OwnerID=1 + i % 5))
+            for i in range(n)]
+
+
+def mint_single(conn, nfts):
+    # The create_nft body, once per NFT
+    ids = []
+    for _, nft in nfts:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO NFTs (Title, Description, CollectionID, OwnerID)
+            OUTPUT INSERTED.NFTID
+            VALUES (?, ?, ?, ?)
+        """, (nft.Title, nft.Description, nft.CollectionID, nft.OwnerID))
+        ids.append(cursor.fetchone()[0])
+        conn.commit()
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nfts", type=int, default=10_000)
+    parser.add_argument("--latency-ms", type=float, default=1)
+    parser.add_argument("--chunk-size", type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        standin.create_schema(path)
+        conn = standin.connect(path, latency=args.latency_ms / 1000)
+
+        single = payloads(args.nfts, "Single")
+        started = time.perf_counter()
+        mint_single(conn, single)
+        single_rate = args.nfts / (time.perf_counter() - started)
+
+        batch = payloads(args.nfts, "Batch")
+        started = time.perf_counter()
+        minted, errors = mint_nfts(conn.cursor(), batch, IdentityMap(), args.chunk_size)
+        batch_rate = args.nfts / (time.perf_counter() - started)
+
+        if errors or len(minted) != args.nfts:
+            raise SystemExit(f"batch mint reported errors: {errors[:5]}")
+        cursor = conn.raw.cursor()
+        for item in minted:
+            title = cursor.execute("SELECT Title FROM NFTs WHERE NFTID = ?", (item["NFTID"],)).fetchone()[0]
+            if title != f"Batch {item['index']}":
+                raise SystemExit(f"NFTID {item['NFTID']} was reported for item {item['index']} but holds {title!r}")
+
+    print(f"nfts={args.nfts} round-trip latency={args.latency_ms}ms chunk size={args.chunk_size}")
+    print(f"{'single inserts (POST /nfts)':<34} {single_rate:10,.0f} rows/s")
+    print(f"{'mint_nfts (POST /api/nfts/batch)':<34} {batch_rate:10,.0f} rows/s  ({batch_rate / single_rate:.0f}x)")
+    print("all returned NFTIDs match their items")
+
+
+if __name__ == "__main__":
+    main()
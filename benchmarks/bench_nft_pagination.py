@@ -0,0 +1,102 @@
+# /api/nfts at catalogue scale: keyset pages vs. OFFSET pages, and streaming memory.
+#
+# Per-page latency should stay flat with keyset pagination wherever the page is in
+# the table, while OFFSET (and the old full-table SELECT *) grows with its size.
+# The NDJSON export path is measured for peak Python memory against fetchall().
+#
+#   python benchmarks/bench_nft_pagination.py [--nfts 200000] [--limit 100]
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+
+COLUMNS = ["NFTID", "Title", "Description", "CollectionID", "OwnerID", "MintedAt", "ImagePath"]
+SELECT = ", ".join(COLUMNS)
+
+
+def seed(path, n):
+    conn = standin.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Users (Username, Email) VALUES ('bench', 'bench@example.com')")
+    cursor.executemany(
+        "INSERT INTO NFTs (Title, Description, OwnerID, MintedAt) VALUES (?, ?, 1, '2025-05-01 12:00:00')",
+        ((f"NFT {i}", f"Synthetic description {i} " * 4) for i in range(n)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nfts", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        standin.create_schema(path, seed=False)
+        seed(path, args.nfts)
+        cursor = standin.connect(path).cursor()
+
+        print(f"nfts={args.nfts} page size={args.limit}")
+        print(f"{'position':>10} {'keyset ms':>10} {'offset ms':>10}")
+        for fraction in (0.0, 0.25, 0.5, 0.75, 0.99):
+            position = int(args.nfts * fraction)
+
+            def keyset():
+                cursor.execute(f"SELECT TOP (?) {SELECT} FROM NFTs WHERE NFTID > ? ORDER BY NFTID", (args.limit, position))
+                cursor.fetchall()
+
+            def offset():
+                cursor.execute(f"SELECT {SELECT} FROM NFTs ORDER BY NFTID LIMIT ? OFFSET ?", (args.limit, position))
+                cursor.fetchall()
+
+            print(f"{position:>10} {timed(keyset):>10.3f} {timed(offset):>10.3f}")
+
+        def full_table():
+            cursor.execute("SELECT * FROM NFTs")
+            return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+
+        print(f"old full-table SELECT *: {timed(full_table, repeat=3):.1f} ms per request")
+
+        # Peak memory: materialising the table vs. streaming NDJSON in fetchmany() chunks
+        tracemalloc.start()
+        json.dumps(full_table())
+        _, materialised = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        cursor.execute(f"SELECT {SELECT} FROM NFTs WHERE NFTID > ? ORDER BY NFTID", (0,))
+        streamed_bytes = 0
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            streamed_bytes += len("".join(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows))
+        _, streamed = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"peak memory, fetchall + json: {materialised / 2**20:8.1f} MiB")
+        print(f"peak memory, NDJSON stream:   {streamed / 2**20:8.1f} MiB ({streamed_bytes / 2**20:.1f} MiB sent)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Bid reads: active-listing lookup + ORDER BY over Bids vs. the in-memory order book.
+#
+# Seeds one listing with --bids bids, then measures the read paths behind
+# /api/nfts/{id}/bids (full list and ?limit=10) and /bids/summary both ways, the
+# cost of adding a bid to a warm book, and finally checks the book against the
+# table with OrderBooks.verify().
+#
+#   python benchmarks/bench_order_book.py [--bids 10000] [--reads 2000] [--latency-ms 0]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from migrate import migrate  # noqa: E402
+from order_book import OrderBooks  # noqa: E402
+
+NFT_ID = 1
+
+
+def seed(path, n):
+    conn = standin.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Users (Username, Email) VALUES ('bench', 'bench@example.com')")
+    cursor.execute("INSERT INTO NFTs (Title, OwnerID, MintedAt) VALUES ('Bench NFT', 1, '2025-05-01 12:00:00')")
+    cursor.execute("INSERT INTO Listings (NFTID, SellerID, Price, IsActive) VALUES (?, 1, 100.00, 1)", (NFT_ID,))
+    rng = random.Random(42)
+    cursor.executemany(
+        "INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt) VALUES (1, 1, ?, '2025-05-02 12:00:00')",
+        ((round(rng.uniform(100, 10_000), 2),) for _ in range(n)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def sql_bids(cursor, limit=None):
+    # The pre-order-book get_bids_for_nft body
+    cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (NFT_ID,))
+    listing_id = cursor.fetchone()[0]
+    top = f"TOP ({limit}) " if limit else ""
+    cursor.execute(f"""
+        SELECT {top}BidID, BidAmount, BidAt, BidderID FROM Bids WHERE ListingID = ? ORDER BY BidAmount DESC
+    """, (listing_id,))
+    return cursor.fetchall()
+
+
+def sql_summary(cursor):
+    cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (NFT_ID,))
+    listing_id = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM Bids WHERE ListingID = ?", (listing_id,))
+    count = cursor.fetchone()[0]
+    return count, sql_bids(cursor, 1)
+
+
+def book_bids(books, cursor, limit=None):
+    return books.book(cursor, books.active_listing(cursor, NFT_ID)).top(limit)
+
+
+def book_summary(books, cursor):
+    book = books.book(cursor, books.active_listing(cursor, NFT_ID))
+    return book.count(), book.highest()
+
+
+def measure(fn, reads):
+    samples = []
+    for _ in range(reads):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bids", type=int, default=10_000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        standin.create_schema(path, seed=False)
+        migrate(standin.connect(path), out=lambda line: None)
+        seed(path, args.bids)
+        conn = standin.connect(path, latency=args.latency_ms / 1000)
+        cursor = conn.cursor()
+
+        books = OrderBooks(sync_interval=1.0)
+        started = time.perf_counter()
+        book_bids(books, cursor)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        expected = [row[0] for row in sql_bids(cursor)]
+        got = [row[0] for row in book_bids(books, cursor)]
+        amounts = [row[1] for row in book_bids(books, cursor)]
+        if amounts != sorted(amounts, reverse=True) or sorted(got) != sorted(expected):
+            raise SystemExit("order book disagrees with ORDER BY BidAmount DESC")
+
+        print(f"bids={args.bids} reads={args.reads} round-trip latency={args.latency_ms}ms")
+        print(f"cold book load: {load_ms:.2f} ms")
+        print(f"{'read':<22} {'sql p50':>9} {'sql p99':>9} {'book p50':>9} {'book p99':>9}   (ms)")
+        for name, sql_fn, book_fn in [
+            ("all bids", lambda: sql_bids(cursor), lambda: book_bids(books, cursor)),
+            ("top 10", lambda: sql_bids(cursor, 10), lambda: book_bids(books, cursor, 10)),
+            ("highest + count", lambda: sql_summary(cursor), lambda: book_summary(books, cursor)),
+        ]:
+            sql_p50, sql_p99 = measure(sql_fn, args.reads)
+            book_p50, book_p99 = measure(book_fn, args.reads)
+            print(f"{name:<22} {sql_p50:9.3f} {sql_p99:9.3f} {book_p50:9.3f} {book_p99:9.3f}")
+
+        # Incremental updates, as create_bid does after its commit
+        rng = random.Random(7)
+        new_bids = []
+        for _ in range(1000):
+            cursor.execute("""
+                INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt)
+                OUTPUT INSERTED.BidID, INSERTED.BidAmount, INSERTED.BidAt
+                VALUES (1, 1, ?, GETDATE())
+            """, (round(rng.uniform(100, 10_000), 2),))
+            new_bids.append(cursor.fetchone())
+        conn.commit()
+        started = time.perf_counter()
+        for bid_id, amount, bid_at in new_bids:
+            books.add_bid(1, (bid_id, amount, bid_at, 1))
+        add_us = (time.perf_counter() - started) * 1_000_000 / len(new_bids)
+        print(f"add_bid on a {args.bids}-bid book: {add_us:.1f} us per bid")
+
+        report = books.verify(cursor, 1)
+        print(f"verify: consistent={report['consistent']} db={report['db_count']} book={report['book_count']}")
+        if not report["consistent"]:
+            raise SystemExit(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# Read/write splitting against a primary and two read replicas, all SQLite stand-ins.
+#
+# Builds a primary with load_test.py's dataset and two replicas that follow it by
+# copying it over (SQLite's backup API) every --interval seconds, so they lag it by up
+# to that much. main.py runs in-process with METAMOOD_REPLICA_CONN_STRS naming them.
+# Then:
+#   - load: --clients clients read /api/nfts, /api/collections and wallets for
+#     --seconds, and every read must be served by a replica, spread across both;
+#   - read-your-writes: a client files a report and reads the moderation queue
+#     straight back, which the primary serves (the write's cookie), while a client
+#     without the cookie may still get the queue from a lagging replica without it;
+#   - lag: replica 1 stops replicating, and once it is more than max lag behind,
+#     reads all go to replica 2;
+#   - outage: replica 2 refuses connections too, and reads fall back to the
+#     primary; when both catch up again they take the reads back.
+# Reports reads per database at each step from /api/db/replicas.
+#
+#   python benchmarks/bench_replicas.py [--users 500] [--clients 16] [--seconds 5] [--interval 0.5] [--max-lag 2]
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# main.py resolves METAMOOD_DB_FACTORY=bench_replicas:connect by importing this module
+sys.modules.setdefault("bench_replicas", sys.modules[__name__])
+
+import standin  # noqa: E402
+from load_test import ROOT, prepare_app_dir, prepare_database  # noqa: E402
+
+
+class ReplicaConnection(standin.StandInConnection):
+    # Fails, like its server went away, while "<file>.down" exists
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.path = path
+
+    def cursor(self):
+        if os.path.exists(self.path + ".down"):
+            raise sqlite3.OperationalError(f"{os.path.basename(self.path)} is down")
+        return super().cursor()
+
+
+def connect(path=None):
+    # standin.connect_from_env for the primary; replicas refuse connections while down
+    if path is None:
+        return standin.connect_from_env()
+    if os.path.exists(path + ".down"):
+        raise sqlite3.OperationalError(f"{os.path.basename(path)} is down")
+    return ReplicaConnection(path)
+
+
+class Replication:
+    # Copies the primary over each replica every `interval` seconds; "<file>.paused" stops a replica's copies
+
+    def __init__(self, primary, replicas, interval):
+        self.primary = primary
+        self.replicas = replicas
+        self.interval = interval
+        self.task = None
+
+    def copy(self, replica):
+        source = sqlite3.connect(self.primary)
+        target = sqlite3.connect(replica, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+    async def run(self):
+        while True:
+            for replica in self.replicas:
+                if not os.path.exists(replica + ".paused"):
+                    await asyncio.to_thread(self.copy, replica)
+            await asyncio.sleep(self.interval)
+
+
+def reads(stats):
+    # {database: reads served}
+    counts = {replica["name"]: replica["reads"] for replica in stats["replicas"]}
+    counts["primary"] = stats["primary_reads"]
+    return counts
+
+
+def served(before, after):
+    return {name: after[name] - before.get(name, 0) for name in after}
+
+
+async def read_load(client, user_ids, seconds, clients):
+    rng = random.Random(3)
+    paths = ["/api/nfts?limit=50", "/api/collections"]
+    deadline = time.perf_counter() + seconds
+    done = []
+
+    async def reader():
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths + [f"/api/users/{rng.choice(user_ids)}/wallet"])
+            response = await client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+            done.append(path)
+
+    await asyncio.gather(*(reader() for _ in range(clients)))
+    return len(done)
+
+
+async def wait_until(client, predicate, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        stats = (await client.get("/api/db/replicas")).json()
+        if predicate(stats):
+            return stats
+        await asyncio.sleep(0.1)
+    raise SystemExit(f"timed out waiting for the replicas: {stats}")
+
+
+async def run(args, primary, replicas):
+    os.environ["METAMOOD_DB_FACTORY"] = "bench_replicas:connect"
+    os.environ["STANDIN_DB"] = primary
+    os.environ["METAMOOD_REPLICA_CONN_STRS"] = "|".join(replicas)
+    sys.path.insert(0, ROOT)
+    import main
+    main.db_router.max_lag = args.max_lag
+    main.REPLICA_CHECK_INTERVAL = min(0.5, args.max_lag / 4)
+    replication = Replication(primary, replicas, args.interval)
+    replication.task = asyncio.create_task(replication.run())
+    await main.app.router.startup()
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://replicas") as client:
+            fit = lambda stats: all(r["error"] is None and r["lag_seconds"] is not None
+                                    and r["lag_seconds"] <= args.max_lag for r in stats["replicas"])
+            stats = await wait_until(client, fit, 10)
+            db = sqlite3.connect(primary)
+            user_ids = [row[0] for row in db.execute("SELECT UserID FROM Wallets LIMIT 200")]
+            username = db.execute("SELECT Username FROM Users ORDER BY UserID LIMIT 1").fetchone()[0]
+            db.close()
+
+            print(f"{'step':<34} {'requests':>9} " + " ".join(f"{name:>9}" for name in reads(stats)))
+
+            def report(step, count, before, after):
+                print(f"{step:<34} {count:9,} " + " ".join(f"{n:9,}" for n in served(before, after).values()))
+
+            before = reads(stats)
+            count = await read_load(client, user_ids, args.seconds, args.clients)
+            after = reads((await client.get("/api/db/replicas")).json())
+            report(f"load, {args.clients} clients", count, before, after)
+            assert after["primary"] == before["primary"], "a read went to the primary"
+            assert all(after[name] > before[name] for name in after if name != "primary"), "a replica took no reads"
+
+            # Read-your-writes: the report response's cookie pins the queue read to the primary
+            reason = f"bench_replicas {time.time()}"
+            writer = httpx.AsyncClient(transport=transport, base_url="http://replicas")
+            stranger = httpx.AsyncClient(transport=transport, base_url="http://replicas")
+            async with writer, stranger:
+                before = reads((await client.get("/api/db/replicas")).json())
+                response = await writer.post("/api/reports", json={"ReporterUsername": username, "NFTID": 1, "Reason": reason})
+                assert response.status_code == 200, response.text
+                own = await writer.get("/api/moderation/reports?limit=5")
+                other = await stranger.get("/api/moderation/reports?limit=5")
+                after = reads((await client.get("/api/db/replicas")).json())
+            report("write, then read it back", 2, before, after)
+            sees = lambda response: any(row["Reason"] == reason for row in response.json())
+            assert sees(own), "the writer didn't read its own report"
+            print(f"{'':<34} report in the writer's queue: {sees(own)}, in another client's: {sees(other)} "
+                  f"(replicas up to {args.interval:g}s behind)")
+
+            # Lag: replica 1 stops replicating
+            open(replicas[0] + ".paused", "w").close()
+            await wait_until(client, lambda s: s["replicas"][0]["lag_seconds"] > args.max_lag, args.max_lag * 3)
+            before = reads((await client.get("/api/db/replicas")).json())
+            count = await read_load(client, user_ids, args.seconds / 2, args.clients)
+            after = reads((await client.get("/api/db/replicas")).json())
+            report("replica1 lagging", count, before, after)
+            assert after["replica1"] == before["replica1"] and after["primary"] == before["primary"]
+
+            # Outage: replica 2 refuses connections as well
+            open(replicas[1] + ".down", "w").close()
+            await wait_until(client, lambda s: s["replicas"][1]["error"] is not None, 5)
+            before = reads((await client.get("/api/db/replicas")).json())
+            count = await read_load(client, user_ids, args.seconds / 2, args.clients)
+            after = reads((await client.get("/api/db/replicas")).json())
+            report("replica1 lagging, replica2 down", count, before, after)
+            assert after["replica1"] == before["replica1"] and after["replica2"] == before["replica2"]
+
+            # Recovery
+            os.remove(replicas[0] + ".paused")
+            os.remove(replicas[1] + ".down")
+            await wait_until(client, fit, 10)
+            before = reads((await client.get("/api/db/replicas")).json())
+            count = await read_load(client, user_ids, args.seconds / 2, args.clients)
+            after = reads((await client.get("/api/db/replicas")).json())
+            report("both caught up", count, before, after)
+            assert after["primary"] == before["primary"]
+    finally:
+        replication.task.cancel()
+        await main.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check read/write splitting across two stand-in replicas.")
+    parser.add_argument("--users", type=int, default=500, help="dataset scale (5 NFTs per user)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5, help="length of the load step")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between replica copies")
+    parser.add_argument("--max-lag", type=float, default=2, help="REPLICA_MAX_LAG for the run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="metamood-replicas-")
+    try:
+        primary = os.path.join(workdir, "primary.db")
+        prepare_database(primary, args.users)
+        replicas = [os.path.join(workdir, f"replica{i}.db") for i in (1, 2)]
+        for replica in replicas:
+            Replication(primary, [], 0).copy(replica)
+        app_dir = os.path.join(workdir, "app")
+        prepare_app_dir(app_dir)
+        os.chdir(app_dir)
+        asyncio.run(run(args, primary, replicas))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
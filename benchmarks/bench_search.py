@@ -0,0 +1,114 @@
+# /api/search query latency at a million NFTs.
+#
+# Builds a SearchIndex over synthetic NFTs whose titles, descriptions and tags are
+# drawn from a Zipf-distributed vocabulary, so a few words appear in most NFTs and
+# most appear in a handful. Then times queries by kind (rare and common words,
+# several words, prefixes) and incremental adds, as create_nft does after
+# startup. Latencies are for the index lookup only; the handler adds one
+# `WHERE NFTID IN (...)` query for the page of rows.
+#
+#   python benchmarks/bench_search.py [--nfts 1000000] [--queries 500] [--limit 20]
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from search_index import SearchIndex  # noqa: E402
+
+SYLLABLES = ["ka", "zu", "mi", "ro", "te", "na", "shi", "vo", "lee", "dra", "gon", "pix", "el", "ar", "to", "neo"]
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def documents(n, words, tags, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    pool = rng.choices(words, weights, k=1 << 16)  # sampled once; choices() per NFT is too slow
+    for nft_id in range(1, n + 1):
+        start = rng.randrange(len(pool) - 20)
+        title = " ".join(pool[start:start + rng.randint(1, 4)]) + f" #{nft_id}"
+        description = " ".join(pool[start + 4:start + 4 + rng.randint(5, 16)])
+        yield nft_id, title, description, rng.sample(tags, 2)
+
+
+def percentile(samples, p):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nfts", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    words = vocabulary(50_000, rng)
+    rng.shuffle(words)  # Zipf rank independent of spelling
+    tags = [f"tag{i}" for i in range(50)]
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.build(documents(args.nfts, words, tags, seed=1))
+    build_s = time.perf_counter() - started
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    common, mid, rare = words[:20], words[200:2000], words[20_000:]
+    kinds = {
+        "rare word": lambda: rng.choice(rare) + " ",
+        "mid word": lambda: rng.choice(mid) + " ",
+        "common word": lambda: rng.choice(common) + " ",
+        "two words": lambda: f"{rng.choice(mid)} {rng.choice(common)} ",
+        "three words": lambda: f"{rng.choice(mid)} {rng.choice(mid[:200])} {rng.choice(common)} ",
+        "two common words": lambda: f"{rng.choice(common)} {rng.choice(common)} ",
+        "prefix (3 chars)": lambda: rng.choice(mid)[:3],
+        "word + prefix": lambda: f"{rng.choice(common)} {rng.choice(mid)[:4]}",
+        "deep page (offset 500)": lambda: rng.choice(common) + " ",
+    }
+
+    print(f"nfts={args.nfts:,} terms={index.stats()['terms']:,} build={build_s:.1f}s "
+          f"({args.nfts / build_s:,.0f} NFTs/s) peak RSS={rss_mb:,.0f} MiB")
+    print(f"{'query':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hits/page':>10}")
+    for kind, make_query in kinds.items():
+        offset = 500 if kind.startswith("deep") else 0
+        samples, hits = [], []
+        for _ in range(args.queries):
+            query = make_query()
+            started = time.perf_counter()
+            page, _ = index.search(query, args.limit, offset)
+            samples.append((time.perf_counter() - started) * 1000)
+            hits.append(len(page))
+        print(f"{kind:<24} {statistics.median(samples):8.3f} {percentile(samples, 95):8.3f} "
+              f"{percentile(samples, 99):8.3f} {max(samples):8.3f} {statistics.mean(hits):10.1f}")
+
+    # create_nft path: adds land in the pending list and are merged every merge_every
+    added = list(documents(20_000, words, tags, seed=2))
+    started = time.perf_counter()
+    for nft_id, title, description, nft_tags in added:
+        index.add(args.nfts + nft_id, title, description, nft_tags)
+    add_s = time.perf_counter() - started
+    samples = []
+    for _ in range(args.queries):
+        query = f"{rng.choice(mid)} {rng.choice(common)} "
+        started = time.perf_counter()
+        index.search(query, args.limit)
+        samples.append((time.perf_counter() - started) * 1000)
+    stats = index.stats()
+    print(f"\nadded {len(added):,} NFTs at {len(added) / add_s:,.0f}/s ({stats['merges']} merges); "
+          f"two words with {stats['pending_documents']:,} pending: p50 {statistics.median(samples):.3f} ms, "
+          f"p99 {percentile(samples, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
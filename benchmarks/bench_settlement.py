@@ -0,0 +1,175 @@
+# Auction settlement throughput: one transaction per listing against chunked settlement.
+#
+# Seeds --listings auctions that have all ended in the SQLite stand-in, most with a few
+# bids, half of them carrying a royalty, sold by --users users who each have one or
+# two wallets; some winners can no longer cover their bid and a few listings drew no
+# bids. Then settles them with AuctionSettlement, each way on a fresh copy:
+#   - chunk_size=1: every listing in its own transaction;
+#   - chunk_size=--chunk: chunked, payouts netted per wallet.
+# Checks each run: the wallets' total is unchanged and none went negative, every sale
+# has its Transactions row and moved NFTs.OwnerID, no due listing is left active, and
+# settling again finds nothing. A last run fails one chunk halfway through its writes,
+# then settles again, and must end exactly where the chunked run did.
+#
+#   python benchmarks/bench_settlement.py [--listings 5000] [--users 2000] [--chunk 100] [--latency 0.001]
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from migrate import migrate  # noqa: E402
+from settlement import AuctionSettlement  # noqa: E402
+
+
+def prepare(path, listings, users, rng):
+    standin.create_schema(path, seed=False)
+    conn = standin.connect(path)
+    cursor = conn.raw.cursor()
+    cursor.executemany("INSERT INTO Users (UserID, Username, Email) VALUES (?, ?, ?)",
+                       [(user_id, f"user{user_id}", f"user{user_id}@example.com") for user_id in range(1, users + 1)])
+    wallets = []
+    for user_id in range(1, users + 1):
+        for n in range(rng.choice((1, 1, 2))):
+            wallets.append((user_id, f"0x{user_id:038x}{n:02x}", round(rng.uniform(20, 800), 2)))
+    cursor.executemany("INSERT INTO Wallets (UserID, PublicKey, Balance) VALUES (?, ?, ?)", wallets)
+    conn.raw.commit()
+    migrate(conn, out=lambda line: None)
+
+    ended = datetime.now() - timedelta(minutes=1)
+    nfts, royalties, listing_rows, bids = [], [], [], []
+    for nft_id in range(1, listings + 1):
+        seller_id = rng.randint(1, users)
+        nfts.append((nft_id, f"NFT {nft_id}", seller_id, rng.randint(1, 50)))
+        if rng.random() < 0.5:
+            royalties.append((nft_id, rng.randint(1, users), rng.choice((2.5, 5, 7.5, 10))))
+        listing_rows.append((nft_id, nft_id, seller_id, ended.strftime("%Y-%m-%d %H:%M:%S")))
+        amount = 10.0
+        for _ in range(rng.choice((0, 1, 2, 3, 4, 5))):
+            amount = round(amount + rng.uniform(1, 60), 2)
+            bidder_id = rng.randint(1, users)
+            if bidder_id != seller_id:
+                bids.append((nft_id, bidder_id, amount))
+    cursor.executemany("INSERT INTO NFTs (NFTID, Title, OwnerID, CollectionID) VALUES (?, ?, ?, ?)", nfts)
+    cursor.executemany("INSERT INTO Royalties (NFTID, CreatorID, Percentage) VALUES (?, ?, ?)", royalties)
+    cursor.executemany("INSERT INTO Listings (ListingID, NFTID, SellerID, Price, IsActive, EndsAt) VALUES (?, ?, ?, 10, 1, ?)",
+                       listing_rows)
+    cursor.executemany("INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt) VALUES (?, ?, ?, CURRENT_TIMESTAMP)", bids)
+    conn.raw.commit()
+    conn.close()
+
+
+def total_balance(raw):
+    return round(raw.execute("SELECT SUM(Balance) FROM Wallets").fetchone()[0], 2)
+
+
+def state(path):
+    # Everything settlement changes, to compare runs
+    raw = standin.connect(path).raw
+    snapshot = (
+        raw.execute("SELECT NFTID, BuyerID, SellerID, SalePrice FROM Transactions ORDER BY NFTID").fetchall(),
+        raw.execute("SELECT WalletID, ROUND(Balance, 2) FROM Wallets ORDER BY WalletID").fetchall(),
+        raw.execute("SELECT NFTID, OwnerID FROM NFTs ORDER BY NFTID").fetchall(),
+        raw.execute("SELECT ListingID, IsActive FROM Listings ORDER BY ListingID").fetchall(),
+    )
+    raw.close()
+    return snapshot
+
+
+def check(path, before, settled):
+    raw = standin.connect(path).raw
+    assert total_balance(raw) == before, (total_balance(raw), before)
+    # SQLite keeps balances as floats, so a wallet emptied to the cent may read -1e-14
+    assert raw.execute("SELECT COUNT(*) FROM Wallets WHERE Balance < -0.005").fetchone()[0] == 0
+    sold = {item.nft_id: item.buyer_id for item in settled if item.outcome == "sold"}
+    assert raw.execute("SELECT COUNT(*) FROM Transactions").fetchone()[0] == len(sold)
+    owners = dict(raw.execute("SELECT NFTID, OwnerID FROM NFTs").fetchall())
+    assert all(owners[nft_id] == buyer_id for nft_id, buyer_id in sold.items())
+    assert raw.execute("SELECT COUNT(*) FROM Listings WHERE IsActive = 1").fetchone()[0] == 0
+    raw.close()
+
+
+class FailingCursor:
+    # Passes through to a cursor, failing the `fail_at`th wallet update, after the chunk's
+    # listings, Transactions rows and owners were written
+    def __init__(self, cursor, fail_at):
+        self._cursor = cursor
+        self.connection = cursor.connection
+        self.fail_at = fail_at
+        self.updates = 0
+
+    def executemany(self, sql, rows):
+        if sql.startswith("UPDATE Wallets"):
+            self.updates += 1
+            if self.updates == self.fail_at:
+                raise RuntimeError("connection lost")
+        return self._cursor.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.001, help="seconds per database round trip")
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "template.db")
+        prepare(template, args.listings, args.users, rng)
+        before = total_balance(standin.connect(template).raw)
+        print(f"{args.listings:,} ended auctions, {args.users:,} users, {args.latency * 1000:g} ms per round trip\n")
+        print(f"{'':<22} {'listings/s':>10} {'seconds':>8} {'sold':>6} {'no bids':>8} {'unpaid':>7} {'volume':>12}")
+
+        def copy(name):
+            path = os.path.join(tmp, name)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(template + suffix):
+                    shutil.copy(template + suffix, path + suffix)
+            return path
+
+        results = {}
+        for label, chunk in (("1 listing per txn", 1), (f"{args.chunk} listings per txn", args.chunk)):
+            path = copy(f"run{chunk}.db")
+            conn = standin.connect(path, args.latency)
+            settlement = AuctionSettlement(batch_size=args.listings, chunk_size=chunk)
+            started = time.perf_counter()
+            settled = settlement.settle_due(conn.cursor())
+            seconds = time.perf_counter() - started
+            assert len(settled) == args.listings and not settlement.failed_chunks
+            assert settlement.settle_due(conn.cursor()) == []  # Settling again finds nothing
+            conn.close()
+            check(path, before, settled)
+            results[chunk] = state(path)
+            outcomes = settlement.stats()["outcomes"]
+            print(f"{label:<22} {len(settled) / seconds:10,.0f} {seconds:8.2f} {outcomes['sold']:6,} "
+                  f"{outcomes['no_bids']:8,} {outcomes['unpaid']:7,} {settlement.stats()['volume']:12,.2f}")
+        assert results[1] == results[args.chunk], "chunked settlement paid out differently"
+
+        # A chunk fails after some of its writes; the retry must not pay anything twice
+        path = copy("retry.db")
+        conn = standin.connect(path)
+        settlement = AuctionSettlement(batch_size=args.listings, chunk_size=args.chunk)
+        failing = FailingCursor(conn.cursor(), fail_at=max(1, args.listings // args.chunk // 2))
+        first = settlement.settle_due(failing)
+        rest = settlement.settle_due(conn.cursor())
+        conn.close()
+        check(path, before, first + rest)
+        assert state(path) == results[args.chunk]
+        print(f"\nretry after a failed chunk: {len(first):,} settled, then {len(rest):,}, "
+              f"{settlement.failed_chunks} failed chunk, same end state")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# /api/trending at a million events: the in-memory windows against GROUP BY queries.
+#
+# Loads a synthetic dataset with bulk_load.generate() into the SQLite stand-in and
+# adds --events views, bids and likes (about 85/10/5) over the last eight days,
+# skewed towards a few hundred hot NFTs, then applies the migrations. Times:
+#   - TrendingIndex.load(), the cold-start rebuild from the event tables;
+#   - the top 20 NFTs and collections for 1h / 24h / 7d, read from the index against
+#     a weighted GROUP BY over the same tables, checking both give the same scores;
+#   - sync() of --batch new events, and record() throughput in memory.
+#
+#   python benchmarks/bench_trending.py [--users 5000] [--events 1000000] [--batch 10000] [--repeat 20]
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import standin  # noqa: E402
+from bulk_load import generate, load_directory  # noqa: E402
+from migrate import migrate  # noqa: E402
+from trending import WEIGHTS, WINDOWS, TrendingIndex  # noqa: E402
+
+TOP = 20
+
+# What trending costs without the index: every event in the window, weighted and grouped
+SCAN_TOP = """
+    SELECT TOP (?) {key}, SUM(Weight) AS Score
+    FROM (
+        SELECT n.NFTID, n.CollectionID, {view} AS Weight
+        FROM NFT_Views e INNER JOIN NFTs n ON n.NFTID = e.NFTID WHERE e.ViewedAt >= ?
+        UNION ALL
+        SELECT n.NFTID, n.CollectionID, {like}
+        FROM Likes e INNER JOIN NFTs n ON n.NFTID = e.NFTID WHERE e.LikedAt >= ?
+        UNION ALL
+        SELECT n.NFTID, n.CollectionID, {bid}
+        FROM Bids e INNER JOIN Listings li ON li.ListingID = e.ListingID INNER JOIN NFTs n ON n.NFTID = li.NFTID
+        WHERE e.BidAt >= ?
+        UNION ALL
+        SELECT n.NFTID, n.CollectionID, {sale}
+        FROM Transactions e INNER JOIN NFTs n ON n.NFTID = e.NFTID WHERE e.TransactionDate >= ?
+    ) events
+    WHERE {key} IS NOT NULL
+    GROUP BY {key}
+    ORDER BY SUM(Weight) DESC, {key}
+"""
+
+
+def add_events(conn, count, sizes, rng, start, span):
+    # Views, bids and likes between `start` and `start + span` seconds, a third of them on
+    # 300 hot NFTs. Likes replace earlier likes of the same user and NFT
+    cursor = conn.raw.cursor()
+    listings = [row[0] for row in cursor.execute("SELECT ListingID FROM Listings")]
+    hot = rng.sample(range(1, sizes["NFTs"] + 1), 300)
+    views, bids, likes = [], [], {}
+    for _ in range(count):
+        nft_id = rng.choice(hot) if rng.random() < 0.3 else rng.randint(1, sizes["NFTs"])
+        at = (start + timedelta(seconds=rng.random() * span)).strftime("%Y-%m-%d %H:%M:%S")
+        user_id = rng.randint(1, sizes["Users"])
+        kind = rng.random()
+        if kind < 0.85:
+            views.append((nft_id, user_id, at))
+        elif kind < 0.95:
+            bids.append((listings[nft_id % len(listings)], user_id, 1.0, at))
+        else:
+            likes[(user_id, nft_id)] = at
+    cursor.executemany("INSERT INTO NFT_Views (NFTID, ViewerID, ViewedAt) VALUES (?, ?, ?)", views)
+    cursor.executemany("INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt) VALUES (?, ?, ?, ?)", bids)
+    cursor.executemany("INSERT OR REPLACE INTO Likes (UserID, NFTID, LikedAt) VALUES (?, ?, ?)",
+                       [(user_id, nft_id, at) for (user_id, nft_id), at in likes.items()])
+    conn.raw.commit()
+
+
+def time_it(fn, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000, help="new events per sync()")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, "data")
+        sizes = generate(data, args.users)
+        path = os.path.join(tmp, "bench.db")
+        standin.create_schema(path, seed=False)
+        conn = standin.connect(path)
+        load_directory(conn, data, out=io.StringIO())
+        # Frozen at the end of the loaded events, so the windows hold still between runs
+        now = datetime.now().replace(microsecond=0)
+        add_events(conn, args.events, sizes, rng, now - timedelta(days=8), 8 * 86400)
+        migrate(conn, out=lambda line: None)
+        cursor = conn.cursor()
+        clock = [now.timestamp()]
+        index = TrendingIndex(clock=lambda: clock[0])
+
+        started = time.perf_counter()
+        counted = index.load(cursor)
+        print(f"events={args.events:,} NFTs={sizes['NFTs']:,}; load() counted {counted:,} in the last 7 days "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        print(f"\n{'top ' + str(TOP):<18} {'scan ms':>10} {'index ms':>10} {'speedup':>8}")
+        for by, key in (("nft", "NFTID"), ("collection", "CollectionID")):
+            sql = SCAN_TOP.format(key=key, **WEIGHTS)
+            for window, (width, count) in WINDOWS.items():
+                # The index's window: the buckets from (count - 1) before the current one
+                since = datetime.fromtimestamp((clock[0] // width - count + 1) * width)
+                scan_ms, scanned = time_it(lambda: cursor.execute(sql, (TOP, since, since, since, since)).fetchall(), 3)
+                index_ms, leaders = time_it(lambda: index.top(window, by, TOP), args.repeat)
+                assert [row[1] for row in scanned] == [score for _, score in leaders], (by, window)
+                print(f"{by + ' ' + window:<18} {scan_ms:10.2f} {index_ms:10.4f} {scan_ms / index_ms:7.0f}x")
+
+        # New events after the frozen "now", then a sync() that reads them
+        add_events(conn, args.batch, sizes, rng, now, 60)
+        clock[0] += 60
+        started = time.perf_counter()
+        added = index.sync(cursor)
+        elapsed = time.perf_counter() - started
+        print(f"\nsync() of {added:,} new events: {elapsed * 1000:.0f} ms ({added / elapsed:,.0f} events/s)")
+
+        events = [(rng.choice(list(WEIGHTS)), rng.randint(1, sizes["NFTs"]), rng.randint(1, 500),
+                   clock[0] - rng.random() * 3600) for _ in range(200_000)]
+        started = time.perf_counter()
+        for event in events:
+            index.record(*event)
+        elapsed = time.perf_counter() - started
+        print(f"record() in memory: {len(events) / elapsed:,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Time to first content for the server-rendered pages: /nfts, /collections,
+# /categories and /reports.
+#
+# A page whose list is in the HTML (marked data-rendered) shows content once the
+# HTML arrives. A page that leaves the list to main.js shows it only after three
+# sequential requests: the HTML, main.js, then the API call. TTFC is the sum of the
+# server times of the requests on that path, plus --rtt milliseconds of network
+# round trip for each of them. The first load of every page is reported separately
+# (cold: empty template, fragment and list caches); the rest are medians of --repeat
+# loads. Runs main.py in-process on the same SQLite stand-in as load_test.py.
+#
+# --root serves another checkout of the repository, so the same dataset can be
+# measured before and after a change:
+#   git worktree add /tmp/before <commit>
+#   python benchmarks/bench_ttfc.py --db ttfc.db --root /tmp/before
+#   python benchmarks/bench_ttfc.py --db ttfc.db
+#
+#   python benchmarks/bench_ttfc.py [--users 2000] [--repeat 20] [--rtt 50]
+#       [--latency 0.0005] [--db ttfc.db] [--root DIR]
+
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import ROOT, prepare_app_dir, prepare_database  # noqa: E402
+
+# Page -> the API call main.js makes when the page arrives without its list
+PAGES = {
+    "/nfts": "/api/nfts?limit=50",
+    "/collections": "/api/collections",
+    "/categories": "/api/categories",
+    "/reports": "/api/reports",
+}
+
+_SCRIPT = re.compile(r'<script src="([^"]*main[^"]*\.js)"')
+
+
+async def timed_get(client, path):
+    started = time.perf_counter()
+    response = await client.get(path)
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        raise SystemExit(f"GET {path}: {response.status_code}")
+    return response, elapsed
+
+
+async def load_page(client, page, rtt):
+    # (TTFC in ms, requests on the critical path, bytes over them, server-rendered?)
+    response, elapsed = await timed_get(client, page)
+    html = response.text
+    if "data-rendered" in html:
+        return elapsed + rtt, 1, len(response.content), True
+    script = _SCRIPT.search(html)
+    if script is None:
+        raise SystemExit(f"{page} has no data-rendered list and no main.js")
+    total, size = elapsed, len(response.content)
+    for path in (script.group(1), PAGES[page]):
+        response, elapsed = await timed_get(client, path)
+        total += elapsed
+        size += len(response.content)
+    return total + 3 * rtt, 3, size, False
+
+
+async def run(args, root, db_path):
+    os.environ["METAMOOD_DB_FACTORY"] = "standin:connect_from_env"
+    os.environ["STANDIN_DB"] = db_path
+    os.environ["STANDIN_LATENCY"] = str(args.latency)
+    sys.path.insert(0, root)
+    import main
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ttfc") as client:
+            results = {}
+            for page in PAGES:
+                cold = await load_page(client, page, args.rtt)
+                warm = [await load_page(client, page, args.rtt) for _ in range(args.repeat)]
+                results[page] = (cold, warm)
+            return results
+    finally:
+        await main.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first content of the MetaMood list pages.")
+    parser.add_argument("--users", type=int, default=2000, help="dataset scale (5 NFTs per user)")
+    parser.add_argument("--repeat", type=int, default=20, help="warm loads per page")
+    parser.add_argument("--rtt", type=float, default=50, help="network round trip per request, in ms")
+    parser.add_argument("--latency", type=float, default=0.0005, help="simulated database round trip in seconds")
+    parser.add_argument("--db", help="stand-in database file to create or reuse (default: a temporary one)")
+    parser.add_argument("--root", default=ROOT, help="checkout to serve (default: this one)")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    workdir = tempfile.mkdtemp(prefix="metamood-ttfc-")
+    try:
+        db_path = os.path.abspath(args.db) if args.db else os.path.join(workdir, "ttfc.db")
+        prepare_database(db_path, args.users)
+        app_dir = os.path.join(workdir, "app")
+        prepare_app_dir(app_dir, root)
+        if os.path.exists(os.path.join(root, "static_assets.py")):
+            sys.path.insert(0, root)
+            from static_assets import build
+            build(os.path.join(app_dir, "static"), out=lambda line: None)
+        os.chdir(app_dir)
+        results = asyncio.run(run(args, root, db_path))
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"root={root} users={args.users:,} repeat={args.repeat} rtt={args.rtt:g}ms latency={args.latency:g}s")
+    print(f"{'page':<13} {'rendered':>8} {'requests':>8} {'KB':>8} {'cold ms':>9} {'median ms':>10} {'server ms':>10}")
+    for page, (cold, warm) in results.items():
+        ttfc, requests, size, rendered = warm[0]
+        median = statistics.median(sample[0] for sample in warm)
+        print(f"{page:<13} {'yes' if rendered else 'no':>8} {requests:>8} {size / 1024:8.1f} {cold[0]:9.1f} "
+              f"{median:10.1f} {median - requests * args.rtt:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# Load test for the main.py routes, without SQL Server.
+#
+# Generates a synthetic dataset with bulk_load.generate(), loads it into a SQLite
+# stand-in database, applies the migrations, and serves main.py in-process with
+# METAMOOD_DB_FACTORY=standin:connect_from_env. Virtual users then run a weighted
+# mix of requests for a fixed time: browsing /api/nfts pages, opening /nfts/{id},
+# polling bids, placing bids and logging in. Prints throughput and p50/p95/p99 per
+# endpoint; --json writes the same as JSON, and --baseline compares this run with
+# an earlier --json file.
+#
+# --db keeps the stand-in database at a path (reused if it exists). --url sends the
+# requests to a server that is already running on that database instead:
+#   PYTHONPATH=benchmarks METAMOOD_DB_FACTORY=standin:connect_from_env STANDIN_DB=load.db uvicorn main:app
+#
+#   python benchmarks/load_test.py [--users 2000] [--duration 30] [--concurrency 16]
+#       [--mix browse=40,detail=25,poll=20,bid=10,login=5] [--latency 0.0005]
+#       [--db load.db] [--url http://localhost:8000] [--json run.json] [--baseline old.json]
+
+import argparse
+import asyncio
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standin  # noqa: E402
+from bulk_load import generate, load_directory  # noqa: E402
+from migrate import migrate  # noqa: E402
+
+DEFAULT_MIX = "browse=40,detail=25,poll=20,bid=10,login=5"
+NFT_PAGE = 50
+
+
+class Targets:
+    """IDs the workload picks from, read from the stand-in database."""
+
+    def __init__(self, path):
+        db = sqlite3.connect(path)
+        self.max_nft = db.execute("SELECT MAX(NFTID) FROM NFTs").fetchone()[0] or 0
+        self.listed = [row[0] for row in db.execute("SELECT NFTID FROM Listings WHERE IsActive = 1")]
+        self.users = [row for row in db.execute("SELECT Username, Email FROM Users")]
+        db.close()
+        if not self.max_nft or not self.listed or not self.users:
+            raise SystemExit(f"{path} has no NFTs, active listings or users to load-test with")
+
+
+# Each operation returns (method, path, JSON body or None); the name is the endpoint label
+def operations(targets):
+    return {
+        "browse": lambda rng: ("GET", f"/api/nfts?after={rng.randrange(targets.max_nft)}&limit={NFT_PAGE}", None),
+        "detail": lambda rng: ("GET", f"/nfts/{rng.randint(1, targets.max_nft)}", None),
+        "poll": lambda rng: ("GET", f"/api/nfts/{rng.choice(targets.listed)}/bids?limit=20", None),
+        "bid": lambda rng: ("POST", "/api/bids", {
+            "NFTID": rng.choice(targets.listed),
+            "BidderUsername": rng.choice(targets.users)[0],
+            "BidAmount": round(rng.uniform(10, 5000), 2),
+        }),
+        "login": lambda rng: ("POST", "/api/login", dict(zip(("Username", "Email"), rng.choice(targets.users)))),
+    }
+
+
+def parse_mix(text, known):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in known:
+            raise SystemExit(f"unknown operation {name.strip()!r}; expected one of {', '.join(known)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def prepare_database(path, users):
+    if os.path.exists(path):
+        return
+    with tempfile.TemporaryDirectory() as data:
+        generate(data, users)
+        standin.create_schema(path, seed=False)
+        conn = standin.connect(path)
+        load_directory(conn, data, out=io.StringIO())
+        migrate(conn, out=lambda line: None)
+        conn.close()
+
+
+def prepare_app_dir(directory, root=ROOT):
+    # main.py serves templates/ and static/ relative to the working directory
+    os.makedirs(os.path.join(directory, "templates"), exist_ok=True)
+    for page in glob.glob(os.path.join(root, "*.html")):
+        shutil.copy(page, os.path.join(directory, "templates"))
+    for asset in ("js/main.js", "css/style.css"):
+        os.makedirs(os.path.join(directory, "static", os.path.dirname(asset)), exist_ok=True)
+        shutil.copy(os.path.join(root, os.path.basename(asset)), os.path.join(directory, "static", asset))
+
+
+async def virtual_user(client, ops, mix, rng, warmup_until, deadline, samples):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = ops[name](rng)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        finished = time.perf_counter()
+        if started >= warmup_until:
+            samples.setdefault(name, []).append(((finished - started) * 1000, status))
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summarize(samples, seconds):
+    def summary(entries):
+        latencies = sorted(latency for latency, _ in entries)
+        errors = sum(1 for _, status in entries if status == 0 or status >= 500)
+        rejected = sum(1 for _, status in entries if 400 <= status < 500)
+        return {
+            "requests": len(entries),
+            "errors": errors,
+            "rejected": rejected,
+            "rps": round(len(entries) / seconds, 1),
+            "mean_ms": round(statistics.mean(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(latencies[-1], 3),
+        }
+    endpoints = {name: summary(entries) for name, entries in sorted(samples.items()) if entries}
+    everything = [entry for entries in samples.values() for entry in entries]
+    return endpoints, summary(everything) if everything else None
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(result, baseline):
+    print(f"\n{'endpoint':<10} {'requests':>9} {'errors':>7} {'4xx':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>9}")
+    rows = list(result["endpoints"].items()) + [("total", result["total"])]
+    for name, row in rows:
+        print(f"{name:<10} {row['requests']:>9,} {row['errors']:>7} {row['rejected']:>6} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>9.2f}")
+    if not baseline:
+        return
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+6.1f}%" if old else "     n/a"
+
+    print(f"\nagainst {baseline.get('commit') or 'baseline'} ({baseline.get('started_at', '?')}):")
+    print(f"{'endpoint':<10} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    old_rows = dict(baseline.get("endpoints", {}), total=baseline.get("total"))
+    for name, row in rows:
+        old = old_rows.get(name)
+        if old:
+            print(f"{name:<10} {change(row['rps'], old['rps'])} {change(row['p50_ms'], old['p50_ms'])} "
+                  f"{change(row['p95_ms'], old['p95_ms'])} {change(row['p99_ms'], old['p99_ms'])}")
+
+
+async def run(args, targets, mix, base_url, transport):
+    ops = operations(targets)
+    samples = {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=30) as client:
+        now = time.perf_counter()
+        warmup_until, deadline = now + args.warmup, now + args.warmup + args.duration
+        await asyncio.gather(*(
+            virtual_user(client, ops, mix, random.Random(args.seed + i), warmup_until, deadline, samples)
+            for i in range(args.concurrency)
+        ))
+    return samples
+
+
+async def run_in_process(args, targets, mix, db_path):
+    os.environ["METAMOOD_DB_FACTORY"] = "standin:connect_from_env"
+    os.environ["STANDIN_DB"] = db_path
+    os.environ["STANDIN_LATENCY"] = str(args.latency)
+    import main
+    await main.app.router.startup()
+    try:
+        return await run(args, targets, mix, "http://load-test", httpx.ASGITransport(app=main.app))
+    finally:
+        await main.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the MetaMood API against a SQLite stand-in database.")
+    parser.add_argument("--users", type=int, default=2000, help="dataset scale (5 NFTs per user)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds run before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights")
+    parser.add_argument("--latency", type=float, default=0.0005,
+                        help="simulated database round trip in seconds (in-process only)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", help="stand-in database file to create or reuse (default: a temporary one)")
+    parser.add_argument("--url", help="load-test a running server instead of main.py in-process")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with the results of an earlier --json run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="metamood-load-")
+    try:
+        db_path = os.path.abspath(args.db) if args.db else os.path.join(workdir, "load.db")
+        started = time.perf_counter()
+        prepare_database(db_path, args.users)
+        targets = Targets(db_path)
+        print(f"database {db_path}: {targets.max_nft:,} NFTs, {len(targets.listed):,} active listings, "
+              f"{len(targets.users):,} users (ready in {time.perf_counter() - started:.1f}s)")
+
+        mix = parse_mix(args.mix, operations(targets))
+        print(f"{args.concurrency} virtual users, {args.duration:g}s after {args.warmup:g}s warm-up, mix {args.mix}")
+        if args.url:
+            samples = asyncio.run(run(args, targets, mix, args.url, None))
+        else:
+            prepare_app_dir(os.path.join(workdir, "app"))
+            os.chdir(os.path.join(workdir, "app"))
+            samples = asyncio.run(run_in_process(args, targets, mix, db_path))
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    endpoints, total = summarize(samples, args.duration)
+    if total is None:
+        raise SystemExit("no requests completed")
+    result = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {key: getattr(args, key) for key in (
+            "users", "duration", "warmup", "concurrency", "mix", "latency", "seed", "url")},
+        "endpoints": endpoints,
+        "total": total,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nwrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
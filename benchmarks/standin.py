@@ -0,0 +1,211 @@
+# SQLite stand-in for the SQL Server database, for benchmarks and local runs.
+#
+# Wraps sqlite3 in a DB-API connection that understands the bits of T-SQL used in
+# main.py (GETDATE(), SCOPE_IDENTITY(), OUTPUT INSERTED.x, TOP (n), (VALUES ...) AS v (cols),
+# hour arithmetic with DATEADD/DATEDIFF, table hints, multi-statement batches read with
+# nextset()). Datetimes are stored as "YYYY-MM-DD HH:MM:SS" text whatever form they arrive
+# in, so they compare in time order like SQL Server DATETIMEs. An optional per-round-trip
+# latency stands in for the network hop to SQL Server, which is what most of our
+# optimizations remove.
+
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from decimal import Decimal
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "metamood_tables.sql")
+
+_OUTPUT = re.compile(r"\bOUTPUT\s+(INSERTED\.\w+(?:\s*,\s*INSERTED\.\w+)*)\s*", re.I)
+_TOP = re.compile(r"\bSELECT\s+TOP\s*\(?\s*(\?|\d+)\s*\)?(.*)$", re.I | re.S)
+_INCLUDE = re.compile(r"\s+INCLUDE\s*\([^)]*\)", re.I)
+_DROP_INDEX = re.compile(r"\bDROP\s+INDEX\s+(\w+)\s+ON\s+\w+", re.I)
+_VALUES_AS = re.compile(r"\(VALUES\s(.*?)\)\s+AS\s+(\w+)\s*\(([^)]*)\)", re.I | re.S)
+_HINTS = re.compile(r"\s+WITH\s*\(\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|NOLOCK)(?:\s*,\s*(?:UPDLOCK|HOLDLOCK|ROWLOCK|NOLOCK))*\s*\)", re.I)
+_HOUR_START = re.compile(r"DATEADD\(HOUR,\s*DATEDIFF\(HOUR,\s*0,\s*([\w.]+)\),\s*0\)", re.I)
+_ADD_HOURS = re.compile(r"DATEADD\(HOUR,\s*(\?|-?\d+),\s*(strftime\('[^']*',\s*[\w.]+\)|[\w.]+)\)", re.I)
+_CAST_DATETIME = re.compile(r"CAST\(\s*\?\s+AS\s+DATETIME\s*\)", re.I)
+_ISO_T = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}")
+
+
+def translate(sql, params=()):
+    sql = sql.replace("GETDATE()", "CURRENT_TIMESTAMP").replace("SCOPE_IDENTITY()", "last_insert_rowid()")
+    # Index DDL and catalog lookups used by migrate.py
+    sql = _INCLUDE.sub("", sql)
+    sql = _DROP_INDEX.sub(r"DROP INDEX \1", sql)
+    sql = sql.replace("INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME", "sqlite_master WHERE type = 'table' AND name")
+    sql = _HINTS.sub("", sql)
+    sql = _HOUR_START.sub(r"strftime('%Y-%m-%d %H:00:00', \1)", sql)
+    sql = _ADD_HOURS.sub(r"datetime(\2, \1 || ' hours')", sql)
+    sql = _CAST_DATETIME.sub("?", sql)
+    params = [normalize(value) for value in params]
+    match = _OUTPUT.search(sql)
+    if match:
+        sql = sql[:match.start()] + sql[match.end():]
+        sql = sql.rstrip().rstrip(";") + " RETURNING " + match.group(1).replace("INSERTED.", "")
+    match = _VALUES_AS.search(sql)
+    if match:
+        # sqlite can't name the columns of a VALUES table; alias column1, column2, ...
+        columns = ", ".join(f"column{i} AS {name.strip()}" for i, name in enumerate(match.group(3).split(","), 1))
+        sql = sql[:match.start()] + f"(SELECT {columns} FROM (VALUES {match.group(1)})) AS {match.group(2)}" + sql[match.end():]
+    match = _TOP.search(sql)
+    if match:
+        # Only handles TOP on the outermost SELECT, which is all main.py uses
+        sql = sql[:match.start()] + "SELECT" + match.group(2).rstrip().rstrip(";") + f" LIMIT {match.group(1)}"
+        if match.group(1) == "?":
+            # The TOP parameter moves from the front of the statement to the LIMIT
+            params = list(params)
+            params.append(params.pop(sql[:match.start()].count("?")))
+    return sql, tuple(params)
+
+
+def normalize(value):
+    # ISO 8601 text ("2025-01-01T10:00:00", as bulk_load files have it) and datetimes in
+    # the stored form. sqlite3 can't bind Decimal (DECIMAL columns under pyodbc)
+    if isinstance(value, str) and _ISO_T.match(value):
+        return value.replace("T", " ", 1)
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def split_batch(sql, params):
+    statements = [s for s in sql.split(";") if s.strip()]
+    if len(statements) <= 1:
+        return [(sql, tuple(params))]
+    params = list(params)
+    out = []
+    for statement in statements:
+        n = statement.count("?")
+        out.append((statement, tuple(params[:n])))
+        params = params[n:]
+    return out
+
+
+class StandInCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+        self._sets = None
+        self._rows = None
+        self.description = None
+        self.rowcount = -1
+        self.fast_executemany = False
+
+    def execute(self, sql, params=()):
+        self.connection.round_trip()
+        if sql.lstrip().upper().startswith("SET IDENTITY_INSERT"):
+            # SQLite always accepts explicit INTEGER PRIMARY KEY values
+            return self
+        batch = split_batch(sql, params)
+        if len(batch) == 1:
+            self._sets = None
+            self._cursor.execute(*translate(*batch[0]))
+            self.description = self._cursor.description
+            self.rowcount = self._cursor.rowcount
+            return self
+        # Multi-statement batch: keep every result set, like SQL Server does
+        self._sets = []
+        for statement, args in batch:
+            self._cursor.execute(*translate(statement, args))
+            if self._cursor.description is not None:
+                self._sets.append((self._cursor.description, self._cursor.fetchall()))
+        self._advance()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.connection.round_trip()
+        self._sets = None
+        self._cursor.executemany(translate(sql)[0], ([normalize(value) for value in params] for params in seq_of_params))
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+        return self
+
+    def _advance(self):
+        if not self._sets:
+            self._rows, self.description = [], None
+            return False
+        self.description, rows = self._sets.pop(0)
+        self._rows = iter(rows)
+        return True
+
+    def nextset(self):
+        return self._advance() if self._sets is not None else None
+
+    def fetchone(self):
+        if self._sets is None:
+            return self._cursor.fetchone()
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        if self._sets is None:
+            return self._cursor.fetchmany(size)
+        return [row for _, row in zip(range(size), self._rows)]
+
+    def fetchall(self):
+        if self._sets is None:
+            return self._cursor.fetchall()
+        return list(self._rows)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    def __init__(self, path, latency=0.0):
+        self.raw = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.latency = latency
+
+    def round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def commit(self):
+        self.round_trip()
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def interrupt(self):
+        self.raw.interrupt()
+
+    def close(self):
+        self.raw.close()
+
+
+def connect(path, latency=0.0):
+    return StandInConnection(path, latency)
+
+
+def connect_from_env(path=None):
+    # Factory for main.py's METAMOOD_DB_FACTORY=standin:connect_from_env. STANDIN_DB is the
+    # SQLite file (read replicas pass theirs, from METAMOOD_REPLICA_CONN_STRS), STANDIN_LATENCY
+    # an optional round-trip delay in seconds
+    return connect(path or os.environ["STANDIN_DB"], float(os.environ.get("STANDIN_LATENCY", 0)))
+
+
+def create_schema(path, seed=True):
+    # Build the metamood_tables.sql schema (and its seed rows) in a SQLite file
+    with open(SCHEMA_FILE, encoding="utf-8", errors="replace") as f:
+        script = f.read()
+    script = script.replace("USE MetaMood;", "")
+    script = script.replace("INT PRIMARY KEY IDENTITY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+    script = script.replace("GETDATE()", "CURRENT_TIMESTAMP")
+    script = re.sub(r"(?m)^SELECT \*.*$", "", script)
+    if not seed:
+        script = ";\n".join(s for s in script.split(";") if "CREATE TABLE" in s or "ALTER TABLE" in s) + ";"
+    conn = sqlite3.connect(path)
+    conn.executescript(script)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.commit()
+    conn.close()
@@ -0,0 +1,278 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from db_pool import ConnectionPool
+from order_book import BidRow
+
+logger = logging.getLogger(__name__)
+
+# Reason -> message for the bids validation turns down
+REJECTIONS = {
+    "not_listed": "The listing is no longer active",
+    "own_listing": "Sellers can't bid on their own listing",
+    "too_low": "Bids must be higher than the current highest bid",
+    "insufficient_funds": "The bid is more than the bidder's available balance",
+}
+
+# The state a batch is validated against, read in one round trip. The locks hold the
+# listings and the bidders' wallets until the batch commits, so batches committed by
+# other workers wait rather than validate against the same state. A relisted NFT gets
+# its old ListingID back, so only bids of the listing's current Generation count.
+# Result set 1: the listings
+# Result set 2: their highest bids, oldest first where several share the top amount
+# Result set 3: the bidders' balances
+# Result set 4: the bidders' reservations, their highest bids on active listings
+STATE_BATCH = """
+SELECT ListingID, SellerID, IsActive, Generation FROM Listings WITH (UPDLOCK, HOLDLOCK) WHERE ListingID IN ({listings});
+
+SELECT b.ListingID, b.BidderID, b.BidAmount
+FROM Bids b
+INNER JOIN Listings l ON l.ListingID = b.ListingID AND l.Generation = b.Generation
+WHERE b.ListingID IN ({listings})
+    AND b.BidAmount = (SELECT MAX(x.BidAmount) FROM Bids x WHERE x.ListingID = b.ListingID AND x.Generation = l.Generation)
+ORDER BY b.ListingID, b.BidID;
+
+SELECT UserID, SUM(Balance) FROM Wallets WITH (UPDLOCK, HOLDLOCK) WHERE UserID IN ({bidders}) GROUP BY UserID;
+
+SELECT b.BidderID, b.ListingID, b.BidAmount
+FROM Bids b
+INNER JOIN Listings l ON l.ListingID = b.ListingID AND l.Generation = b.Generation AND l.IsActive = 1
+WHERE b.BidderID IN ({bidders})
+    AND b.BidAmount = (SELECT MAX(x.BidAmount) FROM Bids x WHERE x.ListingID = b.ListingID AND x.Generation = l.Generation)
+"""
+
+INSERT_BIDS = """
+INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt, Generation)
+OUTPUT INSERTED.BidID, INSERTED.ListingID, INSERTED.BidAmount, INSERTED.BidAt, INSERTED.BidderID
+VALUES {values}
+"""
+
+
+class BidQueueFull(Exception):
+    """Raised by submit() when `max_pending` bids are already waiting."""
+
+
+class BidResult(NamedTuple):
+    accepted: bool
+    reason: Optional[str]  # A REJECTIONS key when not accepted
+    row: Optional[BidRow]  # The inserted bid when accepted
+    highest: Optional[float]  # The highest bid on the listing after this one was decided
+
+
+class _Bid:
+    __slots__ = ("listing_id", "bidder_id", "amount", "future")
+
+    def __init__(self, listing_id: int, bidder_id: int, amount: float):
+        self.listing_id = listing_id
+        self.bidder_id = bidder_id
+        self.amount = amount
+        self.future: "Future[BidResult]" = Future()
+
+
+class BidEngine:
+    """Serialized bid validation with group commit.
+
+    Bids queue per listing and one thread takes them in batches of up to
+    `max_batch`, in arrival order within a listing and round-robin across
+    listings, so a burst on one auction doesn't hold up the others. Each batch
+    is one transaction: it locks the listings and the bidders' wallets, reads the
+    highest bids and reservations, validates every bid in order against them and
+    inserts the accepted ones in a single statement before committing. Bids that
+    arrive while a batch commits wait for the next one, so batches grow with load
+    and a quiet server commits each bid on its own.
+
+    A bid is accepted when the listing is active, the bidder isn't the seller,
+    it is higher than the listing's highest bid, and it fits the bidder's
+    available balance: Wallets.Balance less what the bidder's highest bids on
+    other active listings reserve. Being outbid releases a reservation. Since
+    the state is read from the database under locks, bids taken by other
+    workers' engines are accounted for too.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_batch: int = 64, max_pending: int = 10_000):
+        self.pool = pool
+        # Four parameters per bid; SQL Server allows 2100 per statement
+        self.max_batch = min(max_batch, 500)
+        self.max_pending = max_pending
+
+        self._lock = threading.Condition()
+        self._queues: Dict[int, Deque[_Bid]] = {}  # ListingID -> bids waiting, oldest first
+        self._ready: Deque[int] = deque()  # ListingIDs with bids waiting, in turn
+        self._pending = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.accepted = 0
+        self.rejected: Dict[str, int] = {reason: 0 for reason in REJECTIONS}
+        self.batches = 0
+        self.failed_batches = 0
+        self.largest_batch = 0
+
+    def submit(self, listing_id: int, bidder_id: int, amount: float) -> "Future[BidResult]":
+        bid = _Bid(listing_id, bidder_id, round(float(amount), 2))
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise BidQueueFull(f"{self._pending} bids are waiting to be validated")
+            queue = self._queues.get(listing_id)
+            if queue is None:
+                queue = self._queues[listing_id] = deque()
+                self._ready.append(listing_id)
+            queue.append(bid)
+            self._pending += 1
+            self._lock.notify()
+        return bid.future
+
+    def _take(self) -> List[_Bid]:
+        # Up to max_batch bids, one listing at a time in turn
+        batch: List[_Bid] = []
+        with self._lock:
+            while self._ready and len(batch) < self.max_batch:
+                listing_id = self._ready.popleft()
+                queue = self._queues[listing_id]
+                batch.append(queue.popleft())
+                if queue:
+                    self._ready.append(listing_id)
+                else:
+                    del self._queues[listing_id]
+            self._pending -= len(batch)
+        return batch
+
+    def process(self) -> int:
+        # Validates and commits one batch; returns the number of bids decided
+        batch = self._take()
+        if not batch:
+            return 0
+        try:
+            decisions = self._commit(batch)
+        except Exception as e:
+            logger.error("Error committing %d bids: %s", len(batch), e)
+            self.failed_batches += 1
+            for bid in batch:
+                bid.future.set_exception(e)
+            return len(batch)
+
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for bid, result in decisions:
+            if result.accepted:
+                self.accepted += 1
+            else:
+                self.rejected[result.reason] += 1
+            bid.future.set_result(result)
+        return len(batch)
+
+    def _commit(self, batch: List[_Bid]) -> List[Tuple[_Bid, BidResult]]:
+        listing_ids = sorted({bid.listing_id for bid in batch})
+        bidder_ids = sorted({bid.bidder_id for bid in batch})
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                STATE_BATCH.format(listings=", ".join("?" * len(listing_ids)), bidders=", ".join("?" * len(bidder_ids))),
+                (*listing_ids, *listing_ids, *bidder_ids, *bidder_ids),
+            )
+            listings: Dict[int, Tuple[int, bool]] = {}
+            generations: Dict[int, int] = {}
+            for listing_id, seller_id, active, generation in cursor.fetchall():
+                listings[listing_id] = (seller_id, bool(active))
+                generations[listing_id] = generation
+            cursor.nextset()
+            highest: Dict[int, Tuple[float, int]] = {}
+            for listing_id, bidder_id, amount in cursor.fetchall():
+                highest.setdefault(listing_id, (float(amount), bidder_id))
+            cursor.nextset()
+            balances = {user_id: float(balance or 0) for user_id, balance in cursor.fetchall()}
+            cursor.nextset()
+            reserved: Dict[int, Dict[int, float]] = {}
+            for bidder_id, listing_id, amount in cursor.fetchall():
+                reserved.setdefault(bidder_id, {})[listing_id] = float(amount)
+
+            decisions = self._decide(batch, listings, highest, balances, reserved)
+            accepted = [bid for bid, reason, _ in decisions if reason is None]
+            rows: Dict[Tuple[int, float], BidRow] = {}
+            if accepted:
+                cursor.execute(
+                    INSERT_BIDS.format(values=", ".join(["(?, ?, ?, GETDATE(), ?)"] * len(accepted))),
+                    [value for bid in accepted
+                     for value in (bid.listing_id, bid.bidder_id, bid.amount, generations[bid.listing_id])],
+                )
+                # Accepted amounts only go up within a listing, so (ListingID, amount) picks out each bid
+                for bid_id, listing_id, amount, bid_at, bidder_id in cursor.fetchall():
+                    rows[(listing_id, float(amount))] = (bid_id, float(amount), str(bid_at), bidder_id)
+            conn.commit()
+
+        return [
+            (bid, BidResult(reason is None, reason, rows.get((bid.listing_id, bid.amount)) if reason is None else None, top))
+            for bid, reason, top in decisions
+        ]
+
+    @staticmethod
+    def _decide(batch: List[_Bid], listings: Dict[int, Tuple[int, bool]], highest: Dict[int, Tuple[float, int]],
+                balances: Dict[int, float], reserved: Dict[int, Dict[int, float]]) -> List[Tuple[_Bid, Optional[str], Any]]:
+        # (bid, rejection reason or None, highest amount after it) for each bid, in order.
+        # Accepting a bid updates highest and reserved for the bids after it
+        decisions = []
+        for bid in batch:
+            seller_id, active = listings.get(bid.listing_id, (None, False))
+            top = highest.get(bid.listing_id)
+            held = reserved.setdefault(bid.bidder_id, {})
+            if not active:
+                reason = "not_listed"
+            elif bid.bidder_id == seller_id:
+                reason = "own_listing"
+            elif top is not None and bid.amount <= top[0]:
+                reason = "too_low"
+            elif bid.amount > balances.get(bid.bidder_id, 0.0) - sum(
+                    amount for listing_id, amount in held.items() if listing_id != bid.listing_id):
+                reason = "insufficient_funds"
+            else:
+                reason = None
+                if top is not None:
+                    reserved.get(top[1], {}).pop(bid.listing_id, None)
+                held[bid.listing_id] = bid.amount
+                top = highest[bid.listing_id] = (bid.amount, bid.bidder_id)
+            decisions.append((bid, reason, top[0] if top is not None else None))
+        return decisions
+
+    # Background processing
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="bid-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # Bids already queued are still decided before the thread exits
+        with self._lock:
+            self._stopping = True
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._ready and not self._stopping:
+                    self._lock.wait()
+                if not self._ready:
+                    return
+            self.process()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending, listings = self._pending, len(self._queues)
+        return {
+            "pending": pending,
+            "listings_waiting": listings,
+            "accepted": self.accepted,
+            "rejected": dict(self.rejected),
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "largest_batch": self.largest_batch,
+            "mean_batch": round((self.accepted + sum(self.rejected.values())) / self.batches, 1) if self.batches else 0,
+        }
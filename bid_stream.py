@@ -0,0 +1,144 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+
+class _Subscriber:
+    __slots__ = ("pending", "wake", "resync", "last_write")
+
+    def __init__(self):
+        self.pending: Deque[bytes] = deque()
+        self.wake = asyncio.Event()
+        self.resync = False
+        self.last_write = time.monotonic()
+
+
+class _Topic:
+    # Subscribers of one NFT and the ids of bids already sent to them
+    __slots__ = ("subscribers", "recent", "recent_ids")
+
+    def __init__(self, recent: int):
+        self.subscribers: Set[_Subscriber] = set()
+        self.recent: Deque[int] = deque(maxlen=recent)
+        self.recent_ids: Set[int] = set()
+
+    def seen(self, bid_id: int) -> bool:
+        if bid_id in self.recent_ids:
+            return True
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_ids.discard(self.recent[0])
+        self.recent.append(bid_id)
+        self.recent_ids.add(bid_id)
+        return False
+
+
+class BidBroadcaster:
+    """Fans new bids out to Server-Sent Events subscribers, per NFT.
+
+    publish() encodes a bid once and appends it to each subscriber's queue. A
+    queue holds at most `max_pending` messages: a subscriber that falls further
+    behind has its queue replaced by a single `resync` event, telling the client
+    to refetch /api/nfts/{id}/bids, so a slow reader costs bounded memory and never
+    slows the others. Streams idle for `heartbeat` seconds get a comment line,
+    which also surfaces dead connections so their subscribers are removed; one
+    sweeper task per broadcaster does this instead of a timer per subscriber.
+    A bid published twice (by create_bid and by the cross-worker relay) is sent once.
+
+    All methods must be called on the event loop thread.
+    """
+
+    def __init__(self, max_pending: int = 32, heartbeat: float = 15.0, max_subscribers: int = 10_000):
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self._topics: Dict[int, _Topic] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self.published = 0
+        self.coalesced = 0
+
+    def full(self) -> bool:
+        return self.subscribers >= self.max_subscribers
+
+    def topics(self) -> List[int]:
+        return list(self._topics)
+
+    def publish(self, nft_id: int, bid: Dict[str, Any]) -> int:
+        # Returns the number of subscribers the bid was queued for
+        topic = self._topics.get(nft_id)
+        if topic is None or topic.seen(bid["BidID"]):
+            return 0
+        message = f"id: {bid['BidID']}\nevent: bid\ndata: {json.dumps(bid)}\n\n".encode()
+        for subscriber in topic.subscribers:
+            if subscriber.resync:
+                pass
+            elif len(subscriber.pending) >= self.max_pending:
+                subscriber.pending.clear()
+                subscriber.resync = True
+                self.coalesced += 1
+            else:
+                subscriber.pending.append(message)
+            subscriber.wake.set()
+        self.published += 1
+        return len(topic.subscribers)
+
+    async def events(
+        self,
+        nft_id: int,
+        resync: bool = False,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> AsyncIterator[bytes]:
+        # The SSE body for one subscriber; subscribes on first iteration, unsubscribes on close
+        subscriber = _Subscriber()
+        subscriber.resync = resync
+        topic = self._topics.get(nft_id)
+        if topic is None:
+            topic = self._topics[nft_id] = _Topic(recent=max(self.max_pending * 4, 256))
+        topic.subscribers.add(subscriber)
+        self.subscribers += 1
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep())
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                await subscriber.wake.wait()
+                subscriber.wake.clear()
+                subscriber.last_write = time.monotonic()
+                if subscriber.resync:
+                    subscriber.resync = False
+                    yield b"event: resync\ndata: {}\n\n"
+                elif subscriber.pending:
+                    # Everything queued goes out as one write
+                    chunk = b"".join(subscriber.pending)
+                    subscriber.pending.clear()
+                    yield chunk
+                else:
+                    # Woken by the sweeper
+                    if is_disconnected is not None and await is_disconnected():
+                        return
+                    yield b": ping\n\n"
+        finally:
+            topic.subscribers.discard(subscriber)
+            self.subscribers -= 1
+            if not topic.subscribers and self._topics.get(nft_id) is topic:
+                del self._topics[nft_id]
+
+    async def _sweep(self) -> None:
+        # Wakes streams that have been idle for a heartbeat; exits with the last subscriber
+        while self.subscribers:
+            await asyncio.sleep(self.heartbeat / 2)
+            idle_since = time.monotonic() - self.heartbeat
+            for topic in list(self._topics.values()):
+                for subscriber in topic.subscribers:
+                    if subscriber.last_write <= idle_since:
+                        subscriber.wake.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": self.subscribers,
+            "topics": len(self._topics),
+            "published": self.published,
+            "coalesced": self.coalesced,
+        }
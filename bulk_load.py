@@ -0,0 +1,373 @@
+"""Bulk seed/import loader for the MetaMood database.
+
+Loads one CSV (with a header row) or NDJSON file per table from a directory, in
+foreign-key order, using batched parameter arrays (pyodbc fast_executemany) and
+a commit every --commit-every rows. IDENTITY values in the files are kept.
+`generate` writes a consistent synthetic dataset at any scale.
+
+    python bulk_load.py generate data/ --users 100000 [--format csv|ndjson]
+    python bulk_load.py load data/ --conn-str "DRIVER={ODBC Driver 17 for SQL Server};SERVER=...;DATABASE=METAMOOD;Trusted_Connection=yes;"
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import moderation
+import view_counter
+
+# Tables in foreign-key dependency order: (table, IDENTITY column or None, columns)
+TABLES: List[Tuple[str, Optional[str], List[str]]] = [
+    ("Users", "UserID", ["UserID", "Username", "Email", "CreatedAt"]),
+    ("Categories", "CategoryID", ["CategoryID", "CategoryName"]),
+    ("Tags", "TagID", ["TagID", "TagName"]),
+    ("Wallets", "WalletID", ["WalletID", "UserID", "PublicKey", "Balance"]),
+    ("Collections", "CollectionID", ["CollectionID", "CollectionName", "CreatorID", "CategoryID"]),
+    ("NFTs", "NFTID", ["NFTID", "Title", "Description", "CollectionID", "OwnerID", "MintedAt", "ImagePath"]),
+    ("NFT_Tags", None, ["NFTID", "TagID"]),
+    ("Listings", "ListingID", ["ListingID", "NFTID", "SellerID", "Price", "ListedAt", "IsActive"]),
+    ("Bids", "BidID", ["BidID", "ListingID", "BidderID", "BidAmount", "BidAt"]),
+    ("Transactions", "TransactionID", ["TransactionID", "NFTID", "BuyerID", "SellerID", "SalePrice", "TransactionDate"]),
+    ("Royalties", None, ["NFTID", "CreatorID", "Percentage"]),
+    ("Likes", None, ["UserID", "NFTID", "LikedAt"]),
+    ("Reports", "ReportID", ["ReportID", "ReporterID", "NFTID", "Reason", "ReportedAt"]),
+    ("Favorites", None, ["UserID", "CollectionID", "FavoritedAt"]),
+    ("NFT_Views", "ViewID", ["ViewID", "NFTID", "ViewerID", "ViewedAt"]),
+]
+
+FORMATS = ("csv", "ndjson")
+
+
+# Reading
+
+def read_rows(path: str) -> Tuple[List[str], Iterator[tuple]]:
+    # Returns the file's columns and a lazy iterator over its rows
+    if path.endswith(".csv"):
+        f = open(path, newline="", encoding="utf-8")
+        reader = csv.reader(f)
+        columns = next(reader, [])
+
+        def rows():
+            with f:
+                for record in reader:
+                    # An empty CSV field is NULL
+                    yield tuple(value if value != "" else None for value in record)
+        return columns, rows()
+
+    f = open(path, encoding="utf-8")
+    first = f.readline()
+    if not first.strip():
+        f.close()
+        return [], iter(())
+    columns = list(json.loads(first))
+
+    def rows():
+        with f:
+            yield tuple(json.loads(first).get(c) for c in columns)
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield tuple(record.get(c) for c in columns)
+    return columns, rows()
+
+
+def table_file(directory: str, table: str) -> Optional[str]:
+    for fmt in FORMATS:
+        path = os.path.join(directory, f"{table}.{fmt}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# Loading
+
+class Progress:
+    # Rows loaded and rows/sec, redrawn on one stderr line at most every `interval` seconds
+    def __init__(self, table: str, interval: float = 1.0, out=sys.stderr):
+        self.table = table
+        self.interval = interval
+        self.out = out
+        self.started = time.perf_counter()
+        self.shown = self.started
+        self.rows = 0
+
+    def add(self, rows: int) -> None:
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self.shown >= self.interval:
+            self.shown = now
+            self.out.write(f"\r{self.table}: {self.rows:,} rows ({self.rate():,.0f} rows/s)")
+            self.out.flush()
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def done(self) -> None:
+        self.out.write(f"\r{self.table}: {self.rows:,} rows in {time.perf_counter() - self.started:.1f}s "
+                       f"({self.rate():,.0f} rows/s)\n")
+        self.out.flush()
+
+
+def load_table(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[tuple],
+    identity: Optional[str] = None,
+    chunk_size: int = 5000,
+    commit_every: int = 50_000,
+    progress: Optional[Progress] = None,
+) -> int:
+    # Inserts `rows` in executemany batches of chunk_size, committing every commit_every rows
+    cursor = conn.cursor()
+    if hasattr(cursor, "fast_executemany"):
+        cursor.fast_executemany = True
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    keep_identity = identity is not None and identity in columns
+    if keep_identity:
+        cursor.execute(f"SET IDENTITY_INSERT {table} ON")
+
+    loaded = 0
+    committed = 0
+    batch: List[tuple] = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                cursor.executemany(sql, batch)
+                loaded += len(batch)
+                if progress is not None:
+                    progress.add(len(batch))
+                batch = []
+                if loaded - committed >= commit_every:
+                    conn.commit()
+                    committed = loaded
+        if batch:
+            cursor.executemany(sql, batch)
+            loaded += len(batch)
+            if progress is not None:
+                progress.add(len(batch))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise RuntimeError(f"{table}: failed after {committed:,} committed rows "
+                           f"(batch starting at row {loaded + 1:,}): {e}") from e
+    finally:
+        if keep_identity:
+            # Only one table per session may have IDENTITY_INSERT on
+            cursor.execute(f"SET IDENTITY_INSERT {table} OFF")
+    return loaded
+
+
+def load_directory(
+    conn,
+    directory: str,
+    tables: Optional[Sequence[str]] = None,
+    chunk_size: int = 5000,
+    commit_every: int = 50_000,
+    out=sys.stderr,
+) -> Dict[str, Tuple[int, float]]:
+    # Loads every table file found in `directory`; returns {table: (rows, rows/sec)}
+    wanted = {t.lower() for t in tables} if tables else None
+    results = {}
+    for table, identity, known in TABLES:
+        if wanted is not None and table.lower() not in wanted:
+            continue
+        path = table_file(directory, table)
+        if path is None:
+            continue
+        columns, rows = read_rows(path)
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise ValueError(f"{path}: unknown columns {unknown} for {table}")
+        if not columns:
+            continue
+        progress = Progress(table, out=out)
+        loaded = load_table(conn, table, columns, rows, identity, chunk_size, commit_every, progress)
+        progress.done()
+        results[table] = (loaded, progress.rate())
+    bump_table_versions(conn, list(results))
+    if "Reports" in results:
+        rebuild_report_counts(conn)
+    if "NFT_Views" in results:
+        rebuild_view_counts(conn)
+    return results
+
+
+def bump_table_versions(conn, tables: Sequence[str]) -> None:
+    # The list endpoints' ETags come from Table_Versions (migration 0004); move the
+    # loaded tables' counters so clients refetch. Before that migration there is none
+    if not tables:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"UPDATE Table_Versions SET Version = Version + 1 "
+                       f"WHERE TableName IN ({', '.join('?' * len(tables))})", tables)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+
+
+def rebuild_report_counts(conn) -> None:
+    # Loaded reports bypass create_report, so recount the per-NFT report rollups
+    # (migration 0005) from Reports. Before that migration there are none
+    cursor = conn.cursor()
+    try:
+        moderation.rebuild_report_counts(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+
+
+def rebuild_view_counts(conn) -> None:
+    # Loaded views bypass the view counter, so recount the per-NFT view rollup
+    # (migration 0010) from NFT_Views. Before that migration there is none
+    cursor = conn.cursor()
+    try:
+        view_counter.rebuild_view_counts(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+
+
+# Synthetic data
+
+def generate(directory: str, users: int, fmt: str = "csv", seed: int = 1) -> Dict[str, int]:
+    """Writes a synthetic dataset scaled by `users`, with consistent foreign keys.
+
+    Per user: 1 wallet, 5 NFTs (half of them listed, ~4 bids per listing),
+    0.1 collections, 3 likes, 1 favorite and 25 NFT views.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    start = datetime(2025, 1, 1)
+
+    def when(days: int = 365) -> str:
+        return (start + timedelta(seconds=rng.randrange(days * 86400))).isoformat(timespec="seconds")
+
+    counts = {}
+
+    def write(table: str, rows: Iterable[tuple]) -> None:
+        columns = next(c for t, _, c in TABLES if t == table)
+        path = os.path.join(directory, f"{table}.{fmt}")
+        n = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow("" if value is None else value for value in row)
+                    n += 1
+            else:
+                for row in rows:
+                    f.write(json.dumps(dict(zip(columns, row))) + "\n")
+                    n += 1
+        counts[table] = n
+
+    n_categories = 10
+    n_tags = 50
+    n_collections = max(1, users // 10)
+    n_nfts = users * 5
+    n_listings = n_nfts // 2
+
+    write("Users", ((i, f"user_{i}", f"user_{i}@example.com", when()) for i in range(1, users + 1)))
+    write("Categories", ((i, f"Category {i}") for i in range(1, n_categories + 1)))
+    write("Tags", ((i, f"tag{i}") for i in range(1, n_tags + 1)))
+    write("Wallets", ((i, i, f"0x{rng.getrandbits(160):040x}", round(rng.uniform(0, 10_000), 2))
+                      for i in range(1, users + 1)))
+    collection_creators = [rng.randint(1, users) for _ in range(n_collections)]
+    write("Collections", ((i, f"Collection {i}", collection_creators[i - 1], rng.randint(1, n_categories))
+                          for i in range(1, n_collections + 1)))
+
+    owners = [rng.randint(1, users) for _ in range(n_nfts)]
+    write("NFTs", ((i, f"NFT {i}", f"Synthetic NFT number {i}", rng.randint(1, n_collections), owners[i - 1],
+                    when(), f"/static/images/nft_{i}.png") for i in range(1, n_nfts + 1)))
+    write("NFT_Tags", ((nft_id, tag_id) for nft_id in range(1, n_nfts + 1)
+                       for tag_id in sorted(rng.sample(range(1, n_tags + 1), 2))))
+
+    listed = rng.sample(range(1, n_nfts + 1), n_listings)
+    prices = {}
+
+    def listings():
+        for listing_id, nft_id in enumerate(listed, 1):
+            prices[listing_id] = round(rng.uniform(10, 1000), 2)
+            yield listing_id, nft_id, owners[nft_id - 1], prices[listing_id], when(), 1 if rng.random() < 0.8 else 0
+    write("Listings", listings())
+
+    def bids():
+        bid_id = 0
+        for listing_id in range(1, n_listings + 1):
+            amount = prices[listing_id]
+            for _ in range(rng.randint(0, 8)):
+                bid_id += 1
+                amount = round(amount * rng.uniform(1.01, 1.2), 2)
+                yield bid_id, listing_id, rng.randint(1, users), amount, when()
+    write("Bids", bids())
+
+    write("Transactions", ((i, nft_id, rng.randint(1, users), owners[nft_id - 1], round(rng.uniform(10, 2000), 2), when())
+                           for i, nft_id in enumerate(rng.sample(range(1, n_nfts + 1), n_nfts // 10), 1)))
+    write("Royalties", ((nft_id, owners[nft_id - 1], round(rng.uniform(1, 10), 2))
+                        for nft_id in range(1, n_nfts + 1, 2)))
+    write("Likes", ((user_id, nft_id, when()) for user_id in range(1, users + 1)
+                    for nft_id in sorted(rng.sample(range(1, n_nfts + 1), min(3, n_nfts)))))
+    write("Reports", ((i, rng.randint(1, users), rng.randint(1, n_nfts), "Synthetic report", when())
+                      for i in range(1, n_nfts // 100 + 1)))
+    write("Favorites", ((user_id, rng.randint(1, n_collections), when()) for user_id in range(1, users + 1)))
+
+    def nft_views():
+        for view_id in range(1, users * 25 + 1):
+            yield view_id, rng.randint(1, n_nfts), rng.randint(1, users), when()
+    write("NFT_Views", nft_views())
+    return counts
+
+
+# Command line
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk load or generate MetaMood seed data.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="load <Table>.csv / <Table>.ndjson files from a directory")
+    load.add_argument("directory")
+    load.add_argument("--conn-str", required=True, help="ODBC connection string of the target database")
+    load.add_argument("--tables", help="comma-separated subset of tables to load, e.g. to resume")
+    load.add_argument("--chunk-size", type=int, default=5000, help="rows per executemany batch")
+    load.add_argument("--commit-every", type=int, default=50_000, help="rows per transaction")
+
+    gen = commands.add_parser("generate", help="write a synthetic dataset")
+    gen.add_argument("directory")
+    gen.add_argument("--users", type=int, default=10_000, help="scale; other tables are sized from it")
+    gen.add_argument("--format", choices=FORMATS, default="csv")
+    gen.add_argument("--seed", type=int, default=1)
+
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    if args.command == "generate":
+        counts = generate(args.directory, args.users, args.format, args.seed)
+        total = sum(counts.values())
+        print(f"wrote {total:,} rows in {len(counts)} tables to {args.directory} "
+              f"in {time.perf_counter() - started:.1f}s")
+        return
+
+    import pyodbc
+    conn = pyodbc.connect(args.conn_str)
+    try:
+        tables = args.tables.split(",") if args.tables else None
+        results = load_directory(conn, args.directory, tables, args.chunk_size, args.commit_every)
+    finally:
+        conn.close()
+    total = sum(rows for rows, _ in results.values())
+    elapsed = time.perf_counter() - started
+    print(f"loaded {total:,} rows in {len(results)} tables in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
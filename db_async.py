@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+from db_pool import ConnectionPool
+
+
+class QueryTimeout(Exception):
+    """Raised when a query runs longer than its timeout."""
+
+
+class QueryCancelled(Exception):
+    """Raised when the client went away before the query finished."""
+
+
+class AsyncDB:
+    """Awaitable access to a ConnectionPool for async route handlers.
+
+    `pool` may also be a db_router.ReplicaRouter, which picks the pool per call.
+    Work runs on a dedicated, bounded thread pool (sized to the connection pool)
+    so blocking driver calls never stall the event loop. The work function gets a
+    cursor on a pooled connection; commit with `cursor.connection.commit()`.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        max_workers: Optional[int] = None,
+        query_timeout: float = 10.0,
+        disconnect_poll: float = 0.25,
+    ):
+        self.pool = pool
+        self.query_timeout = query_timeout
+        self.disconnect_poll = disconnect_poll
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or pool.max_size, thread_name_prefix="db"
+        )
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> Any:
+        timeout = self.query_timeout if timeout is None else timeout
+        job = _Job(fn, args, timeout)
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so per-request state (DB metrics) follows
+        context = contextvars.copy_context()
+        work = loop.run_in_executor(self._executor, context.run, job.execute, self.pool)
+        # Abandoned work still finishes on its thread; swallow its result/error there
+        work.add_done_callback(_consume)
+
+        watcher = None
+        if is_disconnected is not None:
+            watcher = asyncio.ensure_future(self._watch(is_disconnected))
+
+        try:
+            waiters = {work} if watcher is None else {work, watcher}
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if work in done:
+                return work.result()
+            if watcher is not None and watcher in done:
+                job.cancel()
+                raise QueryCancelled("Client disconnected before the query finished")
+            job.cancel()
+            raise QueryTimeout(f"Query exceeded {timeout:g}s")
+        except asyncio.CancelledError:
+            # The handler itself was cancelled (e.g. server shutdown)
+            job.cancel()
+            raise
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    async def _watch(self, is_disconnected: Callable[[], Awaitable[bool]]) -> None:
+        while not await is_disconnected():
+            await asyncio.sleep(self.disconnect_poll)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+def _consume(future: "asyncio.Future") -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+class _Job:
+    # Runs on a worker thread; remembers its cursor so the loop side can cancel it
+
+    def __init__(self, fn: Callable[..., Any], args: tuple, timeout: float):
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._cursor = None
+        self._cancelled = False
+
+    def execute(self, pool: ConnectionPool) -> Any:
+        if self._cancelled:
+            raise QueryCancelled("Query cancelled before it started")
+        with pool.connection() as conn:
+            if hasattr(conn, "timeout"):
+                # pyodbc enforces this server-side per statement (whole seconds, 0 = none)
+                conn.timeout = max(1, int(self.timeout + 0.999))
+            cursor = conn.cursor()
+            with self._lock:
+                self._cursor = cursor
+            try:
+                return self.fn(cursor, *self.args)
+            finally:
+                with self._lock:
+                    self._cursor = None
+                if hasattr(conn, "timeout"):
+                    conn.timeout = 0
+                cursor.close()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            cursor = self._cursor
+        if cursor is None:
+            return
+        try:
+            if hasattr(cursor, "cancel"):
+                cursor.cancel()  # pyodbc: SQLCancel on the running statement
+            elif hasattr(cursor.connection, "interrupt"):
+                cursor.connection.interrupt()  # sqlite3
+        except Exception:
+            pass
@@ -0,0 +1,371 @@
+import contextvars
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RequestStats:
+    """Database work done on behalf of one request."""
+
+    __slots__ = ("scope", "statements", "db_seconds", "rows", "pool_wait", "checkouts")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.pool_wait = 0.0
+        self.checkouts = 0
+
+
+# Set by MetricsMiddleware for the duration of a request. AsyncDB and the threadpool
+# that runs sync handlers copy the context, so statements issued there still find it
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("db_request_stats", default=None)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> Iterable[str]:
+        prefix = f"{labels}," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}'
+        yield f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}'
+        suffix = f"{{{labels}}}" if labels else ""
+        yield f"{name}_sum{suffix} {self.sum:.6f}"
+        yield f"{name}_count{suffix} {self.count}"
+
+
+class _RouteMetrics:
+    __slots__ = ("duration", "statements", "db_time", "rows", "responses")
+
+    def __init__(self):
+        self.duration = _Histogram(LATENCY_BUCKETS)
+        self.statements = _Histogram(STATEMENT_BUCKETS)
+        self.db_time = _Histogram(LATENCY_BUCKETS)
+        self.rows = 0
+        self.responses: Dict[int, int] = {}
+
+
+class DBMetrics:
+    """Statement counts, timings, rows fetched and pool waits, per request and per route.
+
+    `instrument(connect)` wraps a connection factory so every cursor it hands out
+    reports to this object; `pool_wait` is the ConnectionPool checkout hook. Work
+    done inside a request (see MetricsMiddleware) is added to that request's
+    RequestStats; everything else, like the background index builds, only to the
+    process-wide statement histogram. Statements slower than `slow_query_ms` are
+    logged with their SQL and the types of their parameters, never the values.
+    """
+
+    def __init__(self, slow_query_ms: Optional[float] = None, log: Callable[[str], None] = print):
+        self.slow_query_ms = slow_query_ms
+        self.log = log
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], _RouteMetrics] = {}
+        self._statement_time = _Histogram(LATENCY_BUCKETS)
+        self._pool_wait = _Histogram(LATENCY_BUCKETS)
+        self._rows = 0
+        self._slow = 0
+
+    # Hooks
+
+    def instrument(self, connect: Callable[[], Any]) -> Callable[[], Any]:
+        def instrumented_connect():
+            return _Connection(connect(), self)
+        return instrumented_connect
+
+    def pool_wait(self, seconds: float) -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.pool_wait += seconds
+            stats.checkouts += 1
+        with self._lock:
+            self._pool_wait.observe(seconds)
+
+    def _statement(self, sql: str, params: tuple, seconds: float, many: bool) -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += seconds
+        slow = self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms
+        with self._lock:
+            self._statement_time.observe(seconds)
+            if slow:
+                self._slow += 1
+        if slow:
+            shape = _params_shape(params[0] if many else params, many)
+            self.log(f"Slow query ({seconds * 1000:.1f} ms, {_route_label(stats)}): "
+                     f"{_WHITESPACE.sub(' ', sql).strip()[:2000]} params {shape}")
+
+    def _db_work(self, seconds: float, rows: int = 0) -> None:
+        # Fetches, nextset and commits: database time that is not a new statement
+        stats = _current.get()
+        if stats is not None:
+            stats.rows += rows
+            stats.db_seconds += seconds
+        with self._lock:
+            self._rows += rows
+
+    # Requests
+
+    def observe_request(self, stats: RequestStats, method: str, status: int, seconds: float) -> None:
+        key = (method, _route_label(stats))
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                route = self._routes[key] = _RouteMetrics()
+            route.duration.observe(seconds)
+            route.statements.observe(stats.statements)
+            route.db_time.observe(stats.db_seconds)
+            route.rows += stats.rows
+            route.responses[status] = route.responses.get(status, 0) + 1
+
+    @staticmethod
+    def server_timing(stats: RequestStats, seconds: float) -> str:
+        return (f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} statements, {stats.rows} rows", '
+                f"pool;dur={stats.pool_wait * 1000:.2f}, total;dur={seconds * 1000:.2f}")
+
+    # Prometheus text exposition; `gauges` and `counters` map extra metric names to (help, value)
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None,
+               counters: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        out: List[str] = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            def histograms(name: str, help_text: str, attribute: str) -> None:
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} histogram")
+                for (method, path), route in routes:
+                    out.extend(getattr(route, attribute).lines(name, _labels(method=method, route=path)))
+
+            out.append("# HELP metamood_http_requests_total Responses by route and status.")
+            out.append("# TYPE metamood_http_requests_total counter")
+            for (method, path), route in routes:
+                for status, count in sorted(route.responses.items()):
+                    out.append(f"metamood_http_requests_total{{{_labels(method=method, route=path, status=status)}}} {count}")
+            histograms("metamood_http_request_duration_seconds", "Time to the last byte of the response.", "duration")
+            histograms("metamood_db_statements_per_request", "SQL statements issued per request.", "statements")
+            histograms("metamood_db_seconds_per_request", "Time spent executing and fetching per request.", "db_time")
+            out.append("# HELP metamood_db_rows_fetched_total Rows fetched by requests to each route.")
+            out.append("# TYPE metamood_db_rows_fetched_total counter")
+            for (method, path), route in routes:
+                out.append(f"metamood_db_rows_fetched_total{{{_labels(method=method, route=path)}}} {route.rows}")
+
+            out.append("# HELP metamood_db_statement_seconds Execution time of each SQL statement, background work included.")
+            out.append("# TYPE metamood_db_statement_seconds histogram")
+            out.extend(self._statement_time.lines("metamood_db_statement_seconds", ""))
+            out.append("# HELP metamood_db_pool_wait_seconds Time to check a connection out of the pool.")
+            out.append("# TYPE metamood_db_pool_wait_seconds histogram")
+            out.extend(self._pool_wait.lines("metamood_db_pool_wait_seconds", ""))
+            out.append("# HELP metamood_db_rows_fetched_all_total Rows fetched, background work included.")
+            out.append("# TYPE metamood_db_rows_fetched_all_total counter")
+            out.append(f"metamood_db_rows_fetched_all_total {self._rows}")
+            out.append("# HELP metamood_db_slow_statements_total Statements over the slow query threshold.")
+            out.append("# TYPE metamood_db_slow_statements_total counter")
+            out.append(f"metamood_db_slow_statements_total {self._slow}")
+
+        for kind, metrics in (("gauge", gauges), ("counter", counters)):
+            for name, (help_text, value) in (metrics or {}).items():
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                out.append(f"{name} {value}")
+        return "\n".join(out) + "\n"
+
+
+def _streamed(start) -> bool:
+    # Starlette sets content-length on every complete body it sends, except where
+    # a body isn't allowed; StreamingResponse has none
+    if start["status"] < 200 or start["status"] in (204, 304):
+        return False
+    return not any(name.lower() == b"content-length" for name, _ in start.get("headers", ()))
+
+
+class MetricsMiddleware:
+    """ASGI middleware that collects a RequestStats per HTTP request.
+
+    Adds a Server-Timing header (database time, statement and row counts, pool
+    wait) to every response with a complete body, and records the request in the
+    per-route histograms once the body has been sent, so streamed responses count
+    in full. Headers go out before a streamed body is generated, so a header there
+    would only cover the work done before the stream started; streamed responses
+    (no content-length, e.g. the NDJSON export and event streams) get none.
+    """
+
+    def __init__(self, app, metrics: DBMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if not _streamed(message):
+                    timing = self.metrics.server_timing(stats, time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.metrics.observe_request(stats, scope["method"], status, time.perf_counter() - started)
+
+
+class _Connection:
+    # DB-API connection proxy; attribute reads and writes (pyodbc's timeout) pass through
+
+    __slots__ = ("_raw", "_metrics")
+
+    def __init__(self, raw: Any, metrics: DBMetrics):
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_metrics", metrics)
+
+    def cursor(self) -> "_Cursor":
+        return _Cursor(self._raw.cursor(), self)
+
+    def commit(self) -> None:
+        started = time.perf_counter()
+        try:
+            self._raw.commit()
+        finally:
+            self._metrics._db_work(time.perf_counter() - started)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._raw, name, value)
+
+
+class _Cursor:
+    # Times execute/executemany and the fetches; fetch time counts as database time
+
+    __slots__ = ("_raw", "_connection")
+
+    def __init__(self, raw: Any, connection: _Connection):
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_connection", connection)
+
+    @property
+    def connection(self) -> _Connection:
+        return self._connection
+
+    def execute(self, sql: str, *params: Any) -> "_Cursor":
+        started = time.perf_counter()
+        try:
+            self._raw.execute(sql, *params)
+        finally:
+            self._connection._metrics._statement(sql, params, time.perf_counter() - started, False)
+        return self
+
+    def executemany(self, sql: str, seq_of_params: Any) -> "_Cursor":
+        started = time.perf_counter()
+        try:
+            self._raw.executemany(sql, seq_of_params)
+        finally:
+            self._connection._metrics._statement(sql, (seq_of_params,), time.perf_counter() - started, True)
+        return self
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = self._raw.fetchone()
+        self._connection._metrics._db_work(time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *size: int) -> List[Any]:
+        started = time.perf_counter()
+        rows = self._raw.fetchmany(*size)
+        self._connection._metrics._db_work(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        started = time.perf_counter()
+        rows = self._raw.fetchall()
+        self._connection._metrics._db_work(time.perf_counter() - started, len(rows))
+        return rows
+
+    def nextset(self) -> Any:
+        started = time.perf_counter()
+        more = self._raw.nextset()
+        self._connection._metrics._db_work(time.perf_counter() - started)
+        return more
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._raw, name, value)
+
+
+def _route_label(stats: Optional[RequestStats]) -> str:
+    if stats is None or stats.scope is None:
+        return "background"
+    # FastAPI routes record the matched route (its path template); mounts such as
+    # /static only their prefix
+    route = stats.scope.get("route")
+    if route is not None:
+        return route.path
+    return stats.scope.get("root_path") or "unmatched"
+
+
+def _params_shape(params: Any, many: bool) -> str:
+    # "(int, str x3)" for the parameters of a statement; executemany adds the batch size
+    if many:
+        rows = params if isinstance(params, (list, tuple)) else None
+        if not rows:
+            return "[batch]"
+        return f"[{len(rows)} x {_params_shape(rows[0], False)}]"
+    if len(params) == 1 and isinstance(params[0], (list, tuple)):
+        params = params[0]
+    runs: List[List[Any]] = []
+    for value in params:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "(" + ", ".join(name if count == 1 else f"{name} x{count}" for name, count in runs) + ")"
+
+
+def _labels(**labels: Any) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
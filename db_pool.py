@@ -0,0 +1,228 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the wait timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw: Any):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of DB-API connections.
+
+    `connect` is any zero-argument callable returning a DB-API connection, so the
+    pool works the same with pyodbc against SQL Server or sqlite3 in tests.
+    `on_checkout`, if given, is called with the seconds each checkout waited.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_lifetime: float = 1800.0,
+        ping_after: float = 30.0,
+        ping_sql: str = "SELECT 1",
+        on_checkout: Optional[Callable[[float], None]] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.ping_sql = ping_sql
+        self.on_checkout = on_checkout
+
+        self._lock = threading.Condition()
+        self._idle: List[_PooledConnection] = []
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._opening = 0
+        self._closed = False
+
+        # Counters for sizing the pool
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_pings = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # Checkout / checkin
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._lock:
+            self._waiting += 1
+            try:
+                while True:
+                    # Checked on every wakeup: close() wakes the waiters, and connections
+                    # released after it free slots that must not be handed out again
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    # A slot is reserved in _opening until the connection is handed out
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        self._opening += 1
+                        break
+                    if len(self._in_use) + self._opening < self.max_size:
+                        pooled = None
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"Timed out after {timeout:g}s waiting for a database connection "
+                            f"({self.max_size} in use)"
+                        )
+                    self._lock.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        # Connecting and pinging happen outside the lock so other threads keep moving
+        try:
+            if pooled is not None:
+                pooled = self._validate(pooled)
+            if pooled is None:
+                pooled = _PooledConnection(self._connect())
+                with self._lock:
+                    self._created += 1
+        except BaseException:
+            with self._lock:
+                self._opening -= 1
+                self._lock.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._opening -= 1
+            closed = self._closed
+            if not closed:
+                self._in_use[id(pooled.raw)] = pooled
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+        if closed:
+            # close() ran while this connection was being opened or validated
+            self._close_quietly(pooled.raw)
+            raise PoolTimeout("Connection pool is closed")
+        if self.on_checkout is not None:
+            self.on_checkout(waited)
+        return pooled.raw
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        with self._lock:
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
+            return
+
+        if not discard:
+            try:
+                # Never hand the next caller an open transaction
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        expired = time.monotonic() - pooled.created_at >= self.max_lifetime
+        if discard or expired or self._closed:
+            self._close_quietly(conn)
+            with self._lock:
+                if expired and not discard:
+                    self._recycled += 1
+                self._lock.notify()
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(pooled)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except BaseException as e:
+            # Driver-level failures can leave the session unusable
+            discard = not isinstance(e, Exception) or _is_driver_error(e)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def _validate(self, pooled: _PooledConnection) -> Optional[_PooledConnection]:
+        now = time.monotonic()
+        if now - pooled.created_at >= self.max_lifetime:
+            self._close_quietly(pooled.raw)
+            with self._lock:
+                self._recycled += 1
+            return None
+        if now - pooled.last_used >= self.ping_after:
+            try:
+                cursor = pooled.raw.cursor()
+                cursor.execute(self.ping_sql)
+                cursor.fetchall()
+                cursor.close()
+            except Exception:
+                self._close_quietly(pooled.raw)
+                with self._lock:
+                    self._failed_pings += 1
+                return None
+        return pooled
+
+    # Maintenance
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._lock.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled.raw)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "failed_pings": self._failed_pings,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    @staticmethod
+    def _close_quietly(conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _is_driver_error(exc: BaseException) -> bool:
+    # Connection-level DB-API errors (pyodbc, sqlite3) may leave the session unusable.
+    # Errors raised by our own handlers (HTTPException etc.) or by bad SQL/data don't.
+    return type(exc).__name__ in {"OperationalError", "InterfaceError"}
@@ -0,0 +1,255 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from db_pool import ConnectionPool, PoolTimeout
+
+BEAT_SQL = "UPDATE Replica_Heartbeat SET BeatAt = ? WHERE HeartbeatID = 1 AND BeatAt < ?"
+POSITION_SQL = "SELECT BeatAt FROM Replica_Heartbeat WHERE HeartbeatID = 1"
+
+# Set by RoutingMiddleware for the duration of a request: None sends its queries to the
+# primary, a number lets replicas caught up to that heartbeat (ms since the epoch) take
+# them. AsyncDB and the threadpool that runs sync handlers copy the context; background
+# work outside a request has the default, the primary
+_reads_after: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("db_reads_after", default=None)
+
+
+def _now_ms(clock) -> int:
+    return int(clock() * 1000)
+
+
+class Replica:
+    __slots__ = ("name", "pool", "position", "error", "in_flight", "reads", "failures")
+
+    def __init__(self, name: str, pool: ConnectionPool):
+        self.name = name
+        self.pool = pool
+        self.position: Optional[int] = None  # Heartbeat last read from it, None until one is
+        self.error: Optional[str] = None  # Why the last check failed
+        self.in_flight = 0
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    """Sends reads to read replicas and everything else to the primary.
+
+    Requests RoutingMiddleware marks as reads are served by a replica when one
+    is fit for them, and otherwise by the primary:
+      - lag: check() writes a heartbeat (the time, in ms) to Replica_Heartbeat on
+        the primary and reads each replica's copy of it back. A replica is fit
+        once its copy is at most `max_lag` seconds old and its last check
+        succeeded, so a replica that stops replicating, or stops answering, is
+        left out until it catches up again;
+      - read-your-writes: a request made after the client's last write carries
+        that write's time, and only replicas whose heartbeat has passed it
+        (so have replicated the write) serve it;
+      - load: among fit replicas the one with the fewest queries running is
+        picked, in turn when they are level;
+      - shared state: reads in a shared_reads() block fill caches and order
+        books every request then sees, so they also wait for this process's
+        last write (see wrote()). A fill is then never older than a write, or
+        cache invalidation, made here.
+    A replica that can't be connected to is left out until its next good check
+    and the read goes to the primary.
+
+    Heartbeats are compared against the clocks of the workers that wrote them,
+    so workers on different hosts rely on those clocks agreeing (NTP) to well
+    within `max_lag`.
+    """
+
+    def __init__(self, primary: ConnectionPool, replicas: Sequence[Tuple[str, ConnectionPool]] = (),
+                 max_lag: float = 10.0, clock=time.time):
+        self.primary = primary
+        self.replicas = [Replica(name, pool) for name, pool in replicas]
+        self.max_lag = max_lag
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._turn = 0
+        self.last_write = 0  # When this process last committed a write, ms since the epoch
+        self.primary_reads = 0  # Reads the primary served for want of a fit replica
+        self.beats = 0
+        self.failed_beats = 0
+
+    @property
+    def max_size(self) -> int:
+        # Connections across every pool; AsyncDB sizes its threads from it
+        return self.primary.max_size + sum(replica.pool.max_size for replica in self.replicas)
+
+    # Routing
+
+    def choose(self, after: int) -> Optional[Replica]:
+        # The fit replica with the fewest queries running, or None; counts it as running one more
+        oldest = max(after, _now_ms(self._clock) - int(self.max_lag * 1000))
+        with self._lock:
+            count = len(self.replicas)
+            best = None
+            for i in range(count):
+                replica = self.replicas[(self._turn + i) % count]
+                if replica.error is None and replica.position is not None and replica.position >= oldest:
+                    if best is None or replica.in_flight < best.in_flight:
+                        best = replica
+            self._turn += 1
+            if best is None:
+                self.primary_reads += 1
+                return None
+            best.in_flight += 1
+            best.reads += 1
+            return best
+
+    def wrote(self, at: Optional[int] = None) -> None:
+        # Records a write committed by this process: RoutingMiddleware does for write
+        # requests, background writers (settlement) call it themselves
+        at = at if at is not None else _now_ms(self._clock)
+        with self._lock:
+            self.last_write = max(self.last_write, at)
+
+    @contextmanager
+    def shared_reads(self):
+        """For reads whose results are kept for other requests, e.g. cache loads and
+        order book loads and catch-ups.
+
+        A stale replica would keep serving the state from before a write to
+        everyone, the writer included, so in the block only replicas that have
+        replicated this process's last write serve reads; the primary does
+        until one has. Connections must be taken inside the block.
+        """
+        after = _reads_after.get()
+        if after is None:
+            yield
+            return
+        token = _reads_after.set(max(after, self.last_write))
+        try:
+            yield
+        finally:
+            _reads_after.reset(token)
+
+    def _done(self, replica: Replica) -> None:
+        with self._lock:
+            replica.in_flight -= 1
+
+    def _fail(self, replica: Replica, error: Exception) -> None:
+        with self._lock:
+            replica.error = str(error) or type(error).__name__
+            replica.failures += 1
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """A pooled connection for the current request: see RoutingMiddleware."""
+        after = _reads_after.get()
+        replica = self.choose(after) if after is not None and self.replicas else None
+        if replica is not None:
+            entered = False
+            try:
+                with replica.pool.connection(timeout) as conn:
+                    entered = True
+                    yield conn
+                return
+            except PoolTimeout:
+                raise
+            except Exception as e:
+                if entered:
+                    raise
+                # Couldn't connect: the primary takes the read
+                print(f"Error connecting to replica {replica.name}: {e}")
+                self._fail(replica, e)
+            finally:
+                self._done(replica)
+        with self.primary.connection(timeout) as conn:
+            yield conn
+
+    # Health
+
+    def check(self) -> None:
+        """Writes a heartbeat to the primary, then reads every replica's position."""
+        if not self.replicas:
+            return
+        beat = _now_ms(self._clock)
+        try:
+            with self.primary.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(BEAT_SQL, (beat, beat))
+                conn.commit()
+            self.beats += 1
+        except Exception as e:
+            # Replica positions stop advancing, so they age out of max_lag and reads fall back
+            print(f"Error writing the replication heartbeat: {e}")
+            self.failed_beats += 1
+        for replica in self.replicas:
+            try:
+                with replica.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(POSITION_SQL)
+                    row = cursor.fetchone()
+                if row is None:
+                    raise LookupError("Replica_Heartbeat has no row; apply the migrations")
+                with self._lock:
+                    replica.position = max(replica.position or 0, int(row[0]))
+                    replica.error = None
+            except Exception as e:
+                self._fail(replica, e)
+
+    def stats(self) -> Dict[str, Any]:
+        now = _now_ms(self._clock)
+        with self._lock:
+            replicas: List[Dict[str, Any]] = [{
+                "name": replica.name,
+                "lag_seconds": round((now - replica.position) / 1000, 3) if replica.position else None,
+                "error": replica.error,
+                "in_flight": replica.in_flight,
+                "reads": replica.reads,
+                "failures": replica.failures,
+                "pool": replica.pool.stats(),
+            } for replica in self.replicas]
+            return {"replicas": replicas, "max_lag_seconds": self.max_lag, "primary_reads": self.primary_reads,
+                    "last_write": self.last_write,
+                    "beats": self.beats, "failed_beats": self.failed_beats}
+
+
+class RoutingMiddleware:
+    """ASGI middleware that marks GET and HEAD requests as reads for ReplicaRouter.
+
+    Other requests run on the primary. When one succeeds, the response sets the
+    `cookie` cookie to the time it finished, in ms; reads that carry it are only
+    served by replicas that have replicated up to that time. The cookie lasts
+    max_lag seconds, after which every fit replica has.
+    """
+
+    def __init__(self, app, router: ReplicaRouter, cookie: str = "metamood_written"):
+        self.app = app
+        self.router = router
+        self.cookie = cookie
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.router.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in ("GET", "HEAD"):
+            token = _reads_after.set(self._written_at(scope))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _reads_after.reset(token)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                written = _now_ms(self.router._clock)
+                self.router.wrote(written)
+                cookie = f"{self.cookie}={written}; Max-Age={int(self.router.max_lag) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+    def _written_at(self, scope) -> int:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                morsel = SimpleCookie(value.decode("latin-1")).get(self.cookie)
+                if morsel is not None and morsel.value.isdigit():
+                    return int(morsel.value)
+        return 0
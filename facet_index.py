@@ -0,0 +1,649 @@
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Facets the browse endpoint filters and counts on, besides price
+FACETS = ("category", "collection", "tag")
+SORTS = ("newest", "price_asc", "price_desc")
+_PLURALS = {"category": "categories", "collection": "collections", "tag": "tags"}
+
+_EMPTY_IDS = np.zeros(0, np.int32)
+_EMPTY_PRICES = np.zeros(0, np.float64)
+_PAGE_BLOCK = 1 << 14  # NFTIDs scanned at a time when reading a page off a mask
+
+# Everything build() swaps in at once
+_STATE = (
+    "_alive", "_collection", "_price", "_tag_slots", "_size", "_live", "_category_of",
+    "_members", "_totals", "_tag_entries", "_by_price", "_sorted_prices", "_names", "synced_through", "built_at",
+)
+
+
+def _resized(values: np.ndarray, size: int, fill) -> np.ndarray:
+    grown = np.full((size,) + values.shape[1:], fill, values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+class _Members:
+    """The sorted NFTIDs having one facet value.
+
+    Appending a higher NFTID, as a mint does, writes into spare capacity; other
+    changes replace the array, so a view taken earlier never changes under a reader.
+    """
+
+    __slots__ = ("_ids", "_n")
+
+    def __init__(self, ids: np.ndarray = _EMPTY_IDS):
+        self._ids = ids
+        self._n = len(ids)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._n]
+
+    def add(self, nft_id: int) -> bool:
+        ids = self.ids()
+        if not self._n or ids[-1] < nft_id:
+            if self._n == len(self._ids):
+                self._ids = _resized(ids, max(8, 2 * self._n), 0)
+            self._ids[self._n] = nft_id
+            self._n += 1
+            return True
+        position = int(np.searchsorted(ids, nft_id))
+        if ids[position] == nft_id:
+            return False
+        self._ids = np.insert(ids, position, nft_id)
+        self._n += 1
+        return True
+
+    def discard(self, nft_id: int) -> bool:
+        ids = self.ids()
+        position = int(np.searchsorted(ids, nft_id))
+        if position == self._n or ids[position] != nft_id:
+            return False
+        self._ids = np.delete(ids, position)
+        self._n -= 1
+        return True
+
+
+class FacetIndex:
+    """In-memory facets for browsing NFTs by category, collection, tag and price.
+
+    Every category, collection and tag keeps the sorted NFTIDs that have it, and
+    listed NFTs are kept sorted by price. NFT attributes are also kept as numpy
+    columns indexed by NFTID: collection, active listing price (NaN when not
+    listed) and tags. A query scatters the selected values' NFTIDs into one
+    boolean mask per facet and ANDs them; facet values are counted with
+    bincount over the NFTs that match, or over the ones that don't when that is
+    the smaller set, so neither filtering nor counting touches the database.
+
+    Values within a facet are ORed and facets are ANDed. Each facet's counts
+    ignore that facet's own filter, so they show what selecting another value
+    would return.
+
+    Mints, listings and tag changes made by this process are applied as they
+    happen. NFTs minted elsewhere are picked up by sync(); listing and tag
+    changes made by other workers show up after the next full load(), which is
+    due every `max_age` seconds.
+    """
+
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.ready = False
+        self.queries = 0
+        self._building = False
+        self._backlog: List[Tuple[str, Tuple[Any, ...]]] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._alive = np.zeros(1024, np.bool_)  # NFTID -> NFT exists
+        self._collection = np.zeros(1024, np.int32)  # NFTID -> CollectionID, 0 if none
+        self._price = np.full(1024, np.nan)  # NFTID -> active listing price, NaN if not listed
+        self._tag_slots = np.zeros((1024, 1), np.int32)  # NFTID -> TagIDs, padded with 0
+        self._size = 0  # highest NFTID seen + 1
+        self._live = 0
+        self._category_of = np.zeros(1024, np.int32)  # CollectionID -> CategoryID, 0 if none
+        self._members: Dict[str, Dict[int, _Members]] = {facet: {} for facet in FACETS}
+        self._totals = {facet: np.zeros(64, np.int64) for facet in FACETS}  # value -> len(members)
+        self._tag_entries = 0  # NFT-tag pairs
+        self._by_price = _EMPTY_IDS  # listed NFTIDs ordered by (price, NFTID)
+        self._sorted_prices = _EMPTY_PRICES  # their prices
+        self._names: Dict[str, Dict[int, str]] = {facet: {} for facet in FACETS}
+        self.synced_through = 0  # highest NFTID read from the database by load() or sync()
+        self.built_at = 0.0
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > self.max_age
+
+    # --- building ---
+
+    def load(self, cursor, chunk_size: int = 5000) -> int:
+        """Builds the index from NFTs, Collections, NFT_Tags and active Listings.
+
+        Returns the number of NFTs indexed.
+        """
+        def rows(sql):
+            cursor.execute(sql)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                yield from chunk
+
+        # Each query's rows are consumed before the next one runs; NFTs, the largest, last
+        categories = list(rows("SELECT CategoryID, CategoryName FROM Categories"))
+        collections = list(rows("SELECT CollectionID, CollectionName, CategoryID FROM Collections"))
+        tags = list(rows("SELECT TagID, TagName FROM Tags"))
+        listings = list(rows("SELECT NFTID, Price FROM Listings WHERE IsActive = 1"))
+        nft_tags = array("i")
+        for nft_id, tag_id in rows("SELECT NFTID, TagID FROM NFT_Tags"):
+            nft_tags.append(nft_id)
+            nft_tags.append(tag_id)
+        return self.build(categories, collections, tags, rows("SELECT NFTID, CollectionID FROM NFTs"),
+                          nft_tags, listings)
+
+    def sync(self, cursor) -> int:
+        """Adds NFTs, collections, categories and tags inserted since the last load() or sync().
+
+        Returns the number of NFTs added. NFTs this process already indexed are skipped.
+        """
+        with self._lock:
+            after = self.synced_through
+            known = {facet: max(names, default=0) for facet, names in self._names.items()}
+
+        cursor.execute("SELECT CategoryID, CategoryName FROM Categories WHERE CategoryID > ?", (known["category"],))
+        for category_id, name in cursor.fetchall():
+            self.set_category(category_id, name)
+        cursor.execute("SELECT CollectionID, CollectionName, CategoryID FROM Collections WHERE CollectionID > ?",
+                       (known["collection"],))
+        for collection_id, name, category_id in cursor.fetchall():
+            self.set_collection(collection_id, name, category_id)
+        cursor.execute("SELECT TagID, TagName FROM Tags WHERE TagID > ?", (known["tag"],))
+        for tag_id, name in cursor.fetchall():
+            self.set_tag(tag_id, name)
+
+        cursor.execute("SELECT NFTID, CollectionID FROM NFTs WHERE NFTID > ? ORDER BY NFTID", (after,))
+        nfts = cursor.fetchall()
+        if not nfts:
+            return 0
+        tags: Dict[int, List[int]] = {}
+        cursor.execute("SELECT NFTID, TagID FROM NFT_Tags WHERE NFTID > ?", (after,))
+        for nft_id, tag_id in cursor.fetchall():
+            tags.setdefault(nft_id, []).append(tag_id)
+        cursor.execute("SELECT NFTID, Price FROM Listings WHERE NFTID > ? AND IsActive = 1", (after,))
+        prices = {nft_id: float(price) for nft_id, price in cursor.fetchall()}
+
+        added = 0
+        for nft_id, collection_id in nfts:
+            if not self.indexed(nft_id):
+                self.add_nft(nft_id, collection_id, tags.get(nft_id, ()), prices.get(nft_id))
+                added += 1
+        with self._lock:
+            self.synced_through = max(self.synced_through, nfts[-1][0])
+        return added
+
+    def indexed(self, nft_id: int) -> bool:
+        with self._lock:
+            return 0 <= nft_id < len(self._alive) and bool(self._alive[nft_id])
+
+    def build(
+        self,
+        categories: Iterable[Tuple[int, str]],
+        collections: Iterable[Tuple[int, str, Optional[int]]],
+        tags: Iterable[Tuple[int, str]],
+        nfts: Iterable[Tuple[int, Optional[int]]],
+        nft_tags: Sequence[int],
+        listings: Iterable[Tuple[int, Any]],
+    ) -> int:
+        """Replaces the index; queries see the old one until it is done.
+
+        `nft_tags` is a flat NFTID, TagID, NFTID, TagID, ... sequence. Changes made
+        while the build runs are replayed on top of it.
+        """
+        with self._lock:
+            self._building = True
+            self._backlog = []
+        try:
+            built = self._build(categories, collections, tags, nfts, nft_tags, listings)
+        except Exception:
+            with self._lock:
+                self._building = False
+            raise
+
+        with self._lock:
+            for name in _STATE:
+                setattr(self, name, getattr(built, name))
+            self._building = False
+            for method, args in self._backlog:
+                getattr(self, method)(*args)
+            self._backlog = []
+            self.ready = True
+            return self._live
+
+    def _build(self, categories, collections, tags, nfts, nft_tags, listings) -> "FacetIndex":
+        built = FacetIndex(self.max_age)
+        for category_id, name in categories:
+            built._set_category(category_id, name)
+        for collection_id, name, category_id in collections:
+            built._set_collection(collection_id, name, category_id)
+        for tag_id, name in tags:
+            built._set_tag(tag_id, name)
+
+        ids, collection_ids = array("i"), array("i")
+        for nft_id, collection_id in nfts:
+            ids.append(nft_id)
+            collection_ids.append(collection_id or 0)
+        ids = np.frombuffer(ids, np.int32)
+        collection_ids = np.frombuffer(collection_ids, np.int32)
+        if len(ids):
+            built._grow(int(ids.max()))
+            built._grow_collections(int(collection_ids.max()))
+        built._alive[ids] = True
+        built._collection[ids] = collection_ids
+        built._live = len(ids)
+        built.synced_through = built._size - 1 if built._size else 0
+        in_category = built._category_of[collection_ids]
+        built._group("collection", collection_ids, ids)
+        built._group("category", in_category, ids)
+
+        # Tags: group the pairs by tag for the member lists and by NFT for the slots
+        pairs = np.asarray(nft_tags, np.int32).reshape(-1, 2)
+        pairs = pairs[pairs[:, 0] < built._size]
+        pairs = pairs[built._alive[pairs[:, 0]]]
+        built._group("tag", pairs[:, 1], pairs[:, 0])
+        built._tag_entries = len(pairs)
+        if len(pairs):
+            by_nft = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+            first = np.flatnonzero(np.diff(by_nft[:, 0], prepend=-1))
+            rank = np.arange(len(by_nft)) - np.repeat(first, np.diff(np.append(first, len(by_nft))))
+            built._tag_slots = np.zeros((len(built._alive), int(rank.max()) + 1), np.int32)
+            built._tag_slots[by_nft[:, 0], rank] = by_nft[:, 1]
+
+        listed = [(nft_id, float(price)) for nft_id, price in listings
+                  if nft_id < built._size and built._alive[nft_id]]
+        if listed:
+            listed_ids = np.array([nft_id for nft_id, _ in listed], np.int32)
+            prices = np.array([price for _, price in listed], np.float64)
+            built._price[listed_ids] = prices
+            order = np.lexsort((listed_ids, prices))
+            built._by_price, built._sorted_prices = listed_ids[order], prices[order]
+        built.built_at = time.monotonic()
+        return built
+
+    def _group(self, facet: str, values: np.ndarray, ids: np.ndarray) -> None:
+        # One sort of (value, NFTID) pairs, sliced into each value's member list
+        order = np.lexsort((ids, values))
+        values, ids = values[order], ids[order]
+        starts = np.flatnonzero(np.diff(values, prepend=-1))
+        ends = np.append(starts[1:], len(values))
+        members = self._members[facet]
+        for value, start, end in zip(values[starts].tolist(), starts.tolist(), ends.tolist()):
+            if value:
+                self._replace(facet, value, ids[start:end])
+
+    def _grow(self, nft_id: int) -> None:
+        if nft_id >= len(self._alive):
+            size = max(nft_id + 1, 2 * len(self._alive))
+            self._alive = _resized(self._alive, size, False)
+            self._collection = _resized(self._collection, size, 0)
+            self._price = _resized(self._price, size, np.nan)
+            self._tag_slots = _resized(self._tag_slots, size, 0)
+        self._size = max(self._size, nft_id + 1)
+
+    def _grow_collections(self, collection_id: int) -> None:
+        if collection_id >= len(self._category_of):
+            self._category_of = _resized(self._category_of, max(collection_id + 1, 2 * len(self._category_of)), 0)
+
+    # --- updates ---
+
+    def _apply(self, method: str, *args) -> None:
+        # Changes arriving during a build are replayed onto the new index once it is swapped in
+        with self._lock:
+            if self._building:
+                self._backlog.append((method, args))
+            getattr(self, method)(*args)
+
+    def add_nft(
+        self, nft_id: int, collection_id: Optional[int], tag_ids: Sequence[int] = (), price: Optional[float] = None
+    ) -> None:
+        self._apply("_add_nft", nft_id, collection_id, tuple(tag_ids), price)
+
+    def set_listing(self, nft_id: int, price: Optional[float]) -> None:
+        """Records the NFT's active listing price, or that it is not listed (None)."""
+        self._apply("_set_listing", nft_id, price)
+
+    def set_tags(self, nft_id: int, tag_ids: Sequence[int]) -> None:
+        """Replaces the NFT's tags."""
+        self._apply("_set_tags", nft_id, tuple(tag_ids))
+
+    def set_category(self, category_id: int, name: str) -> None:
+        self._apply("_set_category", category_id, name)
+
+    def set_collection(self, collection_id: int, name: str, category_id: Optional[int]) -> None:
+        self._apply("_set_collection", collection_id, name, category_id)
+
+    def set_tag(self, tag_id: int, name: str) -> None:
+        self._apply("_set_tag", tag_id, name)
+
+    def _join(self, facet: str, value: int, nft_id: int) -> None:
+        members = self._members[facet].get(value)
+        if members is None:
+            members = self._members[facet][value] = _Members()
+        if members.add(nft_id):
+            self._total(facet, value, len(members))
+
+    def _leave(self, facet: str, value: int, nft_id: int) -> None:
+        members = self._members[facet].get(value)
+        if members is not None and members.discard(nft_id):
+            self._total(facet, value, len(members))
+
+    def _replace(self, facet: str, value: int, ids: np.ndarray) -> None:
+        self._members[facet][value] = _Members(ids)
+        self._total(facet, value, len(ids))
+
+    def _total(self, facet: str, value: int, count: int) -> None:
+        totals = self._totals[facet]
+        if value >= len(totals):
+            totals = self._totals[facet] = _resized(totals, max(value + 1, 2 * len(totals)), 0)
+        totals[value] = count
+
+    def _add_nft(self, nft_id: int, collection_id: Optional[int], tag_ids: Sequence[int], price: Optional[float]) -> None:
+        self._grow(nft_id)
+        collection_id = collection_id or 0
+        self._grow_collections(collection_id)
+        if self._alive[nft_id]:
+            old = int(self._collection[nft_id])
+            if old:
+                self._leave("collection", old, nft_id)
+            if self._category_of[old]:
+                self._leave("category", int(self._category_of[old]), nft_id)
+        else:
+            self._alive[nft_id] = True
+            self._live += 1
+        self._collection[nft_id] = collection_id
+        if collection_id:
+            self._join("collection", collection_id, nft_id)
+        if self._category_of[collection_id]:
+            self._join("category", int(self._category_of[collection_id]), nft_id)
+        self._set_tags(nft_id, tag_ids)
+        self._set_listing(nft_id, price)
+
+    def _set_listing(self, nft_id: int, price: Optional[float]) -> None:
+        self._grow(nft_id)
+        old = self._price[nft_id]
+        if not np.isnan(old):
+            position = self._price_position(old, nft_id)
+            self._by_price = np.delete(self._by_price, position)
+            self._sorted_prices = np.delete(self._sorted_prices, position)
+        if price is None:
+            self._price[nft_id] = np.nan
+            return
+        price = float(price)
+        position = self._price_position(price, nft_id)
+        self._by_price = np.insert(self._by_price, position, nft_id)
+        self._sorted_prices = np.insert(self._sorted_prices, position, price)
+        self._price[nft_id] = price
+
+    def _price_position(self, price: float, nft_id: int) -> int:
+        # Where (price, nft_id) is or would go in _by_price
+        low = int(np.searchsorted(self._sorted_prices, price, "left"))
+        high = int(np.searchsorted(self._sorted_prices, price, "right"))
+        return low + int(np.searchsorted(self._by_price[low:high], nft_id))
+
+    def _set_tags(self, nft_id: int, tag_ids: Sequence[int]) -> None:
+        self._grow(nft_id)
+        old = set(self._tag_slots[nft_id].tolist()) - {0}
+        new = set(tag_ids) - {0}
+        for tag_id in old - new:
+            self._leave("tag", tag_id, nft_id)
+        for tag_id in new - old:
+            self._join("tag", tag_id, nft_id)
+        self._tag_entries += len(new) - len(old)
+        if len(new) > self._tag_slots.shape[1]:
+            widened = np.zeros((len(self._tag_slots), len(new)), np.int32)
+            widened[:, :self._tag_slots.shape[1]] = self._tag_slots
+            self._tag_slots = widened
+        row = np.zeros(self._tag_slots.shape[1], np.int32)
+        row[:len(new)] = sorted(new)
+        self._tag_slots[nft_id] = row
+
+    def _set_category(self, category_id: int, name: str) -> None:
+        self._names["category"][category_id] = name
+
+    def _set_collection(self, collection_id: int, name: str, category_id: Optional[int]) -> None:
+        self._grow_collections(collection_id)
+        old, new = int(self._category_of[collection_id]), category_id or 0
+        members = self._members["collection"].get(collection_id)
+        if old != new and members is not None and len(members):
+            # The collection's NFTs move to the new category
+            ids = members.ids()
+            categories = self._members["category"]
+            if old and old in categories:
+                self._replace("category", old, np.setdiff1d(categories[old].ids(), ids).astype(np.int32))
+            if new:
+                current = categories[new].ids() if new in categories else _EMPTY_IDS
+                self._replace("category", new, np.union1d(current, ids).astype(np.int32))
+        self._category_of[collection_id] = new
+        self._names["collection"][collection_id] = name
+
+    def _set_tag(self, tag_id: int, name: str) -> None:
+        self._names["tag"][tag_id] = name
+
+    # --- queries ---
+
+    def browse(
+        self,
+        categories: Sequence[int] = (),
+        collections: Sequence[int] = (),
+        tags: Sequence[int] = (),
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        listed: Optional[bool] = None,
+        sort: str = "newest",
+        limit: int = 20,
+        offset: int = 0,
+        facet_values: int = 20,
+    ) -> Tuple[List[Tuple[int, Optional[float]]], int, Optional[Dict[str, Any]]]:
+        """Filters, sorts and pages NFTs, and counts facet values over the matches.
+
+        Returns ([(NFTID, price or None)], total matches, facets). A price sort
+        or price bound only matches listed NFTs. Facets hold the `facet_values`
+        most frequent values of each facet, plus any selected ones, and the
+        price range of the listed matches; pass facet_values=0 to skip counting
+        (facets is then None), e.g. for the pages after the first.
+        """
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort {sort!r}")
+        if sort != "newest" or min_price is not None or max_price is not None:
+            if listed is False:
+                raise ValueError("Unlisted NFTs have no price to filter or sort on")
+            listed = True
+        selected = {"category": categories, "collection": collections, "tag": tags}
+
+        with self._lock:
+            self.queries += 1
+            n = self._size
+            alive = self._alive[:n]
+
+            masks: Dict[str, np.ndarray] = {}
+            for facet in FACETS:
+                if selected[facet]:
+                    mask = np.zeros(n, np.bool_)
+                    for value in selected[facet]:
+                        members = self._members[facet].get(value)
+                        if members is not None:
+                            mask[members.ids()] = True
+                    masks[facet] = mask
+            # The slice of _by_price inside the price bounds; a price sort walks it
+            low, high = 0, len(self._by_price)
+            if min_price is not None:
+                low = int(np.searchsorted(self._sorted_prices, min_price, "left"))
+            if max_price is not None:
+                high = int(np.searchsorted(self._sorted_prices, max_price, "right"))
+            if listed is not None:
+                mask = np.zeros(n, np.bool_)
+                mask[self._by_price[low:high]] = True
+                masks["price"] = mask if listed else alive & ~mask
+
+            matched = self._matching(alive, masks)
+            if sort == "newest":
+                total = int(np.count_nonzero(matched))
+                page = self._newest(matched, offset + limit)[offset:]
+            else:
+                in_range = self._by_price[low:high]
+                total = int(np.count_nonzero(matched[in_range]))
+                page = self._in_order(in_range, matched, offset + limit, sort == "price_desc")[offset:]
+            results = [(nft_id, None if np.isnan(self._price[nft_id]) else float(self._price[nft_id]))
+                       for nft_id in page]
+            if not facet_values:
+                return results, total, None
+
+            # A facet is counted over the NFTs matching every other filter; facets
+            # without a filter of their own share the matched set
+            facets: Dict[str, Any] = {}
+            by_mask: Dict[Optional[str], List[str]] = {}
+            for facet in FACETS:
+                by_mask.setdefault(facet if facet in masks else None, []).append(facet)
+            sparse: Dict[int, Tuple[np.ndarray, bool, np.ndarray]] = {}
+            for without, counted in by_mask.items():
+                counting = self._matching(alive, masks, without, matched)
+                counts = self._counts(counting, alive, counted, sparse)
+                for facet in counted:
+                    facets[_PLURALS[facet]] = self._top(facet, counts[facet], selected[facet], facet_values)
+            facets["price"] = self._price_range(self._matching(alive, masks, "price", matched), alive, sparse)
+        return results, total, facets
+
+    @staticmethod
+    def _matching(alive: np.ndarray, masks: Dict[str, np.ndarray], without: Optional[str] = None,
+                  matched: Optional[np.ndarray] = None) -> np.ndarray:
+        # NFTs passing every filter but `without`'s; reuses `matched` when that filter isn't set
+        if matched is not None and without not in masks:
+            return matched
+        if not any(facet != without for facet in masks):
+            return alive
+        result = alive.copy()
+        for facet, mask in masks.items():
+            if facet != without:
+                result &= mask
+        return result
+
+    @staticmethod
+    def _newest(matched: np.ndarray, count: int) -> List[int]:
+        # The `count` highest matching NFTIDs, read from the end a block at a time
+        found: List[int] = []
+        end, block = len(matched), _PAGE_BLOCK
+        while end > 0 and len(found) < count:
+            start = max(0, end - block)
+            found.extend((np.flatnonzero(matched[start:end])[::-1] + start).tolist())
+            end, block = start, block * 2
+        return found[:count]
+
+    @staticmethod
+    def _in_order(ordered: np.ndarray, matched: np.ndarray, count: int, reverse: bool) -> List[int]:
+        # The first `count` matching NFTIDs of `ordered` (or of its reverse)
+        if reverse:
+            ordered = ordered[::-1]
+        found: List[int] = []
+        start, block = 0, _PAGE_BLOCK
+        while start < len(ordered) and len(found) < count:
+            chunk = ordered[start:start + block]
+            found.extend(chunk[matched[chunk]].tolist())
+            start, block = start + block, block * 2
+        return found[:count]
+
+    @staticmethod
+    def _memo(counting: np.ndarray, sparse: Dict[int, Tuple[np.ndarray, bool, np.ndarray]]):
+        # The _sparse() entry of this very mask, or None. Entries hold their mask, so
+        # an id seen here can't be a freed mask's reused by a newer one
+        entry = sparse.get(id(counting))
+        return entry if entry is not None and entry[0] is counting else None
+
+    def _sparse(self, counting: np.ndarray, alive: np.ndarray, sparse: Dict[int, Tuple[np.ndarray, bool, np.ndarray]]):
+        # (complement, ids): the NFTIDs in `counting`, or those outside it if fewer.
+        # Memoized per mask for the duration of one query
+        entry = self._memo(counting, sparse)
+        if entry is None:
+            complement = int(np.count_nonzero(counting)) > self._live // 2
+            entry = counting, complement, np.flatnonzero(alive & ~counting if complement else counting)
+            sparse[id(counting)] = entry
+        return entry[1], entry[2]
+
+    def _counts(self, counting: np.ndarray, alive: np.ndarray, facets: Sequence[str],
+                sparse: Dict[int, Tuple[np.ndarray, bool, np.ndarray]]) -> Dict[str, np.ndarray]:
+        # Value -> count arrays over the `counting` NFTs
+        if counting is alive:
+            return {facet: self._totals[facet] for facet in facets}
+        complement, ids = self._sparse(counting, alive, sparse)
+
+        partial: Dict[str, np.ndarray] = {}
+        if "collection" in facets or "category" in facets:
+            by_collection = np.bincount(self._collection.take(ids), minlength=len(self._category_of))
+            partial["collection"] = by_collection
+            partial["category"] = np.bincount(self._category_of, by_collection[:len(self._category_of)],
+                                              minlength=len(self._totals["category"])).astype(np.int64)
+        if "tag" in facets:
+            if len(ids) * self._tag_slots.shape[1] > self._tag_entries:
+                # Cheaper to look each tag's members up in the mask; this counts directly
+                direct = np.zeros(len(self._totals["tag"]), np.int64)
+                for value, members in self._members["tag"].items():
+                    direct[value] = np.count_nonzero(counting[members.ids()])
+                partial["tag"] = self._totals["tag"] - direct if complement else direct
+            else:
+                partial["tag"] = np.bincount(self._tag_slots.take(ids, axis=0).ravel(),
+                                             minlength=len(self._totals["tag"]))
+
+        counts = {}
+        for facet in facets:
+            totals = self._totals[facet]
+            values = partial[facet][:len(totals)]
+            counts[facet] = totals - values if complement else values
+        return counts
+
+    def _price_range(self, counting: np.ndarray, alive: np.ndarray,
+                     sparse: Dict[int, Tuple[np.ndarray, bool, np.ndarray]]) -> Dict[str, Any]:
+        entry = self._memo(counting, sparse)
+        if counting is alive:
+            prices = self._sorted_prices
+        elif entry is not None and not entry[1]:
+            # Few matches, already listed: look their prices up
+            prices = self._price.take(entry[2])
+            prices = prices[~np.isnan(prices)]
+        else:
+            prices = self._sorted_prices[counting.take(self._by_price)]
+        return {
+            "listed": len(prices),
+            "min": float(prices.min()) if len(prices) else None,
+            "max": float(prices.max()) if len(prices) else None,
+        }
+
+    def _top(self, facet: str, counts: np.ndarray, selected: Sequence[int], k: int) -> List[Dict[str, Any]]:
+        # The k values with the most matches (ties by id), then any selected value left out
+        names = self._names[facet]
+        values = np.flatnonzero(counts[1:] > 0) + 1
+        if len(values) > k:
+            values = values[np.argpartition(-counts[values], k - 1)[:k]]
+        values = values[np.lexsort((values, -counts[values]))].tolist()
+        shown = set(values)
+        values += [value for value in dict.fromkeys(selected) if value not in shown]
+        return [{"id": value, "name": names.get(value), "count": int(counts[value]) if 0 < value < len(counts) else 0}
+                for value in values]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "nfts": self._live,
+                "listed": len(self._by_price),
+                "categories": len(self._names["category"]),
+                "collections": len(self._names["collection"]),
+                "tags": len(self._names["tag"]),
+                "synced_through": self.synced_through,
+                "age_seconds": round(time.monotonic() - self.built_at, 1) if self.ready else None,
+                "queries": self.queries,
+            }
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# SQL Server's default collation compares usernames case-insensitively
+def _key(username: str) -> str:
+    return username.lower()
+
+
+class IdentityMap:
+    """Bounded in-process Username <-> UserID map.
+
+    Usernames don't change after register_user, so resolved pairs are kept until
+    evicted (LRU). Unknown usernames are remembered for `negative_ttl` seconds so
+    repeated bad requests don't each hit the database. Lookups take the caller's
+    cursor and only query on a miss.
+    """
+
+    def __init__(self, max_entries: int = 100_000, negative_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._names: Dict[int, str] = {}
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    def user_id(self, cursor, username: str) -> Optional[int]:
+        key = _key(username)
+        with self._lock:
+            user_id = self._ids.get(key)
+            if user_id is not None:
+                self._ids.move_to_end(key)
+                self.hits += 1
+                return user_id
+            expires_at = self._missing.get(key)
+            if expires_at is not None:
+                if expires_at > time.monotonic():
+                    self.negative_hits += 1
+                    return None
+                del self._missing[key]
+            self.misses += 1
+
+        cursor.execute("SELECT UserID, Username FROM Users WHERE Username = ?", (username,))
+        row = cursor.fetchone()
+        with self._lock:
+            if row is None:
+                self._missing[key] = time.monotonic() + self.negative_ttl
+                self._missing.move_to_end(key)
+                while len(self._missing) > self.max_entries:
+                    self._missing.popitem(last=False)
+                return None
+            self._add(row[0], row[1])
+        return row[0]
+
+    def username(self, cursor, user_id: int) -> Optional[str]:
+        return self.usernames(cursor, [user_id]).get(user_id)
+
+    def usernames(self, cursor, user_ids: Iterable[int], chunk_size: int = 500) -> Dict[int, str]:
+        # Resolves many ids with at most one IN query per chunk of unknown ids
+        found: Dict[int, str] = {}
+        unknown = []
+        with self._lock:
+            for user_id in set(user_ids):
+                name = self._names.get(user_id)
+                if name is None:
+                    unknown.append(user_id)
+                else:
+                    self._ids.move_to_end(_key(name))
+                    found[user_id] = name
+            self.hits += len(found)
+            self.misses += len(unknown)
+
+        for start in range(0, len(unknown), chunk_size):
+            chunk = unknown[start:start + chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT UserID, Username FROM Users WHERE UserID IN ({placeholders})", chunk)
+            rows = cursor.fetchall()
+            with self._lock:
+                for user_id, name in rows:
+                    self._add(user_id, name)
+                    found[user_id] = name
+        return found
+
+    def warm(self, cursor) -> int:
+        # Bulk-load the most recent users, up to the map's capacity
+        cursor.execute("SELECT TOP (?) UserID, Username FROM Users ORDER BY UserID DESC", (self.max_entries,))
+        rows = cursor.fetchall()
+        with self._lock:
+            for user_id, name in reversed(rows):
+                self._add(user_id, name)
+        return len(rows)
+
+    def remember(self, user_id: int, username: str) -> None:
+        # Called after register_user commits; also clears a cached "no such user"
+        with self._lock:
+            self._missing.pop(_key(username), None)
+            self._add(user_id, username)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._ids),
+                "negative_entries": len(self._missing),
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+            }
+
+    # Callers hold self._lock
+
+    def _add(self, user_id: int, username: str) -> None:
+        key = _key(username)
+        self._ids[key] = user_id
+        self._ids.move_to_end(key)
+        self._names[user_id] = username
+        self._missing.pop(key, None)
+        while len(self._ids) > self.max_entries:
+            _, evicted_id = self._ids.popitem(last=False)
+            self._names.pop(evicted_id, None)
@@ -0,0 +1,29 @@
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+import orjson
+
+
+def encode_rows(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    """JSON array of objects, one per cursor row, encoded straight to bytes.
+
+    For list endpoints too large to go through response_model validation and
+    jsonable_encoder: the only per-row work in Python is pairing the column names
+    with the tuple; orjson does the rest in C. Datetimes come out as ISO 8601
+    strings and Decimals as numbers, as the JSON endpoints already return them.
+    Return the bytes in a `Response(media_type="application/json")`; the route's
+    response_model still documents the schema.
+    """
+    return orjson.dumps([dict(zip(columns, row)) for row in rows], default=_default)
+
+
+def encode_cursor(cursor) -> bytes:
+    # All remaining rows of an executed cursor, keyed by its column names
+    return encode_rows([column[0] for column in cursor.description], cursor.fetchall())
+
+
+def _default(value: Any) -> Any:
+    # Types orjson has no native encoding for; pyodbc returns Decimal for DECIMAL/MONEY
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
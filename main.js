@@ -3,22 +3,36 @@ console.log('Script loaded and running.');
 // API endpoints
 const API_URL = 'http://localhost:8000';
 
+// NFTs are fetched a page at a time; the API returns the next page's cursor in a header
+const NFT_PAGE_SIZE = 50;
+let nextNFTCursor = null;
+
+// Same for the moderation queue on the reports page
+const REPORT_PAGE_SIZE = 50;
+let nextReportCursor = null;
+
 // Fetch NFTs from the backend
-async function fetchNFTs() {
+async function fetchNFTs(after = null) {
     try {
-        const response = await fetch(`${API_URL}/api/nfts`);
+        const params = new URLSearchParams({ limit: NFT_PAGE_SIZE });
+        if (after !== null) params.set('after', after);
+        const response = await fetch(`${API_URL}/api/nfts?${params}`);
         const nfts = await response.json();
-        displayNFTs(nfts);
+        nextNFTCursor = response.headers.get('X-Next-After');
+        displayNFTs(nfts, after !== null);
+
+        const loadMoreBtn = document.getElementById('loadMoreNFTs');
+        if (loadMoreBtn) loadMoreBtn.style.display = nextNFTCursor ? '' : 'none';
     } catch (error) {
         console.error('Error fetching NFTs:', error);
     }
 }
 
 // Display NFTs in the grid
-function displayNFTs(nfts) {
+function displayNFTs(nfts, append = false) {
     const nftGrid = document.getElementById('nftGrid');
     if (!nftGrid) return;
-    nftGrid.innerHTML = '';
+    if (!append) nftGrid.innerHTML = '';
 
     nfts.forEach(nft => {
         const nftCard = document.createElement('div');
@@ -82,12 +96,18 @@ function displayCollections(collections) {
     });
 }
 
-// Fetch reports from the backend
-async function fetchReports() {
+// Fetch a page of the moderation queue from the backend, newest reports first
+async function fetchReports(after = null) {
     try {
-        const response = await fetch(`${API_URL}/api/reports`);
+        const params = new URLSearchParams({ limit: REPORT_PAGE_SIZE });
+        if (after !== null) params.set('after', after);
+        const response = await fetch(`${API_URL}/api/moderation/reports?${params}`);
         const reports = await response.json();
-        displayReports(reports);
+        nextReportCursor = response.headers.get('X-Next-After');
+        displayReports(reports, after !== null);
+
+        const loadMoreBtn = document.getElementById('loadMoreReports');
+        if (loadMoreBtn) loadMoreBtn.style.display = nextReportCursor ? '' : 'none';
     } catch (error) {
         console.error('Error fetching reports:', error);
         const reportsListDiv = document.getElementById('reportsList');
@@ -98,12 +118,12 @@ async function fetchReports() {
 }
 
 // Display reports in the list
-function displayReports(reports) {
+function displayReports(reports, append = false) {
     const reportsListDiv = document.getElementById('reportsList');
     if (!reportsListDiv) return; // Exit if div doesn't exist
-    reportsListDiv.innerHTML = ''; // Clear existing content
+    if (!append) reportsListDiv.innerHTML = ''; // Clear existing content
 
-    if (reports.length === 0) {
+    if (reports.length === 0 && !append) {
         reportsListDiv.innerHTML = '<p>No reports found.</p>';
         return;
     }
@@ -114,7 +134,7 @@ function displayReports(reports) {
         reportItem.innerHTML = `
             <p><strong>Report ID:</strong> ${report.ReportID}</p>
             <p><strong>Reported By:</strong> ${report.ReporterUsername}</p>
-            <p><strong>Reported NFT:</strong> ${report.NFTTitle}</p>
+            <p><strong>Reported NFT:</strong> ${report.NFTTitle} (${report.NFTReportCount} report${report.NFTReportCount === 1 ? '' : 's'} in total)</p>
             <p><strong>Reason:</strong> ${report.Reason || 'No reason provided'}</p>
             <p><strong>Reported At:</strong> ${new Date(report.ReportedAt).toLocaleString()}</p>
             <hr>
@@ -324,7 +344,9 @@ document.body.addEventListener('submit', async (event) => {
                 bidMessageElement.textContent = 'Bid placed successfully!';
                 bidMessageElement.style.color = 'green';
                 form.reset(); // Clear the form
-                fetchAndDisplayBids(nftId); // Refresh the list of bids
+                if (!bidStream || bidStream.readyState !== EventSource.OPEN) {
+                    fetchAndDisplayBids(nftId); // Refresh the list of bids; otherwise the bid stream delivers it
+                }
             } else {
                 let errorMessage = `Failed to place bid: ${response.status} ${response.statusText}.`;
                 if (result && result.detail) {
@@ -520,23 +542,49 @@ async function loadCollectionsForDropdown() {
 document.addEventListener('DOMContentLoaded', () => {
     console.log('DOM fully loaded');
     
-    // Load NFTs if on the NFTs page
-    if (document.getElementById('nftGrid')) {
-        fetchNFTs();
+    // Load NFTs if on the NFTs page, unless the server already rendered the first page
+    const nftGrid = document.getElementById('nftGrid');
+    if (nftGrid) {
+        if (nftGrid.dataset.rendered !== undefined) {
+            nextNFTCursor = nftGrid.dataset.nextAfter || null;
+        } else {
+            fetchNFTs();
+        }
+
+        const loadMoreBtn = document.getElementById('loadMoreNFTs');
+        if (loadMoreBtn) {
+            loadMoreBtn.addEventListener('click', () => {
+                if (nextNFTCursor) fetchNFTs(nextNFTCursor);
+            });
+        }
     }
     
     // Load collections if on the collections page
-    if (document.getElementById('collectionList')) {
+    const collectionList = document.getElementById('collectionList');
+    if (collectionList && collectionList.dataset.rendered === undefined) {
         fetchCollections();
     }
     
-    // Load reports if on the reports page
-    if (document.getElementById('reportsList')) {
-        fetchReports();
+    // Load reports if on the reports page, unless the server already rendered the first page
+    const reportsList = document.getElementById('reportsList');
+    if (reportsList) {
+        if (reportsList.dataset.rendered !== undefined) {
+            nextReportCursor = reportsList.dataset.nextAfter || null;
+        } else {
+            fetchReports();
+        }
+
+        const loadMoreBtn = document.getElementById('loadMoreReports');
+        if (loadMoreBtn) {
+            loadMoreBtn.addEventListener('click', () => {
+                if (nextReportCursor) fetchReports(nextReportCursor);
+            });
+        }
     }
     
     // Load categories if on the categories page
-    if (document.getElementById('categoriesList')) {
+    const categoriesList = document.getElementById('categoriesList');
+    if (categoriesList && categoriesList.dataset.rendered === undefined) {
         fetchCategories();
     }
 
@@ -565,6 +613,11 @@ document.addEventListener('DOMContentLoaded', () => {
     updateNavigationLinks();
 });
 
+// Bids shown on the NFT detail page, highest first
+let currentBids = [];
+// Live bid updates for the NFT detail page (Server-Sent Events)
+let bidStream = null;
+
 // New function to fetch and display bids for a specific NFT
 async function fetchAndDisplayBids(nftId) {
     console.log(`Fetching and displaying bids for NFT ID: ${nftId}`);
@@ -576,32 +629,8 @@ async function fetchAndDisplayBids(nftId) {
         }
         const bids = await response.json();
         console.log('Fetched bids data:', bids);
-
-        const bidsListElement = document.querySelector('.nft-bids ul'); // Select the unordered list for bids
-        const bidsSectionElement = document.querySelector('.nft-bids'); // Select the entire bids section
-
-        if (!bidsListElement) {
-            console.log('Bids list element not found.');
-            return; // Exit if the bids list element doesn't exist
-        }
-
-        bidsListElement.innerHTML = ''; // Clear existing bids
-
-        if (bids.length === 0) {
-             // If no bids, hide the bids section or show a message
-            if(bidsSectionElement) bidsSectionElement.style.display = 'none';
-            console.log('No bids found, hiding section.');
-            return;
-        } else {
-             if(bidsSectionElement) bidsSectionElement.style.display = 'block'; // Show the section if there are bids
-             console.log(`Displaying ${bids.length} bids.`);
-        }
-
-        bids.forEach(bid => {
-            const bidItem = document.createElement('li');
-            bidItem.innerHTML = `<strong>${bid.BidderUsername}</strong> bid ${bid.BidAmount} at ${new Date(bid.BidAt).toLocaleString()}`;
-            bidsListElement.appendChild(bidItem);
-        });
+        currentBids = bids;
+        renderBids(bids);
 
     } catch (error) {
         console.error(`Error fetching bids for NFT ${nftId}:`, error);
@@ -612,6 +641,64 @@ async function fetchAndDisplayBids(nftId) {
     }
 }
 
+function renderBids(bids) {
+    const bidsListElement = document.querySelector('.nft-bids ul'); // Select the unordered list for bids
+    const bidsSectionElement = document.querySelector('.nft-bids'); // Select the entire bids section
+
+    if (!bidsListElement) {
+        console.log('Bids list element not found.');
+        return; // Exit if the bids list element doesn't exist
+    }
+
+    bidsListElement.innerHTML = ''; // Clear existing bids
+
+    if (bids.length === 0) {
+         // If no bids, hide the bids section or show a message
+        if(bidsSectionElement) bidsSectionElement.style.display = 'none';
+        console.log('No bids found, hiding section.');
+        return;
+    } else {
+         if(bidsSectionElement) bidsSectionElement.style.display = 'block'; // Show the section if there are bids
+         console.log(`Displaying ${bids.length} bids.`);
+    }
+
+    bids.forEach(bid => {
+        const bidItem = document.createElement('li');
+        bidItem.innerHTML = `<strong>${bid.BidderUsername}</strong> bid ${bid.BidAmount} at ${new Date(bid.BidAt).toLocaleString()}`;
+        bidsListElement.appendChild(bidItem);
+    });
+}
+
+// Subscribe to new bids on an NFT instead of polling /api/nfts/{id}/bids
+function subscribeToBids(nftId) {
+    if (!window.EventSource) {
+        return;
+    }
+    bidStream = new EventSource(`${API_URL}/api/nfts/${nftId}/bids/stream`);
+
+    let connectedBefore = false;
+    bidStream.addEventListener('open', () => {
+        // Bids placed while the stream was reconnecting were missed; reload the list
+        if (connectedBefore) {
+            fetchAndDisplayBids(nftId);
+        }
+        connectedBefore = true;
+    });
+
+    bidStream.addEventListener('bid', (event) => {
+        const bid = JSON.parse(event.data);
+        if (currentBids.some(existing => existing.BidID === bid.BidID)) {
+            return;
+        }
+        currentBids.push(bid);
+        currentBids.sort((a, b) => b.BidAmount - a.BidAmount || a.BidID - b.BidID);
+        renderBids(currentBids);
+    });
+
+    // The server dropped updates for this page because it fell behind
+    bidStream.addEventListener('resync', () => fetchAndDisplayBids(nftId));
+}
+
 // Call fetchAndDisplayBids when the nft_detail page loads
 document.addEventListener('DOMContentLoaded', () => {
     const nftDetailElement = document.querySelector('.nft-detail');
@@ -621,6 +708,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const nftId = pathParts[pathParts.length - 1]; // Assumes URL is /nfts/{nftId}
         if (nftId && !isNaN(nftId)) {
             fetchAndDisplayBids(parseInt(nftId));
+            subscribeToBids(parseInt(nftId));
         }
     }
 }); 
@@ -1,13 +1,41 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
-import pyodbc
-from typing import List, Optional
-from pydantic import BaseModel
+import asyncio
+from contextlib import contextmanager
+import importlib
+import json
+import os
+from typing import Any, List, Optional
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
+from decimal import Decimal
+from db_pool import ConnectionPool, PoolTimeout
+from db_async import AsyncDB, QueryTimeout, QueryCancelled
+from db_metrics import DBMetrics, MetricsMiddleware
+from db_router import ReplicaRouter, RoutingMiddleware
+from nft_detail import load_nft_detail
+from nft_mint import mint_nfts
+from view_counter import ViewCounter
+from cache import TTLCache
+from identity_map import IdentityMap
+from order_book import OrderBooks
+from bid_stream import BidBroadcaster
+from bid_engine import REJECTIONS as BID_REJECTIONS, BidEngine, BidQueueFull
+from search_index import SearchIndex
+from settlement import AuctionSettlement
+from facet_index import FacetIndex
+from json_rows import encode_cursor, encode_rows
+from market_stats import HISTORY_HOURS as MARKET_HISTORY_HOURS, MarketStats
+from moderation import WINDOWS, load_report_queue, parse_queue_cursor, queue_cursor, record_report, top_reported
+from static_assets import StaticAssets
+from table_versions import TableVersions
+from trending import DIMENSIONS as TRENDING_DIMENSIONS, WINDOWS as TRENDING_WINDOWS, TrendingIndex
+from starlette.concurrency import run_in_threadpool
 
 app = FastAPI()
 
@@ -18,21 +46,476 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-After"],  # Pagination cursor for /api/nfts and /api/moderation/reports
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files. `python static_assets.py static/` at deploy fingerprints and
+# precompresses them; templates link them through static_url()
+static_assets = StaticAssets(directory="static")
+app.mount("/static", static_assets, name="static")
 
-# Templates
+# Templates. Compiled templates are kept on disk (a per-user temp directory) so
+# workers skip compiling them again at startup
 templates = Jinja2Templates(directory="templates")
-
-# Database connection settings
+templates.env.globals["static_url"] = static_assets.url
+templates.env.bytecode_cache = FileSystemBytecodeCache()
+
+# Database connection settings. METAMOOD_CONN_STR overrides the ODBC connection string
+# of the primary; METAMOOD_REPLICA_CONN_STRS lists read replicas' connection strings,
+# separated by "|". METAMOOD_DB_FACTORY ("module:function", a function returning a DB-API
+# connection) replaces pyodbc altogether, e.g. with the SQLite stand-in the load tests
+# use: it is called without arguments for the primary and with its connection string
+# for each replica
 server = 'DANIYAL\\SQLEXPRESS'
 database = 'METAMOOD'
-conn_str = f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};Trusted_Connection=yes;'
+conn_str = os.environ.get(
+    "METAMOOD_CONN_STR",
+    f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={database};Trusted_Connection=yes;',
+)
+replica_conn_strs = [s for s in os.environ.get("METAMOOD_REPLICA_CONN_STRS", "").split("|") if s.strip()]
+
+def connect_odbc(dsn: Optional[str] = None):
+    import pyodbc
+    return pyodbc.connect(dsn or conn_str)
+
+def connection_factory(dsn: Optional[str] = None):
+    spec = os.environ.get("METAMOOD_DB_FACTORY")
+    if not spec:
+        factory = connect_odbc
+    else:
+        module, _, function = spec.partition(":")
+        factory = getattr(importlib.import_module(module), function)
+    return factory if dsn is None else lambda: factory(dsn)
+
+# Statement counts, database time and pool wait per request, reported in a Server-Timing
+# header and, per route, at /metrics. Statements slower than SLOW_QUERY_MS are logged
+# with their SQL and parameter types (None turns the log off)
+SLOW_QUERY_MS = 500
+
+db_metrics = DBMetrics(slow_query_ms=SLOW_QUERY_MS)
+app.add_middleware(MetricsMiddleware, metrics=db_metrics)
+
+# Connection pool settings
+POOL_SIZE = 10
+POOL_TIMEOUT = 5  # Seconds to wait for a free connection before answering 503
+POOL_MAX_LIFETIME = 1800  # Recycle connections after 30 minutes
+POOL_PING_AFTER = 30  # Health-check connections that sat idle longer than this
+
+def create_pool(dsn: Optional[str] = None) -> ConnectionPool:
+    return ConnectionPool(
+        db_metrics.instrument(connection_factory(dsn)),
+        max_size=POOL_SIZE,
+        timeout=POOL_TIMEOUT,
+        max_lifetime=POOL_MAX_LIFETIME,
+        ping_after=POOL_PING_AFTER,
+        on_checkout=db_metrics.pool_wait,
+    )
+
+db_pool = create_pool()
+
+# Read replicas, each with a pool like the primary's. GET and HEAD requests read from the
+# least busy replica that has caught up with the primary, and with the client's last write
+# (see db_router); writes, background work, and reads no replica is fit for use the primary
+REPLICA_MAX_LAG = 10  # Seconds behind the primary before a replica stops taking reads
+REPLICA_CHECK_INTERVAL = 1  # Seconds between heartbeats and lag checks
+
+db_router = ReplicaRouter(
+    db_pool,
+    [(f"replica{i}", create_pool(dsn)) for i, dsn in enumerate(replica_conn_strs, 1)],
+    max_lag=REPLICA_MAX_LAG,
+)
+app.add_middleware(RoutingMiddleware, router=db_router)
+replica_check_task: Optional[asyncio.Task] = None
 
+@contextmanager
 def get_connection():
-    return pyodbc.connect(conn_str)
+    # Borrow a pooled connection (a replica's for reads); it is rolled back and returned
+    # to the pool on exit
+    try:
+        with db_router.connection() as conn:
+            yield conn
+    except PoolTimeout as e:
+        # Backpressure: ask clients to retry instead of queueing requests forever
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+# Async handlers run their queries on a bounded worker pool instead of the event loop
+QUERY_TIMEOUT = 10  # Seconds before a query is cancelled and the request answers 504
+
+async_db = AsyncDB(db_router, query_timeout=QUERY_TIMEOUT)
+
+async def run_db(request: Optional[Request], fn, *args):
+    # fn(cursor, *args) runs on a pooled connection; it is cancelled if the client disconnects
+    try:
+        return await async_db.run(fn, *args, is_disconnected=request.is_disconnected if request else None)
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except QueryCancelled as e:
+        raise HTTPException(status_code=499, detail=str(e))
+
+# Page views are buffered and written to NFT_Views / NFT_View_Counts in batches
+VIEW_FLUSH_INTERVAL = 5  # Seconds between view counter flushes
+
+view_counter = ViewCounter(db_pool, flush_interval=VIEW_FLUSH_INTERVAL)
+
+# Bids are validated one listing at a time, in arrival order, and committed in batches
+BID_BATCH_SIZE = 64  # Most bids validated and committed per transaction
+BID_QUEUE_LIMIT = 10_000  # Bids waiting beyond this answer 503
+BID_REJECTION_STATUS = {"not_listed": 400, "own_listing": 403, "too_low": 409, "insufficient_funds": 400}
+
+bid_engine = BidEngine(db_pool, max_batch=BID_BATCH_SIZE, max_pending=BID_QUEUE_LIMIT)
+
+# Categories, collections and users change only through the create/register
+# endpoints, which invalidate their entries; the TTL bounds staleness across workers
+REFERENCE_CACHE_TTL = 300  # Seconds
+USERS_CACHE_TTL = 60
+
+reference_cache = TTLCache(max_entries=64, default_ttl=REFERENCE_CACHE_TTL)
+
+# ETags for the list endpoints come from per-table change counters (Table_Versions)
+# that the write endpoints bump in the same transaction as their change
+TABLE_VERSION_TTL = 1  # Seconds a worker trusts its last read of a counter
+LIST_CACHE_CONTROL = "no-cache"  # Browsers keep the body but revalidate it with If-None-Match
+
+table_versions = TableVersions(ttl=TABLE_VERSION_TTL)
+
+# Pages render their first screen of data into the HTML, so content shows without the
+# browser fetching main.js and then the API; main.js only loads what a page left out.
+# Rendered NFT cards and detail sections are cached per NFT and dropped by the writes
+# that change them (other workers' copies expire after FRAGMENT_CACHE_TTL); rendered
+# lists are cached per table version
+NFT_GRID_PAGE_SIZE = 50  # Same as NFT_PAGE_SIZE in main.js, whose "Load more" continues the grid
+FRAGMENT_CACHE_SIZE = 20_000
+FRAGMENT_CACHE_TTL = 600  # Seconds
+
+fragment_cache = TTLCache(max_entries=FRAGMENT_CACHE_SIZE, default_ttl=FRAGMENT_CACHE_TTL)
+
+# List queries shared by the pages and the JSON endpoints
+COLLECTIONS_QUERY = "SELECT CollectionID, CollectionName, CreatorID, CategoryID FROM Collections ORDER BY CollectionID"
+CATEGORIES_QUERY = "SELECT CategoryID, CategoryName FROM Categories ORDER BY CategoryID"
+REPORTS_QUERY = """
+    SELECT 
+        r.ReportID, r.Reason, r.ReportedAt,
+        u.Username AS ReporterUsername,
+        n.Title AS NFTTitle
+    FROM Reports r
+    INNER JOIN Users u ON r.ReporterID = u.UserID
+    INNER JOIN NFTs n ON r.NFTID = n.NFTID
+    ORDER BY r.ReportedAt DESC
+"""
+
+# Username <-> UserID lookups for the bid/report writes and the bidder/owner names
+IDENTITY_MAP_SIZE = 100_000
+UNKNOWN_USER_TTL = 30  # Seconds to remember that a username does not exist
+
+identity_map = IdentityMap(max_entries=IDENTITY_MAP_SIZE, negative_ttl=UNKNOWN_USER_TTL)
+
+# Bids per active listing, sorted in memory; create_bid updates them after commit and
+# bids placed through other workers are picked up at most ORDER_BOOK_SYNC seconds later
+ORDER_BOOK_SIZE = 10_000  # Listings kept in memory
+ORDER_BOOK_SYNC = 1  # Seconds
+ORDER_BOOK_MAX_AGE = 600  # Seconds before a book is reloaded in full
+
+order_books = OrderBooks(max_books=ORDER_BOOK_SIZE, sync_interval=ORDER_BOOK_SYNC, max_age=ORDER_BOOK_MAX_AGE)
+
+# Live bids for the NFT detail page over Server-Sent Events
+BID_STREAM_MAX_PENDING = 32  # Queued bids per subscriber before it is told to refetch instead
+BID_STREAM_HEARTBEAT = 15  # Seconds between keep-alive comments on an idle stream
+BID_STREAM_MAX_SUBSCRIBERS = 10_000  # Per worker
+
+bid_broadcaster = BidBroadcaster(
+    max_pending=BID_STREAM_MAX_PENDING,
+    heartbeat=BID_STREAM_HEARTBEAT,
+    max_subscribers=BID_STREAM_MAX_SUBSCRIBERS,
+)
+bid_relay_task: Optional[asyncio.Task] = None
+
+# Full-text search over NFT titles, descriptions and tags. Each worker builds its index
+# in the background at startup, indexes what its own mint endpoints insert and picks
+# up NFTs minted through other workers every SEARCH_SYNC_INTERVAL seconds. It is rebuilt
+# every SEARCH_MAX_AGE seconds, for other workers' edits and fresh BM25 statistics
+SEARCH_SYNC_INTERVAL = 5  # Seconds
+SEARCH_MAX_AGE = 3600  # Seconds
+SEARCH_BUILD_TIMEOUT = 600  # Seconds for a build's queries
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_OFFSET = 1000  # Deeper pages cost more to rank; refine the query instead
+
+search_index = SearchIndex(max_age=SEARCH_MAX_AGE)
+search_sync_task: Optional[asyncio.Task] = None
+
+# Faceted browse (category, collection, tag, price) from an in-memory index. Mints,
+# listings and tag changes made through this worker apply at once; NFTs minted through
+# other workers are picked up every FACET_SYNC_INTERVAL seconds, and their listing and
+# tag changes when the index is rebuilt every FACET_MAX_AGE seconds
+FACET_SYNC_INTERVAL = 5  # Seconds
+FACET_MAX_AGE = 300  # Seconds
+FACET_BUILD_TIMEOUT = 600  # Seconds for a build's queries
+BROWSE_PAGE_SIZE = 24
+BROWSE_MAX_PAGE_SIZE = 100
+BROWSE_MAX_OFFSET = 10_000
+BROWSE_FACET_VALUES = 20  # Most frequent values returned per facet
+
+facet_index = FacetIndex(max_age=FACET_MAX_AGE)
+facet_sync_task: Optional[asyncio.Task] = None
+
+# Trending NFTs and collections, scored from views, likes, bids and sales kept in memory
+# per time bucket. New events are read every TRENDING_SYNC_INTERVAL seconds (views once
+# the view counter has flushed them), and the windows are rebuilt from the event tables
+# every TRENDING_MAX_AGE seconds
+TRENDING_SYNC_INTERVAL = 5  # Seconds
+TRENDING_MAX_AGE = 3600  # Seconds
+TRENDING_BUILD_TIMEOUT = 600  # Seconds for a build's queries
+TRENDING_TOP_K = 100  # Leaders kept per window; the most a page can return
+TRENDING_PAGE_SIZE = 20
+
+trending_index = TrendingIndex(k=TRENDING_TOP_K, max_age=TRENDING_MAX_AGE)
+trending_sync_task: Optional[asyncio.Task] = None
+
+# Collection floor prices, volumes and hourly OHLC, kept in memory. Listings made through
+# this worker apply at once and sales are rolled up every MARKET_SYNC_INTERVAL seconds;
+# other workers' listings show up when the stats are rebuilt every MARKET_MAX_AGE seconds
+MARKET_SYNC_INTERVAL = 5  # Seconds
+MARKET_MAX_AGE = 300  # Seconds
+MARKET_BUILD_TIMEOUT = 600  # Seconds for a build's queries
+MARKET_DEFAULT_HOURS = 168  # Hourly buckets returned unless ?hours= asks for more
+
+market_stats = MarketStats(max_age=MARKET_MAX_AGE)
+market_sync_task: Optional[asyncio.Task] = None
+
+# Auctions: listings with an EndsAt are settled once it passes, SETTLEMENT_BATCH at a time
+# and SETTLEMENT_CHUNK per transaction. Any number of workers can run the loop, since a
+# chunk only settles listings still open under its locks
+SETTLEMENT_INTERVAL = 5  # Seconds between looks for due listings when none are left
+SETTLEMENT_BATCH = 1000  # Due listings picked per pass
+SETTLEMENT_CHUNK = 100  # Listings settled per transaction
+SETTLEMENT_TIMEOUT = 600  # Seconds for a pass's queries
+
+auction_settlement = AuctionSettlement(batch_size=SETTLEMENT_BATCH, chunk_size=SETTLEMENT_CHUNK)
+settlement_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+def start_view_counter():
+    view_counter.start()
+
+@app.on_event("startup")
+def start_bid_engine():
+    bid_engine.start()
+
+@app.on_event("startup")
+def warm_identity_map():
+    try:
+        with get_connection() as conn:
+            identity_map.warm(conn.cursor())
+    except Exception as e:
+        # Not fatal: the map fills in on demand
+        print(f"Error warming identity map: {e}")
+
+def load_new_bids(cursor, nft_ids, last_seen):
+    # Bids that reached the order books since the last relay pass, per watched NFT
+    new_bids = []
+    for nft_id in nft_ids:
+        listing_id = order_books.active_listing(cursor, nft_id)
+        if not listing_id:
+            continue
+        book = order_books.book(cursor, listing_id)
+        if nft_id not in last_seen:
+            last_seen[nft_id] = book.last_bid_id
+            continue
+        rows = book.since(last_seen[nft_id])
+        if rows:
+            last_seen[nft_id] = rows[-1][0]
+            names = identity_map.usernames(cursor, [row[3] for row in rows])
+            new_bids.append((nft_id, [{
+                "BidID": row[0],
+                "BidAmount": row[1],
+                "BidAt": row[2],
+                "BidderID": row[3],
+                "BidderUsername": names.get(row[3])
+            } for row in rows]))
+    for nft_id in set(last_seen) - set(nft_ids):
+        del last_seen[nft_id]
+    return new_bids
+
+async def relay_bids():
+    # create_bid publishes its own bids; this picks up bids placed through other
+    # workers, at one order book catch-up per watched NFT per ORDER_BOOK_SYNC
+    last_seen = {}
+    while True:
+        await asyncio.sleep(ORDER_BOOK_SYNC)
+        nft_ids = bid_broadcaster.topics()
+        if not nft_ids and not last_seen:
+            continue
+        try:
+            new_bids = await async_db.run(load_new_bids, nft_ids, last_seen)
+        except Exception as e:
+            print(f"Error relaying bids: {e}")
+            continue
+        for nft_id, bids in new_bids:
+            for bid in bids:
+                bid_broadcaster.publish(nft_id, bid)
+
+@app.on_event("startup")
+async def start_bid_relay():
+    global bid_relay_task
+    bid_relay_task = asyncio.create_task(relay_bids())
+
+@app.on_event("shutdown")
+async def stop_bid_relay():
+    if bid_relay_task is not None:
+        bid_relay_task.cancel()
+
+async def maintain_search_index():
+    # Searches answer 503 until the first build succeeds; a failed build is retried
+    while True:
+        try:
+            if search_index.ready and not search_index.expired():
+                await async_db.run(search_index.sync)
+            else:
+                count = await async_db.run(search_index.load, timeout=SEARCH_BUILD_TIMEOUT)
+                print(f"Search index built with {count} NFTs")
+        except Exception as e:
+            print(f"Error updating search index: {e}")
+        await asyncio.sleep(SEARCH_SYNC_INTERVAL)
+
+@app.on_event("startup")
+async def start_search_index():
+    global search_sync_task
+    search_sync_task = asyncio.create_task(maintain_search_index())
+
+@app.on_event("shutdown")
+async def stop_search_index():
+    if search_sync_task is not None:
+        search_sync_task.cancel()
+
+async def maintain_facet_index():
+    # Browsing answers 503 until the first build succeeds; a failed build is retried
+    while True:
+        try:
+            if facet_index.ready and not facet_index.expired():
+                await async_db.run(facet_index.sync)
+            else:
+                count = await async_db.run(facet_index.load, timeout=FACET_BUILD_TIMEOUT)
+                print(f"Facet index built with {count} NFTs")
+        except Exception as e:
+            print(f"Error updating facet index: {e}")
+        await asyncio.sleep(FACET_SYNC_INTERVAL)
+
+@app.on_event("startup")
+async def start_facet_index():
+    global facet_sync_task
+    facet_sync_task = asyncio.create_task(maintain_facet_index())
+
+@app.on_event("shutdown")
+async def stop_facet_index():
+    if facet_sync_task is not None:
+        facet_sync_task.cancel()
+
+async def maintain_trending_index():
+    # Trending answers 503 until the first build succeeds; a failed build is retried
+    while True:
+        try:
+            if trending_index.ready and not trending_index.expired():
+                await async_db.run(trending_index.sync)
+            else:
+                count = await async_db.run(trending_index.load, timeout=TRENDING_BUILD_TIMEOUT)
+                print(f"Trending index built from {count} events")
+        except Exception as e:
+            print(f"Error updating trending index: {e}")
+        await asyncio.sleep(TRENDING_SYNC_INTERVAL)
+
+@app.on_event("startup")
+async def start_trending_index():
+    global trending_sync_task
+    trending_sync_task = asyncio.create_task(maintain_trending_index())
+
+@app.on_event("shutdown")
+async def stop_trending_index():
+    if trending_sync_task is not None:
+        trending_sync_task.cancel()
+
+async def maintain_market_stats():
+    # Collection stats answer 503 until the first build succeeds; a failed build is retried
+    while True:
+        try:
+            if market_stats.ready and not market_stats.expired():
+                await async_db.run(market_stats.sync)
+            else:
+                count = await async_db.run(market_stats.load, timeout=MARKET_BUILD_TIMEOUT)
+                print(f"Market stats built from {count} sales")
+        except Exception as e:
+            print(f"Error updating market stats: {e}")
+        await asyncio.sleep(MARKET_SYNC_INTERVAL)
+
+@app.on_event("startup")
+async def start_market_stats():
+    global market_sync_task
+    market_sync_task = asyncio.create_task(maintain_market_stats())
+
+@app.on_event("shutdown")
+async def stop_market_stats():
+    if market_sync_task is not None:
+        market_sync_task.cancel()
+
+async def settle_auctions():
+    # A full batch means more are due, so the next pass starts straight away
+    while True:
+        settled = []
+        try:
+            settled = await async_db.run(auction_settlement.settle_due, timeout=SETTLEMENT_TIMEOUT)
+        except Exception as e:
+            print(f"Error settling auctions: {e}")
+        if settled:
+            db_router.wrote()
+        for item in settled:
+            facet_index.set_listing(item.nft_id, None)
+            market_stats.set_listing(item.nft_id, None)
+            order_books.forget(item.listing_id, item.nft_id)
+            if item.outcome == "sold":
+                invalidate_nft_fragments(item.nft_id)
+        if len(settled) < SETTLEMENT_BATCH:
+            await asyncio.sleep(SETTLEMENT_INTERVAL)
+
+@app.on_event("startup")
+async def start_settlement():
+    global settlement_task
+    settlement_task = asyncio.create_task(settle_auctions())
+
+@app.on_event("shutdown")
+async def stop_settlement():
+    if settlement_task is not None:
+        settlement_task.cancel()
+
+async def check_replicas():
+    # Replicas take no reads until their first check
+    while True:
+        try:
+            await run_in_threadpool(db_router.check)
+        except Exception as e:
+            print(f"Error checking replicas: {e}")
+        await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+
+@app.on_event("startup")
+async def start_replica_checks():
+    global replica_check_task
+    if db_router.replicas:
+        replica_check_task = asyncio.create_task(check_replicas())
+
+@app.on_event("shutdown")
+async def stop_replica_checks():
+    if replica_check_task is not None:
+        replica_check_task.cancel()
+
+@app.on_event("shutdown")
+def close_pool():
+    # Flush buffered views and decide queued bids before the pool goes away
+    view_counter.stop()
+    bid_engine.stop()
+    async_db.shutdown()
+    db_pool.close()
+    for replica in db_router.replicas:
+        replica.pool.close()
 
 # Pydantic models
 
@@ -108,6 +591,21 @@ class ReportWithDetails(BaseModel):
     Reason: Optional[str] = None
     ReportedAt: str
 
+class ModerationReport(BaseModel):
+    ReportID: int
+    ReportedAt: str
+    Reason: Optional[str] = None
+    NFTID: int
+    NFTTitle: str
+    ReporterUsername: str
+    NFTReportCount: int
+
+class ReportedNFT(BaseModel):
+    NFTID: int
+    Title: str
+    ReportCount: int
+    LastReportedAt: str
+
 class ReportCreate(BaseModel):
     ReporterUsername: str
     NFTID: int
@@ -131,6 +629,15 @@ class CollectionCreate(BaseModel):
 class CategoryCreate(BaseModel):
     CategoryName: str
 
+class ListingCreate(BaseModel):
+    NFTID: int
+    SellerID: int
+    Price: float
+    EndsAt: Optional[datetime] = None  # Makes the listing an auction, settled to the highest bid at this time
+
+class TagsUpdate(BaseModel):
+    Tags: List[str]
+
 # Routes
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
@@ -140,51 +647,352 @@ async def read_root(request: Request):
 async def get_nfts_page(request: Request):
     # Get user_id from session or query parameter
     user_id = request.query_params.get("user_id")
-    return templates.TemplateResponse("index.html", {"request": request, "user_id": user_id})
+
+    # The first page of the grid; main.js continues it from data-next-after
+    grid, next_after = None, None
+    try:
+        with db_router.shared_reads():  # Fills the card fragments
+            nfts = await run_db(request, load_nft_page, NFT_COLUMNS, 0, NFT_GRID_PAGE_SIZE)
+        grid = Markup("").join(nft_card(nft) for nft in nfts)
+        if len(nfts) == NFT_GRID_PAGE_SIZE:
+            next_after = nfts[-1]["NFTID"]
+    except Exception as e:
+        # Still a working page: without a rendered grid main.js fetches it
+        print(f"Error rendering the NFT grid: {e}")
+    return templates.TemplateResponse("index.html", {
+        "request": request, "user_id": user_id, "grid": grid, "next_after": next_after})
+
+# Columns /api/nfts can return; NFTID is always included because it is the page cursor
+NFT_COLUMNS = ["NFTID", "Title", "Description", "CollectionID", "OwnerID", "MintedAt", "ImagePath"]
+NFT_PAGE_SIZE = 100
+NFT_MAX_PAGE_SIZE = 1000
+NFT_STREAM_CHUNK = 500  # Rows per fetchmany() when streaming NDJSON
+
+def nft_columns(fields: Optional[str]):
+    if not fields:
+        return NFT_COLUMNS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in NFT_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown NFT fields: {', '.join(unknown)}")
+    return ["NFTID"] + [field for field in NFT_COLUMNS if field in requested and field != "NFTID"]
+
+def load_nft_page(cursor, columns, after: int, limit: int):
+    cursor.execute(f"""
+        SELECT TOP (?) {', '.join(columns)}
+        FROM NFTs
+        WHERE NFTID > ?
+        ORDER BY NFTID
+    """, (limit, after))
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def render_fragment(key, template_name: str, **context) -> Markup:
+    # Rendered HTML from fragment_cache; the template only renders on a miss
+    return fragment_cache.get_or_load(key, lambda: Markup(templates.get_template(template_name).render(**context)))
+
+def nft_card(nft) -> Markup:
+    return render_fragment(("nft_card", nft["NFTID"]), "nft_card.html", nft=nft)
+
+def invalidate_nft_fragments(nft_id: int):
+    fragment_cache.invalidate(("nft_card", nft_id), ("nft_summary", nft_id), ("nft_tags", nft_id))
+
+async def rendered_list(request: Request, key: str, table: str, query: str, template_name: str) -> Optional[Markup]:
+    # A reference list rendered with its partial template, cached per table version.
+    # None if it can't be loaded; the page's script then fetches the list itself
+    try:
+        version = table_versions.cached(table)
+        if version is None:
+            with db_router.shared_reads():
+                version = await run_db(request, table_versions.load, table)
+
+        def render():
+            with db_router.shared_reads(), get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                columns = [column[0] for column in cursor.description]
+                items = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return Markup(templates.get_template(template_name).render(items=items))
+
+        html = fragment_cache.get((key, version))
+        if html is None:
+            html = await run_in_threadpool(fragment_cache.get_or_load, (key, version), render)
+        return html
+    except Exception as e:
+        print(f"Error rendering {key}: {e}")
+        return None
+
+def json_value(value):
+    # json.dumps fallback for the types pyodbc hands back
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match compares weakly, so a W/ prefix doesn't matter
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL})
+
+def versioned_json(body: bytes, etag: str) -> Response:
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL})
+
+def table_version(table: str) -> int:
+    version = table_versions.cached(table)
+    if version is None:
+        with db_router.shared_reads(), get_connection() as conn:
+            version = table_versions.load(conn.cursor(), table)
+    return version
+
+async def reference_list(request: Request, key: str, table: str, query: str) -> Response:
+    # A reference list as JSON with an ETag from its table's version. A client whose
+    # copy is current gets a 304 without the list query; otherwise the body comes
+    # from reference_cache, reloaded once the table's version has moved past it
+    version = table_versions.cached(table)
+    if version is None:
+        with db_router.shared_reads():
+            version = await run_db(request, table_versions.load, table)
+    if etag_matches(request.headers.get("if-none-match"), f'"{key}-{version}"'):
+        return not_modified(f'"{key}-{version}"')
+
+    def load():
+        with db_router.shared_reads(), get_connection() as conn:
+            cursor = conn.cursor()
+            # Version before rows: a write in between makes the body newer than its ETag, never older
+            loaded = table_versions.load(cursor, table)
+            cursor.execute(query)
+            return loaded, encode_cursor(cursor)
+
+    # Cache hits are served on the event loop; a miss loads (once) on a worker thread
+    entry = reference_cache.get(key)
+    if entry is not None and entry[0] < version:
+        reference_cache.invalidate(key)
+        entry = None
+    if entry is None:
+        entry = await run_in_threadpool(reference_cache.get_or_load, key, load)
+    loaded, body = entry
+    return versioned_json(body, f'"{key}-{loaded}"')
+
+def stream_nfts(columns, after: int, limit: Optional[int]):
+    # Yields NDJSON from the open cursor in fetchmany() chunks so exports keep memory flat
+    top = "TOP (?) " if limit else ""
+    params = (limit, after) if limit else (after,)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {top}{', '.join(columns)} FROM NFTs WHERE NFTID > ? ORDER BY NFTID", params)
+        while True:
+            rows = cursor.fetchmany(NFT_STREAM_CHUNK)
+            if not rows:
+                break
+            yield "".join(json.dumps(dict(zip(columns, row)), default=json_value) + "\n" for row in rows)
 
 # Add a new API endpoint to get all NFTs as JSON
+# Keyset pagination: pass the X-Next-After header of one page as ?after= for the next
 @app.get("/api/nfts")
-def get_all_nfts_api():
-    conn = None
-    cursor = None
+def get_all_nfts_api(
+    response: Response,
+    after: int = 0,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    columns = nft_columns(fields)
+
+    if format == "ndjson":
+        # Streams every NFT after the cursor unless a limit is given
+        return StreamingResponse(stream_nfts(columns, after, limit), media_type="application/x-ndjson")
+
+    limit = min(limit or NFT_PAGE_SIZE, NFT_MAX_PAGE_SIZE)
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM NFTs")
-        columns = [column[0] for column in cursor.description]
-        nfts = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        with get_connection() as conn:
+            nfts = load_nft_page(conn.cursor(), columns, after, limit)
+
+        # A full page means there may be more; hand back the cursor for the next one
+        if len(nfts) == limit:
+            response.headers["X-Next-After"] = str(nfts[-1]["NFTID"])
         return nfts
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+def load_nft_rows(cursor, nft_ids):
+    # {NFTID: row} for a page of NFTs picked by one of the in-memory indexes
+    placeholders = ", ".join("?" * len(nft_ids))
+    cursor.execute(f"SELECT {', '.join(NFT_COLUMNS)} FROM NFTs WHERE NFTID IN ({placeholders})", nft_ids)
+    return {row[0]: dict(zip(NFT_COLUMNS, row)) for row in cursor.fetchall()}
+
+def load_collection_rows(cursor, collection_ids):
+    # {CollectionID: row} for a page of collections picked by the trending index
+    placeholders = ", ".join("?" * len(collection_ids))
+    cursor.execute(f"""
+        SELECT CollectionID, CollectionName, CreatorID, CategoryID
+        FROM Collections WHERE CollectionID IN ({placeholders})
+    """, collection_ids)
+    columns = [column[0] for column in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+# Full-text search; results come back best match first. The last word also matches as a
+# prefix (search-as-you-type) unless the query ends in a space
+@app.get("/api/search")
+async def search_nfts(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+):
+    if not search_index.ready:
+        raise HTTPException(status_code=503, detail="Search index is still building", headers={"Retry-After": "5"})
+
+    hits, more = await run_in_threadpool(search_index.search, q, limit, offset)
+    rows = await run_db(request, load_nft_rows, [nft_id for nft_id, _ in hits]) if hits else {}
+    # NFTs deleted since they were indexed are skipped rather than failing the page
+    results = [{**rows[nft_id], "Score": score} for nft_id, score in hits if nft_id in rows]
+    return {
+        "query": q,
+        "results": results,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if more and offset + limit <= SEARCH_MAX_OFFSET else None,
+    }
+
+# Faceted browse: values within a filter are ORed (?category=1&category=2), filters are
+# ANDed. Facet counts ignore their own filter; pass facets=false for the pages after the
+# first. Price sorts and price bounds only return listed NFTs
+@app.get("/api/browse")
+async def browse_nfts(
+    request: Request,
+    category: List[int] = Query([]),
+    collection: List[int] = Query([]),
+    tag: List[int] = Query([]),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    listed: Optional[bool] = None,
+    sort: str = Query("newest", pattern="^(newest|price_asc|price_desc)$"),
+    limit: int = Query(BROWSE_PAGE_SIZE, ge=1, le=BROWSE_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=BROWSE_MAX_OFFSET),
+    facets: bool = True,
+):
+    if not facet_index.ready:
+        raise HTTPException(status_code=503, detail="Browse index is still building", headers={"Retry-After": "5"})
+
+    try:
+        page, total, counts = await run_in_threadpool(
+            facet_index.browse, category, collection, tag, min_price, max_price, listed, sort, limit, offset,
+            BROWSE_FACET_VALUES if facets else 0,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = await run_db(request, load_nft_rows, [nft_id for nft_id, _ in page]) if page else {}
+    return {
+        "results": [{**rows[nft_id], "Price": price} for nft_id, price in page if nft_id in rows],
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < total and offset + limit <= BROWSE_MAX_OFFSET else None,
+        "facets": counts,
+    }
+
+# Trending NFTs (by=nft) or collections (by=collection) over the last hour, day or week,
+# highest score first. Scores weigh a view 1, a like 3, a bid 5 and a sale 10
+@app.get("/api/trending")
+async def get_trending(
+    request: Request,
+    window: str = Query("24h", pattern=f"^({'|'.join(TRENDING_WINDOWS)})$"),
+    by: str = Query("nft", pattern=f"^({'|'.join(TRENDING_DIMENSIONS)})$"),
+    limit: int = Query(TRENDING_PAGE_SIZE, ge=1, le=TRENDING_TOP_K),
+):
+    if not trending_index.ready:
+        raise HTTPException(status_code=503, detail="Trending index is still building", headers={"Retry-After": "5"})
+
+    leaders = trending_index.top(window, by, limit)
+    load_rows = load_nft_rows if by == "nft" else load_collection_rows
+    rows = await run_db(request, load_rows, [key for key, _ in leaders]) if leaders else {}
+    # Deleted since they were counted: skipped rather than failing the page
+    return {
+        "window": window,
+        "by": by,
+        "results": [{**rows[key], "Score": score} for key, score in leaders if key in rows],
+    }
 
 @app.post("/nfts")
 def create_nft(nft: NFT):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO NFTs (Title, Description, CollectionID, OwnerID)
-            VALUES (?, ?, ?, ?)
-        """, (nft.Title, nft.Description, nft.CollectionID, nft.OwnerID))
-        conn.commit()
-        return {"message": "NFT created successfully"}
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO NFTs (Title, Description, CollectionID, OwnerID)
+                OUTPUT INSERTED.NFTID
+                VALUES (?, ?, ?, ?)
+            """, (nft.Title, nft.Description, nft.CollectionID, nft.OwnerID))
+            nft_id = cursor.fetchone()[0]
+            conn.commit()
+        search_index.add(nft_id, nft.Title, nft.Description)
+        facet_index.add_nft(nft_id, nft.CollectionID)
+        return {"message": "NFT created successfully", "nft_id": nft_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Bulk minting for large collection drops
+MINT_MAX_BATCH = 10_000  # NFTs per request
+MINT_CHUNK_SIZE = 400  # Rows per INSERT and per transaction
+
+@app.post("/api/nfts/batch")
+def create_nfts_batch(items: List[Any]):
+    if len(items) > MINT_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MINT_MAX_BATCH} NFTs per batch")
+
+    # Invalid items are reported by position; the rest of the batch is still minted
+    nfts = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            nfts.append((index, NFT.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": [
+                f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}" for error in e.errors()
+            ]})
+
+    try:
+        with get_connection() as conn:
+            minted, failed = mint_nfts(conn.cursor(), nfts, identity_map, MINT_CHUNK_SIZE)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error minting NFT batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    by_index = dict(nfts)
+    for item in minted:
+        nft = by_index[item["index"]]
+        search_index.add(item["NFTID"], nft.Title, nft.Description)
+        facet_index.add_nft(item["NFTID"], nft.CollectionID)
+
+    errors = sorted(errors + failed, key=lambda error: error["index"])
+    return {"minted": minted, "errors": errors}
+
 @app.get("/users")
 def get_users():
+    def load_users():
+        with db_router.shared_reads(), get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM Users")
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users")
-        columns = [column[0] for column in cursor.description]
-        users = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        return users
+        return reference_cache.get_or_load("users", load_users, ttl=USERS_CACHE_TTL)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -194,129 +1002,45 @@ async def create_nft_form(request: Request):
 
 @app.get("/nfts/{nft_id}", response_class=HTMLResponse)
 async def get_nft_page(request: Request, nft_id: int):
-    conn = None
-    cursor = None
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Query 1: Get basic NFT details, Listing Price
-        cursor.execute("""
-            SELECT
-                N.NFTID, N.Title, N.Description, N.MintedAt, N.OwnerID, N.CollectionID,
-                L.Price
-            FROM NFTs N
-            LEFT JOIN Listings L ON N.NFTID = L.NFTID
-            WHERE N.NFTID = ?
-        """, (nft_id,))
-        nft_row = cursor.fetchone()
-
-        if nft_row is None:
+        # NFT, owner, collection, view count, tags and bids in one round-trip. It fills the
+        # listing's order book and the page's fragments, which other requests reuse
+        with db_router.shared_reads():
+            template_data = await run_db(request, load_nft_detail, nft_id, identity_map, order_books)
+        if template_data is None:
             raise HTTPException(status_code=404, detail="NFT not found")
 
-        # Extract data from the single joined row
-        nft_data = {
-            "NFTID": nft_row[0],
-            "Title": nft_row[1],
-            "Description": nft_row[2],
-            "MintedAt": nft_row[3],
-            "OwnerID": nft_row[4],
-            "CollectionID": nft_row[5],
-            "ListingPrice": nft_row[6]
-        }
-
-        # Query 2: Get Owner details
-        cursor.execute("SELECT UserID, Username FROM Users WHERE UserID = ?", (nft_data["OwnerID"],))
-        owner_row = cursor.fetchone()
-        owner = UserDetail(UserID=owner_row[0], Username=owner_row[1]) if owner_row else None
-
-        # Query 3: Get Collection details (if CollectionID exists)
-        collection = None
-        if nft_data["CollectionID"] is not None:
-            cursor.execute("SELECT CollectionID, CollectionName FROM Collections WHERE CollectionID = ?", (nft_data["CollectionID"],))
-            collection_row = cursor.fetchone()
-            collection = CollectionDetail(CollectionID=collection_row[0], CollectionName=collection_row[1]) if collection_row else None
-
-        # Query 4: Get View Count
-        cursor.execute("SELECT COUNT(*) FROM NFT_Views WHERE NFTID = ?", (nft_id,))
-        view_count = cursor.fetchone()[0]
-
-        # Increment view count by adding a new view record
-        try:
-            cursor.execute("""
-                INSERT INTO NFT_Views (NFTID, ViewerID, ViewedAt)
-                VALUES (?, ?, GETDATE())
-            """, (nft_id, 1))
-            conn.commit()
-        except Exception as view_error:
-            print(f"Error inserting new view for NFT {nft_id}: {view_error}")
-            # Don't raise an error, just log it and continue
+        user_id = request.query_params.get("user_id") # Get user_id from query parameter
 
-        # Query 5: Get Tags
-        cursor.execute("""
-            SELECT t.TagName
-            FROM Tags t
-            INNER JOIN NFT_Tags nt ON t.TagID = nt.TagID
-            WHERE nt.NFTID = ?
-        """, (nft_id,))
-        tag_rows = cursor.fetchall()
-        tags = [row[0] for row in tag_rows]
-
-        # Query 6: Get Bids for the NFT's active listing
-        bids = []
-        # First, find the active ListingID for this NFT
-        cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (nft_id,))
-        listing_row = cursor.fetchone()
-        listing_id = listing_row[0] if listing_row else None
+        # Count this view; it reaches the database with the next batched flush. Viewers
+        # that aren't users (NFT_Views.ViewerID references Users) count as anonymous, 1
+        viewer_id = 1
+        if user_id and user_id.isdecimal() and int(user_id) < 2 ** 31:  # Users.UserID is an INT
+            if await run_db(request, identity_map.username, int(user_id)) is not None:
+                viewer_id = int(user_id)
+        view_counter.record(nft_id, viewer_id)
+        template_data["ViewCount"] += view_counter.unflushed(nft_id)
 
-        if listing_id:
-            cursor.execute("""
-                SELECT b.BidID, b.BidAmount, b.BidAt, b.BidderID, u.Username AS BidderUsername
-                FROM Bids b
-                INNER JOIN Users u ON b.BidderID = u.UserID
-                WHERE b.ListingID = ?
-                ORDER BY b.BidAmount DESC
-            """, (listing_id,))
-            bid_rows = cursor.fetchall()
-            bids = [{
-                "BidID": row[0],
-                "BidAmount": float(row[1]),
-                "BidAt": str(row[2]),
-                "BidderID": row[3],
-                "BidderUsername": row[4]
-            } for row in bid_rows]
-
-        # Combine data for the template
-        template_data = {
-            "NFTID": nft_data["NFTID"],
-            "Title": nft_data["Title"],
-            "Description": nft_data["Description"],
-            "MintedAt": str(nft_data["MintedAt"]),
-            "Owner": {"UserID": nft_data["OwnerID"], "Username": owner.Username if owner else "Unknown"},
-            "Collection": {"CollectionID": nft_data["CollectionID"], "CollectionName": collection.CollectionName if collection else "N/A"} if collection else None,
-            "ListingPrice": nft_data["ListingPrice"],
-            "ViewCount": view_count + 1,
-            "Tags": tags,
-            "Bids": bids, # Include fetched bids
-        }
+        # Title, description, owner, collection and tags come from the fragment cache;
+        # price, views and bids render every time
+        summary = render_fragment(("nft_summary", nft_id), "nft_summary.html", nft=template_data)
+        tags = render_fragment(("nft_tags", nft_id), "nft_tags.html", tags=template_data["Tags"])
 
         # Pass the fetched data to the template, including user_id
-        user_id = request.query_params.get("user_id") # Get user_id from query parameter
-        return templates.TemplateResponse("nft_detail.html", {"request": request, "nft": template_data, "user_id": user_id})
+        return templates.TemplateResponse("nft_detail.html", {
+            "request": request, "nft": template_data, "summary": summary, "tags": tags, "user_id": user_id})
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching NFT {nft_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 @app.get("/collections", response_class=HTMLResponse)
 async def get_collections_page(request: Request):
     user_id = request.query_params.get("user_id")
-    return templates.TemplateResponse("collections.html", {"request": request, "user_id": user_id})
+    collections = await rendered_list(request, "collection_list", "Collections", COLLECTIONS_QUERY, "collection_list.html")
+    return templates.TemplateResponse("collections.html", {"request": request, "user_id": user_id, "collections": collections})
 
 @app.get("/login", response_class=HTMLResponse)
 async def get_login_page(request: Request):
@@ -326,126 +1050,129 @@ async def get_login_page(request: Request):
 async def get_register_page(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
+# Large lists are encoded straight from the cursor rows (json_rows) instead of through
+# response_model validation; the models still document the response schema
 @app.get("/api/collections", response_model=List[Collection])
-def get_all_collections():
+async def get_all_collections(request: Request):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT CollectionID, CollectionName, CreatorID, CategoryID FROM Collections")
-        columns = [column[0] for column in cursor.description]
-        collections = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        return collections
+        # Cached already encoded, so a hit costs no serialization at all
+        return await reference_list(request, "collections", "Collections", COLLECTIONS_QUERY)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching collections: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Floor price, 24h / 7d volume and hourly OHLC of a collection's sales, from memory.
+# History covers the last `hours` hours, oldest first, leaving out hours without sales
+@app.get("/api/collections/{collection_id}/stats")
+def get_collection_stats(
+    collection_id: int,
+    hours: int = Query(MARKET_DEFAULT_HOURS, ge=1, le=MARKET_HISTORY_HOURS),
+):
+    if not market_stats.ready:
+        raise HTTPException(status_code=503, detail="Market stats are still building", headers={"Retry-After": "5"})
+
+    stats = market_stats.collection(collection_id, hours)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Collection with ID {collection_id} not found")
+    return stats
+
 @app.post("/api/login")
 def login_user(user: UserLogin):
-    conn = None
-    cursor = None
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check if user exists
-        cursor.execute("""
-            SELECT UserID FROM Users 
-            WHERE Username = ? AND Email = ?
-        """, (user.Username, user.Email))
-        
-        result = cursor.fetchone()
-        if result:
-            user_id = result[0]
-            return {"message": "Login successful", "user_id": user_id}
-        else:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-            
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if user exists
+            cursor.execute("""
+                SELECT UserID FROM Users 
+                WHERE Username = ? AND Email = ?
+            """, (user.Username, user.Email))
+
+            result = cursor.fetchone()
+            if result:
+                user_id = result[0]
+                return {"message": "Login successful", "user_id": user_id}
+            else:
+                raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 @app.post("/api/register")
 def register_user(user: UserCreate):
-    conn = None
-    cursor = None
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check if username or email already exists
-        cursor.execute("""
-            SELECT UserID FROM Users 
-            WHERE Username = ? OR Email = ?
-        """, (user.Username, user.Email))
-        
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Username or email already exists")
-        
-        # Insert new user
-        cursor.execute("""
-            INSERT INTO Users (Username, Email, PublicKey)
-            VALUES (?, ?, ?)
-        """, (user.Username, user.Email, user.PublicKey))
-        
-        # Get the new user's ID
-        cursor.execute("SELECT SCOPE_IDENTITY()") # Get the last inserted ID
-        user_id = cursor.fetchone()[0]
-        
-        # Create wallet for the new user
-        cursor.execute("""
-            INSERT INTO Wallets (UserID, PublicKey, Balance)
-            VALUES (?, ?, 0.0)
-        """, (user_id, user.PublicKey))
-        conn.commit()
-        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if username or email already exists
+            cursor.execute("""
+                SELECT UserID FROM Users 
+                WHERE Username = ? OR Email = ?
+            """, (user.Username, user.Email))
+
+            if cursor.fetchone():
+                raise HTTPException(status_code=400, detail="Username or email already exists")
+
+            # Insert new user
+            cursor.execute("""
+                INSERT INTO Users (Username, Email, PublicKey)
+                VALUES (?, ?, ?)
+            """, (user.Username, user.Email, user.PublicKey))
+
+            # Get the new user's ID
+            cursor.execute("SELECT SCOPE_IDENTITY()") # Get the last inserted ID
+            user_id = cursor.fetchone()[0]
+
+            # Create wallet for the new user
+            cursor.execute("""
+                INSERT INTO Wallets (UserID, PublicKey, Balance)
+                VALUES (?, ?, 0.0)
+            """, (user_id, user.PublicKey))
+            conn.commit()
+
+        reference_cache.invalidate("users")
+        identity_map.remember(int(user_id), user.Username)
         return {"user_id": user_id, "message": "User registered successfully"}
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        # Uncommitted work is rolled back when the connection returns to the pool
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 # Add endpoint to get a user's wallet details
 @app.get("/api/users/{user_id}/wallet", response_model=Wallet)
 def get_user_wallet(user_id: int):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check if the user exists first (optional but good practice)
-        cursor.execute("SELECT UserID FROM Users WHERE UserID = ?", (user_id,))
-        user_exists = cursor.fetchone()
-        if not user_exists:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # Fetch wallet details for the user
-        cursor.execute("SELECT WalletID, UserID, PublicKey, Balance FROM Wallets WHERE UserID = ?", (user_id,))
-        wallet_row = cursor.fetchone()
-
-        if wallet_row is None:
-            raise HTTPException(status_code=404, detail="Wallet not found for this user")
-            
-        wallet_data = dict(zip([column[0] for column in cursor.description], wallet_row))
-        
-        return Wallet(**wallet_data)
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if the user exists first (optional but good practice)
+            cursor.execute("SELECT UserID FROM Users WHERE UserID = ?", (user_id,))
+            user_exists = cursor.fetchone()
+            if not user_exists:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            # Fetch wallet details for the user
+            cursor.execute("SELECT WalletID, UserID, PublicKey, Balance FROM Wallets WHERE UserID = ?", (user_id,))
+            wallet_row = cursor.fetchone()
+
+            if wallet_row is None:
+                raise HTTPException(status_code=404, detail="Wallet not found for this user")
 
+            wallet_data = dict(zip([column[0] for column in cursor.description], wallet_row))
+
+            return Wallet(**wallet_data)
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching wallet for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 # Add a route to serve the user's wallet page
 @app.get("/users/{user_id}/wallet", response_class=HTMLResponse)
@@ -453,40 +1180,101 @@ async def get_wallet_page(request: Request, user_id: int):
     # We don't fetch data here, the frontend JS will do that via the API endpoint
     return templates.TemplateResponse("wallet.html", {"request": request, "user_id": user_id})
 
+# Moderation queue page size, and how many of the most reported NFTs are listed
+MODERATION_PAGE_SIZE = 50  # Same as REPORT_PAGE_SIZE in main.js
+MODERATION_MAX_PAGE_SIZE = 500
+TOP_REPORTED_LIMIT = 20
+TOP_REPORTED_MAX = 100
+
 @app.get("/reports", response_class=HTMLResponse)
 async def get_reports_page(request: Request):
     user_id = request.query_params.get("user_id")
-    return templates.TemplateResponse("reports.html", {"request": request, "user_id": user_id})
+
+    # The newest page of the moderation queue (main.js loads the next ones from
+    # data-next-after) and the most reported NFTs of the last 24 hours
+    def load_page(cursor):
+        # Both lists on one connection
+        return load_report_queue(cursor, None, MODERATION_PAGE_SIZE), top_reported(cursor, "24h", TOP_REPORTED_LIMIT)
+
+    reports, next_after, top = None, None, None
+    try:
+        (columns, rows), (top_columns, top_rows) = await run_db(request, load_page)
+        items = [dict(zip(columns, row)) for row in rows]
+        reports = Markup(templates.get_template("report_list.html").render(items=items))
+        if len(items) == MODERATION_PAGE_SIZE:
+            next_after = queue_cursor(items[-1])
+        top = [dict(zip(top_columns, row)) for row in top_rows]
+    except Exception as e:
+        # Still a working page: without a rendered list main.js fetches it
+        print(f"Error rendering the moderation queue: {e}")
+    return templates.TemplateResponse("reports.html", {
+        "request": request, "user_id": user_id, "reports": reports, "next_after": next_after, "top_reported": top})
+
+# Moderation queue, newest first. Keyset pagination on (ReportedAt, ReportID): pass the
+# X-Next-After header of one page as ?after= for the next
+@app.get("/api/moderation/reports", response_model=List[ModerationReport])
+async def get_moderation_queue(request: Request, after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1)):
+    limit = min(limit or MODERATION_PAGE_SIZE, MODERATION_MAX_PAGE_SIZE)
+    if after is not None:
+        try:
+            parse_queue_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        columns, rows = await run_db(request, load_report_queue, after, limit)
+
+        # A full page means there may be more; hand back the cursor for the next one
+        headers = {}
+        if len(rows) == limit:
+            headers["X-Next-After"] = queue_cursor(dict(zip(columns, rows[-1])))
+        return Response(encode_rows(columns, rows), media_type="application/json", headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error fetching the moderation queue: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Most reported NFTs in the last hour, 24 hours, 7 days or all time, from the report
+# count rollups (counted in whole hours) rather than from Reports
+@app.get("/api/moderation/top-reported", response_model=List[ReportedNFT])
+async def get_top_reported(
+    request: Request,
+    window: str = Query("24h", pattern=f"^({'|'.join(WINDOWS)})$"),
+    limit: int = Query(TOP_REPORTED_LIMIT, ge=1, le=TOP_REPORTED_MAX),
+):
+    try:
+        columns, rows = await run_db(request, top_reported, window, limit)
+        return Response(encode_rows(columns, rows), media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error fetching the most reported NFTs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 # Add endpoint to get all reports with details
 @app.get("/api/reports", response_model=List[ReportWithDetails])
-def get_all_reports():
+def get_all_reports(request: Request):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Fetch reports with reporter username and NFT title
-        cursor.execute("""
-            SELECT 
-                r.ReportID, r.Reason, r.ReportedAt,
-                u.Username AS ReporterUsername,
-                n.Title AS NFTTitle
-            FROM Reports r
-            INNER JOIN Users u ON r.ReporterID = u.UserID
-            INNER JOIN NFTs n ON r.NFTID = n.NFTID
-            ORDER BY r.ReportedAt DESC
-        """
-        )
-        
-        columns = [column[0] for column in cursor.description]
-        reports = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        # Format ReportedAt as string
-        for report in reports:
-            report["ReportedAt"] = str(report["ReportedAt"])
+        # The list only changes with Reports (usernames and NFT titles are never edited)
+        version = table_version("Reports")
+        if etag_matches(request.headers.get("if-none-match"), f'"reports-{version}"'):
+            return not_modified(f'"reports-{version}"')
+
+        with db_router.shared_reads(), get_connection() as conn:
+            cursor = conn.cursor()
+            version = table_versions.load(cursor, "Reports")
 
-        return reports
+            # Fetch reports with reporter username and NFT title
+            cursor.execute(REPORTS_QUERY)
 
+            # ReportedAt is encoded as an ISO 8601 string
+            reports = encode_cursor(cursor)
+
+        return versioned_json(reports, f'"reports-{version}"')
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching reports: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -495,78 +1283,63 @@ def get_all_reports():
 @app.post("/api/reports")
 def create_report(report: ReportCreate):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Find the UserID based on the provided ReporterUsername
-        cursor.execute("SELECT UserID FROM Users WHERE Username = ?", (report.ReporterUsername,))
-        user_row = cursor.fetchone()
-
-        if user_row is None:
-            raise HTTPException(status_code=400, detail="Invalid Reporter Username")
-            
-        reporter_id = user_row[0]
-
-        # Optional: Validate NFTID exists (already have this check)
-        cursor.execute("SELECT NFTID FROM NFTs WHERE NFTID = ?", (report.NFTID,))
-        if cursor.fetchone() is None:
-            raise HTTPException(status_code=400, detail="Invalid NFT ID")
-
-        # Insert new report into Reports table using the found ReporterID
-        # ReportedAt will default to GETDATE()
-        cursor.execute("INSERT INTO Reports (ReporterID, NFTID, Reason) VALUES (?, ?, ?)", 
-                       (reporter_id, report.NFTID, report.Reason))
-        conn.commit()
-        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Find the UserID based on the provided ReporterUsername
+            reporter_id = identity_map.user_id(cursor, report.ReporterUsername)
+
+            if reporter_id is None:
+                raise HTTPException(status_code=400, detail="Invalid Reporter Username")
+
+            # Optional: Validate NFTID exists (already have this check)
+            cursor.execute("SELECT NFTID FROM NFTs WHERE NFTID = ?", (report.NFTID,))
+            if cursor.fetchone() is None:
+                raise HTTPException(status_code=400, detail="Invalid NFT ID")
+
+            # Insert new report into Reports table using the found ReporterID
+            # ReportedAt will default to GETDATE()
+            cursor.execute("INSERT INTO Reports (ReporterID, NFTID, Reason) VALUES (?, ?, ?)", 
+                           (reporter_id, report.NFTID, report.Reason))
+            # Count it in the per-NFT rollups in the same transaction
+            record_report(cursor, report.NFTID)
+            table_versions.bump(cursor, "Reports")
+            conn.commit()
+
+        table_versions.invalidate("Reports")
         return {"message": "Report submitted successfully"}
 
+    except HTTPException:
+        # Validation errors from our manual checks; the pool rolls back on exit
+        raise
     except Exception as e:
-        conn.rollback() # Rollback changes if anything fails
         print(f"Error submitting report: {e}")
-        
-        # Check for specific validation errors from our manual checks
-        if "Invalid Reporter Username" in str(e) or "Invalid NFT ID" in str(e):
-             raise HTTPException(status_code=400, detail=str(e))
-
         raise HTTPException(status_code=500, detail="An error occurred while submitting the report.")
 
 # Route to serve the categories page
 @app.get("/categories", response_class=HTMLResponse)
 async def read_categories(request: Request):
     user_id = request.query_params.get("user_id")
-    return templates.TemplateResponse("categories.html", {"request": request, "user_id": user_id})
+    categories = await rendered_list(request, "category_list", "Categories", CATEGORIES_QUERY, "category_list.html")
+    return templates.TemplateResponse("categories.html", {"request": request, "user_id": user_id, "categories": categories})
 
 # API endpoint to get all categories
 @app.get("/api/categories", response_model=list[Category])
-async def get_categories():
-    conn = None
-    cursor = None
-    categories = []
+async def get_categories(request: Request):
     try:
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-        cursor.execute("SELECT CategoryID, CategoryName FROM Categories")
-        rows = cursor.fetchall()
-        for row in rows:
-            categories.append(Category(CategoryID=row[0], CategoryName=row[1]))
+        return await reference_list(request, "categories", "Categories", CATEGORIES_QUERY)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching categories: {e}")
         raise HTTPException(status_code=500, detail="Error fetching categories")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    return categories
 
 @app.post("/api/bids")
-async def create_bid(bid: BidCreate):
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
+async def create_bid(bid: BidCreate, request: Request):
+    if bid.BidAmount <= 0:
+        raise HTTPException(status_code=400, detail="Bid amount must be positive")
 
+    def find_listing(cursor):
         # 1. Verify NFT exists and has an active listing
         cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (bid.NFTID,))
         listing_row = cursor.fetchone()
@@ -576,126 +1349,302 @@ async def create_bid(bid: BidCreate):
         listing_id = listing_row[0]
 
         # 2. Find the UserID based on the provided Username
-        cursor.execute("SELECT UserID FROM Users WHERE Username = ?", (bid.BidderUsername,))
-        user_row = cursor.fetchone()
-        if not user_row:
+        bidder_id = identity_map.user_id(cursor, bid.BidderUsername)
+        if bidder_id is None:
              # Using 400 for bad request due to invalid Username
             raise HTTPException(status_code=400, detail=f"User with username '{bid.BidderUsername}' does not exist.")
 
-        bidder_id = user_row[0]
-
-        # 3. Insert the new bid using the found BidderID
-        cursor.execute("""
-            INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt)
-            VALUES (?, ?, ?, GETDATE())
-        """, (listing_id, bidder_id, bid.BidAmount))
-
-        conn.commit()
+        return listing_id, bidder_id, identity_map.username(cursor, bidder_id)
 
-        return {"message": "Bid placed successfully!"}
+    try:
+        listing_id, bidder_id, bidder_username = await run_db(request, find_listing)
+
+        # 3. Queue the bid behind earlier ones on the listing; the bid engine validates it
+        # against the highest bid and the bidder's available balance and commits it
+        result = await asyncio.wrap_future(bid_engine.submit(listing_id, bidder_id, bid.BidAmount))
+        if not result.accepted:
+            detail = BID_REJECTIONS[result.reason]
+            if result.reason == "too_low":
+                detail += f" ({result.highest:.2f})"
+            raise HTTPException(status_code=BID_REJECTION_STATUS[result.reason], detail=detail)
+
+        bid_row = result.row
+        order_books.add_bid(listing_id, bid_row)
+
+        # Push the new bid to everyone watching this NFT
+        bid_broadcaster.publish(bid.NFTID, {
+            "BidID": bid_row[0],
+            "BidAmount": float(bid_row[1]),
+            "BidAt": str(bid_row[2]),
+            "BidderID": bid_row[3],
+            "BidderUsername": bidder_username
+        })
+        return {"message": "Bid placed successfully!", "bid_id": bid_row[0]}
 
     except HTTPException as http_exc:
         # Re-raise HTTPException to be handled by FastAPI
         raise http_exc
+    except BidQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         # Log the full error for debugging
         print(f"Error creating bid: {e}")
         # Return a 500 Internal Server Error for other exceptions
         raise HTTPException(status_code=500, detail=f"Failed to place bid: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 # New endpoint to get bids for a specific NFT
 @app.get("/api/nfts/{nft_id}/bids")
-async def get_bids_for_nft(nft_id: int):
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
+async def get_bids_for_nft(nft_id: int, request: Request, limit: Optional[int] = Query(None, ge=1)):
+    def load_bids(cursor):
         # Find the active listing ID for the NFT
-        cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (nft_id,))
-        listing_row = cursor.fetchone()
-        listing_id = listing_row[0] if listing_row else None
+        listing_id = order_books.active_listing(cursor, nft_id)
 
         if not listing_id:
             # If no active listing, return an empty list of bids
             return []
 
-        # Get bids for the active listing, including bidder username
-        cursor.execute("""
-            SELECT b.BidID, b.BidAmount, b.BidAt, b.BidderID, u.Username AS BidderUsername
-            FROM Bids b
-            INNER JOIN Users u ON b.BidderID = u.UserID
-            WHERE b.ListingID = ?
-            ORDER BY b.BidAmount DESC -- Show highest bid first
-        """, (listing_id,))
-        bid_rows = cursor.fetchall()
+        # Highest bids first from the listing's order book; bidder usernames come from the identity map
+        bid_rows = order_books.book(cursor, listing_id).top(limit)
+        names = identity_map.usernames(cursor, [row[3] for row in bid_rows])
+        return [row + (names.get(row[3]),) for row in bid_rows]
+
+    try:
+        with db_router.shared_reads():  # Order book loads and catch-ups
+            bid_rows = await run_db(request, load_bids)
 
         # Convert bid rows to a list of dictionaries
         bids = [{
             "BidID": row[0],
-            "BidAmount": float(row[1]),
-            "BidAt": str(row[2]),
+            "BidAmount": row[1],
+            "BidAt": row[2],
             "BidderID": row[3],
             "BidderUsername": row[4]
         } for row in bid_rows]
 
         return bids
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching bids for NFT {nft_id}: {e}")
         # Return an empty list and a 500 error for other exceptions
         raise HTTPException(status_code=500, detail=f"Failed to fetch bids: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+# Live bids for an NFT as Server-Sent Events: a `bid` event per new bid, and
+# `resync` when the client missed some and should refetch /api/nfts/{nft_id}/bids
+@app.get("/api/nfts/{nft_id}/bids/stream")
+async def stream_bids(nft_id: int, request: Request):
+    if bid_broadcaster.full():
+        raise HTTPException(status_code=503, detail="Too many live bid subscribers", headers={"Retry-After": "5"})
+
+    # A reconnecting EventSource sends the id of the last bid it saw
+    resync = request.headers.get("last-event-id") is not None
+    return StreamingResponse(
+        bid_broadcaster.events(nft_id, resync, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Top of book for an NFT: highest bid and number of bids, without the full list
+@app.get("/api/nfts/{nft_id}/bids/summary")
+async def get_bid_summary(nft_id: int, request: Request):
+    def load_summary(cursor):
+        listing_id = order_books.active_listing(cursor, nft_id)
+        if not listing_id:
+            return {"ListingID": None, "BidCount": 0, "HighestBid": None}
+
+        book = order_books.book(cursor, listing_id)
+        highest = book.highest()
+        if highest is not None:
+            highest = {
+                "BidID": highest[0],
+                "BidAmount": highest[1],
+                "BidAt": highest[2],
+                "BidderID": highest[3],
+                "BidderUsername": identity_map.username(cursor, highest[3])
+            }
+        return {"ListingID": listing_id, "BidCount": book.count(), "HighestBid": highest}
+
+    try:
+        with db_router.shared_reads():
+            return await run_db(request, load_summary)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error fetching bid summary for NFT {nft_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch bid summary: {e}")
+
+# Compares a listing's in-memory order book with the Bids table
+@app.get("/api/listings/{listing_id}/book/verify")
+async def verify_order_book(listing_id: int, request: Request):
+    try:
+        with db_router.shared_reads():
+            return await run_db(request, order_books.verify, listing_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error verifying order book for listing {listing_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Lists an NFT for sale, or reprices its listing
+@app.post("/api/listings")
+async def create_listing(listing: ListingCreate, request: Request):
+    if listing.Price <= 0:
+        raise HTTPException(status_code=400, detail="Price must be positive")
+    price = round(listing.Price, 2)
+    ends_at = listing.EndsAt
+    if ends_at is not None:
+        if ends_at.tzinfo is not None:
+            ends_at = ends_at.astimezone().replace(tzinfo=None)  # GETDATE() is server local time
+        if ends_at <= datetime.now():
+            raise HTTPException(status_code=400, detail="EndsAt must be in the future")
+
+    def upsert_listing(cursor):
+        cursor.execute("SELECT OwnerID, CollectionID FROM NFTs WHERE NFTID = ?", (listing.NFTID,))
+        nft_row = cursor.fetchone()
+        if not nft_row:
+            raise HTTPException(status_code=404, detail=f"NFT with ID {listing.NFTID} not found")
+        if nft_row[0] != listing.SellerID:
+            raise HTTPException(status_code=403, detail="Only the owner of an NFT can list it")
+
+        # Listings.NFTID is unique, so an NFT that was listed before gets its row back.
+        # Relisting starts a new Generation, so bids on earlier ones don't count; repricing
+        # an open listing keeps its generation and bids
+        cursor.execute("""
+            UPDATE Listings SET SellerID = ?, Price = ?, ListedAt = GETDATE(), IsActive = 1, EndsAt = ?,
+                Generation = CASE WHEN IsActive = 1 THEN Generation ELSE Generation + 1 END
+            OUTPUT INSERTED.ListingID
+            WHERE NFTID = ?
+        """, (listing.SellerID, price, ends_at, listing.NFTID))
+        listing_row = cursor.fetchone()
+        if not listing_row:
+            cursor.execute("""
+                INSERT INTO Listings (NFTID, SellerID, Price, EndsAt)
+                OUTPUT INSERTED.ListingID
+                VALUES (?, ?, ?, ?)
+            """, (listing.NFTID, listing.SellerID, price, ends_at))
+            listing_row = cursor.fetchone()
+        cursor.connection.commit()
+        return listing_row[0], nft_row[1]
+
+    try:
+        listing_id, collection_id = await run_db(request, upsert_listing)
+        order_books.forget(listing_id, listing.NFTID)
+        facet_index.set_listing(listing.NFTID, price)
+        market_stats.set_listing(listing.NFTID, price, collection_id)
+        return {"message": "NFT listed successfully", "listing_id": listing_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error listing NFT {listing.NFTID}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/listings/{listing_id}")
+async def cancel_listing(listing_id: int, request: Request):
+    def deactivate_listing(cursor):
+        cursor.execute("""
+            UPDATE Listings SET IsActive = 0
+            OUTPUT INSERTED.NFTID
+            WHERE ListingID = ? AND IsActive = 1
+        """, (listing_id,))
+        listing_row = cursor.fetchone()
+        if not listing_row:
+            raise HTTPException(status_code=404, detail=f"No active listing with ID {listing_id}")
+        cursor.connection.commit()
+        return listing_row[0]
+
+    try:
+        nft_id = await run_db(request, deactivate_listing)
+        order_books.forget(listing_id, nft_id)
+        facet_index.set_listing(nft_id, None)
+        market_stats.set_listing(nft_id, None)
+        return {"message": "Listing cancelled", "nft_id": nft_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error cancelling listing {listing_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+NFT_MAX_TAGS = 10
+TAG_MAX_LENGTH = 50  # Tags.TagName is VARCHAR(50)
+
+# Replaces an NFT's tags; tags that don't exist yet are created
+@app.put("/api/nfts/{nft_id}/tags")
+async def set_nft_tags(nft_id: int, update: TagsUpdate, request: Request):
+    names = list(dict.fromkeys(tag.strip() for tag in update.Tags if tag.strip()))
+    if len(names) > NFT_MAX_TAGS:
+        raise HTTPException(status_code=400, detail=f"At most {NFT_MAX_TAGS} tags per NFT")
+    if any(len(name) > TAG_MAX_LENGTH for name in names):
+        raise HTTPException(status_code=400, detail=f"Tags must be at most {TAG_MAX_LENGTH} characters")
+
+    def replace_tags(cursor):
+        cursor.execute("SELECT Title, Description FROM NFTs WHERE NFTID = ?", (nft_id,))
+        nft_row = cursor.fetchone()
+        if not nft_row:
+            raise HTTPException(status_code=404, detail=f"NFT with ID {nft_id} not found")
+
+        tags = {}
+        for name in names:
+            cursor.execute("SELECT TagID, TagName FROM Tags WHERE TagName = ?", (name,))
+            tag_row = cursor.fetchone()
+            if not tag_row:
+                cursor.execute("INSERT INTO Tags (TagName) OUTPUT INSERTED.TagID, INSERTED.TagName VALUES (?)", (name,))
+                tag_row = cursor.fetchone()
+            tags[tag_row[0]] = tag_row[1]
+
+        cursor.execute("DELETE FROM NFT_Tags WHERE NFTID = ?", (nft_id,))
+        for tag_id in tags:
+            cursor.execute("INSERT INTO NFT_Tags (NFTID, TagID) VALUES (?, ?)", (nft_id, tag_id))
+        cursor.connection.commit()
+        return nft_row, tags
+
+    try:
+        (title, description), tags = await run_db(request, replace_tags)
+        for tag_id, name in tags.items():
+            facet_index.set_tag(tag_id, name)
+        facet_index.set_tags(nft_id, list(tags))
+        search_index.add(nft_id, title, description, list(tags.values()))
+        invalidate_nft_fragments(nft_id)
+        return {"nft_id": nft_id, "tags": [{"TagID": tag_id, "TagName": name} for tag_id, name in tags.items()]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error updating tags of NFT {nft_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/collections")
 def create_collection(collection: CollectionCreate):
-    conn = None
-    cursor = None
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Insert new collection and get the new ID
-        cursor.execute("""
-            INSERT INTO Collections (CollectionName, CreatorID, CategoryID)
-            OUTPUT INSERTED.CollectionID
-            VALUES (?, ?, ?)
-        """, (collection.CollectionName, collection.CreatorID, collection.CategoryID))
-        
-        # Fetch the newly created CollectionID
-        collection_id = cursor.fetchone()[0]
-        
-        conn.commit()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Insert new collection and get the new ID
+            cursor.execute("""
+                INSERT INTO Collections (CollectionName, CreatorID, CategoryID)
+                OUTPUT INSERTED.CollectionID
+                VALUES (?, ?, ?)
+            """, (collection.CollectionName, collection.CreatorID, collection.CategoryID))
+
+            # Fetch the newly created CollectionID
+            collection_id = cursor.fetchone()[0]
+            table_versions.bump(cursor, "Collections")
+
+            conn.commit()
+
+        table_versions.invalidate("Collections")
+        reference_cache.invalidate("collections")
+        facet_index.set_collection(collection_id, collection.CollectionName, collection.CategoryID)
+        market_stats.add_collection(collection_id)
         return {"message": "Collection created successfully", "collection_id": collection_id}
-            
+
+    except HTTPException:
+        raise
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 @app.post("/api/categories")
-async def create_category(category: CategoryCreate):
-    conn = None
-    cursor = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
+async def create_category(category: CategoryCreate, request: Request):
+    def insert_category(cursor):
         # Check if category name already exists
         cursor.execute("SELECT CategoryID FROM Categories WHERE CategoryName = ?", (category.CategoryName,))
         if cursor.fetchone():
@@ -706,17 +1655,86 @@ async def create_category(category: CategoryCreate):
             OUTPUT INSERTED.CategoryID
             VALUES (?)
         """, (category.CategoryName,))
-        
+
         new_category_id = cursor.fetchone()[0]
-        conn.commit()
+        table_versions.bump(cursor, "Categories")
+        cursor.connection.commit()
+        return new_category_id
+
+    try:
+        new_category_id = await run_db(request, insert_category)
+        table_versions.invalidate("Categories")
+        reference_cache.invalidate("categories")
+        facet_index.set_category(new_category_id, category.CategoryName)
         return {"message": "Category created successfully", "category_id": new_category_id}
+    except HTTPException:
+        raise
     except Exception as e:
-        if conn:
-            conn.rollback()
         print(f"Error creating category: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+
+# Pool usage counters, used to size POOL_SIZE
+@app.get("/api/db/pool")
+def get_pool_stats():
+    return db_pool.stats()
+
+# Read replicas' lag, health and load
+@app.get("/api/db/replicas")
+def get_replica_stats():
+    return db_router.stats()
+
+# Prometheus scrape endpoint: per-route latency, statement and row histograms, pool gauges.
+# Counters are per worker process
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    pool = db_pool.stats()
+    return PlainTextResponse(db_metrics.render({
+        "metamood_db_pool_in_use": ("Connections checked out.", pool["in_use"]),
+        "metamood_db_pool_idle": ("Idle pooled connections.", pool["idle"]),
+        "metamood_db_pool_waiting": ("Requests waiting for a connection.", pool["waiting"]),
+    }, {
+        "metamood_bid_batches_failed_total": ("Bid batches that failed to commit.", bid_engine.failed_batches),
+        "metamood_settlement_chunks_failed_total": ("Auction settlement chunks rolled back.",
+                                                    auction_settlement.failed_chunks),
+    }), media_type="text/plain; version=0.0.4")
+
+# Bid queue and group commit counters
+@app.get("/api/bids/engine")
+def get_bid_engine_stats():
+    return bid_engine.stats()
+
+# Live bid subscribers and fan-out counters
+@app.get("/api/bids/streams")
+def get_bid_stream_stats():
+    return bid_broadcaster.stats()
+
+# Reference data cache, identity map and order book counters
+@app.get("/api/cache")
+def get_cache_stats():
+    return {"reference": reference_cache.stats(), "identities": identity_map.stats(), "order_books": order_books.stats(),
+            "table_versions": table_versions.stats(), "fragments": fragment_cache.stats()}
+
+# Search index size and freshness
+@app.get("/api/search/stats")
+def get_search_stats():
+    return search_index.stats()
+
+# Browse index size and freshness
+@app.get("/api/browse/stats")
+def get_browse_stats():
+    return facet_index.stats()
+
+# Trending index size and freshness
+@app.get("/api/trending/stats")
+def get_trending_stats():
+    return trending_index.stats()
+
+# Market stats size and freshness
+@app.get("/api/market/stats")
+def get_market_stats():
+    return market_stats.stats()
+
+# Auction settlement outcomes and volume
+@app.get("/api/settlements/stats")
+def get_settlement_stats():
+    return auction_settlement.stats()
@@ -0,0 +1,319 @@
+import heapq
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+HOUR = 3600
+HISTORY_HOURS = 24 * 30  # Hourly buckets kept per collection
+
+# Volume window -> hours it covers: the current hour and the ones before it
+VOLUME_WINDOWS = {"24h": 24, "7d": 168}
+
+# One hour of one collection's sales
+BUCKET = np.dtype([
+    ("hour", np.int64),  # seconds since the epoch // HOUR
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+    ("sales", np.int64),
+])
+_NO_BUCKETS = np.zeros(0, BUCKET)
+
+
+def _epoch(value: Any) -> float:
+    # pyodbc returns datetimes; text (the SQLite stand-in) is parsed
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return value.timestamp()
+
+
+def _reduce(collections: np.ndarray, buckets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Buckets sorted by collection and hour, in time order within an hour -> one bucket per
+    # (collection, hour): first open, highest high, lowest low, last close, summed volume
+    if not len(buckets):
+        return collections[:0], _NO_BUCKETS
+    hours = buckets["hour"]
+    edges = np.empty(len(buckets), np.bool_)
+    edges[0] = True
+    edges[1:] = (collections[1:] != collections[:-1]) | (hours[1:] != hours[:-1])
+    starts = np.flatnonzero(edges)
+    ends = np.append(starts[1:], len(buckets)) - 1
+    out = np.empty(len(starts), BUCKET)
+    out["hour"] = hours[starts]
+    out["open"] = buckets["open"][starts]
+    out["close"] = buckets["close"][ends]
+    out["high"] = np.maximum.reduceat(buckets["high"], starts)
+    out["low"] = np.minimum.reduceat(buckets["low"], starts)
+    out["volume"] = np.add.reduceat(buckets["volume"], starts)
+    out["sales"] = np.add.reduceat(buckets["sales"], starts)
+    return collections[starts], out
+
+
+def rollup(collections: np.ndarray, times: np.ndarray, prices: np.ndarray,
+           transaction_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Hourly OHLC and volume per collection from sales, vectorized.
+
+    Takes one array entry per sale (CollectionID, epoch seconds, price,
+    TransactionID) in any order; returns (CollectionIDs, BUCKET rows) sorted by
+    collection and hour.
+    """
+    order = np.lexsort((transaction_ids, times, collections))
+    prices = prices[order]
+    buckets = np.empty(len(order), BUCKET)
+    buckets["hour"] = times[order] // HOUR
+    for field in ("open", "high", "low", "close", "volume"):
+        buckets[field] = prices
+    buckets["sales"] = 1
+    return _reduce(collections[order], buckets)
+
+
+def _merge(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    # One collection's buckets with later sales' buckets folded in
+    merged = np.concatenate([old, new])
+    merged = merged[np.argsort(merged["hour"], kind="stable")]
+    return _reduce(np.zeros(len(merged), np.int64), merged)[1]
+
+
+class MarketStats:
+    """Floor price, sale volume and hourly OHLC per collection, kept in memory.
+
+    The floor is the lowest active listing price. Listings are kept per
+    collection in a heap that is cleaned lazily: a delisted or repriced entry
+    stays in the heap until it reaches the top and is found stale, and a heap is
+    rebuilt when stale entries outnumber the live ones.
+
+    Sales are rolled up into hourly buckets (BUCKET) with numpy: load() rolls up
+    the last HISTORY_HOURS of Transactions in one pass, and sync() rolls up the
+    rows added since and merges them into the collections they touch. Each
+    collection holds its buckets as one sorted array, trimmed to HISTORY_HOURS
+    when it changes and at every load(), so memory is bounded by collections
+    times HISTORY_HOURS whatever the number of sales.
+
+    Listings made or cancelled by this process apply at once; those of other
+    workers show up after the next load(), due every `max_age` seconds.
+    """
+
+    def __init__(self, max_age: float = 300.0, clock=time.time):
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.ready = False
+        self.built_at = 0.0
+        self._collections: set = set()
+        self._listed: Dict[int, int] = {}  # listed NFTID -> CollectionID
+        self._prices: Dict[int, Dict[int, float]] = {}  # CollectionID -> {listed NFTID: price}
+        self._heaps: Dict[int, List[Tuple[float, int]]] = {}  # CollectionID -> [(price, NFTID)], may be stale
+        self._buckets: Dict[int, np.ndarray] = {}  # CollectionID -> BUCKET rows by hour
+        self._synced_through = 0  # highest TransactionID rolled up
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > self.max_age
+
+    # --- building ---
+
+    def load(self, cursor, chunk_size: int = 5000) -> int:
+        """Rebuilds floors from active Listings and buckets from recent Transactions.
+
+        Returns the number of sales rolled up. Stats show the old values until it
+        is done.
+        """
+        cursor.execute("SELECT CollectionID FROM Collections")
+        collections = {row[0] for row in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT n.CollectionID, l.NFTID, l.Price
+            FROM Listings l INNER JOIN NFTs n ON n.NFTID = l.NFTID
+            WHERE l.IsActive = 1 AND n.CollectionID IS NOT NULL
+        """)
+        listed: Dict[int, int] = {}
+        prices: Dict[int, Dict[int, float]] = {}
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for collection_id, nft_id, price in rows:
+                listed[nft_id] = collection_id
+                prices.setdefault(collection_id, {})[nft_id] = float(price)
+        heaps = {collection_id: self._heap(members) for collection_id, members in prices.items()}
+
+        # The watermark first: sales added meanwhile are left to sync()
+        cursor.execute("SELECT MAX(TransactionID) FROM Transactions")
+        synced_through = cursor.fetchone()[0] or 0
+        since = datetime.fromtimestamp((self._current_hour() - HISTORY_HOURS + 1) * HOUR)
+        cursor.execute("""
+            SELECT n.CollectionID, t.TransactionDate, t.SalePrice, t.TransactionID
+            FROM Transactions t INNER JOIN NFTs n ON n.NFTID = t.NFTID
+            WHERE t.TransactionDate >= CAST(? AS DATETIME) AND t.TransactionID <= ? AND n.CollectionID IS NOT NULL
+        """, (since, synced_through))
+        sales_collections, times, sale_prices, transaction_ids = array("q"), array("d"), array("d"), array("q")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for collection_id, sold_at, price, transaction_id in rows:
+                sales_collections.append(collection_id)
+                times.append(_epoch(sold_at))
+                sale_prices.append(float(price))
+                transaction_ids.append(transaction_id)
+        buckets = self._split(*rollup(np.frombuffer(sales_collections, np.int64), np.frombuffer(times, np.float64),
+                                      np.frombuffer(sale_prices, np.float64),
+                                      np.frombuffer(transaction_ids, np.int64)))
+
+        with self._lock:
+            self._collections = collections
+            self._listed = listed
+            self._prices = prices
+            self._heaps = heaps
+            self._buckets = buckets
+            self._synced_through = synced_through
+            self.built_at = time.monotonic()
+            self.ready = True
+        return len(sale_prices)
+
+    @staticmethod
+    def _split(collections: np.ndarray, buckets: np.ndarray) -> Dict[int, np.ndarray]:
+        # Rows sorted by collection -> {CollectionID: its rows}, copied so each can be freed alone
+        starts = np.flatnonzero(np.diff(collections, prepend=-1))
+        ends = np.append(starts[1:], len(collections))
+        return {int(collections[start]): buckets[start:end].copy() for start, end in zip(starts, ends)}
+
+    def sync(self, cursor) -> int:
+        """Rolls up sales added since the last load() or sync(), and picks up new collections.
+
+        Returns the number of sales added.
+        """
+        with self._lock:
+            after = self._synced_through
+            known = max(self._collections, default=0)
+
+        cursor.execute("SELECT CollectionID FROM Collections WHERE CollectionID > ?", (known,))
+        new_collections = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT n.CollectionID, t.TransactionDate, t.SalePrice, t.TransactionID
+            FROM Transactions t INNER JOIN NFTs n ON n.NFTID = t.NFTID
+            WHERE t.TransactionID > ?
+            ORDER BY t.TransactionID
+        """, (after,))
+        rows = cursor.fetchall()
+
+        with self._lock:
+            self._collections.update(new_collections)
+            if not rows:
+                return 0
+            self._synced_through = max(self._synced_through, rows[-1][3])
+            self._add_sales(rows)
+        return len(rows)
+
+    def _add_sales(self, rows) -> None:
+        rows = [row for row in rows if row[0] is not None]
+        if not rows:
+            return
+        collections, buckets = rollup(
+            np.array([row[0] for row in rows], np.int64),
+            np.array([_epoch(row[1]) for row in rows], np.float64),
+            np.array([float(row[2]) for row in rows], np.float64),
+            np.array([row[3] for row in rows], np.int64),
+        )
+        oldest = self._current_hour() - HISTORY_HOURS + 1
+        for collection_id, new in self._split(collections, buckets).items():
+            merged = _merge(self._buckets.get(collection_id, _NO_BUCKETS), new)
+            self._buckets[collection_id] = merged[merged["hour"] >= oldest]
+
+    def _current_hour(self) -> int:
+        return int(self._clock() // HOUR)
+
+    # --- listings ---
+
+    @staticmethod
+    def _heap(members: Dict[int, float]) -> List[Tuple[float, int]]:
+        heap = [(price, nft_id) for nft_id, price in members.items()]
+        heapq.heapify(heap)
+        return heap
+
+    def add_collection(self, collection_id: int) -> None:
+        with self._lock:
+            self._collections.add(collection_id)
+
+    def set_listing(self, nft_id: int, price: Optional[float], collection_id: Optional[int] = None) -> None:
+        """Lists an NFT of `collection_id` at `price`, or delists it when `price` is None."""
+        with self._lock:
+            previous = self._listed.pop(nft_id, None)
+            if previous is not None:
+                self._prices[previous].pop(nft_id, None)
+            if price is None:
+                return
+            collection_id = collection_id if collection_id is not None else previous
+            if collection_id is None:
+                return
+            self._listed[nft_id] = collection_id
+            members = self._prices.setdefault(collection_id, {})
+            members[nft_id] = float(price)
+            heap = self._heaps.setdefault(collection_id, [])
+            heapq.heappush(heap, (float(price), nft_id))
+            if len(heap) > 2 * len(members) + 16:
+                self._heaps[collection_id] = self._heap(members)
+
+    def _floor(self, collection_id: int) -> Optional[float]:
+        heap = self._heaps.get(collection_id)
+        if not heap:
+            return None
+        members = self._prices.get(collection_id, {})
+        # Drop entries for NFTs delisted or repriced since they were pushed
+        while heap and members.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    # --- queries ---
+
+    def collection(self, collection_id: int, hours: int = 168) -> Optional[Dict[str, Any]]:
+        """Floor, volumes and the last `hours` hourly buckets of one collection.
+
+        None if the collection is unknown. Hours without sales are left out of the
+        history, oldest first.
+        """
+        current = self._current_hour()
+        with self._lock:
+            if collection_id not in self._collections:
+                return None
+            floor = self._floor(collection_id)
+            listed = len(self._prices.get(collection_id, ()))
+            buckets = self._buckets.get(collection_id, _NO_BUCKETS)
+
+        stats: Dict[str, Any] = {"CollectionID": collection_id, "FloorPrice": floor, "Listed": listed}
+        for window, window_hours in VOLUME_WINDOWS.items():
+            recent = buckets[buckets["hour"] > current - window_hours]
+            stats[f"Volume{window}"] = round(float(recent["volume"].sum()), 2)
+            stats[f"Sales{window}"] = int(recent["sales"].sum())
+        history = buckets[buckets["hour"] > current - min(hours, HISTORY_HOURS)]
+        stats["History"] = [
+            {
+                "Hour": datetime.fromtimestamp(int(bucket["hour"]) * HOUR).isoformat(),
+                "Open": round(float(bucket["open"]), 2),
+                "High": round(float(bucket["high"]), 2),
+                "Low": round(float(bucket["low"]), 2),
+                "Close": round(float(bucket["close"]), 2),
+                "Volume": round(float(bucket["volume"]), 2),
+                "Sales": int(bucket["sales"]),
+            }
+            for bucket in history
+        ]
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "collections": len(self._collections),
+                "listed": len(self._listed),
+                "heap_entries": sum(len(heap) for heap in self._heaps.values()),
+                "buckets": sum(len(buckets) for buckets in self._buckets.values()),
+                "bucket_bytes": sum(buckets.nbytes for buckets in self._buckets.values()),
+                "synced_through": self._synced_through,
+                "age_seconds": round(time.monotonic() - self.built_at, 1) if self.ready else None,
+            }
@@ -0,0 +1,166 @@
+"""Versioned schema migrations for the MetaMood database.
+
+Each migration is a pair of files in migrations/: NNNN_name.up.sql and
+NNNN_name.down.sql, split into batches on `GO` lines. Applied versions are
+recorded in Schema_Migrations; each migration runs in one transaction together
+with its version row, so a failed migration leaves nothing behind.
+
+    python migrate.py --conn-str "..." status
+    python migrate.py --conn-str "..." up [--to N]
+    python migrate.py --conn-str "..." down --to N
+"""
+
+import argparse
+import os
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+VERSION_TABLE = "Schema_Migrations"
+
+_FILE = re.compile(r"^(\d+)_(\w+)\.(up|down)\.sql$")
+_GO = re.compile(r"^\s*GO\s*;?\s*$", re.I | re.M)
+
+
+class MigrationError(Exception):
+    """Raised when migrations are inconsistent or one of them fails."""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    up: str
+    down: str
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    files: Dict[int, Dict[str, str]] = {}
+    names: Dict[int, str] = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if names.setdefault(version, match.group(2)) != match.group(2):
+            raise MigrationError(f"Two migrations share version {version}")
+        files.setdefault(version, {})[match.group(3)] = os.path.join(directory, filename)
+
+    migrations = []
+    for version in sorted(files):
+        if set(files[version]) != {"up", "down"}:
+            raise MigrationError(f"Migration {version} needs both an .up.sql and a .down.sql file")
+        migrations.append(Migration(version, names[version], files[version]["up"], files[version]["down"]))
+    return migrations
+
+
+def batches(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        script = f.read()
+    # Statements without GO between them are sent together, as in sqlcmd
+    return [batch for batch in _GO.split(script) if batch.strip()]
+
+
+def ensure_version_table(conn) -> None:
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = ?", (VERSION_TABLE,))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"""
+            CREATE TABLE {VERSION_TABLE} (
+                Version INT PRIMARY KEY,
+                Name VARCHAR(200) NOT NULL,
+                AppliedAt DATETIME DEFAULT GETDATE()
+            )
+        """)
+        conn.commit()
+
+
+def applied(conn) -> Dict[int, Tuple[str, str]]:
+    # {version: (name, applied at)}
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT Version, Name, AppliedAt FROM {VERSION_TABLE}")
+    return {row[0]: (row[1], str(row[2])) for row in cursor.fetchall()}
+
+
+def current_version(conn) -> int:
+    return max(applied(conn), default=0)
+
+
+def _run(conn, migration: Migration, direction: str) -> None:
+    cursor = conn.cursor()
+    try:
+        for batch in batches(getattr(migration, direction)):
+            cursor.execute(batch)
+        if direction == "up":
+            cursor.execute(f"INSERT INTO {VERSION_TABLE} (Version, Name) VALUES (?, ?)",
+                           (migration.version, migration.name))
+        else:
+            cursor.execute(f"DELETE FROM {VERSION_TABLE} WHERE Version = ?", (migration.version,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise MigrationError(f"{direction} {migration.version}_{migration.name} failed: {e}") from e
+
+
+def migrate(
+    conn,
+    target: Optional[int] = None,
+    migrations: Optional[Sequence[Migration]] = None,
+    out: Callable[[str], None] = print,
+) -> List[Tuple[int, str]]:
+    """Brings the schema to `target` (default: the latest migration).
+
+    Applies every unapplied migration up to the target in version order, or
+    reverts applied ones above it newest first. Returns [(version, "up"|"down")].
+    """
+    migrations = list(discover() if migrations is None else migrations)
+    ensure_version_table(conn)
+    done = applied(conn)
+    target = max((m.version for m in migrations), default=0) if target is None else target
+
+    steps = [(m, "up") for m in migrations if m.version <= target and m.version not in done]
+    steps += [(m, "down") for m in reversed(migrations) if m.version > target and m.version in done]
+
+    ran = []
+    for migration, direction in steps:
+        out(f"{direction:>4} {migration.version:04d}_{migration.name}")
+        _run(conn, migration, direction)
+        ran.append((migration.version, direction))
+    return ran
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Apply or revert MetaMood schema migrations.")
+    parser.add_argument("--conn-str", required=True, help="ODBC connection string of the target database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="list migrations and whether they are applied")
+    up = commands.add_parser("up", help="apply migrations")
+    up.add_argument("--to", type=int, help="stop at this version (default: latest)")
+    down = commands.add_parser("down", help="revert migrations")
+    down.add_argument("--to", type=int, required=True, help="version to go back to (0 reverts all)")
+    args = parser.parse_args(argv)
+
+    import pyodbc
+    conn = pyodbc.connect(args.conn_str)
+    try:
+        ensure_version_table(conn)
+        if args.command == "status":
+            done = applied(conn)
+            for migration in discover():
+                state = f"applied {done[migration.version][1]}" if migration.version in done else "pending"
+                print(f"{migration.version:04d}_{migration.name:<40} {state}")
+            print(f"schema version: {max(done, default=0)}")
+            return
+        current = current_version(conn)
+        if args.command == "up" and args.to is not None and args.to < current:
+            raise SystemExit(f"schema is at version {current}; use `down --to {args.to}` to revert")
+        if args.command == "down" and args.to >= current:
+            print("nothing to revert")
+            return
+        ran = migrate(conn, args.to)
+        print(f"schema version: {current_version(conn)} ({len(ran)} migrations run)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+DROP INDEX IX_Listings_NFTID_IsActive ON Listings;
+DROP INDEX IX_Bids_ListingID_BidAmount ON Bids;
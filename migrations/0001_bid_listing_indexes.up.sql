@@ -0,0 +1,6 @@
+-- Order book loads and catch-ups: bids of one listing, by amount
+CREATE INDEX IX_Bids_ListingID_BidAmount ON Bids (ListingID, BidAmount DESC) INCLUDE (BidderID, BidAt);
+
+-- Active-listing lookups from create_bid, the detail page and the order books.
+-- Covers IsActive and Price, so the UNIQUE (NFTID) seek no longer needs a key lookup
+CREATE INDEX IX_Listings_NFTID_IsActive ON Listings (NFTID, IsActive) INCLUDE (Price);
@@ -0,0 +1,2 @@
+DROP INDEX IX_Reports_ReportedAt ON Reports;
+DROP INDEX IX_NFT_Views_NFTID ON NFT_Views;
@@ -0,0 +1,5 @@
+-- Per-NFT view counts (rollup backfill and reconciliation against NFT_View_Counts)
+CREATE INDEX IX_NFT_Views_NFTID ON NFT_Views (NFTID);
+
+-- Moderation list, newest first
+CREATE INDEX IX_Reports_ReportedAt ON Reports (ReportedAt DESC) INCLUDE (ReporterID, NFTID, Reason);
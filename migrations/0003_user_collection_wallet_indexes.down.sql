@@ -0,0 +1,3 @@
+DROP INDEX IX_Wallets_UserID ON Wallets;
+DROP INDEX IX_Collections_CategoryID ON Collections;
+DROP INDEX IX_Users_Username_Email ON Users;
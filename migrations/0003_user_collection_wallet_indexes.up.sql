@@ -0,0 +1,8 @@
+-- login_user matches Username and Email together
+CREATE INDEX IX_Users_Username_Email ON Users (Username, Email);
+
+-- Collections by category
+CREATE INDEX IX_Collections_CategoryID ON Collections (CategoryID);
+
+-- get_user_wallet looks wallets up by owner
+CREATE INDEX IX_Wallets_UserID ON Wallets (UserID);
@@ -0,0 +1 @@
+DROP TABLE Table_Versions;
@@ -0,0 +1,8 @@
+-- Change counters behind the ETags of the list endpoints. Writers bump a table's
+-- row in the same transaction as their change (table_versions.TableVersions.bump)
+CREATE TABLE Table_Versions (
+    TableName VARCHAR(128) PRIMARY KEY,
+    Version BIGINT NOT NULL
+);
+
+INSERT INTO Table_Versions (TableName, Version) VALUES ('Categories', 1), ('Collections', 1), ('Reports', 1);
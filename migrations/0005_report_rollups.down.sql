@@ -0,0 +1,5 @@
+DROP TABLE NFT_Report_Hourly;
+DROP TABLE NFT_Report_Counts;
+
+DROP INDEX IX_Reports_ReportedAt_ReportID ON Reports;
+CREATE INDEX IX_Reports_ReportedAt ON Reports (ReportedAt DESC) INCLUDE (ReporterID, NFTID, Reason);
@@ -0,0 +1,33 @@
+-- Moderation queue keyset: newest first, ReportID breaking ties within one ReportedAt
+DROP INDEX IX_Reports_ReportedAt ON Reports;
+CREATE INDEX IX_Reports_ReportedAt_ReportID ON Reports (ReportedAt DESC, ReportID DESC) INCLUDE (ReporterID, NFTID, Reason);
+
+-- Per-NFT report counts, maintained by create_report in the same transaction as the
+-- report (moderation.record_report), so "most reported" never scans Reports
+CREATE TABLE NFT_Report_Counts (
+    NFTID INT PRIMARY KEY,
+    ReportCount INT NOT NULL,
+    LastReportedAt DATETIME NOT NULL,
+    FOREIGN KEY (NFTID) REFERENCES NFTs(NFTID)
+);
+CREATE INDEX IX_NFT_Report_Counts_ReportCount ON NFT_Report_Counts (ReportCount DESC) INCLUDE (LastReportedAt);
+
+-- The same counts per hour, for the 1h / 24h / 7d windows. Clustered on HourStart,
+-- so a window reads only its own buckets however long the table grows
+CREATE TABLE NFT_Report_Hourly (
+    HourStart DATETIME NOT NULL,
+    NFTID INT NOT NULL,
+    ReportCount INT NOT NULL,
+    PRIMARY KEY (HourStart, NFTID),
+    FOREIGN KEY (NFTID) REFERENCES NFTs(NFTID)
+);
+
+-- Backfill from the reports filed so far (moderation.rebuild_report_counts does the same)
+INSERT INTO NFT_Report_Counts (NFTID, ReportCount, LastReportedAt)
+SELECT NFTID, COUNT(*), MAX(ReportedAt) FROM Reports WHERE ReportedAt IS NOT NULL GROUP BY NFTID;
+
+INSERT INTO NFT_Report_Hourly (HourStart, NFTID, ReportCount)
+SELECT DATEADD(HOUR, DATEDIFF(HOUR, 0, ReportedAt), 0), NFTID, COUNT(*)
+FROM Reports
+WHERE ReportedAt IS NOT NULL
+GROUP BY DATEADD(HOUR, DATEDIFF(HOUR, 0, ReportedAt), 0), NFTID;
@@ -0,0 +1,4 @@
+DROP INDEX IX_Transactions_TransactionDate ON Transactions;
+DROP INDEX IX_Bids_BidAt ON Bids;
+DROP INDEX IX_Likes_LikedAt ON Likes;
+DROP INDEX IX_NFT_Views_ViewedAt ON NFT_Views;
@@ -0,0 +1,6 @@
+-- Trending rebuilds read the last week of each event table by time. Between rebuilds,
+-- views, bids and sales are read by their ID (the clustered key) and likes by LikedAt
+CREATE INDEX IX_NFT_Views_ViewedAt ON NFT_Views (ViewedAt) INCLUDE (NFTID);
+CREATE INDEX IX_Likes_LikedAt ON Likes (LikedAt);
+CREATE INDEX IX_Bids_BidAt ON Bids (BidAt) INCLUDE (ListingID);
+CREATE INDEX IX_Transactions_TransactionDate ON Transactions (TransactionDate) INCLUDE (NFTID);
@@ -0,0 +1 @@
+DROP INDEX IX_Bids_BidderID ON Bids;
@@ -0,0 +1,2 @@
+-- The bid engine reads each bidder's highest bids on active listings (their reservations)
+CREATE INDEX IX_Bids_BidderID ON Bids (BidderID) INCLUDE (ListingID, BidAmount);
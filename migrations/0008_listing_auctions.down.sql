@@ -0,0 +1,2 @@
+DROP INDEX IX_Listings_Due ON Listings;
+ALTER TABLE Listings DROP COLUMN EndsAt;
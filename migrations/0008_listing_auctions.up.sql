@@ -0,0 +1,8 @@
+-- Auctions close at EndsAt (settlement.AuctionSettlement). Listings without one are
+-- fixed-price and stay open until cancelled
+ALTER TABLE Listings ADD EndsAt DATETIME NULL;
+GO
+
+-- Due auctions, soonest first. Only open auctions are indexed, so the index stays
+-- as small as the number of running auctions
+CREATE INDEX IX_Listings_Due ON Listings (EndsAt) WHERE IsActive = 1 AND EndsAt IS NOT NULL;
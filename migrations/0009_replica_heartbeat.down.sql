@@ -0,0 +1 @@
+DROP TABLE Replica_Heartbeat;
@@ -0,0 +1,9 @@
+-- Replication position for read routing (db_router.ReplicaRouter). Every worker writes
+-- its clock (ms since the epoch) here on the primary, so a replica's copy of the row
+-- tells how far it has caught up
+CREATE TABLE Replica_Heartbeat (
+    HeartbeatID INT PRIMARY KEY,
+    BeatAt BIGINT NOT NULL
+);
+
+INSERT INTO Replica_Heartbeat (HeartbeatID, BeatAt) VALUES (1, 0);
@@ -0,0 +1,2 @@
+DROP TABLE NFT_View_Flushes;
+DROP TABLE NFT_View_Counts;
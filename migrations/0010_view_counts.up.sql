@@ -0,0 +1,17 @@
+-- Per-NFT view totals, maintained by the app's write-behind view counter
+-- (view_counter.ViewCounter), so an NFT page reads its count by primary key
+CREATE TABLE NFT_View_Counts (
+    NFTID INT PRIMARY KEY,
+    ViewCount BIGINT NOT NULL DEFAULT 0,
+    FOREIGN KEY (NFTID) REFERENCES NFTs(NFTID)
+);
+
+-- View batches already applied, so a retried flush is not counted twice
+CREATE TABLE NFT_View_Flushes (
+    BatchID CHAR(36) PRIMARY KEY,
+    FlushedAt DATETIME DEFAULT GETDATE()
+);
+
+-- Backfill from the views recorded so far
+INSERT INTO NFT_View_Counts (NFTID, ViewCount)
+SELECT NFTID, COUNT(*) FROM NFT_Views GROUP BY NFTID;
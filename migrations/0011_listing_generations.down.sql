@@ -0,0 +1,10 @@
+DROP INDEX IX_Bids_ListingID_BidAmount ON Bids;
+CREATE INDEX IX_Bids_ListingID_BidAmount ON Bids (ListingID, BidAmount DESC) INCLUDE (BidderID, BidAt);
+GO
+
+ALTER TABLE Bids DROP CONSTRAINT DF_Bids_Generation;
+ALTER TABLE Bids DROP COLUMN Generation;
+GO
+
+ALTER TABLE Listings DROP CONSTRAINT DF_Listings_Generation;
+ALTER TABLE Listings DROP COLUMN Generation;
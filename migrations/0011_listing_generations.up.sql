@@ -0,0 +1,13 @@
+-- A relisted NFT gets its old ListingID back (create_listing), so each time it is
+-- listed again starts a new generation of the listing. Bids carry the generation
+-- they were placed in and only bids of the listing's current one count. Bids made
+-- before this migration all belong to generation 1
+ALTER TABLE Listings ADD Generation INT NOT NULL CONSTRAINT DF_Listings_Generation DEFAULT 1;
+GO
+
+ALTER TABLE Bids ADD Generation INT NOT NULL CONSTRAINT DF_Bids_Generation DEFAULT 1;
+GO
+
+-- Order book loads and catch-ups filter on the generation, so the index covers it
+DROP INDEX IX_Bids_ListingID_BidAmount ON Bids;
+CREATE INDEX IX_Bids_ListingID_BidAmount ON Bids (ListingID, BidAmount DESC) INCLUDE (BidderID, BidAt, Generation);
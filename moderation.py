@@ -0,0 +1,114 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Report counts per NFT are kept in two rollups (migration 0005): NFT_Report_Counts
+# (all time) and NFT_Report_Hourly (one row per NFT and hour). create_report adds to
+# both in the same transaction as the report, so they always agree with Reports and
+# the "most reported" lists read only rollup rows, never Reports itself.
+
+# Window name -> hours of NFT_Report_Hourly buckets it covers; None is all time
+WINDOWS: Dict[str, Optional[int]] = {"1h": 1, "24h": 24, "7d": 168, "all": None}
+
+_HOUR = "DATEADD(HOUR, DATEDIFF(HOUR, 0, GETDATE()), 0)"
+
+# One round trip: create the NFT's rows if they are missing (the locks hold them
+# against a concurrent first report), then count this report
+RECORD_REPORT_BATCH = f"""
+INSERT INTO NFT_Report_Counts (NFTID, ReportCount, LastReportedAt)
+SELECT ?, 0, GETDATE() WHERE NOT EXISTS (SELECT 1 FROM NFT_Report_Counts WITH (UPDLOCK, HOLDLOCK) WHERE NFTID = ?);
+UPDATE NFT_Report_Counts SET ReportCount = ReportCount + 1, LastReportedAt = GETDATE() WHERE NFTID = ?;
+INSERT INTO NFT_Report_Hourly (HourStart, NFTID, ReportCount)
+SELECT {_HOUR}, ?, 0 WHERE NOT EXISTS (
+    SELECT 1 FROM NFT_Report_Hourly WITH (UPDLOCK, HOLDLOCK) WHERE HourStart = {_HOUR} AND NFTID = ?);
+UPDATE NFT_Report_Hourly SET ReportCount = ReportCount + 1 WHERE HourStart = {_HOUR} AND NFTID = ?
+"""
+
+REBUILD_BATCH = """
+DELETE FROM NFT_Report_Hourly;
+DELETE FROM NFT_Report_Counts;
+INSERT INTO NFT_Report_Counts (NFTID, ReportCount, LastReportedAt)
+SELECT NFTID, COUNT(*), MAX(ReportedAt) FROM Reports WHERE ReportedAt IS NOT NULL GROUP BY NFTID;
+INSERT INTO NFT_Report_Hourly (HourStart, NFTID, ReportCount)
+SELECT DATEADD(HOUR, DATEDIFF(HOUR, 0, ReportedAt), 0), NFTID, COUNT(*)
+FROM Reports
+WHERE ReportedAt IS NOT NULL
+GROUP BY DATEADD(HOUR, DATEDIFF(HOUR, 0, ReportedAt), 0), NFTID
+"""
+
+# Newest first; the keyset condition is added after the first page. CAST keeps the
+# cursor's ReportedAt at DATETIME precision, so it compares equal to the row it came from
+REPORT_QUEUE_QUERY = """
+SELECT TOP (?)
+    r.ReportID, r.ReportedAt, r.Reason, r.NFTID,
+    n.Title AS NFTTitle,
+    u.Username AS ReporterUsername,
+    COALESCE(c.ReportCount, 0) AS NFTReportCount
+FROM Reports r
+INNER JOIN Users u ON r.ReporterID = u.UserID
+INNER JOIN NFTs n ON r.NFTID = n.NFTID
+LEFT JOIN NFT_Report_Counts c ON c.NFTID = r.NFTID
+{where}
+ORDER BY r.ReportedAt DESC, r.ReportID DESC
+"""
+_AFTER = "WHERE r.ReportedAt < CAST(? AS DATETIME) OR (r.ReportedAt = CAST(? AS DATETIME) AND r.ReportID < ?)"
+
+
+def record_report(cursor, nft_id: int) -> None:
+    # Call after inserting the report, before committing
+    cursor.execute(RECORD_REPORT_BATCH, (nft_id, nft_id, nft_id, nft_id, nft_id, nft_id))
+
+
+def rebuild_report_counts(cursor) -> None:
+    # Recounts both rollups from Reports, e.g. after reports were bulk loaded
+    cursor.execute(REBUILD_BATCH)
+
+
+def queue_cursor(row: Dict[str, Any]) -> str:
+    # Opaque to clients: "<ReportedAt ISO 8601>,<ReportID>" of the last row of a page
+    reported_at = row["ReportedAt"]
+    if isinstance(reported_at, datetime):
+        reported_at = reported_at.isoformat()
+    return f"{reported_at},{row['ReportID']}"
+
+
+def parse_queue_cursor(after: str) -> Tuple[datetime, int]:
+    # ValueError for anything queue_cursor() did not produce
+    reported_at, _, report_id = after.rpartition(",")
+    return datetime.fromisoformat(reported_at), int(report_id)
+
+
+def load_report_queue(cursor, after: Optional[str], limit: int) -> Tuple[List[str], List[Sequence[Any]]]:
+    # (columns, rows) of one page of the moderation queue, following `after` if given
+    if after is None:
+        cursor.execute(REPORT_QUEUE_QUERY.format(where=""), (limit,))
+    else:
+        reported_at, report_id = parse_queue_cursor(after)
+        cursor.execute(REPORT_QUEUE_QUERY.format(where=_AFTER), (limit, reported_at, reported_at, report_id))
+    return [column[0] for column in cursor.description], cursor.fetchall()
+
+
+def top_reported(cursor, window: str, limit: int) -> Tuple[List[str], List[Sequence[Any]]]:
+    # (columns, rows) of the most reported NFTs in `window` (a WINDOWS key), most first.
+    # Windows are counted in whole hours: the current hour plus the ones before it
+    hours = WINDOWS[window]
+    if hours is None:
+        cursor.execute("""
+            SELECT TOP (?) c.NFTID, n.Title, c.ReportCount, c.LastReportedAt
+            FROM NFT_Report_Counts c
+            INNER JOIN NFTs n ON n.NFTID = c.NFTID
+            ORDER BY c.ReportCount DESC, c.NFTID
+        """, (limit,))
+    else:
+        cursor.execute(f"""
+            SELECT TOP (?) h.NFTID, n.Title, h.ReportCount, c.LastReportedAt
+            FROM (
+                SELECT NFTID, SUM(ReportCount) AS ReportCount
+                FROM NFT_Report_Hourly
+                WHERE HourStart > DATEADD(HOUR, ?, {_HOUR})
+                GROUP BY NFTID
+            ) h
+            INNER JOIN NFTs n ON n.NFTID = h.NFTID
+            INNER JOIN NFT_Report_Counts c ON c.NFTID = h.NFTID
+            ORDER BY h.ReportCount DESC, h.NFTID
+        """, (limit, -hours))
+    return [column[0] for column in cursor.description], cursor.fetchall()
@@ -0,0 +1,71 @@
+from typing import Any, Dict, Optional
+
+from identity_map import IdentityMap
+from order_book import OrderBooks
+
+# Everything the NFT detail page needs, fetched in a single round-trip.
+# Result set 1: the NFT with its listing price, active listing, collection and flushed view count
+# Result set 2: tag names
+# Bids come from the listing's in-memory order book, and owner and bidder
+# usernames from the IdentityMap, instead of joins on Bids and Users.
+NFT_DETAIL_BATCH = """
+SELECT
+    N.NFTID, N.Title, N.Description, N.MintedAt, N.OwnerID, N.CollectionID,
+    L.Price,
+    C.CollectionID, C.CollectionName,
+    COALESCE(VC.ViewCount, 0) AS ViewCount,
+    (SELECT MAX(AL.ListingID) FROM Listings AL WHERE AL.NFTID = N.NFTID AND AL.IsActive = 1) AS ActiveListingID
+FROM NFTs N
+LEFT JOIN Listings L ON N.NFTID = L.NFTID
+LEFT JOIN Collections C ON C.CollectionID = N.CollectionID
+LEFT JOIN NFT_View_Counts VC ON VC.NFTID = N.NFTID
+WHERE N.NFTID = ?;
+
+SELECT t.TagName
+FROM Tags t
+INNER JOIN NFT_Tags nt ON t.TagID = nt.TagID
+WHERE nt.NFTID = ?;
+"""
+
+
+def load_nft_detail(cursor, nft_id: int, identities: IdentityMap, books: OrderBooks) -> Optional[Dict[str, Any]]:
+    # Returns the nft_detail.html template data, or None if the NFT doesn't exist.
+    # ViewCount is the rollup total; add the view counter's unflushed views to it.
+    cursor.execute(NFT_DETAIL_BATCH, (nft_id, nft_id))
+
+    nft_row = cursor.fetchone()
+    if nft_row is None:
+        return None
+    (nft_id, title, description, minted_at, owner_id, collection_id,
+     price, found_collection_id, collection_name, view_count, listing_id) = nft_row
+
+    cursor.nextset()
+    tags = [row[0] for row in cursor.fetchall()]
+
+    # Loads the book on first use, otherwise at most a catch-up query for newer bids
+    bid_rows = books.book(cursor, listing_id).top() if listing_id is not None else []
+
+    # Usually all cached; otherwise one extra query for the unknown ids
+    names = identities.usernames(cursor, [owner_id] + [row[3] for row in bid_rows])
+    owner_name = names.get(owner_id)
+
+    bids = [{
+        "BidID": row[0],
+        "BidAmount": row[1],
+        "BidAt": row[2],
+        "BidderID": row[3],
+        "BidderUsername": names.get(row[3])
+    } for row in bid_rows]
+
+    return {
+        "NFTID": nft_id,
+        "Title": title,
+        "Description": description,
+        "MintedAt": str(minted_at),
+        "Owner": {"UserID": owner_id, "Username": owner_name if owner_name is not None else "Unknown"},
+        "Collection": {"CollectionID": collection_id, "CollectionName": collection_name} if found_collection_id is not None else None,
+        "ListingPrice": price,
+        "ViewCount": view_count,
+        "Tags": tags,
+        "Bids": bids,
+    }
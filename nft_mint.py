@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from identity_map import IdentityMap
+
+# SQL Server accepts at most 2100 parameters per statement
+MAX_PARAMETERS = 2000
+TITLE_MAX_LENGTH = 100  # NFTs.Title is VARCHAR(100)
+
+
+def _insert_sql(rows: int) -> str:
+    # IDENTITY values follow the ORDER BY, so sorting the OUTPUT ids maps them back
+    # to Seq; the order OUTPUT returns rows in is not guaranteed
+    values = ", ".join(["(?, ?, ?, ?, ?)"] * rows)
+    return f"""
+        INSERT INTO NFTs (Title, Description, CollectionID, OwnerID)
+        OUTPUT INSERTED.NFTID
+        SELECT Title, Description, CollectionID, OwnerID
+        FROM (VALUES {values}) AS v (Seq, Title, Description, CollectionID, OwnerID)
+        ORDER BY Seq
+    """
+
+
+def _existing_collections(cursor, collection_ids: Set[int], chunk_size: int = 500) -> Set[int]:
+    ids = list(collection_ids)
+    found = set()
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"SELECT CollectionID FROM Collections WHERE CollectionID IN ({placeholders})", chunk)
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+def mint_nfts(
+    cursor,
+    nfts: Sequence[Tuple[int, Any]],
+    identities: IdentityMap,
+    chunk_size: int = 400,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Inserts many NFTs with multi-row INSERTs, committing each chunk.
+
+    `nfts` are (index, NFT) pairs that already passed the request model. Items with
+    an over-long title or an unknown owner or collection are reported instead of
+    inserted. A chunk the database rejects is rolled back and its items reported;
+    the other chunks still go in. Returns (minted, errors) as lists of
+    {"index", "NFTID"} and {"index", "errors"}.
+    """
+    chunk_size = max(1, min(chunk_size, MAX_PARAMETERS // 5))
+
+    owners = identities.usernames(cursor, {nft.OwnerID for _, nft in nfts})
+    collections = _existing_collections(
+        cursor, {nft.CollectionID for _, nft in nfts if nft.CollectionID is not None}
+    )
+
+    valid = []
+    errors = []
+    for index, nft in nfts:
+        problems = []
+        if not nft.Title.strip():
+            problems.append("Title: must not be blank")
+        elif len(nft.Title) > TITLE_MAX_LENGTH:
+            problems.append(f"Title: must be at most {TITLE_MAX_LENGTH} characters")
+        if nft.OwnerID not in owners:
+            problems.append(f"OwnerID: user {nft.OwnerID} does not exist")
+        if nft.CollectionID is not None and nft.CollectionID not in collections:
+            problems.append(f"CollectionID: collection {nft.CollectionID} does not exist")
+        if problems:
+            errors.append({"index": index, "errors": problems})
+        else:
+            valid.append((index, nft))
+
+    minted = []
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        params = []
+        for seq, (_, nft) in enumerate(chunk):
+            params.extend((seq, nft.Title, nft.Description, nft.CollectionID, nft.OwnerID))
+        try:
+            cursor.execute(_insert_sql(len(chunk)), params)
+            nft_ids = sorted(row[0] for row in cursor.fetchall())
+            cursor.connection.commit()
+        except Exception as e:
+            print(f"Error minting NFTs {chunk[0][0]}..{chunk[-1][0]}: {e}")
+            cursor.connection.rollback()
+            errors.extend({"index": index, "errors": [f"insert failed: {e}"]} for index, _ in chunk)
+            continue
+        minted.extend({"index": index, "NFTID": nft_id} for (index, _), nft_id in zip(chunk, nft_ids))
+
+    errors.sort(key=lambda error: error["index"])
+    return minted, errors
@@ -0,0 +1,168 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# (BidID, BidAmount, BidAt, BidderID) as stored in Bids
+BidRow = Tuple[int, float, str, int]
+
+# A relisted NFT gets its old ListingID back (create_listing), so the bids that count
+# are the ones of the listing's current Generation
+BIDS_QUERY = """
+SELECT b.BidID, b.BidAmount, b.BidAt, b.BidderID
+FROM Bids b INNER JOIN Listings l ON l.ListingID = b.ListingID AND l.Generation = b.Generation
+WHERE b.ListingID = ? AND b.BidID > ?
+"""
+
+
+class ListingBook:
+    """Bids on one listing, kept sorted by amount (highest first, then oldest BidID)."""
+
+    def __init__(self, listing_id: int):
+        self.listing_id = listing_id
+        self._lock = threading.Lock()
+        self._order: List[Tuple[float, int]] = []  # (-amount, BidID), ascending
+        self._bids: Dict[int, BidRow] = {}
+        self.last_bid_id = 0
+        self.synced_at = 0.0
+        self.loaded_at = 0.0
+
+    def add(self, rows) -> None:
+        with self._lock:
+            for bid_id, amount, bid_at, bidder_id in rows:
+                if bid_id in self._bids:
+                    continue
+                amount = float(amount)
+                self._bids[bid_id] = (bid_id, amount, str(bid_at), bidder_id)
+                bisect.insort(self._order, (-amount, bid_id))
+                self.last_bid_id = max(self.last_bid_id, bid_id)
+
+    def highest(self) -> Optional[BidRow]:
+        with self._lock:
+            return self._bids[self._order[0][1]] if self._order else None
+
+    def top(self, n: Optional[int] = None) -> List[BidRow]:
+        with self._lock:
+            keys = self._order if n is None else self._order[:n]
+            return [self._bids[bid_id] for _, bid_id in keys]
+
+    def since(self, bid_id: int) -> List[BidRow]:
+        # Bids with a higher BidID, oldest first
+        with self._lock:
+            return sorted(row for key, row in self._bids.items() if key > bid_id)
+
+    def count(self) -> int:
+        return len(self._bids)
+
+    def snapshot(self) -> Dict[int, float]:
+        with self._lock:
+            return {bid_id: row[1] for bid_id, row in self._bids.items()}
+
+
+class OrderBooks:
+    """Per-listing order books for the bid read paths.
+
+    A book is loaded from Bids on first use and then kept current: create_bid
+    adds its own bids directly, and bids placed through other workers are picked
+    up by a catch-up query at most every `sync_interval` seconds. Books are
+    reloaded in full after `max_age` seconds and the least recently used ones are
+    dropped beyond `max_books`, as are the cached NFTID -> active ListingID lookups.
+
+    BidIDs are handed out at insert, not at commit, so a bid can become visible
+    after one with a higher id. The catch-up therefore re-reads the last
+    `overlap` ids below the highest one the book has (bids it already has are
+    skipped). Bids placed through BidEngine commit in id order on any one listing,
+    since it locks the listing; a bid from another writer that commits more than
+    `overlap` ids late only shows after the next full reload.
+    """
+
+    def __init__(self, max_books: int = 10_000, sync_interval: float = 1.0, max_age: float = 600.0,
+                 overlap: int = 1000):
+        self.max_books = max_books
+        self.sync_interval = sync_interval
+        self.max_age = max_age
+        self.overlap = overlap
+        self._lock = threading.Lock()
+        self._books: "OrderedDict[int, ListingBook]" = OrderedDict()
+        self._active: "OrderedDict[int, Tuple[Optional[int], float]]" = OrderedDict()  # NFTID -> (ListingID, cached at)
+        self.loads = 0
+        self.catch_ups = 0
+
+    def active_listing(self, cursor, nft_id: int) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._active.get(nft_id)
+        if cached is not None and now - cached[1] < self.sync_interval:
+            return cached[0]
+        cursor.execute("SELECT ListingID FROM Listings WHERE NFTID = ? AND IsActive = 1", (nft_id,))
+        row = cursor.fetchone()
+        listing_id = row[0] if row else None
+        with self._lock:
+            self._active[nft_id] = (listing_id, now)
+            self._active.move_to_end(nft_id)
+            while len(self._active) > self.max_books:
+                self._active.popitem(last=False)
+        return listing_id
+
+    def book(self, cursor, listing_id: int) -> ListingBook:
+        now = time.monotonic()
+        with self._lock:
+            book = self._books.get(listing_id)
+            if book is not None:
+                self._books.move_to_end(listing_id)
+
+        if book is None or now - book.loaded_at >= self.max_age:
+            book = ListingBook(listing_id)
+            cursor.execute(BIDS_QUERY, (listing_id, 0))
+            book.add(cursor.fetchall())
+            book.loaded_at = book.synced_at = now
+            with self._lock:
+                self._books[listing_id] = book
+                self._books.move_to_end(listing_id)
+                while len(self._books) > self.max_books:
+                    self._books.popitem(last=False)
+                self.loads += 1
+        elif now - book.synced_at >= self.sync_interval:
+            cursor.execute(BIDS_QUERY, (listing_id, max(book.last_bid_id - self.overlap, 0)))
+            book.add(cursor.fetchall())
+            book.synced_at = now
+            self.catch_ups += 1
+        return book
+
+    def add_bid(self, listing_id: int, row: BidRow) -> None:
+        # Called by create_bid after commit; books not yet loaded pick it up on load
+        with self._lock:
+            book = self._books.get(listing_id)
+        if book is not None:
+            book.add([row])
+
+    def forget(self, listing_id: int, nft_id: Optional[int] = None) -> None:
+        # For listing changes (closing, relisting) made by this process
+        with self._lock:
+            self._books.pop(listing_id, None)
+            if nft_id is not None:
+                self._active.pop(nft_id, None)
+
+    def verify(self, cursor, listing_id: int) -> Dict[str, Any]:
+        # Consistency check of the in-memory book against Bids
+        book = self.book(cursor, listing_id)
+        cursor.execute(BIDS_QUERY, (listing_id, 0))
+        in_db = {row[0]: float(row[1]) for row in cursor.fetchall()}
+        in_memory = book.snapshot()
+        missing = sorted(set(in_db) - set(in_memory))
+        unexpected = sorted(set(in_memory) - set(in_db))
+        mismatched = sorted(b for b in set(in_db) & set(in_memory) if in_db[b] != in_memory[b])
+        return {
+            "ListingID": listing_id,
+            "consistent": not (missing or unexpected or mismatched),
+            "db_count": len(in_db),
+            "book_count": len(in_memory),
+            "missing": missing,
+            "unexpected": unexpected,
+            "mismatched": mismatched,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"books": len(self._books), "loads": self.loads, "catch_ups": self.catch_ups}
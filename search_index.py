@@ -0,0 +1,666 @@
+import bisect
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+_ENDS_IN_WORD = re.compile(r"\w$")
+
+# (NFTID, Title, Description, tag names) as indexed
+Document = Tuple[int, Optional[str], Optional[str], Sequence[str]]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class _Postings(NamedTuple):
+    docs: np.ndarray  # document slots, ascending
+    scores: np.ndarray  # BM25 contribution of this term to each document
+    order: Optional[np.ndarray]  # positions in descending score order, for common terms
+    max_score: float
+    df: int  # live documents as of the last merge
+    dense: Optional[np.ndarray]  # score by slot (0 if absent), for terms in most documents
+
+
+class _View(NamedTuple):
+    # A term as one query sees it: merged postings plus pending ones scored now
+    docs: np.ndarray
+    scores: np.ndarray
+    order: Optional[np.ndarray]
+    pending_docs: np.ndarray
+    pending_scores: np.ndarray
+    df: int
+    max_score: float
+    dense: Optional[np.ndarray]
+
+
+_EMPTY_DOCS = np.zeros(0, np.int32)
+_EMPTY_SCORES = np.zeros(0, np.float32)
+
+# Everything build() swaps in at once
+_STATE = (
+    "_size", "_slot_ids", "_lengths", "_alive", "_slot_of", "_live", "_total_length", "synced_through",
+    "_terms", "_vocab", "_vocab_df", "_pending", "_merging", "_pending_vocab", "_pending_count",
+    "_base_docs", "_base_scores", "_base_starts", "_base_df", "_base_max", "_base_order", "_base_dense", "built_at",
+)
+
+
+class SearchIndex:
+    """BM25 full-text index over NFT titles, descriptions and tags.
+
+    Each term's postings are numpy arrays of document slots with precomputed BM25
+    scores; terms in at least `impact_min` documents also keep a score-ordered
+    permutation so the best matches are read off the front instead of scoring
+    the whole list, and terms in at least `dense_share` of all NFTs a dense
+    score-by-slot array so matching against them is a lookup.
+
+    NFTs added after the build go to a pending list that is scored at query time.
+    Every `merge_every` NFTs the list is scored once and appended to the postings,
+    off the lock, by the thread whose add() filled it. Scores are fixed when a
+    posting is merged; build() recomputes them all with current statistics.
+    NFTs minted elsewhere are picked up by sync(); edits and tag changes made by
+    other workers show up after the next full load(), due every `max_age` seconds.
+
+    Queries match NFTs containing every word, the last one as a prefix
+    ("drag" finds "dragon") unless the query ends in a space. Title words count
+    `title_weight` times towards term frequency.
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.2,
+        b: float = 0.75,
+        title_weight: int = 2,
+        merge_every: int = 10_000,
+        min_prefix: int = 2,
+        max_expansions: int = 16,
+        impact_min: int = 4096,
+        dense_share: float = 0.1,
+        max_age: float = 3600.0,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.merge_every = merge_every
+        self.min_prefix = min_prefix
+        self.max_expansions = max_expansions
+        self.impact_min = impact_min
+        self.dense_share = dense_share
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.ready = False
+        self.merges = 0
+        self.searches = 0
+        self._generation = 0  # bumped by build() so a merge that started before it is dropped
+        self._building = False
+        self._backlog: List[Document] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._size = 0  # slots handed out; a re-indexed NFT gets a new slot
+        self._slot_ids = np.zeros(1024, np.int64)  # slot -> NFTID
+        self._lengths = np.zeros(1024, np.float32)
+        self._alive = np.zeros(1024, np.bool_)
+        self._slot_of = np.full(1024, -1, np.int32)  # NFTID -> slot
+        self._live = 0
+        self._total_length = 0
+        self.synced_through = 0  # highest NFTID read from the database by load() or sync()
+        # term -> postings, or the term's id in the _base_* arrays: build() keeps its
+        # postings in shared arrays because most terms (NFT numbers, names) are in
+        # one NFT and a million small arrays would cost more than the postings
+        self._terms: Dict[str, Union[int, _Postings]] = {}
+        self._base_docs, self._base_scores = _EMPTY_DOCS, _EMPTY_SCORES
+        self._base_starts = np.zeros(1, np.int64)
+        self._base_df = np.zeros(0, np.int64)
+        self._base_max = _EMPTY_SCORES
+        self._base_order: Dict[int, np.ndarray] = {}
+        self._base_dense: Dict[int, np.ndarray] = {}
+        self._vocab: List[str] = []  # merged terms, sorted, for prefix lookups
+        self._vocab_df = np.zeros(0, np.int64)
+        self._pending: Dict[str, List[Tuple[int, int]]] = {}  # term -> [(slot, tf)]
+        self._merging: Dict[str, List[Tuple[int, int]]] = {}  # pending entries a merge is working on
+        self._pending_vocab: List[str] = []  # pending terms not merged yet, sorted
+        self._pending_count = 0
+        self.built_at = 0.0
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > self.max_age
+
+    def _counts(self, title: Optional[str], description: Optional[str], tags: Sequence[str]) -> Counter:
+        counts = Counter(tokenize(description))
+        for tag in tags:
+            counts.update(tokenize(tag))
+        for term in tokenize(title):
+            counts[term] += self.title_weight
+        return counts
+
+    # --- building ---
+
+    def load(self, cursor, chunk_size: int = 5000) -> int:
+        """Builds the index from NFTs and NFT_Tags; returns the number of NFTs indexed."""
+        tags: Dict[int, List[str]] = {}
+        cursor.execute("""
+            SELECT nt.NFTID, t.TagName
+            FROM NFT_Tags nt
+            INNER JOIN Tags t ON nt.TagID = t.TagID
+        """)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for nft_id, tag in rows:
+                tags.setdefault(nft_id, []).append(tag)
+
+        def documents():
+            cursor.execute("SELECT NFTID, Title, Description FROM NFTs")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for nft_id, title, description in rows:
+                    yield nft_id, title, description, tags.get(nft_id, ())
+
+        return self.build(documents())
+
+    def sync(self, cursor) -> int:
+        """Indexes NFTs inserted since the last load() or sync(), e.g. by other workers.
+
+        Returns the number of NFTs added. NFTs this process already indexed are skipped.
+        """
+        after = self.synced_through
+        cursor.execute("SELECT NFTID, Title, Description FROM NFTs WHERE NFTID > ? ORDER BY NFTID", (after,))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        tags: Dict[int, List[str]] = {}
+        cursor.execute("""
+            SELECT nt.NFTID, t.TagName
+            FROM NFT_Tags nt
+            INNER JOIN Tags t ON nt.TagID = t.TagID
+            WHERE nt.NFTID > ?
+        """, (after,))
+        for nft_id, tag in cursor.fetchall():
+            tags.setdefault(nft_id, []).append(tag)
+
+        added = 0
+        for nft_id, title, description in rows:
+            if not self.indexed(nft_id):
+                self.add(nft_id, title, description, tags.get(nft_id, ()))
+                added += 1
+        with self._lock:
+            self.synced_through = max(self.synced_through, rows[-1][0])
+        return added
+
+    def indexed(self, nft_id: int) -> bool:
+        with self._lock:
+            return 0 <= nft_id < len(self._slot_of) and self._slot_of[nft_id] >= 0
+
+    def build(self, documents: Iterable[Document]) -> int:
+        """Replaces the index with `documents`; searches see the old index until it is done.
+
+        NFTs added while the build runs are replayed on top of it.
+        """
+        with self._lock:
+            self._building = True
+            self._backlog = []
+        try:
+            built = self._build(documents)
+        except Exception:
+            with self._lock:
+                self._building = False
+            raise
+
+        with self._lock:
+            for name in _STATE:
+                setattr(self, name, getattr(built, name))
+            self._generation += 1
+            self._building = False
+            for document in self._backlog:
+                self._add(*document)
+            self._backlog = []
+            self.ready = True
+            return self._live
+
+    def _build(self, documents: Iterable[Document]) -> "SearchIndex":
+        # Postings are collected as flat (term, slot, tf) columns and grouped with
+        # one sort, so a million NFTs don't need a Python list per term
+        built = SearchIndex(self.k1, self.b, self.title_weight, self.merge_every,
+                            self.min_prefix, self.max_expansions, self.impact_min, self.dense_share, self.max_age)
+
+        term_ids: Dict[str, int] = {}
+        term_col, slot_col, tf_col = array("i"), array("i"), array("H")
+        ids, lengths = array("q"), array("f")
+        for nft_id, title, description, tags in documents:
+            counts = built._counts(title, description, tags)
+            slot = len(ids)
+            ids.append(nft_id)
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(term_ids)
+                term_col.append(term_id)
+                slot_col.append(slot)
+                tf_col.append(min(tf, 65535))
+
+        count = len(ids)
+        built._grow(max(count, 1))
+        built._slot_ids[:count] = np.frombuffer(ids, np.int64) if count else 0
+        built._lengths[:count] = np.frombuffer(lengths, np.float32) if count else 0
+        built._alive[:count] = True
+        built._size = built._live = count
+        built._total_length = int(built._lengths[:count].sum())
+        if count:
+            max_id = built.synced_through = int(built._slot_ids[:count].max())
+            built._slot_of = np.full(max(max_id + 1, 1024), -1, np.int32)
+            built._slot_of[built._slot_ids[:count]] = np.arange(count)
+
+        if term_ids:
+            terms = np.frombuffer(term_col, np.int32)
+            grouped = np.argsort(terms, kind="stable")  # keeps slots ascending within a term
+            docs = np.frombuffer(slot_col, np.int32)[grouped]
+            tfs = np.frombuffer(tf_col, np.uint16)[grouped]
+            df = np.bincount(terms, minlength=len(term_ids))
+            scores = built._scores(docs, tfs, np.repeat(df, df))
+            starts = np.zeros(len(df) + 1, np.int64)
+            np.cumsum(df, out=starts[1:])
+            built._base_docs, built._base_scores = docs, scores
+            built._base_starts, built._base_df = starts, df
+            built._base_max = np.maximum.reduceat(scores, starts[:-1])
+            for term_id in np.flatnonzero(df >= built.impact_min):
+                start, end = starts[term_id], starts[term_id + 1]
+                postings = built._append(None, docs[start:end], scores[start:end], int(df[term_id]))
+                built._base_order[int(term_id)] = postings.order
+                if postings.dense is not None:
+                    built._base_dense[int(term_id)] = postings.dense
+            built._terms = term_ids
+            built._vocab = sorted(term_ids)
+            built._vocab_df = df[np.fromiter((term_ids[term] for term in built._vocab), np.int64, len(df))]
+        built.built_at = time.monotonic()
+        return built
+
+    # --- incremental updates ---
+
+    def add(self, nft_id: int, title: Optional[str], description: Optional[str], tags: Sequence[str] = ()) -> None:
+        """Indexes one NFT, replacing what was indexed for it before."""
+        with self._lock:
+            if self._building:
+                self._backlog.append((nft_id, title, description, tuple(tags)))
+            self._add(nft_id, title, description, tags)
+            merging = self._start_merge()
+        if merging:
+            self._merge(*merging)
+
+    def remove(self, nft_id: int) -> None:
+        with self._lock:
+            if self._building:
+                self._backlog.append((nft_id, None, None, ()))
+            self._remove(nft_id)
+
+    def _add(self, nft_id: int, title: Optional[str], description: Optional[str], tags: Sequence[str]) -> None:
+        self._remove(nft_id)
+        counts = self._counts(title, description, tags)
+        if not counts:
+            return
+        slot = self._size
+        self._grow(slot + 1)
+        if nft_id >= len(self._slot_of):
+            grown = np.full(max(nft_id + 1, 2 * len(self._slot_of)), -1, np.int32)
+            grown[:len(self._slot_of)] = self._slot_of
+            self._slot_of = grown
+        length = sum(counts.values())
+        self._slot_ids[slot] = nft_id
+        self._lengths[slot] = length
+        self._alive[slot] = True
+        self._slot_of[nft_id] = slot
+        self._size += 1
+        self._live += 1
+        self._total_length += length
+
+        for term, tf in counts.items():
+            entries = self._pending.get(term)
+            if entries is None:
+                entries = self._pending[term] = []
+                if term not in self._terms and term not in self._merging:
+                    bisect.insort(self._pending_vocab, term)
+            entries.append((slot, min(tf, 65535)))
+        self._pending_count += 1
+
+    def _remove(self, nft_id: int) -> None:
+        # Postings of removed slots stay in the arrays and are skipped at query time
+        if nft_id < 0 or nft_id >= len(self._slot_of):
+            return
+        slot = int(self._slot_of[nft_id])
+        if slot < 0:
+            return
+        self._slot_of[nft_id] = -1
+        self._alive[slot] = False
+        self._live -= 1
+        self._total_length -= int(self._lengths[slot])
+
+    def _grow(self, size: int) -> None:
+        if size <= len(self._slot_ids):
+            return
+        capacity = max(size, 2 * len(self._slot_ids))
+        for name in ("_slot_ids", "_lengths", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _start_merge(self):
+        # Hands the pending list to a merge if it is full and no merge or build is running
+        if self._pending_count < self.merge_every or self._merging or self._building:
+            return None
+        merging = (self._pending, self._pending_count, self._generation)
+        self._merging, self._pending, self._pending_count = self._pending, {}, 0
+        return merging
+
+    def _merge(self, merging: Dict[str, List[Tuple[int, int]]], count: int, generation: int) -> None:
+        # Runs without the lock: only merges replace postings and one runs at a
+        # time, and searches keep seeing `merging` as pending until it is swapped in
+        try:
+            merged, vocab, vocab_df = self._merged_postings(merging)
+        except Exception:
+            with self._lock:
+                if generation == self._generation:
+                    # Keep the entries pending (and searchable) for the next merge
+                    for term, entries in self._pending.items():
+                        merging.setdefault(term, []).extend(entries)
+                    self._pending = merging
+                    self._pending_count += count
+                self._merging = {}
+            raise
+
+        with self._lock:
+            if generation == self._generation:
+                self._terms.update(merged)
+                self._vocab, self._vocab_df = vocab, vocab_df
+                self._pending_vocab = sorted(term for term in self._pending if term not in self._terms)
+                self.merges += 1
+            self._merging = {}
+
+    def _merged_postings(self, merging: Dict[str, List[Tuple[int, int]]]):
+        # (postings by term, vocabulary, vocabulary dfs) with `merging` scored and appended
+        terms = list(merging)
+        sizes = np.fromiter((len(merging[term]) for term in terms), np.int64, len(terms))
+        total = int(sizes.sum())
+        slots = np.fromiter((slot for term in terms for slot, _ in merging[term]), np.int32, total)
+        tfs = np.fromiter((tf for term in terms for _, tf in merging[term]), np.uint16, total)
+        starts = np.zeros(len(terms) + 1, np.int64)
+        np.cumsum(sizes, out=starts[1:])
+
+        olds = [self._merged(term) for term in terms]
+        df = np.fromiter((old.df if old else 0 for old in olds), np.int64, len(terms))
+        df += np.add.reduceat(self._alive[slots].astype(np.int64), starts[:-1])
+        scores = self._scores(slots, tfs, np.repeat(df, sizes))
+        merged = {
+            term: self._append(old, slots[starts[i]:starts[i + 1]], scores[starts[i]:starts[i + 1]], int(df[i]))
+            for i, (term, old) in enumerate(zip(terms, olds))
+        }
+
+        vocab, vocab_df = self._vocab, self._vocab_df.copy()
+        for term, old in zip(terms, olds):
+            if old is not None:
+                vocab_df[bisect.bisect_left(vocab, term)] = merged[term].df
+        new_terms = sorted(term for term, old in zip(terms, olds) if old is None)
+        if new_terms:
+            at = [bisect.bisect_left(vocab, term) for term in new_terms]
+            vocab_df = np.insert(vocab_df, at, [merged[term].df for term in new_terms])
+            vocab = sorted(vocab + new_terms)  # two sorted runs; timsort merges them in linear time
+        return merged, vocab, vocab_df
+
+    # --- scoring ---
+
+    def _scores(self, docs: np.ndarray, tfs: np.ndarray, df) -> np.ndarray:
+        n = max(self._live, 1)
+        avgdl = max(self._total_length / n, 1.0)
+        df = np.asarray(df, np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        tf = tfs.astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / avgdl)
+        return (idf * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def _append(self, old: Optional[_Postings], docs: np.ndarray, scores: np.ndarray, df: int) -> _Postings:
+        # `docs` are newer than every slot in `old`, so appending keeps slots ascending
+        if old is not None:
+            new_docs, new_scores = docs, scores
+            docs, scores = np.concatenate((old.docs, docs)), np.concatenate((old.scores, scores))
+        order = None
+        if len(docs) >= self.impact_min:
+            if old is None or old.order is None:
+                order = np.argsort(-scores, kind="stable").astype(np.int32)
+            else:
+                # Insert the new postings into the existing score order
+                added = np.argsort(-new_scores, kind="stable")
+                at = np.searchsorted(-old.scores[old.order], -new_scores[added], side="right")
+                order = np.insert(old.order, at, (added + len(old.docs)).astype(np.int32))
+        dense = None
+        if order is not None and df >= self.dense_share * self._live:
+            dense = np.zeros(int(docs[-1]) + 1, np.float32)
+            if old is not None and old.dense is not None:
+                dense[:len(old.dense)] = old.dense
+                dense[new_docs] = new_scores
+            else:
+                dense[docs] = scores
+        max_score = float(scores.max()) if len(scores) else 0.0
+        return _Postings(docs, scores, order, max_score, df, dense)
+
+    def _merged(self, term: str) -> Optional[_Postings]:
+        entry = self._terms.get(term)
+        if entry is None or isinstance(entry, _Postings):
+            return entry
+        start, end = self._base_starts[entry], self._base_starts[entry + 1]
+        return _Postings(self._base_docs[start:end], self._base_scores[start:end], self._base_order.get(entry),
+                         float(self._base_max[entry]), int(self._base_df[entry]), self._base_dense.get(entry))
+
+    def _view(self, term: str) -> _View:
+        postings = self._merged(term)
+        # Entries being merged are older than the pending ones, so slots stay ascending
+        entries = self._merging.get(term, []) + self._pending.get(term, [])
+        if entries:
+            pending_docs = np.fromiter((slot for slot, _ in entries), np.int32, len(entries))
+            pending_tfs = np.fromiter((tf for _, tf in entries), np.uint16, len(entries))
+        else:
+            pending_docs, pending_tfs = _EMPTY_DOCS, np.zeros(0, np.uint16)
+        df = int(self._alive[pending_docs].sum()) + (postings.df if postings else 0)
+        pending_scores = self._scores(pending_docs, pending_tfs, df) if entries else _EMPTY_SCORES
+        max_score = max(postings.max_score if postings else 0.0,
+                        float(pending_scores.max()) if len(pending_scores) else 0.0)
+        if postings is None:
+            return _View(_EMPTY_DOCS, _EMPTY_SCORES, None, pending_docs, pending_scores, df, max_score, None)
+        return _View(postings.docs, postings.scores, postings.order, pending_docs, pending_scores, df, max_score,
+                     postings.dense)
+
+    def _expand(self, prefix: str) -> List[str]:
+        # The most frequent terms starting with `prefix`, merged or pending
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        lo, hi = bisect.bisect_left(self._vocab, prefix), bisect.bisect_left(self._vocab, upper)
+        if hi - lo > self.max_expansions:
+            top = np.argpartition(-self._vocab_df[lo:hi], self.max_expansions)[:self.max_expansions]
+            terms = [self._vocab[lo + int(i)] for i in top]
+        else:
+            terms = self._vocab[lo:hi]
+        lo, hi = bisect.bisect_left(self._pending_vocab, prefix), bisect.bisect_left(self._pending_vocab, upper)
+        return list(terms) + self._pending_vocab[lo:hi][:self.max_expansions]
+
+    # --- querying ---
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[Tuple[int, float]], bool]:
+        """Returns ([(NFTID, score)], more) for one page of results, best first."""
+        words = tokenize(query)
+        if not words or limit <= 0:
+            return [], False
+        last = words[-1] if _ENDS_IN_WORD.search(query) else None
+        k = offset + limit + 1  # one extra tells whether there is another page
+
+        with self._lock:
+            self.searches += 1
+            groups = []
+            for word in dict.fromkeys(words):
+                if word == last and len(word) >= self.min_prefix:
+                    terms = self._expand(word)
+                elif word in self._terms or word in self._pending or word in self._merging:
+                    terms = [word]
+                else:
+                    terms = []
+                if not terms:
+                    return [], False
+                groups.append([self._view(term) for term in terms])
+            alive, slot_ids = self._alive, self._slot_ids
+
+        if len(groups) == 1:
+            docs, scores = self._union(groups[0], k, alive)
+        else:
+            docs, scores = self._intersect(groups, k, alive)
+
+        ranked = np.lexsort((docs, -scores))[:k]
+        more = len(ranked) == k
+        page = ranked[offset:offset + limit]
+        return [(int(slot_ids[docs[i]]), round(float(scores[i]), 4)) for i in page], more
+
+    def _best(self, view: _View, k: int, alive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # At least k live matches of one term with the highest scores (all of them for rare terms)
+        if view.order is not None:
+            take = k
+            while True:
+                positions = view.order[:take]
+                docs = view.docs[positions]
+                keep = alive[docs]
+                if keep.sum() >= k or take >= len(view.order):
+                    break
+                take *= 4  # skip past removed NFTs
+            docs, scores = docs[keep], view.scores[positions][keep]
+        else:
+            keep = alive[view.docs]
+            docs, scores = view.docs[keep], view.scores[keep]
+            if len(docs) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                docs, scores = docs[top], scores[top]
+        keep = alive[view.pending_docs]
+        return (np.concatenate((docs, view.pending_docs[keep])),
+                np.concatenate((scores, view.pending_scores[keep])))
+
+    @staticmethod
+    def _dedupe(parts: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        # Concatenates (docs, scores) parts, keeping each doc's highest score
+        docs = np.concatenate([part[0] for part in parts])
+        scores = np.concatenate([part[1] for part in parts])
+        if len(parts) > 1:
+            by_doc = np.lexsort((-scores, docs))
+            docs, scores = docs[by_doc], scores[by_doc]
+            first = np.ones(len(docs), np.bool_)
+            first[1:] = docs[1:] != docs[:-1]
+            docs, scores = docs[first], scores[first]
+        return docs, scores
+
+    def _union(self, views: List[_View], k: int, alive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # A prefix matches a document through its best-scoring expansion; the top k of
+        # that maximum are always among the top k of some single expansion
+        return self._dedupe([self._best(view, k, alive) for view in views])
+
+    @staticmethod
+    def _lookup(views: List[_View], docs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # (matched, best score) of each doc in one word's expansions
+        matched = np.zeros(len(docs), np.bool_)
+        best = np.zeros(len(docs), np.float32)
+        for view in views:
+            if view.dense is not None:
+                # Slots past the end of the dense array are newer than its last merge
+                scores = view.dense[np.minimum(docs, len(view.dense) - 1)]
+                scores[docs >= len(view.dense)] = 0
+                matched |= scores > 0
+                np.maximum(best, scores, out=best)
+            for term_docs, term_scores in ((view.docs, view.scores), (view.pending_docs, view.pending_scores)):
+                if not len(term_docs) or view.dense is not None and term_docs is view.docs:
+                    continue
+                at = np.minimum(np.searchsorted(term_docs, docs), len(term_docs) - 1)
+                hit = term_docs[at] == docs
+                matched |= hit
+                np.maximum(best, np.where(hit, term_scores[at], 0), out=best)
+        return matched, best
+
+    def _top(self, parts: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        docs, scores = self._dedupe(parts)
+        if len(docs) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        return docs, scores
+
+    def _intersect(self, groups: List[List[_View]], k: int, alive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Every word must match. One word drives: its postings are checked against
+        # the other words with binary searches, most selective first. The driver is
+        # the word needing the fewest searches (its postings times the others'
+        # expansions); a prefix drives one expansion at a time, as in _union.
+        #
+        # Common terms are read in score order a block at a time, the other words'
+        # too, and walking stops once the k-th best beats the sum of the next unread
+        # scores (Fagin's threshold algorithm) or one word is used up.
+        views = sum(len(group) for group in groups)
+        driver = min(groups, key=lambda group: sum(view.df for view in group) * (views - len(group)))
+        others = sorted((group for group in groups if group is not driver),
+                        key=lambda group: sum(view.df for view in group))
+
+        def check(docs, scores, words):
+            keep = alive[docs]
+            docs, scores = docs[keep], scores[keep]
+            for group in words:
+                if not len(docs):
+                    break
+                matched, extra = self._lookup(group, docs)
+                docs, scores = docs[matched], scores[matched] + extra[matched]
+            return docs, scores
+
+        # Documents found through the driver carry its score; those found through
+        # another word are looked up in every word, the driver included
+        walking = [view for view in driver if view.order is not None]
+        helpers = [group[0] for group in others if len(group) == 1 and group[0].order is not None]
+        everything = [driver] + others
+        parts = [check(view.pending_docs, view.pending_scores, others) for view in driver]
+        parts += [check(view.docs, view.scores, others) for view in driver if view.order is None]
+        parts += [check(view.pending_docs, np.zeros(len(view.pending_docs), np.float32), everything)
+                  for view in helpers]
+        docs, scores = self._top(parts, k)
+
+        start, block = 0, max(4 * k, 1024)
+        while any(start < len(view.order) for view in walking):
+            parts = [(docs, scores)]
+            for view in walking:
+                positions = view.order[start:start + block]
+                parts.append(check(view.docs[positions], view.scores[positions], others))
+            for view in helpers:
+                found = view.docs[view.order[start:start + block]]
+                parts.append(check(found, np.zeros(len(found), np.float32), everything))
+            docs, scores = self._top(parts, k)
+            start += block
+            block *= 2
+
+            if any(start >= len(view.order) for view in helpers):
+                break  # every document of that word has been seen
+            threshold = max((float(view.scores[view.order[start]]) for view in walking
+                             if start < len(view.order)), default=0.0)
+            threshold += sum(float(view.scores[view.order[start]]) for view in helpers)
+            threshold += sum(max(view.max_score for view in group) for group in others
+                             if len(group) > 1 or group[0].order is None)
+            if len(docs) >= k and scores.min() >= threshold:
+                break
+        return docs, scores
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": self._live,
+                "terms": len(self._vocab) + len(self._pending_vocab),
+                "pending_documents": self._pending_count,
+                "synced_through": self.synced_through,
+                "age_seconds": round(time.monotonic() - self.built_at, 1) if self.ready else None,
+                "merges": self.merges,
+                "searches": self.searches,
+            }
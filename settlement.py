@@ -0,0 +1,229 @@
+import logging
+import threading
+from datetime import datetime
+from decimal import ROUND_DOWN, Decimal
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+CENT = Decimal("0.01")
+
+logger = logging.getLogger(__name__)
+
+# Outcome -> what happened to a due listing. Every outcome closes the listing
+OUTCOMES = {
+    "sold": "The highest bid bought the NFT",
+    "no_bids": "Closed without bids",
+    "unpaid": "The highest bidder's wallets no longer cover the bid",
+    "no_wallet": "The seller or the royalty's creator has no wallet to pay into",
+    "owner_changed": "The seller no longer owns the NFT",
+    "own_bid": "The highest bid is the seller's own",
+}
+
+DUE_QUERY = """
+SELECT TOP (?) ListingID FROM Listings
+WHERE IsActive = 1 AND EndsAt IS NOT NULL AND EndsAt <= CAST(? AS DATETIME)
+ORDER BY EndsAt, ListingID
+"""
+
+# A chunk's listings, winning bids and royalties in one round trip. The locks hold the
+# listings and NFTs until the chunk commits, and only listings still open are read,
+# so a chunk that is retried, or settled by another worker meanwhile, finds nothing
+# left to do. A relisted NFT gets its old ListingID back, so only bids of the listing's
+# current Generation count.
+# Result set 1: the listings still open, with their NFTs
+# Result set 2: their highest bids, oldest first where several share the top amount
+# Result set 3: the royalties on their NFTs
+CHUNK_BATCH = """
+SELECT l.ListingID, l.NFTID, l.SellerID, n.OwnerID, n.CollectionID
+FROM Listings l WITH (UPDLOCK, HOLDLOCK)
+INNER JOIN NFTs n WITH (UPDLOCK) ON n.NFTID = l.NFTID
+WHERE l.ListingID IN ({ids}) AND l.IsActive = 1;
+
+SELECT b.ListingID, b.BidderID, b.BidAmount
+FROM Bids b
+INNER JOIN Listings l ON l.ListingID = b.ListingID AND l.Generation = b.Generation
+WHERE b.ListingID IN ({ids})
+    AND b.BidAmount = (SELECT MAX(x.BidAmount) FROM Bids x WHERE x.ListingID = b.ListingID AND x.Generation = l.Generation)
+ORDER BY b.ListingID, b.BidID;
+
+SELECT r.NFTID, r.CreatorID, r.Percentage
+FROM Royalties r INNER JOIN Listings l ON l.NFTID = r.NFTID
+WHERE l.ListingID IN ({ids})
+"""
+
+WALLETS_QUERY = """
+SELECT WalletID, UserID, Balance FROM Wallets WITH (UPDLOCK, HOLDLOCK)
+WHERE UserID IN ({ids})
+ORDER BY UserID, WalletID
+"""
+
+
+class Settled(NamedTuple):
+    listing_id: int
+    nft_id: int
+    collection_id: Optional[int]
+    outcome: str  # An OUTCOMES key
+    buyer_id: Optional[int]
+    price: Optional[Decimal]
+
+
+def _money(value: Any) -> Decimal:
+    # pyodbc returns DECIMAL columns as Decimal; the SQLite stand-in as float
+    return value if isinstance(value, Decimal) else Decimal(str(value)).quantize(CENT)
+
+
+def royalty(price: Decimal, percentage: Decimal) -> Decimal:
+    # Rounded down to the cent; the seller gets the rest, so no cent is created or lost
+    return (price * percentage / 100).quantize(CENT, rounding=ROUND_DOWN)
+
+
+class AuctionSettlement:
+    """Closes auctions whose EndsAt has passed, in batches.
+
+    settle_due() picks up to `batch_size` due listings and settles them
+    `chunk_size` at a time, each chunk in one transaction: it locks the listings,
+    reads their highest bids, royalties and the wallets involved, works out every
+    payout of the chunk, and applies them together: Transactions rows, the
+    buyers' debits, sellers' and creators' credits (one UPDATE per wallet, net of
+    everything the chunk moves through it), NFTs.OwnerID and Listings.IsActive.
+    A chunk commits whole or not at all, and only open listings are read under
+    the locks, so running it again (a retry, or another worker) never pays twice.
+
+    A buyer is debited across their wallets in WalletID order, the total the bid
+    engine checked bids against; sellers and creators are credited to their first
+    wallet.
+    """
+
+    def __init__(self, batch_size: int = 1000, chunk_size: int = 100):
+        self.batch_size = batch_size
+        # Each chunk's IDs are query parameters; SQL Server allows 2100 per statement
+        self.chunk_size = min(chunk_size, 600)
+        self._lock = threading.Lock()
+        self.outcomes: Dict[str, int] = {outcome: 0 for outcome in OUTCOMES}
+        self.volume = Decimal(0)
+        self.chunks = 0
+        self.failed_chunks = 0
+
+    def due(self, cursor, now: Optional[datetime] = None) -> List[int]:
+        cursor.execute(DUE_QUERY, (self.batch_size, now or datetime.now()))
+        return [row[0] for row in cursor.fetchall()]
+
+    def settle_due(self, cursor, now: Optional[datetime] = None) -> List[Settled]:
+        """Settles the due listings found now; returns what happened to each.
+
+        A chunk that fails is rolled back, logged and left for the next call; the
+        chunks committed before it are still returned.
+        """
+        listing_ids = self.due(cursor, now)
+        settled: List[Settled] = []
+        for start in range(0, len(listing_ids), self.chunk_size):
+            chunk = listing_ids[start:start + self.chunk_size]
+            try:
+                settled.extend(self.settle(cursor, chunk))
+            except Exception as e:
+                cursor.connection.rollback()
+                logger.error("Error settling listings %d..%d: %s", chunk[0], chunk[-1], e)
+                with self._lock:
+                    self.failed_chunks += 1
+                break
+        return settled
+
+    def settle(self, cursor, listing_ids: Sequence[int]) -> List[Settled]:
+        """Settles `listing_ids` in one transaction, committing it; open listings only."""
+        placeholders = ", ".join("?" * len(listing_ids))
+        cursor.execute(CHUNK_BATCH.format(ids=placeholders), (*listing_ids, *listing_ids, *listing_ids))
+        listings = cursor.fetchall()
+        cursor.nextset()
+        winners: Dict[int, Tuple[int, Decimal]] = {}
+        for listing_id, bidder_id, amount in cursor.fetchall():
+            winners.setdefault(listing_id, (bidder_id, _money(amount)))
+        cursor.nextset()
+        royalties = {nft_id: (creator_id, _money(percentage)) for nft_id, creator_id, percentage in cursor.fetchall()}
+        if not listings:
+            cursor.connection.commit()
+            return []
+
+        users = set()
+        for listing_id, nft_id, seller_id, _, _ in listings:
+            if listing_id in winners:
+                users.update((seller_id, winners[listing_id][0]))
+                if nft_id in royalties:
+                    users.add(royalties[nft_id][0])
+        wallets: Dict[int, List[List[Any]]] = {}  # UserID -> [[WalletID, balance], ...]
+        if users:
+            ordered = sorted(users)
+            cursor.execute(WALLETS_QUERY.format(ids=", ".join("?" * len(ordered))), ordered)
+            for wallet_id, user_id, balance in cursor.fetchall():
+                wallets.setdefault(user_id, []).append([wallet_id, _money(balance or 0)])
+
+        settled, sales, owners, deltas = self._payouts(listings, winners, royalties, wallets)
+
+        cursor.execute(f"UPDATE Listings SET IsActive = 0 WHERE ListingID IN ({placeholders})", tuple(listing_ids))
+        if hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        if sales:
+            cursor.executemany("INSERT INTO Transactions (NFTID, BuyerID, SellerID, SalePrice) VALUES (?, ?, ?, ?)",
+                               sales)
+            cursor.executemany("UPDATE NFTs SET OwnerID = ? WHERE NFTID = ?", owners)
+            cursor.executemany("UPDATE Wallets SET Balance = Balance + ? WHERE WalletID = ?",
+                               [(delta, wallet_id) for wallet_id, delta in sorted(deltas.items()) if delta])
+        cursor.connection.commit()
+
+        with self._lock:
+            self.chunks += 1
+            for item in settled:
+                self.outcomes[item.outcome] += 1
+                if item.outcome == "sold":
+                    self.volume += item.price
+        return settled
+
+    @staticmethod
+    def _payouts(listings, winners, royalties, wallets):
+        # Every payout of a chunk, in ListingID order. Balances in `wallets` are updated
+        # as sales are decided, so a buyer winning several auctions pays for each in turn.
+        # Returns (settled, Transactions rows, owner changes, {WalletID: balance change})
+        settled: List[Settled] = []
+        sales, owners = [], []
+        deltas: Dict[int, Decimal] = {}
+        for listing_id, nft_id, seller_id, owner_id, collection_id in sorted(listings):
+            winner = winners.get(listing_id)
+            outcome, buyer_id, price = "sold", None, None
+            if winner is None:
+                outcome = "no_bids"
+            elif owner_id != seller_id:
+                outcome = "owner_changed"
+            elif winner[0] == seller_id:
+                # The bid engine turns these down; a sale to oneself would only pay the royalty
+                outcome = "own_bid"
+            else:
+                buyer_id, price = winner
+                creator = royalties.get(nft_id)
+                if seller_id not in wallets or (creator is not None and creator[0] not in wallets):
+                    outcome = "no_wallet"
+                elif sum(balance for _, balance in wallets.get(buyer_id, ())) < price:
+                    outcome = "unpaid"
+            if outcome != "sold":
+                settled.append(Settled(listing_id, nft_id, collection_id, outcome, None, None))
+                continue
+
+            owed = price
+            for wallet in wallets[buyer_id]:
+                debit = min(wallet[1], owed)
+                if debit > 0:
+                    wallet[1] -= debit
+                    deltas[wallet[0]] = deltas.get(wallet[0], Decimal(0)) - debit
+                    owed -= debit
+            cut = royalty(price, creator[1]) if creator is not None else Decimal(0)
+            for user_id, amount in ((seller_id, price - cut), (creator[0] if creator else None, cut)):
+                if user_id is not None and amount:
+                    wallet = wallets[user_id][0]
+                    wallet[1] += amount
+                    deltas[wallet[0]] = deltas.get(wallet[0], Decimal(0)) + amount
+            sales.append((nft_id, buyer_id, seller_id, price))
+            owners.append((buyer_id, nft_id))
+            settled.append(Settled(listing_id, nft_id, collection_id, "sold", buyer_id, price))
+        return settled, sales, owners, deltas
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"outcomes": dict(self.outcomes), "volume": float(self.volume),
+                    "chunks": self.chunks, "failed_chunks": self.failed_chunks}
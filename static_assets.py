@@ -0,0 +1,200 @@
+"""Fingerprinted, precompressed static assets.
+
+The build step writes, next to each asset under the static directory, a copy
+named after a hash of its content (css/style.css -> css/style.1a2b3c4d5e.css),
+gzip (.gz) and, when the `brotli` package is installed, brotli (.br) variants
+of the text assets, and a manifest.json recording both:
+
+    python static_assets.py static/
+
+StaticAssets serves the directory like StaticFiles, but picks the smallest
+precompressed variant the client accepts and marks fingerprinted files as
+immutable for a year. Templates link assets through `static_url("css/style.css")`,
+so changing a file changes its URL. Without a manifest (no build yet) assets
+are served as they are, revalidated on every load.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import stat
+from typing import Callable, Dict, List, Optional, Sequence
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST = "manifest.json"
+HASH_LENGTH = 10
+COMPRESSIBLE = {".css", ".js", ".mjs", ".html", ".svg", ".json", ".map", ".txt", ".xml"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred first; the suffix is appended to the served file name
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_FINGERPRINTED = re.compile(rf"\.[0-9a-f]{{{HASH_LENGTH}}}(\.[^./]+)?$")
+
+
+def build(directory: str, out: Callable[[str], None] = print) -> Dict[str, object]:
+    """Fingerprints and precompresses every asset under `directory`; returns the manifest.
+
+    Safe to rerun: earlier outputs are skipped as inputs, and files whose content
+    did not change keep their fingerprint and are not rewritten.
+    """
+    files: Dict[str, str] = {}
+    encodings: Dict[str, List[str]] = {}
+    for source in _sources(directory):
+        with open(os.path.join(directory, source), "rb") as f:
+            content = f.read()
+        stem, ext = os.path.splitext(source)
+        fingerprinted = f"{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+        _write_if_changed(os.path.join(directory, fingerprinted), content)
+        files[source] = fingerprinted
+
+        if ext.lower() not in COMPRESSIBLE:
+            continue
+        variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(content, quality=11)
+        for name in (source, fingerprinted):
+            kept = []
+            for encoding, suffix in ENCODINGS:
+                data = variants.get(encoding)
+                # Only worth serving when it actually saves bytes
+                if data is not None and len(data) < len(content):
+                    _write_if_changed(os.path.join(directory, name + suffix), data)
+                    kept.append(encoding)
+            if kept:
+                encodings[name] = kept
+        out(f"{source} -> {fingerprinted} ({len(content):,} bytes; "
+            + ", ".join(f"{e} {len(variants[e]):,}" for e in encodings.get(source, [])) + ")")
+
+    manifest = {"files": files, "encodings": encodings}
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    if brotli is None:
+        out("brotli is not installed; wrote gzip variants only")
+    return manifest
+
+
+def _sources(directory: str) -> List[str]:
+    sources = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+            if path == MANIFEST or path.endswith((".gz", ".br")) or _FINGERPRINTED.search(path):
+                continue
+            sources.append(path)
+    return sorted(sources)
+
+
+def _write_if_changed(path: str, data: bytes) -> None:
+    # Rewriting would bump the mtime, and with it the ETag, of an unchanged file
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return
+    except FileNotFoundError:
+        pass
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class StaticAssets(StaticFiles):
+    """StaticFiles that serves the build's precompressed and fingerprinted files."""
+
+    def __init__(self, directory: str, prefix: str = "/static", **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.prefix = prefix.rstrip("/")
+        self.files: Dict[str, str] = {}
+        self.encodings: Dict[str, List[str]] = {}
+        try:
+            with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.files = manifest.get("files", {})
+            self.encodings = manifest.get("encodings", {})
+        except FileNotFoundError:
+            pass
+        self._immutable = set(self.files.values())
+
+    def url(self, path: str) -> str:
+        # Template helper: the fingerprinted URL of an asset, or its plain one before a build
+        path = path.lstrip("/")
+        return f"{self.prefix}/{self.files.get(path, path)}"
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        name = path.replace(os.sep, "/")
+        response = None
+        available = self.encodings.get(name)
+        if available and scope["method"] in ("GET", "HEAD"):
+            encoding = _negotiate(Headers(scope=scope).get("accept-encoding", ""), available)
+            if encoding is not None:
+                response = await self._encoded_response(path, name, encoding, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE if name in self._immutable else REVALIDATE
+            if available:
+                response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _encoded_response(self, path: str, name: str, encoding: str, scope: Scope) -> Optional[Response]:
+        suffix = dict(ENCODINGS)[encoding]
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            return None
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        response = FileResponse(
+            full_path,
+            stat_result=stat_result,
+            method=scope["method"],
+            media_type=media_type,
+            headers={"Content-Encoding": encoding},
+        )
+        # The ETag is that of the compressed file, so each encoding validates separately
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def _negotiate(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    # First of `available` (smallest first) the client accepts with a non-zero q-value
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the MetaMood static assets.")
+    parser.add_argument("directory", nargs="?", default="static", help="static directory (default: static)")
+    args = parser.parse_args(argv)
+    manifest = build(args.directory)
+    print(f"{len(manifest['files'])} assets; manifest written to {os.path.join(args.directory, MANIFEST)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class TableVersions:
+    """Change counters from Table_Versions, for ETags and version-checked caches.
+
+    Writers call bump() with their cursor before committing, so a table's version
+    moves in the same transaction as its rows, whichever worker wrote them.
+    Readers get the version from cached() without touching the database for up to
+    `ttl` seconds after the last load(), a primary-key lookup. After committing a
+    bump, invalidate() makes this worker's next read load the new version at once;
+    other workers see it within `ttl`.
+    """
+
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self.hits = 0
+        self.loads = 0
+
+    def cached(self, table: str) -> Optional[int]:
+        with self._lock:
+            entry = self._versions.get(table)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def load(self, cursor, table: str) -> int:
+        cursor.execute("SELECT Version FROM Table_Versions WHERE TableName = ?", (table,))
+        row = cursor.fetchone()
+        if row is None:
+            raise LookupError(f"Table_Versions has no row for {table}")
+        version = int(row[0])
+        with self._lock:
+            self._versions[table] = (version, time.monotonic() + self.ttl)
+            self.loads += 1
+        return version
+
+    def bump(self, cursor, table: str) -> None:
+        cursor.execute("UPDATE Table_Versions SET Version = Version + 1 WHERE TableName = ?", (table,))
+
+    def invalidate(self, table: str) -> None:
+        with self._lock:
+            self._versions.pop(table, None)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"tables": {table: version for table, (version, _) in self._versions.items()},
+                    "hits": self.hits, "loads": self.loads}
@@ -0,0 +1,46 @@
+# The tests run against the SQLite stand-in from benchmarks/ (no SQL Server needed)
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+import standin  # noqa: E402
+from migrate import migrate  # noqa: E402
+
+
+def seeded_database(path):
+    # metamood_tables.sql with its seed rows, migrated to the latest version
+    standin.create_schema(path)
+    conn = standin.connect(path)
+    migrate(conn, out=lambda line: None)
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def database(tmp_path):
+    return seeded_database(str(tmp_path / "metamood.db"))
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    # main.app on its own seeded stand-in database, started up once for the session
+    from fastapi.testclient import TestClient
+    from load_test import prepare_app_dir
+
+    workdir = tmp_path_factory.mktemp("app")
+    os.environ["METAMOOD_DB_FACTORY"] = "standin:connect_from_env"
+    os.environ["STANDIN_DB"] = seeded_database(str(workdir / "metamood.db"))
+    prepare_app_dir(str(workdir))
+    cwd = os.getcwd()
+    os.chdir(workdir)  # main.py serves templates/ and static/ relative to it
+    try:
+        import main
+        with TestClient(main.app) as test_client:
+            yield test_client
+    finally:
+        os.chdir(cwd)
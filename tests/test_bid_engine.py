@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+
+import standin
+from bid_engine import BidEngine
+from db_pool import ConnectionPool
+
+
+def add_bidder(raw, name, balance):
+    user_id = raw.execute("INSERT INTO Users (Username, Email) VALUES (?, ?)", (name, f"{name}@example.com")).lastrowid
+    raw.execute("INSERT INTO Wallets (UserID, PublicKey, Balance) VALUES (?, ?, ?)", (user_id, f"key-{name}", balance))
+    return user_id
+
+
+def test_batch_with_too_low_and_insufficient_funds_bids(database):
+    raw = standin.connect(database).raw
+    listing_id, seller_id = raw.execute("SELECT ListingID, SellerID FROM Listings WHERE NFTID = 28").fetchone()
+    highest = raw.execute("SELECT MAX(BidAmount) FROM Bids WHERE ListingID = ?", (listing_id,)).fetchone()[0]
+    rich = add_bidder(raw, "rich_bidder", 100_000)
+    poor = add_bidder(raw, "poor_bidder", 5)
+    raw.commit()
+
+    engine = BidEngine(ConnectionPool(lambda: standin.connect(database)))
+    futures = [
+        engine.submit(listing_id, rich, highest + 10),
+        engine.submit(listing_id, rich, highest + 5),  # Below the bid just accepted
+        engine.submit(listing_id, poor, highest + 20),
+        engine.submit(listing_id, seller_id, highest + 30),
+        engine.submit(listing_id, rich, highest + 40),
+    ]
+    assert engine.process() == 5  # One listing, so one batch
+    results = [future.result() for future in futures]
+
+    assert [result.reason for result in results] == [None, "too_low", "insufficient_funds", "own_listing", None]
+    assert [result.highest for result in results] == [highest + 10] * 4 + [highest + 40]
+    accepted = [result.row[0] for result in results if result.accepted]
+    rows = raw.execute(f"SELECT BidID, BidderID, BidAmount FROM Bids WHERE BidID IN ({', '.join('?' * len(accepted))})",
+                       accepted).fetchall()
+    assert sorted(rows) == sorted(zip(accepted, [rich, rich], [highest + 10, highest + 40]))
+    stats = engine.stats()
+    assert (stats["accepted"], stats["batches"]) == (2, 1)
+    assert stats["rejected"] == {"not_listed": 0, "own_listing": 1, "too_low": 1, "insufficient_funds": 1}
+
+
+def test_failed_batch_is_logged_and_counted(caplog):
+    def connect():
+        raise ConnectionError("database unreachable")
+
+    engine = BidEngine(ConnectionPool(connect))
+    future = engine.submit(1, 2, 10)
+    with caplog.at_level(logging.ERROR, logger="bid_engine"):
+        assert engine.process() == 1
+    with pytest.raises(ConnectionError):
+        future.result()
+    assert engine.stats()["failed_batches"] == 1
+    assert "Error committing 1 bids: database unreachable" in caplog.text
+
+
+def test_failed_batches_are_in_metrics(client):
+    text = client.get("/metrics").text
+    assert "# TYPE metamood_bid_batches_failed_total counter" in text
+    assert "\nmetamood_bid_batches_failed_total 0\n" in text
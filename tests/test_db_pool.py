@@ -0,0 +1,32 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+def test_waiter_woken_by_close_does_not_get_a_connection():
+    pool = ConnectionPool(lambda: sqlite3.connect(":memory:", check_same_thread=False), max_size=1, timeout=5)
+    held = pool.acquire()
+    outcome = []
+
+    def wait_for_connection():
+        try:
+            outcome.append(pool.acquire())
+        except PoolTimeout as e:
+            outcome.append(e)
+
+    waiter = threading.Thread(target=wait_for_connection)
+    waiter.start()
+    while pool.stats()["waiting"] == 0:
+        time.sleep(0.001)
+    pool.close()
+    pool.release(held)  # Frees the only slot right after close() woke the waiter
+    waiter.join(5)
+
+    assert len(outcome) == 1 and isinstance(outcome[0], PoolTimeout)
+    assert pool.stats()["in_use"] == 0
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+
+import pytest
+
+import db_router
+from db_router import ReplicaRouter
+
+
+class FakePool:
+    # Hands out its own name as the connection
+    max_size = 1
+
+    def __init__(self, name):
+        self.name = name
+
+    @contextmanager
+    def connection(self, timeout=None):
+        yield self.name
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def router():
+    clock = Clock()
+    router = ReplicaRouter(FakePool("primary"), [("replica", FakePool("replica"))], max_lag=10, clock=clock)
+    router.replicas[0].position = 99_000  # One second behind
+    token = db_router._reads_after.set(0)  # A GET without the write cookie, as RoutingMiddleware marks it
+    yield router
+    db_router._reads_after.reset(token)
+
+
+def served(router):
+    with router.connection() as conn:
+        return conn
+
+
+def test_shared_reads_wait_for_the_last_local_write(router):
+    assert served(router) == "replica"
+    with router.shared_reads():
+        assert served(router) == "replica"
+
+    router.wrote(99_500)  # Committed after the replica's position
+    assert served(router) == "replica"  # Other reads still may lag
+    with router.shared_reads():
+        assert served(router) == "primary"
+
+    router.replicas[0].position = 99_600
+    with router.shared_reads():
+        assert served(router) == "replica"
+
+
+def test_shared_reads_outside_a_read_request(router):
+    token = db_router._reads_after.set(None)
+    try:
+        with router.shared_reads():
+            assert served(router) == "primary"
+    finally:
+        db_router._reads_after.reset(token)
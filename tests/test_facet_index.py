@@ -0,0 +1,97 @@
+import random
+from collections import Counter
+
+import pytest
+
+from facet_index import FacetIndex
+
+CATEGORIES = range(1, 6)
+COLLECTIONS = range(1, 40)
+TAGS = range(1, 30)
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    # A random catalog, and the same data as a FacetIndex
+    rng = random.Random(5)
+    category_of = {c: rng.choice([None, *CATEGORIES]) for c in COLLECTIONS}
+    nfts = {i: rng.choice([None, *COLLECTIONS]) for i in range(1, 3001)}
+    tags = {i: set(rng.sample(TAGS, rng.randint(0, 3))) for i in nfts}
+    prices = {i: round(rng.uniform(1, 100), 2) for i in nfts if rng.random() < 0.3}
+
+    index = FacetIndex()
+    index.build([(c, f"Category {c}") for c in CATEGORIES],
+                [(c, f"Collection {c}", category_of[c]) for c in COLLECTIONS],
+                [(t, f"tag{t}") for t in TAGS],
+                list(nfts.items()),
+                [value for nft_id in nfts for tag_id in sorted(tags[nft_id]) for value in (nft_id, tag_id)],
+                list(prices.items()))
+    return index, category_of, nfts, tags, prices
+
+
+def brute_force(catalog, categories, collections, tags, min_price, max_price, listed):
+    # (matching NFTIDs, {facet: Counter of values over the NFTs matching the other filters},
+    #  prices of the listed NFTs matching every filter but the price's)
+    _, category_of, nfts, nft_tags, prices = catalog
+    if min_price is not None or max_price is not None:
+        listed = True
+
+    def passes(nft_id, skip=None):
+        if skip == "price":
+            return passes_facets(nft_id)
+        price = prices.get(nft_id)
+        if not passes_facets(nft_id, skip):
+            return False
+        if listed is not None and (price is not None) != listed:
+            return False
+        if price is not None and ((min_price is not None and price < min_price)
+                                  or (max_price is not None and price > max_price)):
+            return False
+        return True
+
+    def passes_facets(nft_id, skip=None):
+        collection = nfts[nft_id]
+        if categories and skip != "category" and category_of.get(collection) not in categories:
+            return False
+        if collections and skip != "collection" and collection not in collections:
+            return False
+        if tags and skip != "tag" and not nft_tags[nft_id] & set(tags):
+            return False
+        return True
+
+    counts = {
+        "categories": Counter(category_of.get(nfts[i]) for i in nfts if passes(i, "category")),
+        "collections": Counter(nfts[i] for i in nfts if passes(i, "collection")),
+        "tags": Counter(t for i in nfts if passes(i, "tag") for t in nft_tags[i]),
+    }
+    for counter in counts.values():
+        counter.pop(None, None)
+    listed_prices = [prices[i] for i in nfts if i in prices and passes(i, "price")]
+    return sorted((i for i in nfts if passes(i)), reverse=True), counts, listed_prices
+
+
+def test_facet_counts_match_brute_force(catalog):
+    index = catalog[0]
+    rng = random.Random(11)
+    for _ in range(300):
+        # Mostly two or three filtered facets, each counted without its own filter
+        query = dict(
+            categories=rng.sample(CATEGORIES, rng.choice([0, 1, 2])),
+            collections=rng.sample(COLLECTIONS, rng.choice([0, 1, 5, 15])),
+            tags=rng.sample(TAGS, rng.choice([0, 1, 2, 8])),
+            min_price=rng.choice([None, 20.0]),
+            max_price=rng.choice([None, 70.0]),
+            listed=rng.choice([None, None, True, False]),
+        )
+        if query["min_price"] is not None or query["max_price"] is not None:
+            query["listed"] = None if query["listed"] is False else query["listed"]
+        results, total, facets = index.browse(**query, limit=10, facet_values=100)
+        matching, counts, listed_prices = brute_force(catalog, **query)
+
+        assert total == len(matching), query
+        assert [nft_id for nft_id, _ in results] == matching[:10], query
+        for facet, expected in counts.items():
+            got = {value["id"]: value["count"] for value in facets[facet] if value["count"]}
+            assert got == dict(expected), (facet, query)
+        assert facets["price"] == {"listed": len(listed_prices), "min": min(listed_prices, default=None),
+                                   "max": max(listed_prices, default=None)}, query
@@ -0,0 +1,17 @@
+import standin
+from migrate import applied, migrate
+
+
+def test_database_at_0009_picks_up_later_migrations(tmp_path):
+    path = str(tmp_path / "metamood.db")
+    standin.create_schema(path)
+    conn = standin.connect(path)
+    migrate(conn, target=9, out=lambda line: None)
+    assert max(applied(conn)) == 9
+
+    ran = migrate(conn, out=lambda line: None)
+    assert (10, "up") in ran
+    assert max(applied(conn)) == max(version for version, _ in ran)
+    views = dict(conn.raw.execute("SELECT NFTID, COUNT(*) FROM NFT_Views GROUP BY NFTID").fetchall())
+    assert views
+    assert dict(conn.raw.execute("SELECT NFTID, ViewCount FROM NFT_View_Counts").fetchall()) == views
@@ -0,0 +1,63 @@
+import os
+
+import standin
+from order_book import OrderBooks
+
+
+def listing_of(cursor, nft_id):
+    cursor.execute("SELECT ListingID, SellerID FROM Listings WHERE NFTID = ?", (nft_id,))
+    return cursor.fetchone()
+
+
+def test_bids_older_than_listed_at_count(database):
+    # Seed bid 36 on NFT 28 is dated before the listing's ListedAt
+    cursor = standin.connect(database).cursor()
+    listing_id, _ = listing_of(cursor, 28)
+    book = OrderBooks().book(cursor, listing_id)
+    assert 490.0 in [row[1] for row in book.top()]
+    assert OrderBooks().verify(cursor, listing_id)["db_count"] == book.count()
+
+
+def test_catch_up_rereads_bids_committed_out_of_order(database):
+    conn = standin.connect(database)
+    cursor = conn.cursor()
+    listing_id, _ = listing_of(cursor, 28)
+    books = OrderBooks(sync_interval=0)
+    books.book(cursor, listing_id)
+    cursor.execute("SELECT MAX(BidID) FROM Bids")
+    last = cursor.fetchone()[0]
+
+    insert = "INSERT INTO Bids (BidID, ListingID, BidderID, BidAmount, BidAt) VALUES (?, ?, 4, ?, GETDATE())"
+    cursor.execute(insert, (last + 10, listing_id, 900.0))
+    conn.commit()
+    assert books.book(cursor, listing_id).last_bid_id == last + 10
+    # Took its id first but committed second
+    cursor.execute(insert, (last + 5, listing_id, 800.0))
+    conn.commit()
+    assert books.verify(cursor, listing_id)["consistent"]
+
+
+def test_relisting_drops_the_earlier_bids(client):
+    cursor = standin.connect(os.environ["STANDIN_DB"]).cursor()
+    listing_id, _ = listing_of(cursor, 28)
+    cursor.execute("SELECT OwnerID FROM NFTs WHERE NFTID = 28")
+    seller_id = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT u.Username FROM Users u INNER JOIN Wallets w ON w.UserID = u.UserID
+        WHERE u.UserID <> ? ORDER BY w.Balance DESC
+    """, (seller_id,))
+    bidder = cursor.fetchone()[0]
+    assert client.get("/api/nfts/28/bids").json()
+
+    assert client.delete(f"/api/listings/{listing_id}").status_code == 200
+    response = client.post("/api/listings", json={"NFTID": 28, "SellerID": seller_id, "Price": 500})
+    assert response.json()["listing_id"] == listing_id
+    assert client.get("/api/nfts/28/bids").json() == []
+
+    response = client.post("/api/bids", json={"NFTID": 28, "BidderUsername": bidder, "BidAmount": 1})
+    assert response.status_code == 200, response.text
+    assert [bid["BidAmount"] for bid in client.get("/api/nfts/28/bids").json()] == [1.0]
+
+    # Repricing an open listing keeps its bids
+    client.post("/api/listings", json={"NFTID": 28, "SellerID": seller_id, "Price": 450})
+    assert [bid["BidAmount"] for bid in client.get("/api/nfts/28/bids").json()] == [1.0]
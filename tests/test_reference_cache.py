@@ -0,0 +1,33 @@
+import time
+
+
+def reference_stats(client):
+    return client.get("/api/cache").json()["reference"]
+
+
+def test_new_category_is_listed_on_the_next_read(client):
+    client.get("/api/categories")
+    hits = reference_stats(client)["hits"]
+    before = client.get("/api/categories").json()
+    assert reference_stats(client)["hits"] > hits  # Served from the cache
+
+    name = f"Test category {time.time()}"
+    response = client.post("/api/categories", json={"CategoryName": name})
+    assert response.status_code == 200, response.text
+
+    after = client.get("/api/categories").json()
+    assert name not in [row["CategoryName"] for row in before]
+    assert name in [row["CategoryName"] for row in after]
+
+
+def test_new_collection_is_listed_on_the_next_read(client):
+    client.get("/api/collections")
+    hits = reference_stats(client)["hits"]
+    client.get("/api/collections")
+    assert reference_stats(client)["hits"] > hits
+
+    name = f"Test collection {time.time()}"
+    response = client.post("/api/collections", json={"CollectionName": name, "CreatorID": 1, "CategoryID": 1})
+    assert response.status_code == 200, response.text
+
+    assert name in [row["CollectionName"] for row in client.get("/api/collections").json()]
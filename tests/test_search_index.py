@@ -0,0 +1,22 @@
+import standin
+from search_index import SearchIndex
+
+
+def test_rebuild_picks_up_edits_made_elsewhere(database):
+    conn = standin.connect(database)
+    index = SearchIndex(max_age=3600)
+    assert index.expired()
+    index.load(conn.cursor())
+    assert not index.expired()
+    assert index.stats()["age_seconds"] is not None
+
+    # Another worker renames NFT 1; sync() only picks up new NFTs
+    conn.raw.execute("UPDATE NFTs SET Title = 'Zyzzyva' WHERE NFTID = 1")
+    conn.raw.commit()
+    index.sync(conn.cursor())
+    assert index.search("zyzzyva")[0] == []
+
+    index.max_age = 0
+    assert index.expired()
+    index.load(conn.cursor())
+    assert [nft_id for nft_id, _ in index.search("zyzzyva")[0]] == [1]
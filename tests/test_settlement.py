@@ -0,0 +1,83 @@
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import standin
+from settlement import AuctionSettlement, Settled
+
+
+def add_user(raw, name, balances):
+    user_id = raw.execute("INSERT INTO Users (Username, Email) VALUES (?, ?)", (name, f"{name}@example.com")).lastrowid
+    for i, balance in enumerate(balances):
+        raw.execute("INSERT INTO Wallets (UserID, PublicKey, Balance) VALUES (?, ?, ?)", (user_id, f"key-{name}-{i}", balance))
+    return user_id
+
+
+def add_auction(raw, seller_id, title):
+    nft_id = raw.execute("INSERT INTO NFTs (Title, OwnerID) VALUES (?, ?)", (title, seller_id)).lastrowid
+    ends_at = datetime.now() - timedelta(minutes=1)
+    listing_id = raw.execute("INSERT INTO Listings (NFTID, SellerID, Price, IsActive, EndsAt) VALUES (?, ?, 50, 1, ?)",
+                             (nft_id, seller_id, ends_at)).lastrowid
+    return nft_id, listing_id
+
+
+def balances(raw, user_id):
+    # The stand-in keeps DECIMAL columns as floats
+    return [round(row[0], 2) for row in raw.execute("SELECT Balance FROM Wallets WHERE UserID = ? ORDER BY WalletID", (user_id,))]
+
+
+def test_sale_splits_the_royalty_and_debits_several_wallets(database):
+    raw = standin.connect(database).raw
+    seller = add_user(raw, "auction_seller", [0])
+    creator = add_user(raw, "auction_creator", [0])
+    buyer = add_user(raw, "auction_buyer", [30, 100])
+    nft_id, listing_id = add_auction(raw, seller, "Sold at auction")
+    raw.execute("INSERT INTO Royalties (NFTID, CreatorID, Percentage) VALUES (?, ?, 7.5)", (nft_id, creator))
+    raw.executemany("INSERT INTO Bids (ListingID, BidderID, BidAmount, BidAt) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                    [(listing_id, buyer, 99.99), (listing_id, buyer, 120.33)])
+    unsold_nft, unsold_listing = add_auction(raw, seller, "No bids")
+    raw.commit()
+
+    settlement = AuctionSettlement()
+    settled = settlement.settle_due(standin.connect(database).cursor())
+
+    assert settled == [
+        Settled(listing_id, nft_id, None, "sold", buyer, Decimal("120.33")),
+        Settled(unsold_listing, unsold_nft, None, "no_bids", None, None),
+    ]
+    # 7.5% of 120.33 is 9.02475, rounded down to the cent; the seller gets the rest
+    assert balances(raw, creator) == [9.02]
+    assert balances(raw, seller) == [111.31]
+    # Debited in WalletID order: the first wallet is emptied, the second pays the rest
+    assert balances(raw, buyer) == [0, 9.67]
+    assert raw.execute("SELECT OwnerID FROM NFTs WHERE NFTID = ?", (nft_id,)).fetchone()[0] == buyer
+    assert raw.execute("SELECT BuyerID, SellerID, SalePrice FROM Transactions WHERE NFTID = ?",
+                       (nft_id,)).fetchall() == [(buyer, seller, 120.33)]
+    assert raw.execute("SELECT COUNT(*) FROM Listings WHERE ListingID IN (?, ?) AND IsActive = 1",
+                       (listing_id, unsold_listing)).fetchone()[0] == 0
+    assert settlement.stats()["outcomes"]["sold"] == 1
+    assert settlement.settle_due(standin.connect(database).cursor()) == []
+
+
+def test_failed_chunk_is_rolled_back_logged_and_counted(database, caplog):
+    raw = standin.connect(database).raw
+    seller = add_user(raw, "auction_seller", [0])
+    _, listing_id = add_auction(raw, seller, "Unsettled")
+    raw.commit()
+
+    settlement = AuctionSettlement()
+
+    def fail(cursor, listing_ids):
+        cursor.execute("UPDATE Listings SET IsActive = 0 WHERE ListingID = ?", (listing_ids[0],))
+        raise ConnectionError("connection lost")
+
+    settlement.settle = fail
+    with caplog.at_level(logging.ERROR, logger="settlement"):
+        assert settlement.settle_due(standin.connect(database).cursor()) == []
+    assert f"Error settling listings {listing_id}..{listing_id}: connection lost" in caplog.text
+    assert settlement.stats()["failed_chunks"] == 1
+    assert raw.execute("SELECT IsActive FROM Listings WHERE ListingID = ?", (listing_id,)).fetchone()[0] == 1
+
+
+def test_failed_chunks_are_in_metrics(client):
+    assert "\nmetamood_settlement_chunks_failed_total 0\n" in client.get("/metrics").text
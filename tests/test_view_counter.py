@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import standin
+from db_pool import ConnectionPool
+from view_counter import ViewCounter
+
+
+def test_flush_deletes_batch_ids_past_the_retry_horizon(database):
+    raw = standin.connect(database).raw
+    now = datetime.now()
+    raw.executemany("INSERT INTO NFT_View_Flushes (BatchID, FlushedAt) VALUES (?, ?)",
+                    [("old", now - timedelta(hours=3)), ("recent", now - timedelta(hours=1))])
+    raw.commit()
+
+    counter = ViewCounter(ConnectionPool(lambda: standin.connect(database)), retry_horizon=3600)
+    counter.record(1, 2)
+    assert counter.flush() == 1
+    ids = {row[0] for row in raw.execute("SELECT BatchID FROM NFT_View_Flushes")}
+    assert "old" not in ids and "recent" in ids and len(ids) == 2
+
+
+def test_batch_not_flushed_within_the_retry_horizon_is_dropped(database):
+    down = [True]
+
+    def connect():
+        if down[0]:
+            raise ConnectionError("database unreachable")
+        return standin.connect(database)
+
+    counter = ViewCounter(ConnectionPool(connect), retry_horizon=0)
+    counter.record(1, 2)
+    assert counter.flush() == 0
+    assert counter.stats()["pending"] == 1
+
+    down[0] = False
+    counter.flush()
+    assert counter.stats() == {"pending": 0, "flushed": 0, "failed_flushes": 1, "dropped": 1, "rejected": 0}
+    assert counter.unflushed(1) == 0
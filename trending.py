@@ -0,0 +1,297 @@
+import heapq
+import threading
+import time
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Event kind -> its weight in the trending score
+WEIGHTS = {"view": 1, "like": 3, "bid": 5, "sale": 10}
+
+# Window -> (bucket width in seconds, number of buckets); a window slides a bucket at a time
+WINDOWS = {"1h": (60, 60), "24h": (900, 96), "7d": (3600, 168)}
+LONGEST = max(width * count for width, count in WINDOWS.values())
+
+DIMENSIONS = ("nft", "collection")
+
+# Event kind -> (table, aliased `e`; its ID column, or None; its time column; the join to
+# NFTs `n`). Likes have no ID column, so they are read from a LikedAt watermark instead
+_SOURCES = {
+    "view": ("NFT_Views", "ViewID", "ViewedAt", "INNER JOIN NFTs n ON n.NFTID = e.NFTID"),
+    "like": ("Likes", None, "LikedAt", "INNER JOIN NFTs n ON n.NFTID = e.NFTID"),
+    "bid": ("Bids", "BidID", "BidAt",
+            "INNER JOIN Listings li ON li.ListingID = e.ListingID INNER JOIN NFTs n ON n.NFTID = li.NFTID"),
+    "sale": ("Transactions", "TransactionID", "TransactionDate", "INNER JOIN NFTs n ON n.NFTID = e.NFTID"),
+}
+
+
+def _epoch(value: Any) -> Optional[float]:
+    # pyodbc returns datetimes; text (the SQLite stand-in) is parsed
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return value.timestamp()
+
+
+class _Ring:
+    """Scores per key over one window, in a ring of time buckets.
+
+    add() counts into the bucket its time falls in and into a running total per
+    key; advance() retires the buckets that slid out of the window by subtracting
+    them from the totals. The `k` keys with the highest totals are kept as scores
+    grow, and ranked again from the totals when buckets retire, the only time
+    scores go down.
+    """
+
+    __slots__ = ("width", "count", "k", "slots", "head", "totals", "top", "floor")
+
+    def __init__(self, width: int, count: int, k: int):
+        self.width = width
+        self.count = count
+        self.k = k
+        self.slots: List[Dict[Hashable, int]] = [{} for _ in range(count)]
+        self.head: Optional[int] = None  # bucket number (time // width) of the newest bucket
+        self.totals: Dict[Hashable, int] = {}
+        self.top: Dict[Hashable, int] = {}  # the k keys with the highest totals (all of them if fewer)
+        self.floor = 0  # lowest score in top once it holds k keys
+
+    def advance(self, bucket: int) -> None:
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        for number in range(self.head + 1, min(bucket, self.head + self.count) + 1):
+            slot = self.slots[number % self.count]
+            for key, score in slot.items():
+                left = self.totals[key] - score
+                if left > 0:
+                    self.totals[key] = left
+                else:
+                    del self.totals[key]
+            slot.clear()
+        self.head = bucket
+        self._rank()
+
+    def add(self, key: Hashable, score: int, bucket: int, rank: bool = True) -> bool:
+        # rank=False leaves `top` stale, for bulk loads that call _rank() once at the end
+        if self.head is None or bucket > self.head:
+            self.advance(bucket)
+        elif bucket <= self.head - self.count:
+            return False  # Already out of the window
+        slot = self.slots[bucket % self.count]
+        slot[key] = slot.get(key, 0) + score
+        total = self.totals[key] = self.totals.get(key, 0) + score
+        if rank:
+            self._promote(key, total)
+        return True
+
+    def _promote(self, key: Hashable, total: int) -> None:
+        top = self.top
+        if key in top:
+            previous = top[key]
+            top[key] = total
+            if previous == self.floor and len(top) == self.k:
+                self.floor = min(top.values())
+        elif len(top) < self.k:
+            top[key] = total
+            if len(top) == self.k:
+                self.floor = min(top.values())
+        elif total > self.floor:
+            del top[min(top, key=top.__getitem__)]
+            top[key] = total
+            self.floor = min(top.values())
+
+    def _rank(self) -> None:
+        self.top = dict(heapq.nlargest(self.k, self.totals.items(), key=itemgetter(1)))
+        self.floor = min(self.top.values()) if len(self.top) == self.k else 0
+
+    def leaders(self, limit: int) -> List[Tuple[Hashable, int]]:
+        return sorted(self.top.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+class TrendingIndex:
+    """Trending NFTs and collections over the last hour, day and week.
+
+    Views, likes, bids and sales are weighted (WEIGHTS) and counted per NFT and
+    per collection in one _Ring per window, so recording an event and reading a
+    leaderboard cost the same however many events the window holds. The events
+    come from their append-only tables: load() rebuilds the rings from the
+    longest window's worth of NFT_Views, Likes, Bids and Transactions, and sync()
+    reads the rows added since, by ID (by LikedAt for Likes). Every worker reads
+    the same rows, so each counts every event once whichever worker took it.
+
+    A row committed out of ID order after sync() passed its ID is missed until
+    the next load(), due every `max_age` seconds.
+    """
+
+    def __init__(self, k: int = 100, max_age: float = 3600.0, clock=time.time):
+        self.k = k
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.ready = False
+        self.events = 0
+        self.built_at = 0.0
+        self._rings = self._new_rings()
+        self._watermarks: Dict[str, Any] = {}
+        self._likes_at_watermark: set = set()  # (UserID, NFTID) of the likes at the LikedAt watermark
+
+    def _new_rings(self) -> Dict[Tuple[str, str], _Ring]:
+        return {(dimension, window): _Ring(width, count, self.k)
+                for dimension in DIMENSIONS for window, (width, count) in WINDOWS.items()}
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > self.max_age
+
+    @staticmethod
+    def _record(rings, weight: int, nft_id: int, collection_id: Optional[int], at: float, rank: bool = True) -> None:
+        for (dimension, _), ring in rings.items():
+            key = nft_id if dimension == "nft" else collection_id
+            if key is not None:
+                ring.add(key, weight, int(at // ring.width), rank)
+
+    def record(self, kind: str, nft_id: int, collection_id: Optional[int], at: float) -> None:
+        """Counts one event; `at` is its time in seconds since the epoch."""
+        with self._lock:
+            self._record(self._rings, WEIGHTS[kind], nft_id, collection_id, at)
+            self.events += 1
+
+    # --- building ---
+
+    def load(self, cursor, chunk_size: int = 5000) -> int:
+        """Rebuilds every window from the events of the last LONGEST seconds.
+
+        Returns the number of events counted. Leaderboards show the old counts
+        until it is done.
+        """
+        now = self._clock()
+        since = datetime.fromtimestamp(now - LONGEST)
+        rings = self._new_rings()
+        for ring in rings.values():
+            ring.advance(int(now // ring.width))
+
+        watermarks: Dict[str, Any] = {}
+        events = 0
+        likes = []
+        for kind, (table, id_column, time_column, join) in _SOURCES.items():
+            weight = WEIGHTS[kind]
+            if id_column is not None:
+                # The watermark first: rows added meanwhile are left to sync()
+                cursor.execute(f"SELECT MAX({id_column}) FROM {table}")
+                watermarks[kind] = cursor.fetchone()[0] or 0
+                cursor.execute(f"""
+                    SELECT n.NFTID, n.CollectionID, e.{time_column}
+                    FROM {table} e {join}
+                    WHERE e.{time_column} >= CAST(? AS DATETIME) AND e.{id_column} <= ?
+                """, (since, watermarks[kind]))
+            else:
+                cursor.execute(f"""
+                    SELECT n.NFTID, n.CollectionID, e.{time_column}, e.UserID
+                    FROM {table} e {join}
+                    WHERE e.{time_column} >= CAST(? AS DATETIME)
+                """, (since,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    at = _epoch(row[2])
+                    if at is not None:
+                        self._record(rings, weight, row[0], row[1], at, rank=False)
+                        events += 1
+                if id_column is None:
+                    likes.extend(rows)
+        for ring in rings.values():
+            ring._rank()
+        like_mark, likes_at_mark = self._like_watermark(since, set(), likes)
+        watermarks["like"] = like_mark
+
+        with self._lock:
+            self._rings = rings
+            self._watermarks = watermarks
+            self._likes_at_watermark = likes_at_mark
+            self.events = events
+            self.built_at = time.monotonic()
+            self.ready = True
+        return events
+
+    @staticmethod
+    def _like_watermark(mark: Any, at_mark: set, rows: List[tuple]) -> Tuple[Any, set]:
+        # The latest LikedAt read so far, and the (UserID, NFTID) of the likes at it, which
+        # the next sync() reads again (>=) and skips
+        latest = _epoch(mark)
+        for row in rows:
+            at = _epoch(row[2])
+            if at is not None and at > latest:
+                mark, latest, at_mark = row[2], at, set()
+        at_mark = set(at_mark)
+        at_mark.update((row[3], row[0]) for row in rows if _epoch(row[2]) == latest)
+        return mark, at_mark
+
+    def sync(self, cursor) -> int:
+        """Counts the events added since the last load() or sync(); returns how many."""
+        with self._lock:
+            watermarks = dict(self._watermarks)
+            likes_at_mark = self._likes_at_watermark
+
+        batches = []
+        for kind, (table, id_column, time_column, join) in _SOURCES.items():
+            if id_column is not None:
+                cursor.execute(f"""
+                    SELECT n.NFTID, n.CollectionID, e.{time_column}, e.{id_column}
+                    FROM {table} e {join}
+                    WHERE e.{id_column} > ?
+                    ORDER BY e.{id_column}
+                """, (watermarks[kind],))
+                rows = cursor.fetchall()
+                if rows:
+                    watermarks[kind] = rows[-1][3]
+            else:
+                cursor.execute(f"""
+                    SELECT n.NFTID, n.CollectionID, e.{time_column}, e.UserID
+                    FROM {table} e {join}
+                    WHERE e.{time_column} >= CAST(? AS DATETIME)
+                """, (watermarks[kind],))
+                rows = [row for row in cursor.fetchall() if (row[3], row[0]) not in likes_at_mark]
+                watermarks[kind], likes_at_mark = self._like_watermark(watermarks[kind], likes_at_mark, rows)
+            batches.append((WEIGHTS[kind], rows))
+
+        now = self._clock()
+        added = 0
+        with self._lock:
+            for weight, rows in batches:
+                for row in rows:
+                    at = _epoch(row[2])
+                    if at is not None:
+                        self._record(self._rings, weight, row[0], row[1], at)
+                        added += 1
+            for ring in self._rings.values():
+                ring.advance(int(now // ring.width))
+            self._watermarks = watermarks
+            self._likes_at_watermark = likes_at_mark
+            self.events += added
+        return added
+
+    # --- queries ---
+
+    def top(self, window: str, dimension: str = "nft", limit: int = 20) -> List[Tuple[int, int]]:
+        """[(NFTID or CollectionID, score)] with the highest scores in `window`, highest first."""
+        if window not in WINDOWS or dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown window {window!r} or dimension {dimension!r}")
+        now = self._clock()
+        with self._lock:
+            ring = self._rings[(dimension, window)]
+            ring.advance(int(now // ring.width))
+            return ring.leaders(min(limit, self.k))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "events": self.events,
+                "keys": {f"{dimension}/{window}": len(ring.totals) for (dimension, window), ring in self._rings.items()},
+                "watermarks": {kind: str(mark) for kind, mark in self._watermarks.items()},
+                "age_seconds": round(time.monotonic() - self.built_at, 1) if self.ready else None,
+            }
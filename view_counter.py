@@ -0,0 +1,221 @@
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from db_pool import ConnectionPool
+
+# Errors about the rows themselves (a ViewerID or NFTID that doesn't exist, a value out of
+# range): pyodbc and sqlite3 both name them so, and retrying the same rows can't succeed
+REJECTED_ERRORS = ("IntegrityError", "DataError")
+
+REBUILD_BATCH = """
+DELETE FROM NFT_View_Counts;
+INSERT INTO NFT_View_Counts (NFTID, ViewCount)
+SELECT NFTID, COUNT(*) FROM NFT_Views GROUP BY NFTID
+"""
+
+
+def rebuild_view_counts(cursor) -> None:
+    # Recounts the rollup from NFT_Views, e.g. after views were bulk loaded
+    cursor.execute(REBUILD_BATCH)
+
+
+class _Batch:
+    __slots__ = ("batch_id", "events", "counts", "created")
+
+    def __init__(self, events: List[Tuple[int, int, datetime]]):
+        # The id makes a retried flush idempotent (see NFT_View_Flushes)
+        self.batch_id = str(uuid.uuid4())
+        self.events = events
+        self.counts = Counter(nft_id for nft_id, _, _ in events)
+        self.created = datetime.now()
+
+
+class ViewCounter:
+    """Write-behind NFT view counting.
+
+    Page views are buffered in memory and flushed in batches: the raw rows go to
+    NFT_Views and per-NFT totals are added to the NFT_View_Counts rollup, in one
+    transaction that also records the batch id in NFT_View_Flushes. A batch whose
+    commit outcome is unknown is retried with the same id, so it is never counted
+    twice. A batch the database rejects outright is split in halves, down to the
+    views it rejects, which are dropped. Readers add unflushed() to the rollup
+    value for an up-to-date count.
+
+    Batches are retried for at most `retry_horizon` seconds and then dropped.
+    Each flush deletes the batch ids recorded more than twice that long ago, so
+    NFT_View_Flushes stays small and keeps every id a retry could still use,
+    even with some clock skew between workers.
+    """
+
+    def __init__(self, pool: ConnectionPool, flush_interval: float = 5.0, max_pending: int = 100_000,
+                 retry_horizon: float = 3600.0):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retry_horizon = retry_horizon
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._events: List[Tuple[int, int, datetime]] = []
+        self._unflushed: Dict[int, int] = {}
+        self._retry: Optional[_Batch] = None
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def record(self, nft_id: int, viewer_id: int) -> None:
+        with self._lock:
+            if len(self._events) >= self.max_pending:
+                # The database has been unreachable for a while; shed load instead of growing
+                self.dropped += 1
+                return
+            self._events.append((nft_id, viewer_id, datetime.now()))
+            self._unflushed[nft_id] = self._unflushed.get(nft_id, 0) + 1
+            if len(self._events) >= self.max_pending // 2:
+                self._wake.set()
+
+    def unflushed(self, nft_id: int) -> int:
+        return self._unflushed.get(nft_id, 0)
+
+    def flush(self) -> int:
+        # Returns the number of views written; failures are kept for the next attempt
+        with self._flush_lock:
+            written = 0
+            if self._retry is not None:
+                batch, self._retry = self._retry, None
+                if (datetime.now() - batch.created).total_seconds() > self.retry_horizon:
+                    # Its id may be gone from NFT_View_Flushes, so a retry could count it twice
+                    print(f"Dropping {len(batch.events)} NFT views not flushed within {self.retry_horizon:.0f}s")
+                    self._settle(batch.counts)
+                    self.dropped += len(batch.events)
+                else:
+                    written, self._retry = self._write_or_split(batch)
+                    if self._retry is not None:
+                        return written
+
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return written
+
+            views, self._retry = self._write_or_split(_Batch(events))
+            return written + views
+
+    def _write_or_split(self, batch: _Batch) -> Tuple[int, Optional[_Batch]]:
+        # (views written, the batch to retry after a transient failure)
+        error = self._write(batch)
+        if error is None:
+            return len(batch.events), None
+        if type(error).__name__ not in REJECTED_ERRORS:
+            return 0, batch
+        if len(batch.events) == 1:
+            print(f"Dropping NFT view {batch.events[0]}: {error}")
+            self._settle(batch.counts)
+            self.rejected += 1
+            return 0, None
+
+        # Nothing of a rejected batch committed, so its halves can go under new ids
+        half = len(batch.events) // 2
+        written, retry = self._write_or_split(_Batch(batch.events[:half]))
+        if retry is not None:
+            # The second half goes back to the buffer (it is still in unflushed())
+            with self._lock:
+                self._events[:0] = batch.events[half:]
+            return written, retry
+        views, retry = self._write_or_split(_Batch(batch.events[half:]))
+        return written + views, retry
+
+    def _write(self, batch: _Batch) -> Optional[Exception]:
+        # None once the batch is committed, otherwise the error
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                if hasattr(cursor, "fast_executemany"):
+                    cursor.fast_executemany = True
+                try:
+                    now = datetime.now()
+                    cursor.execute("INSERT INTO NFT_View_Flushes (BatchID, FlushedAt) VALUES (?, ?)",
+                                   (batch.batch_id, now))
+                except Exception as e:
+                    if type(e).__name__ != "IntegrityError":
+                        raise
+                    # An earlier attempt committed even though we saw an error
+                else:
+                    cursor.executemany(
+                        "INSERT INTO NFT_Views (NFTID, ViewerID, ViewedAt) VALUES (?, ?, ?)",
+                        batch.events,
+                    )
+                    totals = sorted(batch.counts.items())
+                    cursor.executemany("""
+                        INSERT INTO NFT_View_Counts (NFTID, ViewCount)
+                        SELECT ?, 0 WHERE NOT EXISTS (SELECT 1 FROM NFT_View_Counts WHERE NFTID = ?)
+                    """, [(nft_id, nft_id) for nft_id, _ in totals])
+                    cursor.executemany(
+                        "UPDATE NFT_View_Counts SET ViewCount = ViewCount + ? WHERE NFTID = ?",
+                        [(views, nft_id) for nft_id, views in totals],
+                    )
+                    cursor.execute("DELETE FROM NFT_View_Flushes WHERE FlushedAt < ?",
+                                   (now - timedelta(seconds=2 * self.retry_horizon),))
+                    conn.commit()
+        except Exception as e:
+            print(f"Error flushing {len(batch.events)} NFT views: {e}")
+            self.failed_flushes += 1
+            return e
+
+        self._settle(batch.counts)
+        self.flushed += len(batch.events)
+        return None
+
+    def _settle(self, counts: Counter) -> None:
+        # Views written or dropped no longer count as unflushed
+        with self._lock:
+            for nft_id, views in counts.items():
+                remaining = self._unflushed.get(nft_id, 0) - views
+                if remaining > 0:
+                    self._unflushed[nft_id] = remaining
+                else:
+                    self._unflushed.pop(nft_id, None)
+
+    # Background flushing
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # Final flush so views buffered at shutdown are not lost
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._events) + (len(self._retry.events) if self._retry else 0)
+        return {
+            "pending": pending,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }